@@ -93,6 +93,86 @@ class ClustalIterator(AlignmentIterator):
 
     _header = None  # for caching lines between __next__ calls
 
+    # Whitelisted headers we know about
+    _known_headers = ['CLUSTAL', 'PROBCONS', 'MUSCLE', 'MSAPROBS', 'Kalign']
+
+    def _blocks(self):
+        """Iterate over the blocks of the next alignment (PRIVATE).
+
+        This is a generator function returning (ids, fragments, annotations)
+        tuples, one for each interleaved block in the file, where fragments
+        is a list of the sequence strings in that block (in the same order
+        as the ids), and annotations is a dictionary of per-column strings
+        (here just the "clustal_consensus" line).  Unlike __next__, the
+        sequences are never concatenated, so memory use is bounded by the
+        size of a single block.  Used by Bio.AlignIO.parse_windows().
+        """
+        handle = self.handle
+
+        if self._header is None:
+            line = handle.readline()
+        else:
+            line = self._header
+            self._header = None
+        if not line:
+            return
+        if line.strip().split()[0] not in self._known_headers:
+            raise ValueError("%s is not a known CLUSTAL header: %s" %
+                             (line.strip().split()[0],
+                              ", ".join(self._known_headers)))
+
+        ids = None
+        while True:
+            line = handle.readline()
+            while line and not line.strip():
+                line = handle.readline()
+            if not line:
+                break  # end of file
+            if line.split(None, 1)[0] in self._known_headers:
+                # Found concatenated alignment.
+                self._header = line
+                break
+
+            names = []
+            fragments = []
+            seq_cols = None
+            while line and line[0] not in " \r\n":
+                fields = line.rstrip().split()
+                # We expect there to be two fields, there can be an optional
+                # "sequence number" field containing the letter count.
+                if len(fields) < 2 or len(fields) > 3:
+                    raise ValueError("Could not parse line:\n%s" % line)
+                if seq_cols is None:
+                    start = len(fields[0]) + \
+                        line[len(fields[0]):].find(fields[1])
+                    seq_cols = slice(start, start + len(fields[1]))
+                names.append(fields[0])
+                fragments.append(fields[1])
+                line = handle.readline()
+
+            width = len(fragments[0])
+            for fragment in fragments:
+                if len(fragment) != width:
+                    raise ValueError("Sequences have different lengths "
+                                     "within a block")
+            if ids is None:
+                ids = names
+                if self.records_per_alignment is not None and \
+                        self.records_per_alignment != len(ids):
+                    raise ValueError("Found %i records in this alignment, "
+                                     "told to expect %i"
+                                     % (len(ids), self.records_per_alignment))
+            elif names != ids:
+                raise ValueError("Identifiers out of order? "
+                                 "Got %r but expected %r" % (names, ids))
+
+            annotations = {}
+            if line and line[0] == " ":
+                # Sequence consensus line (trailing spaces may be missing)
+                consensus = line.rstrip("\r\n")[seq_cols]
+                annotations["clustal_consensus"] = consensus.ljust(width)
+            yield ids, fragments, annotations
+
     def __next__(self):
         handle = self.handle
 
@@ -107,8 +187,7 @@ class ClustalIterator(AlignmentIterator):
         if not line:
             raise StopIteration
 
-        # Whitelisted headers we know about
-        known_headers = ['CLUSTAL', 'PROBCONS', 'MUSCLE', 'MSAPROBS', 'Kalign']
+        known_headers = self._known_headers
         if line.strip().split()[0] not in known_headers:
             raise ValueError("%s is not a known CLUSTAL header: %s" %
                              (line.strip().split()[0],
@@ -34,6 +34,7 @@ A 1-column wide alignment would have ``start == end``.
 """
 import os
 from itertools import islice
+from collections import OrderedDict
 
 try:
     from sqlite3 import dbapi2 as _sqlite
@@ -51,6 +52,9 @@ from .Interfaces import SequentialAlignmentWriter
 
 MAFINDEX_VERSION = 2
 
+# Number of rows written to the SQLite index per executemany call
+_INSERT_BATCH_SIZE = 10000
+
 
 class MafWriter(SequentialAlignmentWriter):
     """Accepts a MultipleSeqAlignment object, writes a MAF file."""
@@ -241,11 +245,19 @@ class MafIndex(object):
     The index is a sqlite3 database that is built upon creation of the object
     if necessary, and queried when methods *search* or *get_spliced* are
     used.
+
+    The most recently parsed alignment blocks are kept in memory (up to
+    *cache_size* of them, use zero to disable this), so that repeated or
+    overlapping queries do not need to re-read and re-parse the MAF file.
+    Note this means repeated searches may return the same
+    *MultipleSeqAlignment* objects, which should therefore not be modified.
     """
 
-    def __init__(self, sqlite_file, maf_file, target_seqname):
+    def __init__(self, sqlite_file, maf_file, target_seqname, cache_size=100):
         """Indexes or loads the index of a MAF file."""
         self._target_seqname = target_seqname
+        self._cache_size = cache_size
+        self._record_cache = OrderedDict()
         # example: Tests/MAF/ucsc_mm9_chr10.mafindex
         self._index_filename = sqlite_file
         # example: /home/bli/src/biopython/Tests/MAF
@@ -350,13 +362,19 @@ class MafIndex(object):
                           (mafpath,))
         self._con.execute("CREATE TABLE offset_data (bin INTEGER, start INTEGER, end INTEGER, offset INTEGER);")
 
+        self._con.commit()
+
         insert_count = 0
 
-        # iterate over the entire file and insert in batches
+        # iterate over the entire file and insert in large batches, all
+        # within a single transaction (committing each small batch made
+        # SQLite sync to disk every time, which dominated the run time on
+        # whole genome alignments). The record_count of -1 marks the index
+        # as unfinished until the final commit.
         mafindex_func = self.__maf_indexer()
 
         while True:
-            batch = list(islice(mafindex_func, 100))
+            batch = list(islice(mafindex_func, _INSERT_BATCH_SIZE))
             if not batch:
                 break
 
@@ -364,7 +382,6 @@ class MafIndex(object):
             # which yields zero-based "inclusive" start and end coordinates
             self._con.executemany(
                 "INSERT INTO offset_data (bin, start, end, offset) VALUES (?,?,?,?);", batch)
-            self._con.commit()
             insert_count += len(batch)
 
         # then make indexes on the relevant fields
@@ -403,16 +420,17 @@ class MafIndex(object):
                                          % (self._target_seqname,))
                     elif line.startswith("s"):
                         # s (literal), src (ID), start, size, strand, srcSize, text (sequence)
-                        line_split = line.strip().split()
+                        line_split = line.split()
 
                         if line_split[1] == self._target_seqname:
                             start = int(line_split[2])
                             size = int(line_split[3])
-                            if size != len(line_split[6].replace("-", "")):
+                            text = line_split[6]
+                            letters = len(text) - text.count("-")
+                            if size != letters:
                                 raise ValueError(
                                     "Invalid length for target coordinates "
-                                    "(expected %s, found %s)" % (
-                                        size, len(line_split[6].replace("-", ""))))
+                                    "(expected %s, found %s)" % (size, letters))
 
                             # "inclusive" end position is start + length - 1
                             end = start + size - 1
@@ -467,20 +485,30 @@ class MafIndex(object):
         return 0
 
     def _get_record(self, offset):
-        """Retrieve a single MAF record located at the offset provided (PRIVATE)."""
-        self._maf_fp.seek(offset)
-        return next(self._mafiter)
-
-    def search(self, starts, ends):
-        """Search index database for MAF records overlapping ranges provided.
-
-        Returns *MultipleSeqAlignment* results in order by start, then end, then
-        internal offset field.
+        """Retrieve a single MAF record located at the offset provided (PRIVATE).
 
-        *starts* should be a list of 0-based start coordinates of segments in the reference.
-        *ends* should be the list of the corresponding segment ends
-        (in the half-open UCSC convention:
-        http://genome.ucsc.edu/blog/the-ucsc-genome-browser-coordinate-counting-systems/).
+        Recently parsed records are returned from the cache.
+        """
+        cache = self._record_cache
+        try:
+            record = cache.pop(offset)
+        except KeyError:
+            self._maf_fp.seek(offset)
+            record = next(self._mafiter)
+        if self._cache_size > 0:
+            # Re-inserting moves the record to the end (most recent)
+            cache[offset] = record
+            if len(cache) > self._cache_size:
+                cache.popitem(last=False)
+        return record
+
+    def _find_blocks(self, starts, ends):
+        """Return the index rows for all blocks overlapping the regions (PRIVATE).
+
+        Returns a list of (start, end, offset) tuples sorted by start, then
+        end, then offset, with zero-based "inclusive" start and end
+        coordinates. Each block is listed once, even if it overlaps more than
+        one of the regions.
         """
         # verify the provided exon coordinates
         if len(starts) != len(ends):
@@ -494,10 +522,10 @@ class MafIndex(object):
                     exonstart, exonend, exonlen))
         con = self._con
 
-        # Keep track of what blocks have already been yielded
+        # Keep track of what blocks have already been found
         # in order to avoid duplicating them
         # (see https://github.com/biopython/biopython/issues/1083)
-        yielded_rec_coords = set([])
+        rows = {}
         # search for every exon
         for exonstart, exonend in zip(starts, ends):
             try:
@@ -532,34 +560,48 @@ class MafIndex(object):
                 "ORDER BY start, end, offset ASC;" %
                 (possible_bins, exonstart, exonend - 1, exonend - 1))
 
-            rows = result.fetchall()
-
             # rows come from the sqlite index,
             # which should have been written using __make_new_index,
             # so rec_start and rec_end should be zero-based "inclusive" coordinates
-            for rec_start, rec_end, offset in rows:
-                # Avoid yielding multiple time the same block
-                if (rec_start, rec_end) in yielded_rec_coords:
-                    continue
-                else:
-                    yielded_rec_coords.add((rec_start, rec_end))
-                # Iterate through hits, fetching alignments from the MAF file
-                # and checking to be sure we've retrieved the expected record.
+            for rec_start, rec_end, offset in result:
+                # Only keep the first block found with these coordinates
+                if (rec_start, rec_end) not in rows:
+                    rows[rec_start, rec_end] = offset
 
-                fetched = self._get_record(int(offset))
+        return sorted((rec_start, rec_end, offset)
+                      for (rec_start, rec_end), offset in rows.items())
 
-                for record in fetched:
-                    if record.id == self._target_seqname:
-                        # start and size come from the maf lines
-                        start = record.annotations["start"]
-                        # "inclusive" end is start + length - 1
-                        end = start + record.annotations["size"] - 1
+    def search(self, starts, ends):
+        """Search index database for MAF records overlapping ranges provided.
+
+        Returns *MultipleSeqAlignment* results in order by start, then end, then
+        internal offset field.
+
+        *starts* should be a list of 0-based start coordinates of segments in the reference.
+        *ends* should be the list of the corresponding segment ends
+        (in the half-open UCSC convention:
+        http://genome.ucsc.edu/blog/the-ucsc-genome-browser-coordinate-counting-systems/).
+        """
+        # All the index queries are done up front, so that each block is
+        # parsed once even if it overlaps several of the requested regions
+        for rec_start, rec_end, offset in self._find_blocks(starts, ends):
+            # Iterate through hits, fetching alignments from the MAF file
+            # and checking to be sure we've retrieved the expected record.
+
+            fetched = self._get_record(int(offset))
 
-                        if not (start == rec_start and end == rec_end):
-                            raise ValueError("Expected %s-%s @ offset %s, found %s-%s" %
-                                             (rec_start, rec_end, offset, start, end))
+            for record in fetched:
+                if record.id == self._target_seqname:
+                    # start and size come from the maf lines
+                    start = record.annotations["start"]
+                    # "inclusive" end is start + length - 1
+                    end = start + record.annotations["size"] - 1
 
-                yield fetched
+                    if not (start == rec_start and end == rec_end):
+                        raise ValueError("Expected %s-%s @ offset %s, found %s-%s" %
+                                         (rec_start, rec_end, offset, start, end))
+
+            yield fetched
 
     def get_spliced(self, starts, ends, strand=1):
         """Return a multiple alignment of the exact sequence range provided.
@@ -640,36 +682,44 @@ class MafIndex(object):
                     # This is length in terms of actual letters in the reference
                     total_rec_length += ungapped_length
 
-                    # blank out these positions for every seqname
-                    for seqrec in multiseq:
-                        for pos in range(rec_start, rec_end + 1):
-                            split_by_position[seqrec.id][pos] = ""
-
+                    target_seq = str(seqrec.seq)
                     break
             # http://psung.blogspot.fr/2007/12/for-else-in-python.html
             # https://docs.python.org/2/tutorial/controlflow.html#break-and-continue-statements-and-else-clauses-on-loops
             else:
                 raise ValueError("Did not find %s in alignment bundle" % (self._target_seqname,))
 
-            # the true, chromosome/contig/etc position in the target seqname
-            real_pos = rec_start
-
-            # loop over the alignment to fill split_by_position
-            for gapped_pos in range(0, rec_length):
-                for seqrec in multiseq:
-                    # keep track of this position's value for the target seqname
-                    if seqrec.id == self._target_seqname:
-                        track_val = seqrec.seq[gapped_pos]
-
-                    # Here, a real_pos that corresponds to just after a series of "-"
-                    # in the reference will "accumulate" the letters found in other sequences
-                    # in front of the "-"s
-                    split_by_position[seqrec.id][real_pos] += seqrec.seq[gapped_pos]
-
-                # increment the real_pos counter only when non-gaps are found in
-                # the target_seqname, and we haven't reached the end of the record
-                if track_val != "-" and real_pos < rec_end:
-                    real_pos += 1
+            # Find where to cut the alignment columns into the fragments for
+            # each reference position. A real_pos that corresponds to just
+            # after a series of "-" in the reference will "accumulate" the
+            # letters found in other sequences in front of the "-"s, while
+            # the last position also takes any trailing columns.
+            cuts = [0]
+            for gapped_pos, letter in enumerate(target_seq):
+                if letter != "-":
+                    cuts.append(gapped_pos + 1)
+            del cuts[rec_end - rec_start + 1:]
+            cuts.append(rec_length)
+            if len(cuts) < rec_end - rec_start + 2:
+                # Fewer letters than the declared size; the remaining
+                # positions (as in the original per-column loop) stay empty
+                cuts.extend([rec_length] * (rec_end - rec_start + 2 - len(cuts)))
+            positions = range(rec_start, rec_end + 1)
+
+            # Slice every sequence at once rather than column by column,
+            # overwriting anything from previous blocks at these positions
+            block_fragments = {}
+            for seqrec in multiseq:
+                seq = str(seqrec.seq)
+                fragments = [seq[cuts[i]:cuts[i + 1]]
+                             for i in range(len(cuts) - 1)]
+                if seqrec.id in block_fragments:
+                    # Repeated identifier, letters accumulate
+                    fragments = [a + b for a, b in
+                                 zip(block_fragments[seqrec.id], fragments)]
+                block_fragments[seqrec.id] = fragments
+            for seqid, fragments in block_fragments.items():
+                split_by_position[seqid].update(zip(positions, fragments))
 
         # make sure the number of bp entries equals the sum of the record lengths
         if len(split_by_position[self._target_seqname]) != total_rec_length:
@@ -694,20 +744,17 @@ class MafIndex(object):
 
             # iterate from start to end, taking bases from split_by_position when
             # they exist, using N or - for gaps when there is no alignment.
-            append = seq_splice.append
 
             for exonstart, exonend in zip(starts, ends):
                 # exonend is exclusive
-                for real_pos in range(exonstart, exonend):
-                    # if this seqname has this position, add it
-                    if real_pos in seq_split:
-                        append(seq_split[real_pos])
-                    # if not, but it's in the target_seqname, add length-matched filler
-                    elif real_pos in realpos_to_len:
-                        append(filler_char * realpos_to_len[real_pos])
-                    # it's not in either, so add a single filler character
-                    else:
-                        append(filler_char)
+                exon_splice = list(map(seq_split.get, range(exonstart, exonend)))
+                if None in exon_splice:
+                    for i, letters in enumerate(exon_splice):
+                        if letters is None:
+                            # if not, but it's in the target_seqname, add length-matched
+                            # filler, otherwise add a single filler character
+                            exon_splice[i] = filler_char * realpos_to_len.get(exonstart + i, 1)
+                seq_splice.extend(exon_splice)
 
             subseq[seqid] = "".join(seq_splice)
 
@@ -185,6 +185,77 @@ class PhylipIterator(AlignmentIterator):
         seq = line[self.id_width:].strip().replace(' ', '')
         return seq_id, seq
 
+    def _blocks(self):
+        """Iterate over the blocks of the next alignment (PRIVATE).
+
+        This is a generator function returning (ids, fragments, annotations)
+        tuples, one for each interlaced block in the file, where fragments
+        is a list of the sequence strings in that block (in the same order
+        as the ids).  PHYLIP has no per-column annotation, so annotations is
+        always an empty dictionary.  Unlike __next__, the sequences are never
+        concatenated, so memory use is bounded by the size of a single block.
+        Used by Bio.AlignIO.parse_windows().
+        """
+        handle = self.handle
+
+        if self._header is None:
+            line = handle.readline()
+        else:
+            line = self._header
+            self._header = None
+        if not line:
+            return
+        if not self._is_header(line):
+            raise ValueError("First line should have two integers")
+        number_of_seqs, length_of_seqs = [int(x) for x in line.split()]
+
+        if self.records_per_alignment is not None and \
+                self.records_per_alignment != number_of_seqs:
+            raise ValueError("Found %i records in this alignment, "
+                             "told to expect %i"
+                             % (number_of_seqs, self.records_per_alignment))
+
+        ids = []
+        fragments = []
+        for i in range(number_of_seqs):
+            line = handle.readline().rstrip()
+            sequence_id, s = self._split_id(line)
+            ids.append(sequence_id)
+            fragments.append(s)
+        done = 0
+        line = ""
+        while True:
+            width = len(fragments[0])
+            for s in fragments:
+                if "." in s:
+                    raise ValueError(_NO_DOTS)
+                if len(s) != width:
+                    raise ValueError("Sequences have different lengths "
+                                     "within a block")
+            done += width
+            yield ids, fragments, {}
+
+            # Skip any blank lines between blocks...
+            while "" == line.strip():
+                line = handle.readline()
+                if not line:
+                    break  # end of file
+            if not line:
+                break  # end of file
+            if self._is_header(line):
+                # Looks like the start of a concatenated alignment
+                self._header = line
+                break
+            fragments = []
+            for i in range(number_of_seqs):
+                fragments.append(line.strip().replace(" ", ""))
+                line = handle.readline()
+                if (not line) and i + 1 < number_of_seqs:
+                    raise ValueError("End of file mid-block")
+        if done != length_of_seqs:
+            raise ValueError("Expected alignment length %i, found %i"
+                             % (length_of_seqs, done))
+
     def __next__(self):
         """Parse the next alignment from the handle."""
         handle = self.handle
@@ -371,6 +371,96 @@ class StockholmIterator(AlignmentIterator):
 
     _header = None  # for caching lines between __next__ calls
 
+    def _blocks(self):
+        """Iterate over the blocks of the next alignment (PRIVATE).
+
+        This is a generator function returning (ids, fragments, annotations)
+        tuples, one for each interleaved block in the file, where fragments
+        is a list of the sequence strings in that block (in the same order
+        as the ids), and annotations is a dictionary of the per-column #=GC
+        strings (using the same keys as the column_annotations from
+        __next__).  The per-file, per-sequence and per-residue (#=GF, #=GS
+        and #=GR) meta-data is ignored.  Unlike __next__, the sequences are
+        never concatenated, so memory use is bounded by the size of a single
+        block.  Used by Bio.AlignIO.parse_windows().
+        """
+        handle = self.handle
+
+        if self._header is None:
+            line = handle.readline()
+        else:
+            line = self._header
+            self._header = None
+        if not line:
+            return
+        if line.strip() != '# STOCKHOLM 1.0':
+            raise ValueError("Did not find STOCKHOLM header")
+
+        ids = None
+        names = []
+        fragments = []
+        gc = {}
+        while True:
+            raw = handle.readline()
+            line = raw.strip()
+            if line == '# STOCKHOLM 1.0':
+                # Found concatenated alignment (without a "//" line).
+                self._header = line
+            if not line or line == "//" or self._header is not None:
+                # End of block (blank line), alignment, or file
+                if fragments:
+                    width = len(fragments[0])
+                    for fragment in fragments:
+                        if len(fragment) != width:
+                            raise ValueError("Sequences have different "
+                                             "lengths within a block")
+                    if ids is None:
+                        ids = names
+                        if self.records_per_alignment is not None and \
+                                self.records_per_alignment != len(ids):
+                            raise ValueError("Found %i records in this "
+                                             "alignment, told to expect %i"
+                                             % (len(ids),
+                                                self.records_per_alignment))
+                    elif names != ids:
+                        raise ValueError("Identifiers out of order? "
+                                         "Got %r but expected %r"
+                                         % (names, ids))
+                    annotations = {}
+                    for k, v in gc.items():
+                        if len(v) != width:
+                            raise ValueError("%s length %i, expected %i"
+                                             % (k, len(v), width))
+                        if k in self.pfam_gc_mapping:
+                            k = self.pfam_gc_mapping[k]
+                        elif k.endswith("_cons") and \
+                                k[:-5] in self.pfam_gr_mapping:
+                            k = self.pfam_gr_mapping[k[:-5]]
+                        else:
+                            k = "GC:" + k
+                        annotations[k] = v
+                    yield ids, fragments, annotations
+                    names = []
+                    fragments = []
+                    gc = {}
+                if raw and not line:
+                    continue  # blank line between blocks
+                break
+            elif line[0] != "#":
+                # Sequence
+                # Format: "<seqname> <sequence>"
+                parts = [x.strip() for x in line.split(" ", 1)]
+                if len(parts) != 2:
+                    raise ValueError(
+                        "Could not split line into identifier "
+                        "and sequence:\n" + line)
+                names.append(parts[0])
+                fragments.append(parts[1].replace(".", "-"))
+            elif line[:5] == '#=GC ':
+                # Generic per-Column annotation, exactly 1 char per column
+                feature, text = line[5:].strip().split(None, 2)
+                gc[feature] = gc.get(feature, "") + text.strip()
+
     def __next__(self):
         """Parse the next alignment from the handle."""
         handle = self.handle
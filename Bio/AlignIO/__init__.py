@@ -146,7 +146,10 @@ from Bio._py3k import basestring
 
 from Bio.Align import MultipleSeqAlignment
 from Bio.Alphabet import Alphabet, AlphabetEncoder, _get_base_alphabet
+from Bio.Alphabet import single_letter_alphabet
 from Bio.File import as_handle
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
 
 from . import StockholmIO
 from . import ClustalIO
@@ -173,6 +176,14 @@ _FormatToIterator = {  # "fasta" is done via Bio.SeqIO
                      "stockholm": StockholmIO.StockholmIterator,
                      }
 
+# Formats which can be read block by block with parse_windows, these
+# iterator classes must provide a _blocks() generator method:
+_FormatToBlockIterator = {"clustal": ClustalIO.ClustalIterator,
+                          "phylip": PhylipIO.PhylipIterator,
+                          "phylip-relaxed": PhylipIO.RelaxedPhylipIterator,
+                          "stockholm": StockholmIO.StockholmIterator,
+                          }
+
 _FormatToWriter = {  # "fasta" is done via Bio.SeqIO
                      # "emboss" : EmbossIO.EmbossWriter, (unfinished)
                    "clustal": ClustalIO.ClustalWriter,
@@ -449,6 +460,206 @@ def read(handle, format, seq_count=None, alphabet=None):
     return first
 
 
+def _get_blocks(handle, format, seq_count=None, alphabet=None):
+    """Return a block generator for the first alignment in a handle (PRIVATE).
+
+    The generator returns (ids, fragments, annotations) tuples, see the
+    _blocks() methods of the supported alignment iterator classes.
+    """
+    from Bio import SeqIO
+
+    # Try and give helpful error messages:
+    if not isinstance(format, basestring):
+        raise TypeError("Need a string for the file format (lower case)")
+    if not format:
+        raise ValueError("Format required (lower case string)")
+    if format != format.lower():
+        raise ValueError("Format string '%s' should be lower case" % format)
+    if alphabet is not None and not (isinstance(alphabet, Alphabet) or
+                                     isinstance(alphabet, AlphabetEncoder)):
+        raise ValueError("Invalid alphabet, %s" % repr(alphabet))
+    if seq_count is not None and not isinstance(seq_count, int):
+        raise TypeError("Need integer for seq_count (sequences per alignment)")
+
+    if format in _FormatToBlockIterator:
+        iterator_class = _FormatToBlockIterator[format]
+    elif format in _FormatToIterator or format in SeqIO._FormatToIterator:
+        raise ValueError("Reading format '%s' is supported, but not "
+                         "block by block" % format)
+    else:
+        raise ValueError("Unknown format '%s'" % format)
+    if alphabet is None:
+        return iterator_class(handle, seq_count)._blocks()
+    return iterator_class(handle, seq_count, alphabet=alphabet)._blocks()
+
+
+def _window_alignment(ids, fragments, annotations, alphabet):
+    """Build a MultipleSeqAlignment for one column window (PRIVATE)."""
+    records = (SeqRecord(Seq(s, alphabet), id=i, name=i, description=i)
+               for (i, s) in zip(ids, fragments))
+    return MultipleSeqAlignment(records, alphabet,
+                                column_annotations=annotations)
+
+
+def parse_windows(handle, format, window=None, seq_count=None,
+                  alphabet=None):
+    """Iterate over column windows of an alignment file.
+
+    Arguments:
+     - handle    - handle to the file, or the filename as a string.
+     - format    - string describing the file format, one of "clustal",
+       "phylip", "phylip-relaxed" or "stockholm".
+     - window    - Optional integer, number of alignment columns in each
+       window.  If omitted (default) the blocks used in the file itself
+       are returned (i.e. one window per interleaved block).
+     - seq_count - Optional integer, number of sequences expected in the
+       alignment.
+     - alphabet  - optional Alphabet object.
+
+    This returns (start, alignment) tuples, where start is the (zero based)
+    column offset of the window within the full alignment, and alignment is
+    a MultipleSeqAlignment holding just those columns (including any per
+    column annotation from the file, like the Clustal consensus or the
+    Stockholm #=GC lines, but no per-sequence annotation).  The last window
+    may be shorter than requested.  Only the first alignment in the file is
+    read.
+
+    Unlike Bio.AlignIO.parse(), the full sequences are never held in memory,
+    so this can be used to compute per-window statistics on alignments with
+    millions of columns:
+
+    >>> from Bio import AlignIO
+    >>> for start, window in AlignIO.parse_windows("Clustalw/opuntia.aln",
+    ...                                            "clustal", 50):
+    ...     print("%i %i %s" % (start, window.get_alignment_length(),
+    ...                         window[0].seq[:10]))
+    0 50 TATACATTAA
+    50 50 TATATA----
+    100 50 AAAATATCTA
+    150 6 ACCAGA
+
+    Note that sequential formats, or Stockholm files without interleaved
+    blocks, hold each sequence on a single line so the whole alignment will
+    be loaded before the first window is returned.
+    """
+    if window is not None and (not isinstance(window, int) or window < 1):
+        raise ValueError("Window size should be a positive integer")
+
+    with as_handle(handle, 'rU') as fp:
+        blocks = _get_blocks(fp, format, seq_count, alphabet)
+        if alphabet is None:
+            alphabet = single_letter_alphabet
+
+        start = 0
+        if window is None:
+            for ids, fragments, annotations in blocks:
+                yield start, _window_alignment(ids, fragments, annotations,
+                                               alphabet)
+                start += len(fragments[0])
+            return
+
+        # Buffer the blocks as lists of strings (to avoid repeated string
+        # concatenation) until we have at least one full window.
+        rows = None
+        columns = {}
+        width = 0
+        for ids, fragments, annotations in blocks:
+            if rows is None:
+                rows = [[] for i in ids]
+                columns = dict((k, []) for k in annotations)
+            elif set(annotations) != set(columns):
+                raise ValueError("Per-column annotation differs between "
+                                 "blocks")
+            for row, fragment in zip(rows, fragments):
+                row.append(fragment)
+            for k, v in annotations.items():
+                columns[k].append(v)
+            width += len(fragments[0])
+            if width < window:
+                continue
+            rows = ["".join(row) for row in rows]
+            columns = dict((k, "".join(v)) for k, v in columns.items())
+            offset = 0
+            while width - offset >= window:
+                end = offset + window
+                yield start, _window_alignment(
+                    ids, [row[offset:end] for row in rows],
+                    dict((k, v[offset:end]) for k, v in columns.items()),
+                    alphabet)
+                start += window
+                offset = end
+            rows = [[row[offset:]] for row in rows]
+            columns = dict((k, [v[offset:]]) for k, v in columns.items())
+            width -= offset
+        if width:
+            yield start, _window_alignment(
+                ids, ["".join(row) for row in rows],
+                dict((k, "".join(v)) for k, v in columns.items()),
+                alphabet)
+
+
+def read_memmap(handle, format, filename, seq_count=None):
+    """Load an alignment into an on-disk memory-mapped character matrix.
+
+    Arguments:
+     - handle    - handle to the file, or the filename as a string.
+       A handle must support seek() as the file is read twice.
+     - format    - string describing the file format, one of "clustal",
+       "phylip", "phylip-relaxed" or "stockholm".
+     - filename  - name of the (binary) file to hold the matrix, this will
+       be overwritten if it already exists.
+     - seq_count - Optional integer, number of sequences expected in the
+       alignment.
+
+    Returns a tuple of the sequence identifiers (as a list of strings), and
+    a NumPy memmap array of single byte strings (dtype "S1") with one row
+    per sequence and one column per alignment column, in row-major (C)
+    order.  Only the first alignment in the file is read.
+
+    The alignment is written into the matrix block by block, so the full
+    sequences are never held in memory.  A first pass over the file is
+    used to find the dimensions of the alignment.  The matrix can later be
+    reopened with numpy.memmap using the same filename, dtype and shape.
+    For example::
+
+        from Bio import AlignIO
+        ids, matrix = AlignIO.read_memmap("big.aln", "clustal", "big.dat")
+        gaps_per_column = (matrix == b"-").sum(axis=0)
+
+    """
+    try:
+        import numpy
+    except ImportError:
+        from Bio import MissingPythonDependencyError
+        raise MissingPythonDependencyError(
+            "Please install NumPy if you want to use "
+            "Bio.AlignIO.read_memmap(). See http://www.numpy.org/")
+
+    with as_handle(handle, 'rU') as fp:
+        offset = fp.tell()
+        ids = None
+        length = 0
+        for ids, fragments, annotations in _get_blocks(fp, format,
+                                                       seq_count):
+            length += len(fragments[0])
+        if ids is None:
+            raise ValueError("No records found in handle")
+
+        matrix = numpy.memmap(filename, dtype="S1", mode="w+",
+                              shape=(len(ids), length))
+        fp.seek(offset)
+        start = 0
+        for ids, fragments, annotations in _get_blocks(fp, format,
+                                                       seq_count):
+            width = len(fragments[0])
+            block = "".join(fragments).encode("ascii")
+            matrix[:, start:start + width] = numpy.frombuffer(
+                block, dtype="S1").reshape(len(ids), width)
+            start += width
+        matrix.flush()
+    return ids, matrix
+
+
 def convert(in_file, in_format, out_file, out_format, alphabet=None):
     """Convert between two alignment files, returns number of alignments.
 
@@ -12,7 +12,9 @@ Bio.Cluster and the underlying C Clustering Library is described in
 M. de Hoon et al. (2004) https://doi.org/10.1093/bioinformatics/bth078
 """
 
+import multiprocessing
 import numbers
+import random
 
 try:
     import numpy
@@ -89,7 +91,8 @@ class Tree(_cluster.Tree):
 
 
 def kcluster(data, nclusters=2, mask=None, weight=None, transpose=False,
-             npass=1, method='a', dist='e', initialid=None):
+             npass=1, method='a', dist='e', initialid=None, threads=1,
+             seed=None):
     """Perform k-means clustering.
 
     This function performs k-means clustering on the values in data, and
@@ -131,6 +134,13 @@ def kcluster(data, nclusters=2, mask=None, weight=None, transpose=False,
        order in which items are assigned to clusters (i.e., using
        the same order as in the data matrix). In that case, the
        k-means algorithm is fully deterministic.
+     - threads: the number of threads performing the npass repetitions
+       concurrently (None meaning one per CPU).
+     - seed: the seed of the random initial clusterings, as an integer
+       between 0 and 2**32 - 1. Each repetition starts from a random
+       initial clustering determined by the seed and the number of the
+       repetition, so for a given seed the result does not depend on
+       the number of threads. If seed is None, a random seed is used.
 
     Return values:
      - clusterid: array containing the number of the cluster to which each
@@ -149,12 +159,16 @@ def kcluster(data, nclusters=2, mask=None, weight=None, transpose=False,
     mask = __check_mask(mask, shape)
     weight = __check_weight(weight, ndata)
     clusterid, npass = __check_initialid(initialid, npass, nitems)
+    threads = __check_threads(threads)
+    seed = __check_seed(seed)
     error, nfound = _cluster.kcluster(data, nclusters, mask, weight, transpose,
-                                      npass, method, dist, clusterid)
+                                      npass, method, dist, clusterid, threads,
+                                      seed)
     return clusterid, error, nfound
 
 
-def kmedoids(distance, nclusters=2, npass=1, initialid=None):
+def kmedoids(distance, nclusters=2, npass=1, initialid=None, threads=1,
+             seed=None):
     """Perform k-medoids clustering.
 
     This function performs k-medoids clustering, and returns the cluster
@@ -203,6 +217,13 @@ def kmedoids(distance, nclusters=2, npass=1, initialid=None):
        without randomizing the order in which items are assigned to
        clusters (i.e., using the same order as in the data matrix).
        In that case, the k-medoids algorithm is fully deterministic.
+     - threads: the number of threads performing the npass repetitions
+       concurrently (None meaning one per CPU).
+     - seed: the seed of the random initial clusterings, as an integer
+       between 0 and 2**32 - 1. Each repetition starts from a random
+       initial clustering determined by the seed and the number of the
+       repetition, so for a given seed the result does not depend on
+       the number of threads. If seed is None, a random seed is used.
 
     Return values:
      - clusterid: array containing the number of the cluster to which each
@@ -214,18 +235,32 @@ def kmedoids(distance, nclusters=2, npass=1, initialid=None):
     """
     distance = __check_distancematrix(distance)
     nitems = len(distance)
+    if isinstance(distance, numpy.ndarray) and distance.ndim == 1:
+        # the distances between n items are n * (n - 1) / 2 values
+        nitems = int(round((1 + numpy.sqrt(1 + 8 * nitems)) / 2))
     clusterid, npass = __check_initialid(initialid, npass, nitems)
-    error, nfound = _cluster.kmedoids(distance, nclusters, npass, clusterid)
+    threads = __check_threads(threads)
+    seed = __check_seed(seed)
+    error, nfound = _cluster.kmedoids(distance, nclusters, npass, clusterid,
+                                      threads, seed)
     return clusterid, error, nfound
 
 
 def treecluster(data, mask=None, weight=None, transpose=False, method='m',
-                dist='e', distancematrix=None):
+                dist='e', distancematrix=None, filename=None, threads=1):
     """Perform hierarchical clustering, and return a Tree object.
 
     This function implements the pairwise single, complete, centroid, and
     average linkage hierarchical clustering methods.
 
+    Single linkage clustering uses the SLINK algorithm, which calculates
+    the distances from the data values as needed, without storing the
+    distance matrix. Complete and average linkage clustering use the
+    nearest-neighbor chain algorithm on the distance matrix, taking a time
+    proportional to the square of the number of items. Centroid linkage
+    clustering takes a time proportional to the cube of the number of
+    items.
+
     Keyword arguments:
      - data: nrows x ncolumns array containing the data values.
      - mask: nrows x ncolumns array of integers, showing which data are
@@ -281,6 +316,14 @@ def treecluster(data, mask=None, weight=None, transpose=False, method='m',
        distance matrix as part of the clustering algorithm, be sure
        to save this array in a different variable before calling
        treecluster if you need it later.
+     - filename: for complete and average linkage clustering of the data
+       values, the name of a file in which to store the distance matrix
+       as a memory-mapped 1D array rather than in memory. The distances
+       are overwritten in place during the clustering, so the contents of
+       the file are not usable afterwards. The file is not deleted.
+     - threads: for complete and average linkage clustering of the data
+       values, the number of threads calculating the distance matrix
+       (None meaning one per CPU).
 
     Either data or distancematrix should be None. If distancematrix is None,
     the hierarchical clustering solution is calculated from the values stored
@@ -302,9 +345,17 @@ def treecluster(data, mask=None, weight=None, transpose=False, method='m',
         data = __check_data(data)
         shape = data.shape
         ndata = shape[0] if transpose else shape[1]
+        nitems = shape[1] if transpose else shape[0]
         mask = __check_mask(mask, shape)
         weight = __check_weight(weight, ndata)
-    if distancematrix is not None:
+        threads = __check_threads(threads)
+        if method in ('m', 'a') and nitems > 1:
+            # cluster the distance matrix, calculated here in parallel
+            distancematrix = __calculate_distancematrix(data, mask, weight,
+                                                        transpose, dist, True,
+                                                        filename, threads)
+            data = mask = weight = None
+    elif distancematrix is not None:
         distancematrix = __check_distancematrix(distancematrix)
         if mask is not None:
             raise ValueError('mask is ignored if distancematrix is used')
@@ -464,7 +515,8 @@ def clustercentroids(data, mask=None, clusterid=None, method='a',
     return _cluster.clustercentroids(data, mask, clusterid, method, transpose)
 
 
-def distancematrix(data, mask=None, weight=None, transpose=False, dist='e'):
+def distancematrix(data, mask=None, weight=None, transpose=False, dist='e',
+                   condensed=False, filename=None, threads=1):
     """Calculate and return a distance matrix from the data.
 
     This function returns the distance matrix calculated from the data.
@@ -485,6 +537,16 @@ def distancematrix(data, mask=None, weight=None, transpose=False, dist='e'):
        - dist == 'x': absolute uncentered correlation
        - dist == 's': Spearman's rank correlation
        - dist == 'k': Kendall's tau
+     - condensed: if True, return the distance matrix as a single 1D array
+       (see below).
+     - filename: if given, the distance matrix is written as a 1D array
+       (as if condensed were True) to a memory-mapped file with this
+       name, calculating a block of rows at a time, and the numpy.memmap
+       is returned. This allows distance matrices larger than the
+       available memory to be calculated. With fewer than two items the
+       file is left empty, and an empty array is returned instead.
+     - threads: the number of threads calculating the distances (None
+       meaning one per CPU).
 
     Return value:
     The distance matrix is returned as a list of 1D arrays containing the
@@ -514,6 +576,14 @@ def distancematrix(data, mask=None, weight=None, transpose=False, dist='e'):
         [16.,  0., 16.,  9.]
         [64., 16.,  0., 49.]
         [ 1.,  9., 49.,  0.]
+
+    If condensed is True, or filename is given, the rows are instead stored
+    consecutively in a single 1D array of size nitems * (nitems - 1) / 2,
+    which for the example above is
+
+        array([16., 64., 16., 1., 9., 49.])
+
+    This can be passed as the distance matrix to kmedoids and treecluster.
     """
     data = __check_data(data)
     shape = data.shape
@@ -523,9 +593,9 @@ def distancematrix(data, mask=None, weight=None, transpose=False, dist='e'):
     else:
         nitems, ndata = shape
     weight = __check_weight(weight, ndata)
-    matrix = [numpy.empty(i, dtype='d') for i in range(nitems)]
-    _cluster.distancematrix(data, mask, weight, transpose, dist, matrix)
-    return matrix
+    threads = __check_threads(threads)
+    return __calculate_distancematrix(data, mask, weight, transpose, dist,
+                                      condensed, filename, threads)
 
 
 def pca(data):
@@ -683,7 +753,8 @@ class Record(object):
         if self.gorder:
             self.gorder = numpy.array(self.gorder)
 
-    def treecluster(self, transpose=False, method='m', dist='e'):
+    def treecluster(self, transpose=False, method='m', dist='e',
+                    filename=None, threads=1):
         """Apply hierarchical clustering and return a Tree object.
 
         The pairwise single, complete, centroid, and average linkage
@@ -706,6 +777,12 @@ class Record(object):
            - method == 'm': Complete (maximum) pairwise linkage (default)
            - method == 'c': Centroid linkage
            - method == 'a': Average pairwise linkage
+         - filename: for complete and average linkage, the name of a file
+           in which to store the distance matrix as a memory-mapped array,
+           rather than in memory. Its contents are overwritten during the
+           clustering.
+         - threads: for complete and average linkage, the number of threads
+           calculating the distance matrix (None meaning one per CPU).
 
         See the description of the Tree class for more information about
         the Tree object returned by this method.
@@ -715,10 +792,10 @@ class Record(object):
         else:
             weight = self.eweight
         return treecluster(self.data, self.mask, weight, transpose, method,
-                           dist)
+                           dist, None, filename, threads)
 
     def kcluster(self, nclusters=2, transpose=False, npass=1,
-                 method='a', dist='e', initialid=None):
+                 method='a', dist='e', initialid=None, threads=1, seed=None):
         """Apply k-means or k-median clustering.
 
         This method returns a tuple (clusterid, error, nfound).
@@ -749,6 +826,11 @@ class Record(object):
            initial clustering and without randomizing the order in which items
            are assigned to clusters (i.e., using the same order as in the data
            matrix). In that case, the k-means algorithm is fully deterministic.
+         - threads: the number of threads performing the npass repetitions
+           concurrently (None meaning one per CPU).
+         - seed: the seed of the random initial clusterings. For a given
+           seed, the result does not depend on the number of threads. If
+           seed is None, a random seed is used.
 
         Return values:
          - clusterid: array containing the number of the cluster to which each
@@ -763,7 +845,7 @@ class Record(object):
         else:
             weight = self.eweight
         return kcluster(self.data, nclusters, self.mask, weight, transpose,
-                        npass, method, dist, initialid)
+                        npass, method, dist, initialid, threads, seed)
 
     def somcluster(self, transpose=False, nxgrid=2, nygrid=1, inittau=0.02,
                    niter=1, dist='e'):
@@ -880,7 +962,8 @@ class Record(object):
         return clusterdistance(self.data, self.mask, weight,
                                index1, index2, method, dist, transpose)
 
-    def distancematrix(self, transpose=False, dist='e'):
+    def distancematrix(self, transpose=False, dist='e', condensed=False,
+                       filename=None, threads=1):
         """Calculate the distance matrix and return it as a list of arrays.
 
         Keyword arguments:
@@ -896,6 +979,12 @@ class Record(object):
            - dist == 'x': absolute uncentered correlation
            - dist == 's': Spearman's rank correlation
            - dist == 'k': Kendall's tau
+         - condensed: if True, return the distance matrix as a single 1D
+           array.
+         - filename: if given, write the distance matrix as a 1D array to a
+           memory-mapped file with this name.
+         - threads: the number of threads calculating the distances (None
+           meaning one per CPU).
 
         Return value:
 
@@ -916,12 +1005,15 @@ class Record(object):
             [7., 3., 0., 6.]
             [4., 2., 6., 0.]
 
+        See the distancematrix function for the 1D array returned if
+        condensed is True or filename is given.
         """
         if transpose:
             weight = self.gweight
         else:
             weight = self.eweight
-        return distancematrix(self.data, self.mask, weight, transpose, dist)
+        return distancematrix(self.data, self.mask, weight, transpose, dist,
+                              condensed, filename, threads)
 
     def save(self, jobname, geneclusters=None, expclusters=None):
         """Save the clustering results.
@@ -1118,6 +1210,49 @@ def read(handle):
 # Everything below is private
 #
 
+# maximum number of distances calculated at once when writing the distance
+# matrix to a file
+_BLOCK_SIZE = 2 ** 22
+
+
+def __calculate_distancematrix(data, mask, weight, transpose, dist,
+                               condensed, filename, threads):
+    if transpose:
+        nitems = data.shape[1]
+    else:
+        nitems = data.shape[0]
+    if filename is not None:
+        size = nitems * (nitems - 1) // 2
+        if size == 0:
+            # an empty file cannot be memory-mapped
+            open(filename, 'wb').close()
+            return numpy.empty(0, dtype='d')
+        matrix = numpy.memmap(filename, dtype='d', mode='w+', shape=(size,))
+        first = 1
+        start = 0
+        while first < nitems:
+            # rows first to last - 1 are stored from start to end
+            last = first + 1
+            end = start + first
+            while last < nitems and end + last - start <= _BLOCK_SIZE:
+                end += last
+                last += 1
+            _cluster.distancematrix(data, mask, weight, transpose, dist,
+                                    matrix[start:end], first, threads)
+            matrix.flush()
+            first = last
+            start = end
+    elif condensed:
+        matrix = numpy.empty(nitems * (nitems - 1) // 2, dtype='d')
+        _cluster.distancematrix(data, mask, weight, transpose, dist, matrix,
+                                1, threads)
+    else:
+        matrix = [numpy.empty(i, dtype='d') for i in range(nitems)]
+        _cluster.distancematrix(data, mask, weight, transpose, dist, matrix,
+                                0, threads)
+    return matrix
+
+
 def __check_data(data):
     if isinstance(data, numpy.ndarray):
         data = numpy.require(data, dtype='d', requirements='C')
@@ -1146,6 +1281,24 @@ def __check_weight(weight, ndata):
         return numpy.array(weight, dtype='d')
 
 
+def __check_threads(threads):
+    if threads is None:
+        return multiprocessing.cpu_count()
+    elif isinstance(threads, numbers.Integral) and threads > 0:
+        return threads
+    raise ValueError("Number of threads should be a positive integer or "
+                     "None, not %r" % threads)
+
+
+def __check_seed(seed):
+    if seed is None:
+        return random.getrandbits(32)
+    elif isinstance(seed, numbers.Integral) and 0 <= seed < 2 ** 32:
+        return seed
+    raise ValueError("seed should be an integer between 0 and 2**32 - 1 "
+                     "or None, not %r" % seed)
+
+
 def __check_initialid(initialid, npass, nitems):
     if initialid is None:
         if npass <= 0:
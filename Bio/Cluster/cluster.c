@@ -175,41 +175,64 @@ void sort(int n, const double data[], int index[])
 
 /* ********************************************************************** */
 
+typedef struct {double value; int index;} Rankitem;
+
+/* ---------------------------------------------------------------------- */
+
+static
+int rankitemcompare(const void* a, const void* b)
+/* Helper function for qsort, comparing the values of two Rankitems, and their
+ * indices if the values are equal, so that the sort is stable. */
+{ const double term1 = ((const Rankitem*)a)->value;
+  const double term2 = ((const Rankitem*)b)->value;
+  if (term1 < term2) return -1;
+  if (term1 > term2) return +1;
+  return ((const Rankitem*)a)->index - ((const Rankitem*)b)->index;
+}
+
+/* ---------------------------------------------------------------------- */
+
 static double* getrank(int n, const double data[], const double weight[])
 /* Calculates the ranks of the elements in the array data. Two elements with
  * the same value get the same rank, equal to the average of the ranks had the
  * elements different values. The ranks are returned as a newly allocated
  * array that should be freed by the calling routine. If getrank fails due to
  * a memory allocation error, it returns NULL.
+ * Unlike sort, this does not use the static sortdata variable, so that the
+ * distancematrix_rows routine can be used from several threads at once.
  */
 { int i, j, k, l;
   double* rank;
-  int* index;
+  Rankitem* items;
   double total = 0.0;
   double subtotal;
   double current;
   double value;
   rank = malloc(n*sizeof(double));
   if (!rank) return NULL;
-  index = malloc(n*sizeof(int));
-  if (!index)
+  items = malloc(n*sizeof(Rankitem));
+  if (!items)
   { free(rank);
     return NULL;
   }
-  /* Call sort to get an index table */
-  sort(n, data, index);
+  /* Sort the values together with their indices to get an index table */
+  for (i = 0; i < n; i++)
+  { items[i].value = data[i];
+    items[i].index = i;
+  }
+  qsort(items, n, sizeof(Rankitem), rankitemcompare);
   /* Build a rank table */
   k = 0;
-  j = index[0];
+  j = items[0].index;
   current = data[j];
   subtotal = weight[j];
   for (i = 1; i < n; i++) {
-      j = index[i];
+      j = items[i].index;
       value = data[j];
       if (value != current) {
           current = value;
           value = total + (subtotal + 1.0) / 2.0;
-          for (l = k; l < i; l++) rank[index[l]] = value;
+          for (l = k; l < i; l++) rank[items[l].index] = value;
           k = i;
           total += subtotal;
           subtotal = 0.0;
@@ -217,8 +240,8 @@ static double* getrank(int n, const double data[], const double weight[])
       subtotal += weight[j];
   }
   value = total + (subtotal + 1.0) / 2.0;
-  for (l = k; l < i; l++) rank[index[l]] = value;
-  free(index);
+  for (l = k; l < i; l++) rank[items[l].index] = value;
+  free(items);
   return rank;
 }
 
@@ -1748,7 +1771,11 @@ static double(*setmetric(char dist))
 
 /* *********************************************************************  */
 
-static double uniform(void)
+static int randomstate[2] = {0, 0};
+/* The state of the random number generator used by kcluster, kmedoids, and
+ * somcluster. It is initialized using the current time when first used. */
+
+static double uniform(int state[2])
 /*
 Purpose
 =======
@@ -1760,17 +1787,19 @@ Pierre l'Ecuyer
 Efficient and Portable Combined Random Number Generators
 Communications of the ACM, Volume 31, Number 6, June 1988, pages 742-749,774.
 
-The first time this routine is called, it initializes the random number
-generator using the current time. First, the current epoch time in seconds is
-used as a seed for the random number generator in the C library. The first two
-random numbers generated by this generator are used to initialize the random
-number generator implemented in this routine.
+If the state of the random number generator is zero, this routine first
+initializes it using the current time. First, the current epoch time in seconds
+is used as a seed for the random number generator in the C library. The first
+two random numbers generated by this generator are used to initialize the
+random number generator implemented in this routine.
 
 
 Arguments
 =========
 
-None.
+state      (input/output) int[2]
+The two seeds of the combined random number generator, which are updated on
+return.
 
 
 Return value
@@ -1784,8 +1813,8 @@ A double-precison number between 0.0 and 1.0.
   static const int m2 = 2147483399;
   const double scale = 1.0/m1;
 
-  static int s1 = 0;
-  static int s2 = 0;
+  int s1 = state[0];
+  int s2 = state[1];
 
   if (s1==0 || s2==0) /* initialize */
   { unsigned int initseed = (unsigned int) time(0);
@@ -1806,12 +1835,59 @@ A double-precison number between 0.0 and 1.0.
     if (z < 1) z+=(m1-1);
   } while (z==m1); /* To avoid returning 1.0 */
 
+  state[0] = s1;
+  state[1] = s2;
   return z*scale;
 }
 
 /* ************************************************************************ */
 
-static int binomial(int n, double p)
+static unsigned long scramble(unsigned long x)
+/* Returns a 32-bit hash of the lower 32 bits of x. */
+{ x &= 0xFFFFFFFFUL;
+  x ^= x >> 16;
+  x = (x * 0x7FEB352DUL) & 0xFFFFFFFFUL;
+  x ^= x >> 15;
+  x = (x * 0x846CA68BUL) & 0xFFFFFFFFUL;
+  x ^= x >> 16;
+  return x;
+}
+
+static void seedstate(unsigned int seed, int ipass, int state[2])
+/*
+Purpose
+=======
+
+This routine initializes the state of the random number generator used by
+uniform for pass ipass of a clustering algorithm, as a function of seed and
+ipass only. The passes can then be run in any order, or concurrently, and
+still start from the same random initial clustering.
+
+
+Arguments
+=========
+
+seed       (input) unsigned int
+The seed chosen by the user.
+
+ipass      (input) int
+The number of the pass.
+
+state      (output) int[2]
+The two seeds of the combined random number generator.
+
+============================================================================
+*/
+{ static const unsigned long m1 = 2147483563;
+  static const unsigned long m2 = 2147483399;
+  const unsigned long x = scramble(seed) + 2 * (unsigned long) ipass;
+  state[0] = (int) (1 + scramble(x) % (m1-1));
+  state[1] = (int) (1 + scramble(x + 1) % (m2-1));
+}
+
+/* ************************************************************************ */
+
+static int binomial(int n, double p, int state[2])
 /*
 Purpose
 =======
@@ -1835,6 +1911,9 @@ equal to 0.5.
 n          (input) int
 The number of trials.
 
+state      (input/output) int[2]
+The state of the random number generator.
+
 
 Return value
 ============
@@ -1849,7 +1928,7 @@ An integer drawn from a binomial distribution with parameters (p, n).
     const double a = (n+1)*s;
     double r = exp(n*log(q)); /* pow() causes a crash on AIX */
     int x = 0;
-    double u = uniform();
+    double u = uniform(state);
     while (1)
     { if (u < r) return x;
       u-=r;
@@ -1877,8 +1956,8 @@ An integer drawn from a binomial distribution with parameters (p, n).
     { /* Step 1 */
       int y;
       int k;
-      double u = uniform();
-      double v = uniform();
+      double u = uniform(state);
+      double v = uniform(state);
       u *= p4;
       if (u <= p1) return (int)(xm-p1*v+u);
       /* Step 2 */
@@ -1953,7 +2032,8 @@ An integer drawn from a binomial distribution with parameters (p, n).
 
 /* ************************************************************************ */
 
-static void randomassign(int nclusters, int nelements, int clusterid[])
+static void randomassign(int nclusters, int nelements, int clusterid[],
+  int state[2])
 /*
 Purpose
 =======
@@ -1977,6 +2057,9 @@ to be clustered).
 clusterid  (output) int[nelements]
 The cluster number to which an element was assigned.
 
+state      (input/output) int[2]
+The state of the random number generator.
+
 ============================================================================
 */
 { int i, j;
@@ -1989,7 +2072,7 @@ The cluster number to which an element was assigned.
    */
   for (i = 0; i < nclusters-1; i++)
   { p = 1.0/(nclusters-i);
-    j = binomial(n, p);
+    j = binomial(n, p, state);
     n -= j;
     j += k+1; /* Assign at least one element to cluster i */
     for ( ; k < j; k++) clusterid[k] = i;
@@ -1999,7 +2082,7 @@ The cluster number to which an element was assigned.
 
   /* Create a random permutation of the cluster assignments */
   for (i = 0; i < nelements; i++)
-  { j = (int) (i + (nelements-i)*uniform());
+  { j = (int) (i + (nelements-i)*uniform(state));
     k = clusterid[j];
     clusterid[j] = clusterid[i];
     clusterid[i] = k;
@@ -2375,7 +2458,7 @@ static int
 kmeans(int nclusters, int nrows, int ncolumns, double** data, int** mask,
   double weight[], int transpose, int npass, char dist,
   double** cdata, int** cmask, int clusterid[], double* error,
-  int tclusterid[], int counts[], int mapping[])
+  int tclusterid[], int counts[], int mapping[], int state[2])
 { int i, j, k;
   const int nelements = (transpose==0) ? nrows : ncolumns;
   const int ndata = (transpose==0) ? ncolumns : nrows;
@@ -2398,7 +2481,7 @@ kmeans(int nclusters, int nrows, int ncolumns, double** data, int** mask,
     int period = 10;
 
     /* Perform the EM algorithm. First, randomly assign elements to clusters. */
-    if (npass!=0) randomassign(nclusters, nelements, tclusterid);
+    if (npass!=0) randomassign(nclusters, nelements, tclusterid, state);
 
     for (i = 0; i < nclusters; i++) counts[i] = 0;
     for (i = 0; i < nelements; i++) counts[tclusterid[i]]++;
@@ -2480,7 +2563,8 @@ static int
 kmedians(int nclusters, int nrows, int ncolumns, double** data, int** mask,
   double weight[], int transpose, int npass, char dist,
   double** cdata, int** cmask, int clusterid[], double* error,
-  int tclusterid[], int counts[], int mapping[], double cache[])
+  int tclusterid[], int counts[], int mapping[], double cache[],
+  int state[2])
 { int i, j, k;
   const int nelements = (transpose==0) ? nrows : ncolumns;
   const int ndata = (transpose==0) ? ncolumns : nrows;
@@ -2503,7 +2587,7 @@ kmedians(int nclusters, int nrows, int ncolumns, double** data, int** mask,
     int period = 10;
 
     /* Perform the EM algorithm. First, randomly assign elements to clusters. */
-    if (npass!=0) randomassign(nclusters, nelements, tclusterid);
+    if (npass!=0) randomassign(nclusters, nelements, tclusterid, state);
 
     for (i = 0; i < nclusters; i++) counts[i]=0;
     for (i = 0; i < nelements; i++) counts[tclusterid[i]]++;
@@ -2581,6 +2665,95 @@ kmedians(int nclusters, int nrows, int ncolumns, double** data, int** mask,
 
 /* ********************************************************************* */
 
+static void
+kclusterstate(int nclusters, int nrows, int ncolumns,
+  double** data, int** mask, double weight[], int transpose,
+  int npass, char method, char dist,
+  int clusterid[], double* error, int* ifound, int state[2])
+/* Performs k-means or k-median clustering as described for kcluster, drawing
+ * the random initial clusterings using the given random number generator
+ * state. */
+{ const int nelements = (transpose==0) ? nrows : ncolumns;
+  const int ndata = (transpose==0) ? ncolumns : nrows;
+
+  int i;
+  int ok;
+  int* tclusterid;
+  int* mapping = NULL;
+  double** cdata;
+  int** cmask;
+  int* counts;
+
+  if (nelements < nclusters)
+  { *ifound = 0;
+    return;
+  }
+  /* More clusters asked for than elements available */
+
+  *ifound = -1;
+
+  /* This will contain the number of elements in each cluster, which is
+   * needed to check for empty clusters. */
+  counts = malloc(nclusters*sizeof(int));
+  if (!counts) return;
+
+  /* Find out if the user specified an initial clustering */
+  if (npass<=1) tclusterid = clusterid;
+  else
+  { tclusterid = malloc(nelements*sizeof(int));
+    if (!tclusterid)
+    { free(counts);
+      return;
+    }
+    mapping = malloc(nclusters*sizeof(int));
+    if (!mapping)
+    { free(counts);
+      free(tclusterid);
+      return;
+    }
+    for (i = 0; i < nelements; i++) clusterid[i] = 0;
+  }
+
+  /* Allocate space to store the centroid data */
+  if (transpose==0) ok = makedatamask(nclusters, ndata, &cdata, &cmask);
+  else ok = makedatamask(ndata, nclusters, &cdata, &cmask);
+  if (!ok)
+  { free(counts);
+    if (npass>1)
+    { free(tclusterid);
+      free(mapping);
+    }
+    return;
+  }
+
+  if (method=='m')
+  { double* cache = malloc(nelements*sizeof(double));
+    if (cache)
+    { *ifound = kmedians(nclusters, nrows, ncolumns, data, mask, weight,
+                         transpose, npass, dist, cdata, cmask, clusterid, error,
+                         tclusterid, counts, mapping, cache, state);
+      free(cache);
+    }
+  }
+  else
+    *ifound = kmeans(nclusters, nrows, ncolumns, data, mask, weight,
+                     transpose, npass, dist, cdata, cmask, clusterid, error,
+                     tclusterid, counts, mapping, state);
+
+  /* Deallocate temporarily used space */
+  if (npass > 1)
+  { free(mapping);
+    free(tclusterid);
+  }
+
+  if (transpose==0) freedatamask(nclusters, cdata, cmask);
+  else freedatamask(ndata, cdata, cmask);
+
+  free(counts);
+}
+
+/* ---------------------------------------------------------------------- */
+
 void kcluster(int nclusters, int nrows, int ncolumns,
   double** data, int** mask, double weight[], int transpose,
   int npass, char method, char dist,
@@ -2669,144 +2842,66 @@ number of clusters is larger than the number of elements being clustered,
 
 ========================================================================
 */
-{ const int nelements = (transpose==0) ? nrows : ncolumns;
-  const int ndata = (transpose==0) ? ncolumns : nrows;
-
-  int i;
-  int ok;
-  int* tclusterid;
-  int* mapping = NULL;
-  double** cdata;
-  int** cmask;
-  int* counts;
-
-  if (nelements < nclusters)
-  { *ifound = 0;
-    return;
-  }
-  /* More clusters asked for than elements available */
-
-  *ifound = -1;
-
-  /* This will contain the number of elements in each cluster, which is
-   * needed to check for empty clusters. */
-  counts = malloc(nclusters*sizeof(int));
-  if (!counts) return;
-
-  /* Find out if the user specified an initial clustering */
-  if (npass<=1) tclusterid = clusterid;
-  else
-  { tclusterid = malloc(nelements*sizeof(int));
-    if (!tclusterid)
-    { free(counts);
-      return;
-    }
-    mapping = malloc(nclusters*sizeof(int));
-    if (!mapping)
-    { free(counts);
-      free(tclusterid);
-      return;
-    }
-    for (i = 0; i < nelements; i++) clusterid[i] = 0;
-  }
-
-  /* Allocate space to store the centroid data */
-  if (transpose==0) ok = makedatamask(nclusters, ndata, &cdata, &cmask);
-  else ok = makedatamask(ndata, nclusters, &cdata, &cmask);
-  if (!ok)
-  { free(counts);
-    if (npass>1)
-    { free(tclusterid);
-      free(mapping);
-    }
-    return;
-  }
-
-  if (method=='m')
-  { double* cache = malloc(nelements*sizeof(double));
-    if (cache)
-    { *ifound = kmedians(nclusters, nrows, ncolumns, data, mask, weight,
-                         transpose, npass, dist, cdata, cmask, clusterid, error,
-                         tclusterid, counts, mapping, cache);
-      free(cache);
-    }
-  }
-  else
-    *ifound = kmeans(nclusters, nrows, ncolumns, data, mask, weight,
-                     transpose, npass, dist, cdata, cmask, clusterid, error,
-                     tclusterid, counts, mapping);
-
-  /* Deallocate temporarily used space */
-  if (npass > 1)
-  { free(mapping);
-    free(tclusterid);
-  }
-
-  if (transpose==0) freedatamask(nclusters, cdata, cmask);
-  else freedatamask(ndata, cdata, cmask);
-
-  free(counts);
+{ kclusterstate(nclusters, nrows, ncolumns, data, mask, weight, transpose,
+                npass, method, dist, clusterid, error, ifound, randomstate);
 }
 
-/* *********************************************************************** */
+/* ---------------------------------------------------------------------- */
 
-void kmedoids(int nclusters, int nelements, double** distmatrix,
-  int npass, int clusterid[], double* error, int* ifound)
+void kcluster_pass(int nclusters, int nrows, int ncolumns,
+  double** data, int** mask, double weight[], int transpose,
+  char method, char dist, unsigned int seed, int ipass,
+  int clusterid[], double* error, int* ifound)
 /*
 Purpose
 =======
 
-The kmedoids routine performs k-medoids clustering on a given set of elements,
-using the distance matrix and the number of clusters passed by the user.
-Multiple passes are being made to find the optimal clustering solution, each
-time starting from a different initial clustering.
+The kcluster_pass routine performs a single pass of the k-means or k-median
+clustering done by kcluster, starting from a random initial clustering that is
+determined by seed and ipass only. Passes can therefore be run concurrently,
+with the same results as when run one after the other.
 
 
 Arguments
 =========
 
-nclusters  (input) int
-The number of clusters to be found.
+nclusters, nrows, ncolumns, data, mask, weight, transpose, method, dist
+(input) as described for kcluster.
 
-nelements  (input) int
-The number of elements to be clustered.
-
-distmatrix (input) double array, ragged
-  (number of rows is nelements, number of columns is equal to the row number)
-The distance matrix. To save space, the distance matrix is given in the
-form of a ragged array. The distance matrix is symmetric and has zeros
-on the diagonal. See distancematrix for a description of the content.
+seed       (input) unsigned int
+The seed of the random number generator.
 
-npass      (input) int
-The number of times clustering is performed. Clustering is performed npass
-times, each time starting from a different (random) initial assignment of genes
-to clusters. The clustering solution with the lowest within-cluster sum of
-distances is chosen.
-If npass==0, then the clustering algorithm will be run once, where the initial
-assignment of elements to clusters is taken from the clusterid array.
+ipass      (input) int
+The number of the pass.
 
-clusterid  (output; input) int[nelements]
-On input, if npass==0, then clusterid contains the initial clustering assignment
-from which the clustering algorithm starts; all numbers in clusterid should be
-between zero and nelements-1 inclusive. If npass!=0, clusterid is ignored on
-input.
-On output, clusterid contains the clustering solution that was found: clusterid
-contains the number of the cluster to which each item was assigned. On output,
-the number of a cluster is defined as the item number of the centroid of the
-cluster.
+clusterid  (output) int[nrows] if transpose==0
+                    int[ncolumns] otherwise
+The cluster number to which a gene or microarray was assigned.
 
-error      (output) double
-The sum of distances to the cluster center of each item in the optimal k-medoids
-clustering solution that was found.
+error      (output) double*
+The sum of distances to the cluster center of each item in the clustering
+solution that was found.
 
-ifound     (output) int
-If kmedoids is successful: the number of times the optimal clustering solution
-was found. The value of ifound is at least 1; its maximum value is npass.
-If the user requested more clusters than elements available, ifound is set
-to 0. If kmedoids fails due to a memory allocation error, ifound is set to -1.
+ifound     (output) int*
+On success, ifound is set to 1. If the number of clusters is larger than the
+number of elements being clustered, *ifound is set to 0 as an error code. If a
+memory allocation error occurs, *ifound is set to -1.
 
 ========================================================================
 */
+{ int state[2];
+  seedstate(seed, ipass, state);
+  kclusterstate(nclusters, nrows, ncolumns, data, mask, weight, transpose,
+                1, method, dist, clusterid, error, ifound, state);
+}
+
+/* *********************************************************************** */
+
+static void
+kmedoidsstate(int nclusters, int nelements, double** distmatrix,
+  int npass, int clusterid[], double* error, int* ifound, int state[2])
+/* Performs k-medoids clustering as described for kmedoids, drawing the random
+ * initial clusterings using the given random number generator state. */
 { int i, j, icluster;
   int* tclusterid;
   int* saved;
@@ -2857,7 +2952,7 @@ to 0. If kmedoids fails due to a memory allocation error, ifound is set to -1.
     int counter = 0;
     int period = 10;
 
-    if (npass!=0) randomassign(nclusters, nelements, tclusterid);
+    if (npass!=0) randomassign(nclusters, nelements, tclusterid, state);
     while (1)
     { double previous = total;
       total = 0.0;
@@ -2936,6 +3031,116 @@ to 0. If kmedoids fails due to a memory allocation error, ifound is set to -1.
   return;
 }
 
+/* ---------------------------------------------------------------------- */
+
+void kmedoids(int nclusters, int nelements, double** distmatrix,
+  int npass, int clusterid[], double* error, int* ifound)
+/*
+Purpose
+=======
+
+The kmedoids routine performs k-medoids clustering on a given set of elements,
+using the distance matrix and the number of clusters passed by the user.
+Multiple passes are being made to find the optimal clustering solution, each
+time starting from a different initial clustering.
+
+
+Arguments
+=========
+
+nclusters  (input) int
+The number of clusters to be found.
+
+nelements  (input) int
+The number of elements to be clustered.
+
+distmatrix (input) double array, ragged
+  (number of rows is nelements, number of columns is equal to the row number)
+The distance matrix. To save space, the distance matrix is given in the
+form of a ragged array. The distance matrix is symmetric and has zeros
+on the diagonal. See distancematrix for a description of the content.
+
+npass      (input) int
+The number of times clustering is performed. Clustering is performed npass
+times, each time starting from a different (random) initial assignment of genes
+to clusters. The clustering solution with the lowest within-cluster sum of
+distances is chosen.
+If npass==0, then the clustering algorithm will be run once, where the initial
+assignment of elements to clusters is taken from the clusterid array.
+
+clusterid  (output; input) int[nelements]
+On input, if npass==0, then clusterid contains the initial clustering assignment
+from which the clustering algorithm starts; all numbers in clusterid should be
+between zero and nelements-1 inclusive. If npass!=0, clusterid is ignored on
+input.
+On output, clusterid contains the clustering solution that was found: clusterid
+contains the number of the cluster to which each item was assigned. On output,
+the number of a cluster is defined as the item number of the centroid of the
+cluster.
+
+error      (output) double
+The sum of distances to the cluster center of each item in the optimal k-medoids
+clustering solution that was found.
+
+ifound     (output) int
+If kmedoids is successful: the number of times the optimal clustering solution
+was found. The value of ifound is at least 1; its maximum value is npass.
+If the user requested more clusters than elements available, ifound is set
+to 0. If kmedoids fails due to a memory allocation error, ifound is set to -1.
+
+========================================================================
+*/
+{ kmedoidsstate(nclusters, nelements, distmatrix, npass, clusterid, error,
+                ifound, randomstate);
+}
+
+/* ---------------------------------------------------------------------- */
+
+void kmedoids_pass(int nclusters, int nelements, double** distmatrix,
+  unsigned int seed, int ipass, int clusterid[], double* error, int* ifound)
+/*
+Purpose
+=======
+
+The kmedoids_pass routine performs a single pass of the k-medoids clustering
+done by kmedoids, starting from a random initial clustering that is determined
+by seed and ipass only. Passes can therefore be run concurrently, with the
+same results as when run one after the other.
+
+
+Arguments
+=========
+
+nclusters, nelements, distmatrix
+(input) as described for kmedoids.
+
+seed       (input) unsigned int
+The seed of the random number generator.
+
+ipass      (input) int
+The number of the pass.
+
+clusterid  (output) int[nelements]
+The number of the cluster to which each item was assigned, defined as the
+item number of the centroid of the cluster.
+
+error      (output) double
+The sum of distances to the cluster center of each item in the clustering
+solution that was found.
+
+ifound     (output) int
+On success, ifound is set to 1. If the user requested more clusters than
+elements available, ifound is set to 0. If a memory allocation error occurs,
+ifound is set to -1.
+
+========================================================================
+*/
+{ int state[2];
+  seedstate(seed, ipass, state);
+  kmedoidsstate(nclusters, nelements, distmatrix, 1, clusterid, error, ifound,
+                state);
+}
+
 /* ******************************************************************** */
 
 void distancematrix(int nrows, int ncolumns, double** data, int** mask,
@@ -3006,7 +3211,47 @@ the distance matrix are stored in this array.
 */
 { /* First determine the size of the distance matrix */
   const int n = (transpose==0) ? nrows : ncolumns;
-  const int ndata = (transpose==0) ? ncolumns : nrows;
+
+  /* Calculate the distances and save them in the ragged array */
+  distancematrix_rows(nrows, ncolumns, data, mask, weights, dist, transpose,
+                      1, n, matrix);
+}
+
+/* ******************************************************************** */
+
+void distancematrix_rows(int nrows, int ncolumns, double** data, int** mask,
+  double weights[], char dist, int transpose, int first, int last,
+  double** matrix)
+/*
+Purpose
+=======
+
+The distancematrix_rows routine calculates the rows first to last-1 of the
+distance matrix calculated by the distancematrix routine. This allows the
+distance matrix to be calculated in blocks of rows, or by several threads at
+once, each calculating different rows.
+
+Arguments
+=========
+
+The arguments nrows, ncolumns, data, mask, weights, dist, and transpose are
+the same as for the distancematrix routine.
+
+first      (input) int
+The first row of the distance matrix to calculate.
+
+last       (input) int
+One more than the last row of the distance matrix to calculate.
+
+distmatrix (output) double**
+A ragged array, with the number of columns in each row is equal to the
+row index (so distmatrix[i] has i columns). Upon return, the values of
+the distance matrix in rows first to last-1 are stored in this array; the
+other rows are not accessed.
+
+========================================================================
+*/
+{ const int ndata = (transpose==0) ? ncolumns : nrows;
   int i,j;
 
   /* Set the metric function as indicated by dist */
@@ -3014,8 +3259,7 @@ the distance matrix are stored in this array.
     (int, double**, double**, int**, int**, const double[], int, int, int) =
        setmetric(dist);
 
-  /* Calculate the distances and save them in the ragged array */
-  for (i = 1; i < n; i++)
+  for (i = first; i < last; i++)
     for (j = 0; j < i; j++)
       matrix[i][j]=metric(ndata,data,data,mask,mask,weights,i,j,transpose);
 }
@@ -3564,89 +3808,27 @@ If a memory error occurs, pslcluster returns NULL.
 }
 /* ******************************************************************** */
 
-static Node* pmlcluster(int nelements, double** distmatrix)
+static Node* pnncluster(int nelements, double** distmatrix, char method)
 /*
 
 Purpose
 =======
 
-The pmlcluster routine performs clustering using pairwise maximum- (complete-)
-linking on the given distance matrix.
-
-Arguments
-=========
-
-nelements     (input) int
-The number of elements to be clustered.
-
-distmatrix (input) double**
-The distance matrix, with nelements rows, each row being filled up to the
-diagonal. The elements on the diagonal are not used, as they are assumed to be
-zero. The distance matrix will be modified by this routine.
-
-Return value
-============
-
-A pointer to a newly allocated array of Node structs, describing the
-hierarchical clustering solution consisting of nelements-1 nodes. Depending on
-whether genes (rows) or samples (columns) were clustered, nelements is equal
-to nrows or ncolumns. See src/cluster.h for a description of the Node
-structure.
-If a memory error occurs, pmlcluster returns NULL.
-========================================================================
-*/
-{ int j;
-  int n;
-  int* clusterid;
-  Node* result;
-
-  clusterid = malloc(nelements*sizeof(int));
-  if (!clusterid) return NULL;
-  result = malloc((nelements-1)*sizeof(Node));
-  if (!result)
-  { free(clusterid);
-    return NULL;
-  }
-
-  /* Setup a list specifying to which cluster a gene belongs */
-  for (j = 0; j < nelements; j++) clusterid[j] = j;
-
-  for (n = nelements; n > 1; n--)
-  { int is = 1;
-    int js = 0;
-    result[nelements-n].distance = find_closest_pair(n, distmatrix, &is, &js);
-
-    /* Fix the distances */
-    for (j = 0; j < js; j++)
-      distmatrix[js][j] = max(distmatrix[is][j],distmatrix[js][j]);
-    for (j = js+1; j < is; j++)
-      distmatrix[j][js] = max(distmatrix[is][j],distmatrix[j][js]);
-    for (j = is+1; j < n; j++)
-      distmatrix[j][js] = max(distmatrix[j][is],distmatrix[j][js]);
-
-    for (j = 0; j < is; j++) distmatrix[is][j] = distmatrix[n-1][j];
-    for (j = is+1; j < n-1; j++) distmatrix[j][is] = distmatrix[n-1][j];
-
-    /* Update clusterids */
-    result[nelements-n].left = clusterid[is];
-    result[nelements-n].right = clusterid[js];
-    clusterid[js] = n-nelements-1;
-    clusterid[is] = clusterid[n-1];
-  }
-  free(clusterid);
-
-  return result;
-}
-
-/* ******************************************************************* */
+The pnncluster routine performs clustering using pairwise maximum- (complete-)
+linking (method=='m') or pairwise average-linking (method=='a') on the given
+distance matrix, using the nearest-neighbor chain algorithm described in:
 
-static Node* palcluster(int nelements, double** distmatrix)
-/*
-Purpose
-=======
+Murtagh, F. (1983). A survey of recent advances in hierarchical clustering
+algorithms. The Computer Journal, 26(4): 354-359.
 
-The palcluster routine performs clustering using pairwise average
-linking on the given distance matrix.
+Starting from any cluster, the algorithm follows the chain of nearest
+neighbors until it reaches two clusters that are each other's nearest
+neighbor, and joins them. As maximum- and average-linkage are reducible, the
+remaining part of the chain is still a chain of nearest neighbors after the
+two clusters are joined, and can be continued. This finds the same clusters as
+joining the closest pair of clusters at each step, in O(n^2) instead of O(n^3)
+time. The clusters are not joined in order of increasing distance, so the
+nodes are sorted by distance at the end.
 
 Arguments
 =========
@@ -3659,6 +3841,11 @@ The distance matrix, with nelements rows, each row being filled up to the
 diagonal. The elements on the diagonal are not used, as they are assumed to be
 zero. The distance matrix will be modified by this routine.
 
+method     (input) char
+Defines which hierarchical clustering method is used:
+method=='m': pairwise maximum- (or complete-) linkage clustering
+method=='a': pairwise average-linkage clustering
+
 Return value
 ============
 
@@ -3667,26 +3854,30 @@ hierarchical clustering solution consisting of nelements-1 nodes. Depending on
 whether genes (rows) or samples (columns) were clustered, nelements is equal
 to nrows or ncolumns. See src/cluster.h for a description of the Node
 structure.
-If a memory error occurs, palcluster returns NULL.
+If a memory error occurs, pnncluster returns NULL.
 ========================================================================
 */
-{ int j;
+{ int i, j;
   int n;
+  int top = 0;
+  const int nnodes = nelements - 1;
   int* clusterid;
   int* number;
+  int* chain;
+  int* position;
+  Rankitem* order;
+  Node* nodes;
   Node* result;
 
   clusterid = malloc(nelements*sizeof(int));
-  if (!clusterid) return NULL;
   number = malloc(nelements*sizeof(int));
-  if (!number)
-  { free(clusterid);
-    return NULL;
-  }
-  result = malloc((nelements-1)*sizeof(Node));
-  if (!result)
+  chain = malloc(nelements*sizeof(int));
+  nodes = malloc(nnodes*sizeof(Node));
+  if (!clusterid || !number || !chain || !nodes)
   { free(clusterid);
     free(number);
+    free(chain);
+    free(nodes);
     return NULL;
   }
 
@@ -3699,38 +3890,83 @@ If a memory error occurs, palcluster returns NULL.
   }
 
   for (n = nelements; n > 1; n--)
-  { int sum;
-    int is = 1;
-    int js = 0;
-    result[nelements-n].distance = find_closest_pair(n, distmatrix, &is, &js);
+  { int is;
+    int js;
+    double distance;
+
+    /* Follow the chain of nearest neighbors until its last two clusters are
+     * each other's nearest neighbor. */
+    if (top == 0) chain[top++] = 0;
+    while (1)
+    { const int k = chain[top-1];
+      /* Start from the previous cluster in the chain, if any, so that it is
+       * kept in case of ties, or else from any other cluster (the distances
+       * may be infinite or NaN) */
+      int jmin = (top > 1) ? chain[top-2] : (k == 0) ? 1 : 0;
+      distance = (jmin < k) ? distmatrix[k][jmin] : distmatrix[jmin][k];
+      for (j = 0; j < k; j++)
+        if (distmatrix[k][j] < distance)
+        { distance = distmatrix[k][j];
+          jmin = j;
+        }
+      for (j = k+1; j < n; j++)
+        if (distmatrix[j][k] < distance)
+        { distance = distmatrix[j][k];
+          jmin = j;
+        }
+      if ((top > 1 && jmin == chain[top-2]) || top == n) break;
+      chain[top++] = jmin;
+    }
+    is = chain[top-1];
+    js = chain[top-2];
+    top -= 2;
+    if (is < js)
+    { j = is;
+      is = js;
+      js = j;
+    }
+    distance = distmatrix[is][js];
 
     /* Save result */
-    result[nelements-n].left = clusterid[is];
-    result[nelements-n].right = clusterid[js];
+    nodes[nelements-n].left = clusterid[is];
+    nodes[nelements-n].right = clusterid[js];
+    nodes[nelements-n].distance = distance;
 
     /* Fix the distances */
-    sum = number[is] + number[js];
-    for (j = 0; j < js; j++)
-    { distmatrix[js][j] = distmatrix[is][j]*number[is]
-                        + distmatrix[js][j]*number[js];
-      distmatrix[js][j] /= sum;
-    }
-    for (j = js+1; j < is; j++)
-    { distmatrix[j][js] = distmatrix[is][j]*number[is]
-                        + distmatrix[j][js]*number[js];
-      distmatrix[j][js] /= sum;
+    if (method=='m')
+    { for (j = 0; j < js; j++)
+        distmatrix[js][j] = max(distmatrix[is][j],distmatrix[js][j]);
+      for (j = js+1; j < is; j++)
+        distmatrix[j][js] = max(distmatrix[is][j],distmatrix[j][js]);
+      for (j = is+1; j < n; j++)
+        distmatrix[j][js] = max(distmatrix[j][is],distmatrix[j][js]);
     }
-    for (j = is+1; j < n; j++)
-    { distmatrix[j][js] = distmatrix[j][is]*number[is]
-                        + distmatrix[j][js]*number[js];
-      distmatrix[j][js] /= sum;
+    else
+    { const int sum = number[is] + number[js];
+      for (j = 0; j < js; j++)
+      { distmatrix[js][j] = distmatrix[is][j]*number[is]
+                          + distmatrix[js][j]*number[js];
+        distmatrix[js][j] /= sum;
+      }
+      for (j = js+1; j < is; j++)
+      { distmatrix[j][js] = distmatrix[is][j]*number[is]
+                          + distmatrix[j][js]*number[js];
+        distmatrix[j][js] /= sum;
+      }
+      for (j = is+1; j < n; j++)
+      { distmatrix[j][js] = distmatrix[j][is]*number[is]
+                          + distmatrix[j][js]*number[js];
+        distmatrix[j][js] /= sum;
+      }
     }
 
+    /* Move the last cluster into the place of cluster is */
     for (j = 0; j < is; j++) distmatrix[is][j] = distmatrix[n-1][j];
     for (j = is+1; j < n-1; j++) distmatrix[j][is] = distmatrix[n-1][j];
+    for (j = 0; j < top; j++) if (chain[j] == n-1) chain[j] = is;
 
     /* Update number of elements in the clusters */
-    number[js] = sum;
+    number[js] += number[is];
     number[is] = number[n-1];
 
     /* Update clusterids */
@@ -3740,6 +3976,73 @@ If a memory error occurs, palcluster returns NULL.
   free(clusterid);
   free(number);
 
+  /* Sort the nodes by distance, keeping the order of nodes at the same
+   * distance, and renumber the nodes accordingly. Rounding errors may make
+   * the distance of a node slightly smaller than that of its children, so
+   * the nodes are sorted by the largest distance of their descendants, to
+   * keep each node after its children. */
+  order = malloc(nnodes*sizeof(Rankitem));
+  result = malloc(nnodes*sizeof(Node));
+  position = malloc((nelements+nnodes)*sizeof(int));
+  if (!order || !result || !position)
+  { free(order);
+    free(result);
+    free(position);
+    free(nodes);
+    free(chain);
+    return NULL;
+  }
+  for (i = 0; i < nnodes; i++)
+  { double value = nodes[i].distance;
+    j = nodes[i].left;
+    if (j < 0 && order[-j-1].value > value) value = order[-j-1].value;
+    j = nodes[i].right;
+    if (j < 0 && order[-j-1].value > value) value = order[-j-1].value;
+    order[i].value = value;
+    order[i].index = i;
+  }
+  qsort(order, nnodes, sizeof(Rankitem), rankitemcompare);
+  /* chain is reused to store the new number of each node */
+  for (i = 0; i < nnodes; i++) chain[order[i].index] = i;
+  for (i = 0; i < nnodes; i++)
+  { result[i] = nodes[order[i].index];
+    if (result[i].left < 0) result[i].left = -chain[-result[i].left-1]-1;
+    if (result[i].right < 0) result[i].right = -chain[-result[i].right-1]-1;
+  }
+  free(order);
+  free(nodes);
+
+  /* Put the left and right clusters of each node in the same order as when
+   * joining the closest pair of clusters at each step, with the distance
+   * matrix rows of joined clusters moved as above. Element i is stored as i,
+   * node i as nelements+i; chain is reused to store the cluster in each
+   * row. */
+  for (i = 0; i < nelements; i++)
+  { position[i] = i;
+    chain[i] = i;
+  }
+  for (i = 0, n = nelements; i < nnodes; i++, n--)
+  { const int left = result[i].left;
+    const int right = result[i].right;
+    int is = position[(left < 0) ? nelements-left-1 : left];
+    int js = position[(right < 0) ? nelements-right-1 : right];
+    if (is < js)
+    { j = is;
+      is = js;
+      js = j;
+    }
+    j = chain[is];
+    result[i].left = (j < nelements) ? j : nelements-j-1;
+    j = chain[js];
+    result[i].right = (j < nelements) ? j : nelements-j-1;
+    chain[js] = nelements+i;
+    position[nelements+i] = js;
+    chain[is] = chain[n-1];
+    position[chain[is]] = is;
+  }
+  free(position);
+  free(chain);
+
   return result;
 }
 
@@ -3807,6 +4110,9 @@ For the first three, either the distance matrix or the gene expression data is
 sufficient to perform the clustering algorithm. For pairwise centroid-linkage
 clustering, however, the gene expression data are always needed, even if the
 distance matrix itself is available.
+Single-linkage clustering uses the SLINK algorithm (see pslcluster), which does
+not need the distance matrix, and maximum- and average-linkage clustering use
+the nearest-neighbor chain algorithm (see pnncluster); both take O(n^2) time.
 
 distmatrix (input) double**
 The distance matrix. If the distance matrix is zero initially, the distance
@@ -3859,10 +4165,8 @@ If a memory error occurs, treecluster returns NULL.
                           dist, transpose);
       break;
     case 'm':
-      result = pmlcluster(nelements, distmatrix);
-      break;
     case 'a':
-      result = palcluster(nelements, distmatrix);
+      result = pnncluster(nelements, distmatrix, method);
       break;
     case 'c':
       result = pclcluster(nrows, ncolumns, data, mask, weight, distmatrix,
@@ -4062,7 +4366,7 @@ void somworker(int nrows, int ncolumns, double** data, int** mask,
   { for (iy = 0; iy < nygrid; iy++)
     { double sum = 0.;
       for (i = 0; i < ndata; i++)
-      { double term = -1.0 + 2.0*uniform();
+      { double term = -1.0 + 2.0*uniform(randomstate);
         celldata[ix][iy][i] = term;
         sum += term * term;
       }
@@ -4075,7 +4379,7 @@ void somworker(int nrows, int ncolumns, double** data, int** mask,
   index = malloc(nelements*sizeof(int));
   for (i = 0; i < nelements; i++) index[i] = i;
   for (i = 0; i < nelements; i++)
-  { j = (int) (i + (nelements-i)*uniform());
+  { j = (int) (i + (nelements-i)*uniform(randomstate));
     ix = index[j];
     index[j] = index[i];
     index[i] = ix;
@@ -42,6 +42,9 @@ double clusterdistance(int nrows, int ncolumns, double** data, int** mask,
   char method, int transpose);
 void distancematrix(int ngenes, int ndata, double** data, int** mask,
   double* weight, char dist, int transpose, double** distances);
+void distancematrix_rows(int ngenes, int ndata, double** data, int** mask,
+  double* weight, char dist, int transpose, int first, int last,
+  double** distances);
 
 /* Chapter 3 */
 int getclustercentroids(int nclusters, int nrows, int ncolumns,
@@ -54,6 +57,11 @@ void kcluster(int nclusters, int ngenes, int ndata, double** data,
   int clusterid[], double* error, int* ifound);
 void kmedoids(int nclusters, int nelements, double** distance,
   int npass, int clusterid[], double* error, int* ifound);
+void kcluster_pass(int nclusters, int ngenes, int ndata, double** data,
+  int** mask, double weight[], int transpose, char method, char dist,
+  unsigned int seed, int ipass, int clusterid[], double* error, int* ifound);
+void kmedoids_pass(int nclusters, int nelements, double** distance,
+  unsigned int seed, int ipass, int clusterid[], double* error, int* ifound);
 
 /* Chapter 4 */
 typedef struct {int left; int right; double distance;} Node;
@@ -1,9 +1,15 @@
 #include "Python.h"
+#include "pythread.h"
 #include <stdio.h>
 #include <string.h>
 #include <float.h>
 #include "cluster.h"
 
+#ifndef PYTHREAD_INVALID_THREAD_ID
+/* Before Python 3.7, PyThread_start_new_thread returned a long */
+#define PYTHREAD_INVALID_THREAD_ID (-1)
+#endif
+
 
 /* ========================================================================== */
 /* -- Helper routines ------------------------------------------------------- */
@@ -432,15 +438,9 @@ _convert_array_to_distancematrix(PyObject* array, Distancematrix* distances) {
         return 0;
     }
     if (view->ndim == 1) {
-        int m = (int) view->shape[0];
-        if (m != view->shape[0]) {
-            PyErr_Format(PyExc_ValueError,
-                         "distance matrix is too large (size = %zd)",
-                         view->shape[0]);
-            return 0;
-        }
-        n = (int)(1+sqrt(1+8*m)/2); /* rounds to (1+sqrt(1+8*m))/2 */
-        if (n*n-n != 2 * m) {
+        const Py_ssize_t m = view->shape[0];
+        n = (int)(1+sqrt(1+8*(double)m)/2); /* rounds to (1+sqrt(1+8*m))/2 */
+        if ((Py_ssize_t)n*(n-1) != 2 * m) {
             PyErr_SetString(PyExc_ValueError,
                             "distance matrix has unexpected size.");
             return 0;
@@ -1223,10 +1223,158 @@ py_version(PyObject* self)
 #endif
 }
 
+/* passes of kcluster and kmedoids */
+typedef struct {
+    int nclusters;
+    int nrows;
+    int ncols;
+    double** data;
+    int** mask;
+    double* weight;
+    int transpose;
+    char method;
+    char dist;
+    int nelements;
+    double** distances;  /* for kmedoids; NULL for kcluster */
+    unsigned int seed;
+    int ipass;
+    int* clusterid;
+    double error;
+    int ifound;
+    PyThread_type_lock done;
+} KclusterTask;
+
+static void
+kcluster_task(void* argument)
+{
+    /* Perform a single pass of kcluster or kmedoids. */
+    KclusterTask* task = argument;
+    if (task->distances)
+        kmedoids_pass(task->nclusters, task->nelements, task->distances,
+                      task->seed, task->ipass, task->clusterid,
+                      &task->error, &task->ifound);
+    else
+        kcluster_pass(task->nclusters, task->nrows, task->ncols,
+                      task->data, task->mask, task->weight, task->transpose,
+                      task->method, task->dist, task->seed, task->ipass,
+                      task->clusterid, &task->error, &task->ifound);
+    if (task->done) PyThread_release_lock(task->done);
+}
+
+static int
+same_clustering(int nelements, int nclusters, const int clusterid[],
+                const int tclusterid[], int mapping[])
+/* Checks if two clustering solutions are the same. If mapping is NULL, the
+ * cluster numbers should be equal (as for kmedoids); otherwise, they may be
+ * permuted (as for kcluster), and mapping is used as workspace.
+ */
+{
+    int i;
+    if (!mapping) {
+        for (i = 0; i < nelements; i++)
+            if (clusterid[i] != tclusterid[i]) return 0;
+        return 1;
+    }
+    for (i = 0; i < nclusters; i++) mapping[i] = -1;
+    for (i = 0; i < nelements; i++) {
+        const int j = tclusterid[i];
+        const int k = clusterid[i];
+        if (mapping[k] == -1) mapping[k] = j;
+        else if (mapping[k] != j) return 0;
+    }
+    return 1;
+}
+
+static int
+kcluster_threaded(KclusterTask* task, int npass, int threads,
+                  int clusterid[], double* error)
+/* Performs npass passes of kcluster or kmedoids, using the given number of
+ * threads, and stores the best clustering solution in clusterid. Pass ipass
+ * starts from a random initial clustering determined by task->seed and ipass,
+ * and the solutions are compared in the order of the passes, so the result
+ * does not depend on the number of threads. The calling thread should not
+ * hold the global interpreter lock. Returns the number of times the best
+ * solution was found, or -1 if out of memory.
+ */
+{
+    int i, j;
+    int ipass;
+    int ifound = 0;
+    const int nelements = task->nelements;
+    int* mapping = NULL;
+    int* solutions;
+    KclusterTask* tasks;
+    if (threads > npass) threads = npass;
+    tasks = malloc(threads*sizeof(KclusterTask));
+    solutions = malloc(threads*nelements*sizeof(int));
+    if (!task->distances) mapping = malloc(task->nclusters*sizeof(int));
+    if (!tasks || !solutions || (!task->distances && !mapping)) {
+        free(tasks);
+        free(solutions);
+        free(mapping);
+        return -1;
+    }
+    for (ipass = 0; ipass < npass; ipass += threads) {
+        const int n = (npass - ipass < threads) ? npass - ipass : threads;
+        for (i = 0; i < n; i++) {
+            tasks[i] = *task;
+            tasks[i].ipass = ipass + i;
+            tasks[i].clusterid = solutions + i*nelements;
+            tasks[i].done = NULL;
+        }
+        for (i = 1; i < n; i++) {
+            PyThread_type_lock done = PyThread_allocate_lock();
+            if (done) {
+                PyThread_acquire_lock(done, WAIT_LOCK);
+                tasks[i].done = done;
+                if (PyThread_start_new_thread(kcluster_task, &tasks[i])
+                        == PYTHREAD_INVALID_THREAD_ID) {
+                    PyThread_release_lock(done);
+                    PyThread_free_lock(done);
+                    tasks[i].done = NULL;
+                }
+            }
+            /* If the thread could not be started, do its pass here */
+            if (!tasks[i].done) kcluster_task(&tasks[i]);
+        }
+        kcluster_task(&tasks[0]);
+        for (i = 1; i < n; i++) {
+            PyThread_type_lock done = tasks[i].done;
+            if (done) {
+                /* Wait for the thread to finish */
+                PyThread_acquire_lock(done, WAIT_LOCK);
+                PyThread_release_lock(done);
+                PyThread_free_lock(done);
+            }
+        }
+        /* Compare the solutions in the order of the passes */
+        for (i = 0; i < n; i++) {
+            const int* tclusterid = tasks[i].clusterid;
+            if (tasks[i].ifound < 0) {
+                ifound = -1;
+                break;
+            }
+            if (ifound > 0 && same_clustering(nelements, task->nclusters,
+                                              clusterid, tclusterid,
+                                              mapping)) ifound++;
+            else if (ifound == 0 || tasks[i].error < *error) {
+                ifound = 1;
+                *error = tasks[i].error;
+                for (j = 0; j < nelements; j++) clusterid[j] = tclusterid[j];
+            }
+        }
+        if (ifound < 0) break;
+    }
+    free(tasks);
+    free(solutions);
+    free(mapping);
+    return ifound;
+}
+
 /* kcluster */
 static char kcluster__doc__[] =
 "kcluster(data, nclusters, mask, weight, transpose, npass, method,\n"
-"         dist, clusterid) -> None\n"
+"         dist, clusterid, threads=1, seed=0) -> error, nfound\n"
 "\n"
 "This function implements k-means clustering.\n"
 "\n"
@@ -1271,7 +1419,20 @@ static char kcluster__doc__[] =
 "   as an input variable, containing the initial condition from which\n"
 "   the EM algorithm should start. In this case, the k-means algorithm\n"
 "   is fully deterministic.\n"
-"\n";
+"\n"
+" - threads: the number of threads performing the passes concurrently.\n"
+"\n"
+" - seed: the seed of the random initial conditions. Each pass starts\n"
+"   from a random initial condition determined by the seed and the\n"
+"   number of the pass, so the result does not depend on the number of\n"
+"   threads.\n"
+"\n"
+"The passes are performed without holding the global interpreter lock.\n"
+"\n"
+"Return values:\n"
+" - error: the within-cluster sum of distances for the returned k-means\n"
+"   clustering solution;\n"
+" - nfound: the number of times this solution was found.\n";
 
 static PyObject*
 py_kcluster(PyObject* self, PyObject* args, PyObject* keywords)
@@ -1288,6 +1449,8 @@ py_kcluster(PyObject* self, PyObject* args, PyObject* keywords)
     char method = 'a';
     char dist = 'e';
     Py_buffer clusterid = {0};
+    int threads = 1;
+    unsigned long seed = 0;
     double error;
     int ifound = 0;
 
@@ -1300,8 +1463,11 @@ py_kcluster(PyObject* self, PyObject* args, PyObject* keywords)
                              "method",
                              "dist",
                              "clusterid",
+                             "threads",
+                             "seed",
                               NULL};
-    if(!PyArg_ParseTupleAndKeywords(args, keywords, "O&iO&O&iiO&O&O&", kwlist,
+    if(!PyArg_ParseTupleAndKeywords(args, keywords, "O&iO&O&iiO&O&O&|ik",
+                                    kwlist,
                                     data_converter, &data,
                                     &nclusters,
                                     mask_converter, &mask,
@@ -1310,7 +1476,9 @@ py_kcluster(PyObject* self, PyObject* args, PyObject* keywords)
                                     &npass,
                                     method_kcluster_converter, &method,
                                     distance_converter, &dist,
-                                    index_converter, &clusterid)) goto exit;
+                                    index_converter, &clusterid,
+                                    &threads,
+                                    &seed)) goto exit;
     if (!data.values) {
         PyErr_SetString(PyExc_RuntimeError, "data is None");
         goto exit;
@@ -1345,6 +1513,11 @@ py_kcluster(PyObject* self, PyObject* args, PyObject* keywords)
                         "more clusters than items to be clustered");
         goto exit;
     }
+    if (threads < 1) {
+        PyErr_SetString(PyExc_ValueError,
+                        "threads should be a positive integer");
+        goto exit;
+    }
     if (npass < 0) {
         PyErr_SetString(PyExc_RuntimeError, "expected a non-negative integer");
         goto exit;
@@ -1357,20 +1530,43 @@ py_kcluster(PyObject* self, PyObject* args, PyObject* keywords)
                             "more clusters requested than found in clusterid");
             goto exit;
         }
+        kcluster(nclusters,
+                 nrows,
+                 ncols,
+                 data.values,
+                 mask.values,
+                 weight.buf,
+                 transpose,
+                 npass,
+                 method,
+                 dist,
+                 clusterid.buf,
+                 &error,
+                 &ifound);
+    }
+    else {
+        KclusterTask task = {0};
+        task.nclusters = nclusters;
+        task.nrows = nrows;
+        task.ncols = ncols;
+        task.data = data.values;
+        task.mask = mask.values;
+        task.weight = weight.buf;
+        task.transpose = transpose;
+        task.method = method;
+        task.dist = dist;
+        task.nelements = nitems;
+        task.distances = NULL;
+        task.seed = (unsigned int) seed;
+        Py_BEGIN_ALLOW_THREADS
+        ifound = kcluster_threaded(&task, npass, threads,
+                                   clusterid.buf, &error);
+        Py_END_ALLOW_THREADS
+    }
+    if (ifound == -1) {
+        PyErr_NoMemory();
+        ifound = 0;
     }
-    kcluster(nclusters,
-             nrows,
-             ncols,
-             data.values,
-             mask.values,
-             weight.buf,
-             transpose,
-             npass,
-             method,
-             dist,
-             clusterid.buf,
-             &error,
-             &ifound);
 exit:
     free_data(&data);
     free_mask(&mask);
@@ -1383,7 +1579,8 @@ exit:
 
 /* kmedoids */
 static char kmedoids__doc__[] =
-"kmedoids(distance, nclusters, npass, clusterid) -> error, nfound\n"
+"kmedoids(distance, nclusters, npass, clusterid, threads=1, seed=0)\n"
+"    -> error, nfound\n"
 "\n"
 "This function implements k-medoids clustering.\n"
 "\n"
@@ -1426,6 +1623,15 @@ static char kmedoids__doc__[] =
 "   the EM algorithm should start. In this case, the k-medoids algorithm\n"
 "   is fully deterministic.\n"
 "\n"
+" - threads: the number of threads performing the passes concurrently.\n"
+"\n"
+" - seed: the seed of the random initial conditions. Each pass starts\n"
+"   from a random initial condition determined by the seed and the\n"
+"   number of the pass, so the result does not depend on the number of\n"
+"   threads.\n"
+"\n"
+"The passes are performed without holding the global interpreter lock.\n"
+"\n"
 "Return values:\n"
 " - error: the within-cluster sum of distances for the returned k-means\n"
 "   clustering solution;\n"
@@ -1438,6 +1644,8 @@ py_kmedoids(PyObject* self, PyObject* args, PyObject* keywords)
     Distancematrix distances = {0};
     Py_buffer clusterid = {0};
     int npass = 1;
+    int threads = 1;
+    unsigned long seed = 0;
     double error;
     int ifound = -2;
 
@@ -1445,12 +1653,21 @@ py_kmedoids(PyObject* self, PyObject* args, PyObject* keywords)
                              "nclusters",
                              "npass",
                              "clusterid",
+                             "threads",
+                             "seed",
                               NULL};
-    if(!PyArg_ParseTupleAndKeywords(args, keywords, "O&iiO&", kwlist,
+    if(!PyArg_ParseTupleAndKeywords(args, keywords, "O&iiO&|ik", kwlist,
                                     distancematrix_converter, &distances,
                                     &nclusters,
                                     &npass,
-                                    index_converter, &clusterid)) goto exit;
+                                    index_converter, &clusterid,
+                                    &threads,
+                                    &seed)) goto exit;
+    if (threads < 1) {
+        PyErr_SetString(PyExc_ValueError,
+                        "threads should be a positive integer");
+        goto exit;
+    }
     if (npass < 0) {
         PyErr_SetString(PyExc_RuntimeError, "expected a non-negative integer");
         goto exit;
@@ -1474,13 +1691,25 @@ py_kmedoids(PyObject* self, PyObject* args, PyObject* keywords)
                         "more clusters requested than items to be clustered");
         goto exit;
     }
-    kmedoids(nclusters,
-             distances.n,
-             distances.values,
-             npass,
-             clusterid.buf,
-             &error,
-             &ifound);
+    if (npass == 0)
+        kmedoids(nclusters,
+                 distances.n,
+                 distances.values,
+                 npass,
+                 clusterid.buf,
+                 &error,
+                 &ifound);
+    else {
+        KclusterTask task = {0};
+        task.nclusters = nclusters;
+        task.nelements = distances.n;
+        task.distances = distances.values;
+        task.seed = (unsigned int) seed;
+        Py_BEGIN_ALLOW_THREADS
+        ifound = kcluster_threaded(&task, npass, threads,
+                                   clusterid.buf, &error);
+        Py_END_ALLOW_THREADS
+    }
 
 exit:
     free_distancematrix(&distances);
@@ -2108,8 +2337,8 @@ exit:
 
 /* distancematrix */
 static char distancematrix__doc__[] =
-"distancematrix(data, mask, weight, transpose, dist, distancematrix)\n"
-"              -> None\n"
+"distancematrix(data, mask, weight, transpose, dist, distancematrix,\n"
+"               first=0, threads=1) -> None\n"
 "\n"
 "This function calculuates the distance matrix between the data values.\n"
 "\n"
@@ -2152,19 +2381,119 @@ static char distancematrix__doc__[] =
 "    [0.\t1.\t7.\t4.]\n"
 "    [1.\t0.\t3.\t2.]\n"
 "    [7.\t3.\t0.\t6.]\n"
-"    [4.\t2.\t6.\t0.]\n";
+"    [4.\t2.\t6.\t0.]\n"
+"\n"
+"   Alternatively, distancematrix can be a 1D array, in which the rows\n"
+"   of the distance matrix are stored consecutively, starting from the\n"
+"   row given by first (e.g. array([1., 7., 3., 4., 2., 6.]) for the\n"
+"   whole matrix above, or array([4., 2., 6.]) for first == 3).\n"
+"\n"
+" - first: the first row stored in distancematrix, if it is a 1D array.\n"
+"\n"
+" - threads: the number of threads calculating the distances.\n"
+"\n"
+"The distances are calculated without holding the global interpreter\n"
+"lock.\n";
+
+typedef struct {
+    int nrows;
+    int ncols;
+    double** data;
+    int** mask;
+    double* weight;
+    char dist;
+    int transpose;
+    int first;
+    int last;
+    int step;
+    double** matrix;
+    PyThread_type_lock done;
+} DistancematrixTask;
+
+static void
+distancematrix_task(void* argument)
+{
+    /* Calculate every step'th row, starting from first. */
+    DistancematrixTask* task = argument;
+    int i;
+    for (i = task->first; i < task->last; i += task->step)
+        distancematrix_rows(task->nrows, task->ncols,
+                            task->data, task->mask, task->weight,
+                            task->dist, task->transpose,
+                            i, i + 1, task->matrix);
+    if (task->done) PyThread_release_lock(task->done);
+}
+
+static int
+distancematrix_threaded(DistancematrixTask* task, int threads)
+/* Calculates the rows first to last-1 of the distance matrix, using the
+ * given number of threads. The rows are interleaved between the threads,
+ * as the later rows are longer. The calling thread should not hold the
+ * global interpreter lock. Returns 0 if out of memory.
+ */
+{
+    int i;
+    DistancematrixTask* tasks;
+    if (threads > task->last - task->first) threads = task->last - task->first;
+    if (threads <= 1) {
+        distancematrix_task(task);
+        return 1;
+    }
+    tasks = malloc(threads*sizeof(DistancematrixTask));
+    if (!tasks) return 0;
+    for (i = 0; i < threads; i++) {
+        tasks[i] = *task;
+        tasks[i].first = task->first + i;
+        tasks[i].step = threads;
+        tasks[i].done = NULL;
+    }
+    for (i = 1; i < threads; i++) {
+        PyThread_type_lock done = PyThread_allocate_lock();
+        if (done) {
+            PyThread_acquire_lock(done, WAIT_LOCK);
+            tasks[i].done = done;
+            if (PyThread_start_new_thread(distancematrix_task, &tasks[i])
+                    == PYTHREAD_INVALID_THREAD_ID) {
+                PyThread_release_lock(done);
+                PyThread_free_lock(done);
+                tasks[i].done = NULL;
+            }
+        }
+        /* If the thread could not be started, do its rows below */
+        if (!tasks[i].done) distancematrix_task(&tasks[i]);
+    }
+    distancematrix_task(&tasks[0]);
+    for (i = 1; i < threads; i++) {
+        PyThread_type_lock done = tasks[i].done;
+        if (done) {
+            /* Wait for the thread to finish */
+            PyThread_acquire_lock(done, WAIT_LOCK);
+            PyThread_release_lock(done);
+            PyThread_free_lock(done);
+        }
+    }
+    free(tasks);
+    return 1;
+}
 
 static PyObject*
 py_distancematrix(PyObject* self, PyObject* args, PyObject* keywords)
 {
-    PyObject* list;
+    PyObject* argument;
     Distancematrix distances = {0};
     Data data = {0};
     Mask mask = {0};
     Py_buffer weight = {0};
+    Py_buffer view = {0};
     int transpose = 0;
     char dist = 'e';
-    int nrows, ncols, ndata;
+    int first = 0;
+    int threads = 1;
+    int nrows, ncols, ndata, nitems;
+    int last;
+    int ok;
+    double** values = NULL;
+    DistancematrixTask task;
     PyObject* result = NULL;
 
     /* -- Read the input variables --------------------------------------- */
@@ -2174,14 +2503,18 @@ py_distancematrix(PyObject* self, PyObject* args, PyObject* keywords)
                              "transpose",
                              "dist",
                              "distancematrix",
+                             "first",
+                             "threads",
                               NULL};
-    if(!PyArg_ParseTupleAndKeywords(args, keywords, "O&O&O&iO&O!", kwlist,
+    if(!PyArg_ParseTupleAndKeywords(args, keywords, "O&O&O&iO&O|ii", kwlist,
                                     data_converter, &data,
                                     mask_converter, &mask,
                                     vector_converter, &weight,
                                     &transpose,
                                     distance_converter, &dist,
-                                    &PyList_Type, &list)) goto exit;
+                                    &argument,
+                                    &first,
+                                    &threads)) goto exit;
     if (!data.values) {
         PyErr_SetString(PyExc_RuntimeError, "data is None");
         goto exit;
@@ -2199,22 +2532,89 @@ py_distancematrix(PyObject* self, PyObject* args, PyObject* keywords)
         goto exit;
     }
     ndata = (transpose==0) ? ncols : nrows;
+    nitems = (transpose==0) ? nrows : ncols;
     if (weight.shape[0] != ndata) {
         PyErr_Format(PyExc_RuntimeError,
                      "weight has incorrect size %zd (expected %d)",
                      weight.shape[0], ndata);
         goto exit;
     }
-    if (_convert_list_to_distancematrix(list, &distances) == 0) goto exit;
-
-    distancematrix(nrows,
-                   ncols,
-                   data.values,
-                   mask.values,
-                   weight.buf,
-                   dist,
-                   transpose,
-                   distances.values);
+    if (threads < 1) {
+        PyErr_Format(PyExc_ValueError,
+                     "threads should be positive (got %d)", threads);
+        goto exit;
+    }
+    if (PyList_Check(argument)) {
+        if (_convert_list_to_distancematrix(argument, &distances) == 0)
+            goto exit;
+        if (distances.n != nitems) {
+            PyErr_Format(PyExc_ValueError,
+                         "distance matrix has %d rows (expected %d)",
+                         distances.n, nitems);
+            goto exit;
+        }
+        values = distances.values;
+        first = 1;
+        last = nitems;
+    }
+    else {
+        /* The rows from first are stored consecutively in a 1D array */
+        double* p;
+        Py_ssize_t size;
+        const int flag = PyBUF_WRITABLE | PyBUF_ND | PyBUF_C_CONTIGUOUS;
+        if (PyObject_GetBuffer(argument, &view, flag) == -1) {
+            PyErr_SetString(PyExc_RuntimeError,
+                            "distance matrix has unexpected format.");
+            goto exit;
+        }
+        if (view.ndim != 1) {
+            PyErr_Format(PyExc_ValueError,
+                         "distance matrix has incorrect rank "
+                         "(%d; expected 1)", view.ndim);
+            goto exit;
+        }
+        if (view.itemsize != sizeof(double)) {
+            PyErr_SetString(PyExc_RuntimeError,
+                            "distance matrix has an incorrect data type");
+            goto exit;
+        }
+        if (first < 1) first = 1;
+        size = view.shape[0];
+        for (last = first; size > 0 && last < nitems; last++) size -= last;
+        if (size != 0) {
+            PyErr_Format(PyExc_ValueError,
+                         "distance matrix has unexpected size %zd",
+                         view.shape[0]);
+            goto exit;
+        }
+        values = malloc((last > 0 ? last : 1)*sizeof(double*));
+        if (!values) {
+            PyErr_NoMemory();
+            goto exit;
+        }
+        for (p = view.buf, size = first; size < last; p += size, size++)
+            values[size] = p;
+    }
+
+    task.nrows = nrows;
+    task.ncols = ncols;
+    task.data = data.values;
+    task.mask = mask.values;
+    task.weight = weight.buf;
+    task.dist = dist;
+    task.transpose = transpose;
+    task.first = first;
+    task.last = last;
+    task.step = 1;
+    task.matrix = values;
+    task.done = NULL;
+    Py_BEGIN_ALLOW_THREADS
+    ok = distancematrix_threaded(&task, threads);
+    Py_END_ALLOW_THREADS
+    if (!ok) {
+        PyErr_NoMemory();
+        goto exit;
+    }
 
     Py_INCREF(Py_None);
     result = Py_None;
@@ -2222,6 +2622,8 @@ exit:
     free_data(&data);
     free_mask(&mask);
     PyBuffer_Release(&weight);
+    if (values && values != distances.values) free(values);
+    if (view.obj) PyBuffer_Release(&view);
     free_distancematrix(&distances);
     return result;
 }
@@ -25,6 +25,7 @@ import itertools
 import platform
 
 from Bio._py3k import basestring
+from Bio._utils import WorkerPool
 
 try:
     from collections import UserDict as _dict_base
@@ -511,6 +512,30 @@ class _IndexedSeqFileDict(_dict_base):
         self._proxy._handle.close()
 
 
+# number of offsets written to the SQLite index at a time
+_INSERT_BATCH_SIZE = 10000
+
+
+def _file_stamp(filename):
+    """Return the size and modification time of a file (PRIVATE)."""
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime
+
+
+def _scan_offsets(filename, arguments):
+    """Return a list of the keys, offsets and lengths in a file (PRIVATE).
+
+    This is run in the worker processes when indexing several files in
+    parallel, with the (proxy factory, format) tuple as arguments.
+    """
+    proxy_factory, format = arguments
+    random_access_proxy = proxy_factory(format, filename)
+    try:
+        return list(random_access_proxy)
+    finally:
+        random_access_proxy._handle.close()
+
+
 class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
     """Read only dictionary interface to many sequential record files.
 
@@ -524,11 +549,19 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
     There are OS limits on the number of files that can be open at once,
     so a pool are kept. If a record is required from a closed file, then
     one of the open handles is closed first.
+
+    When building (or updating) the index, the files can be scanned in
+    parallel using a pool of worker processes, in which case the proxy
+    factory must be picklable (e.g. a module level function, or a
+    functools.partial of one). The size and modification time of each file
+    are recorded, so that when updating an existing index only new or
+    changed files need to be scanned again.
     """
 
     def __init__(self, index_filename, filenames,
                  proxy_factory, format,
-                 key_function, repr, max_open=10):
+                 key_function, repr, max_open=10, processes=1,
+                 update=False):
         """Initialize the class."""
         # TODO? - Don't keep filename list in memory (just in DB)?
         # Should save a chunk of memory if dealing with 1000s of files.
@@ -551,6 +584,7 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
         self._proxy_factory = proxy_factory
         self._repr = repr
         self._max_open = max_open
+        self._processes = processes
         self._proxies = {}
 
         # Note if using SQLite :memory: trick index filename, this will
@@ -558,11 +592,15 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
         self._relative_path = os.path.abspath(os.path.dirname(index_filename))
 
         if os.path.isfile(index_filename):
-            self._load_index()
+            if update:
+                self._load_index(check_filenames=False)
+                self._update_index(filenames)
+            else:
+                self._load_index()
         else:
             self._build_index()
 
-    def _load_index(self):
+    def _load_index(self, check_filenames=True):
         """Call from __init__ to re-use an existing index (PRIVATE)."""
         index_filename = self._index_filename
         relative_path = self._relative_path
@@ -618,11 +656,14 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
                         tmp.append(os.path.join(relative_path, f.replace("/", os.path.sep)))
                 self._filenames = tmp
                 del tmp
-            if filenames and len(filenames) != len(self._filenames):
+            if not check_filenames:
+                # Filenames are compared when updating the index
+                pass
+            elif filenames and len(filenames) != len(self._filenames):
                 con.close()
                 raise ValueError("Index file says %i files, not %i"
                                  % (len(self._filenames), len(filenames)))
-            if filenames and filenames != self._filenames:
+            elif filenames and filenames != self._filenames:
                 for old, new in zip(self._filenames, filenames):
                     # Want exact match (after making relative to the index above)
                     if os.path.abspath(old) != os.path.abspath(new):
@@ -648,13 +689,9 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
     def _build_index(self):
         """Call from __init__ to create a new index (PRIVATE)."""
         index_filename = self._index_filename
-        relative_path = self._relative_path
         filenames = self._filenames
         format = self._format
-        key_function = self._key_function
         proxy_factory = self._proxy_factory
-        max_open = self._max_open
-        random_access_proxies = self._proxies
 
         if not format or not filenames:
             raise ValueError("Filenames to index and format required to build %r" % index_filename)
@@ -678,61 +715,22 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
         con.execute("INSERT INTO meta_data (key, value) VALUES (?,?);",
                     ("filenames_relative_to_index", "True"))
         # TODO - Record the alphabet?
-        # TODO - Record the file size and modified date?
-        con.execute(
-            "CREATE TABLE file_data (file_number INTEGER, name TEXT);")
+        con.execute("CREATE TABLE file_data (file_number INTEGER, name TEXT, "
+                    "size INTEGER, mtime REAL);")
         con.execute("CREATE TABLE offset_data (key TEXT, "
                     "file_number INTEGER, offset INTEGER, length INTEGER);")
-        count = 0
         for i, filename in enumerate(filenames):
-            # Default to storing as an absolute path,
-            f = os.path.abspath(filename)
-            if not os.path.isabs(filename) and not os.path.isabs(index_filename):
-                # Since user gave BOTH filename & index as relative paths,
-                # we will store this relative to the index file even though
-                # if it may now start ../ (meaning up a level)
-                # Note for cross platform use (e.g. shared drive over SAMBA),
-                # convert any Windows slash into Unix style for rel paths.
-                f = os.path.relpath(filename, relative_path).replace(os.path.sep, "/")
-            elif (os.path.dirname(os.path.abspath(filename)) +
-                  os.path.sep).startswith(relative_path + os.path.sep):
-                # Since sequence file is in same directory or sub directory,
-                # might as well make this into a relative path:
-                f = os.path.relpath(filename, relative_path).replace(os.path.sep, "/")
-                assert not f.startswith("../"), f
-            # print("DEBUG - storing %r as [%r] %r" % (filename, relative_path, f))
-            con.execute(
-                "INSERT INTO file_data (file_number, name) VALUES (?,?);",
-                (i, f))
-            random_access_proxy = proxy_factory(format, filename)
-            if key_function:
-                offset_iter = ((key_function(k), i, o, l)
-                               for (k, o, l) in random_access_proxy)
-            else:
-                offset_iter = ((k, i, o, l)
-                               for (k, o, l) in random_access_proxy)
-            while True:
-                batch = list(itertools.islice(offset_iter, 100))
-                if not batch:
-                    break
-                # print("Inserting batch of %i offsets, %s ... %s"
-                #       % (len(batch), batch[0][0], batch[-1][0]))
-                con.executemany(
-                    "INSERT INTO offset_data (key,file_number,offset,length) VALUES (?,?,?,?);",
-                    batch)
-                con.commit()
-                count += len(batch)
-            if len(random_access_proxies) < max_open:
-                random_access_proxies[i] = random_access_proxy
-            else:
-                random_access_proxy._handle.close()
+            con.execute("INSERT INTO file_data (file_number, name, size, "
+                        "mtime) VALUES (?,?,?,?);",
+                        (i, self._stored_filename(filename)) +
+                        _file_stamp(filename))
+        count = self._add_offsets(list(enumerate(filenames)))
         self._length = count
         # print("About to index %i entries" % count)
         try:
             con.execute("CREATE UNIQUE INDEX IF NOT EXISTS "
                         "key_index ON offset_data(key);")
         except _IntegrityError as err:
-            self._proxies = random_access_proxies
             self.close()
             con.close()
             raise ValueError("Duplicate key? %s" % err)
@@ -742,6 +740,162 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
         con.commit()
         # print("Index created")
 
+    def _update_index(self, filenames):
+        """Call from __init__ to update an existing index (PRIVATE).
+
+        Only the files which are new, or whose size or modification time
+        has changed, are scanned. The offsets for any other files are kept
+        (renumbered if the file order has changed), while those for any
+        files no longer listed are removed.
+        """
+        con = self._con
+        if filenames is None:
+            filenames = self._filenames
+        if not filenames:
+            con.close()
+            raise ValueError("Filenames to index required to update %r"
+                             % self._index_filename)
+
+        # Older indexes did not record the file sizes and modification times
+        columns = [row[1] for row in
+                   con.execute("PRAGMA table_info(file_data);")]
+        if "size" not in columns:
+            con.execute("ALTER TABLE file_data ADD COLUMN size INTEGER;")
+            con.execute("ALTER TABLE file_data ADD COLUMN mtime REAL;")
+        indexed = {}
+        rows = con.execute("SELECT file_number, size, mtime FROM file_data "
+                           "ORDER BY file_number;")
+        for (number, size, mtime), filename in zip(rows, self._filenames):
+            indexed[os.path.abspath(filename)] = (number, (size, mtime))
+
+        renumber = []
+        rescan = []
+        file_rows = []
+        for i, filename in enumerate(filenames):
+            stamp = _file_stamp(filename)
+            number, old_stamp = indexed.get(os.path.abspath(filename),
+                                            (None, None))
+            if old_stamp == stamp:
+                renumber.append((number, i))
+            else:
+                rescan.append((i, filename))
+            file_rows.append((i, self._stored_filename(filename)) + stamp)
+        if not rescan and len(renumber) == len(indexed) and \
+                all(old == new for old, new in renumber):
+            # Nothing has changed
+            return
+
+        # Create the temporary table first, as older versions of the sqlite3
+        # module implicitly commit before such statements
+        con.execute("CREATE TEMP TABLE renumber (old INTEGER PRIMARY KEY, "
+                    "new INTEGER);")
+        try:
+            con.execute("UPDATE meta_data SET value = ? WHERE key = ?;",
+                        (-1, "count"))
+            con.executemany("INSERT INTO renumber (old, new) VALUES (?,?);",
+                            renumber)
+            # Offsets for changed or removed files are set to NULL
+            con.execute("UPDATE offset_data SET file_number = (SELECT new "
+                        "FROM renumber WHERE old = offset_data.file_number);")
+            con.execute("DELETE FROM offset_data WHERE file_number IS NULL;")
+            con.execute("DELETE FROM file_data;")
+            con.executemany("INSERT INTO file_data (file_number, name, size, "
+                            "mtime) VALUES (?,?,?,?);", file_rows)
+            con.execute("DELETE FROM meta_data WHERE key = ?;",
+                        ("filenames_relative_to_index",))
+            con.execute("INSERT INTO meta_data (key, value) VALUES (?,?);",
+                        ("filenames_relative_to_index", "True"))
+            self._filenames = list(filenames)
+            self._add_offsets(rescan)
+        except _IntegrityError as err:
+            con.rollback()
+            self.close()
+            con.close()
+            raise ValueError("Duplicate key? %s" % err)
+        count, = con.execute("SELECT COUNT(key) FROM offset_data;").fetchone()
+        self._length = count
+        con.execute("UPDATE meta_data SET value = ? WHERE key = ?;",
+                    (count, "count"))
+        con.commit()
+        con.execute("DROP TABLE renumber;")
+
+    def _stored_filename(self, filename):
+        """Return the filename as it should be stored in the index (PRIVATE)."""
+        relative_path = self._relative_path
+        # Default to storing as an absolute path,
+        f = os.path.abspath(filename)
+        if not os.path.isabs(filename) and not os.path.isabs(self._index_filename):
+            # Since user gave BOTH filename & index as relative paths,
+            # we will store this relative to the index file even though
+            # if it may now start ../ (meaning up a level)
+            # Note for cross platform use (e.g. shared drive over SAMBA),
+            # convert any Windows slash into Unix style for rel paths.
+            f = os.path.relpath(filename, relative_path).replace(os.path.sep, "/")
+        elif (os.path.dirname(os.path.abspath(filename)) +
+              os.path.sep).startswith(relative_path + os.path.sep):
+            # Since sequence file is in same directory or sub directory,
+            # might as well make this into a relative path:
+            f = os.path.relpath(filename, relative_path).replace(os.path.sep, "/")
+            assert not f.startswith("../"), f
+        # print("DEBUG - storing %r as [%r] %r" % (filename, relative_path, f))
+        return f
+
+    def _scan_files(self, numbered_filenames):
+        """Return the file numbers with iterables of their offsets (PRIVATE).
+
+        Given a list of (file number, filename) tuples, yields tuples of the
+        file number and an iterable of (key, offset, length) tuples, in the
+        same order. Unless using a single process, the files are scanned by
+        a pool of worker processes.
+        """
+        format = self._format
+        proxy_factory = self._proxy_factory
+        if self._processes == 1 or len(numbered_filenames) < 2:
+            random_access_proxies = self._proxies
+            for i, filename in numbered_filenames:
+                random_access_proxy = proxy_factory(format, filename)
+                yield i, random_access_proxy
+                if len(random_access_proxies) < self._max_open:
+                    random_access_proxies[i] = random_access_proxy
+                else:
+                    random_access_proxy._handle.close()
+            return
+        filenames = [filename for i, filename in numbered_filenames]
+        with WorkerPool(_scan_offsets, (proxy_factory, format),
+                        self._processes) as pool:
+            # imap returns the results in order, as each file is done
+            for (i, filename), offsets in zip(numbered_filenames,
+                                              pool.imap(filenames)):
+                yield i, offsets
+
+    def _add_offsets(self, numbered_filenames):
+        """Scan the files, adding their offsets to the index (PRIVATE).
+
+        The offsets are written in large batches, but not committed.
+        Returns the number of offsets added.
+        """
+        con = self._con
+        key_function = self._key_function
+        count = 0
+        for i, offsets in self._scan_files(numbered_filenames):
+            if key_function:
+                offset_iter = ((key_function(k), i, o, l)
+                               for (k, o, l) in offsets)
+            else:
+                offset_iter = ((k, i, o, l)
+                               for (k, o, l) in offsets)
+            while True:
+                batch = list(itertools.islice(offset_iter, _INSERT_BATCH_SIZE))
+                if not batch:
+                    break
+                # print("Inserting batch of %i offsets, %s ... %s"
+                #       % (len(batch), batch[0][0], batch[-1][0]))
+                con.executemany(
+                    "INSERT INTO offset_data (key,file_number,offset,length) VALUES (?,?,?,?);",
+                    batch)
+                count += len(batch)
+        return count
+
     def __repr__(self):
         return self._repr
 
@@ -9,8 +9,15 @@ This module contains classes which implement Dynamic Programming
 algorithms that can be used generally.
 """
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from Bio._py3k import range
 
+from Bio import MissingPythonDependencyError
+
 
 class AbstractDPAlgorithms(object):
     """An abstract class to calculate forward and backward probabilities.
@@ -327,3 +334,188 @@ class LogDPAlgorithms(AbstractDPAlgorithms):
     def __init__(self, markov_model, sequence):
         """Initialize."""
         raise NotImplementedError("Haven't coded this yet...")
+
+
+def _encode(sequences, letters):
+    """Encode sequences as rows of an array of letter indices (PRIVATE).
+
+    Returns the array, with the shorter sequences padded with zeros, and
+    the array of the sequence lengths.
+    """
+    index = dict((letter, i) for i, letter in enumerate(letters))
+    lengths = numpy.array([len(sequence) for sequence in sequences],
+                          numpy.intp)
+    codes = numpy.zeros((len(sequences), max(lengths) if len(lengths) else 0),
+                        numpy.intp)
+    for row, sequence in zip(codes, sequences):
+        try:
+            row[:len(sequence)] = [index[letter] for letter in sequence]
+        except KeyError as err:
+            raise ValueError("Unexpected letter %r, not in the alphabet"
+                             % err.args[0])
+    return codes, lengths
+
+
+def _forward_arrays(initial, transition, emission, codes, lengths):
+    """Calculate the scaled forward variables of encoded sequences (PRIVATE).
+
+    Returns an array of the forward variables by sequence, position and
+    state, scaled to sum to one at each position, and an array of the
+    scaling values by sequence and position (one after the end of each
+    sequence).
+    """
+    num_seqs, length = codes.shape
+    emission_rows = emission.T
+    forward = numpy.zeros((num_seqs, length, len(initial)))
+    scales = numpy.ones((num_seqs, length))
+    for i in range(length):
+        if i == 0:
+            values = initial * emission_rows[codes[:, 0]]
+        else:
+            values = values.dot(transition) * emission_rows[codes[:, i]]
+        sums = values.sum(axis=1)
+        sums[i >= lengths] = 1
+        values /= sums[:, None]
+        forward[:, i] = values
+        scales[:, i] = sums
+    return forward, scales
+
+
+def _backward_arrays(transition, emission, codes, lengths, scales):
+    """Calculate the scaled backward variables of encoded sequences (PRIVATE).
+
+    These are scaled using the scaling values of the forward variables, so
+    that the product of the forward and backward variables is the posterior
+    probability of each state.
+    """
+    num_seqs, length = codes.shape
+    emission_rows = emission.T
+    backward = numpy.ones((num_seqs, length, transition.shape[0]))
+    values = backward[:, length - 1]
+    for i in range(length - 2, -1, -1):
+        values = (emission_rows[codes[:, i + 1]] * values /
+                  scales[:, i + 1, None]).dot(transition.T)
+        # the last position of each sequence has backward variables of one
+        values[i + 1 >= lengths] = 1
+        backward[:, i] = values
+    return backward
+
+
+def _expected_counts(initial, transition, emission, codes, lengths):
+    """Calculate the expected transition and emission counts (PRIVATE).
+
+    Returns the expected number of each transition (from state by to state)
+    and emission (state by emission) in the encoded sequences, as in
+    formulas 3.20 and 3.21 in Durbin et al, and the log probability of each
+    sequence.
+    """
+    forward, scales = _forward_arrays(initial, transition, emission, codes,
+                                      lengths)
+    if not (scales > 0).all():
+        raise ValueError("A sequence has a probability of zero under the "
+                         "current model")
+    backward = _backward_arrays(transition, emission, codes, lengths, scales)
+    valid = numpy.arange(codes.shape[1]) < lengths[:, None]
+    # E_{k}(b), summing the posterior probabilities of the states
+    posterior = (forward * backward)[valid]
+    valid_codes = codes[valid]
+    emission_counts = numpy.array([
+        numpy.bincount(valid_codes, posterior[:, k], emission.shape[1])
+        for k in range(len(initial))]).reshape(emission.shape)
+    # A_{kl}, summing f_{k}(i) a_{kl} e_{l}(x_{i + 1}) b_{l}(i + 1) over the
+    # pairs of positions in each sequence, with the scaling value of i + 1
+    pairs = valid[:, 1:]
+    after = (emission.T[codes[:, 1:]] * backward[:, 1:] /
+             scales[:, 1:, None])[pairs]
+    transition_counts = transition * forward[:, :-1][pairs].T.dot(after)
+    return transition_counts, emission_counts, numpy.log(scales).sum(axis=1)
+
+
+class ArrayDPAlgorithms(object):
+    """Calculate forward and backward variables with NumPy arrays.
+
+    This works on a list of training sequences at once, with the states and
+    emissions encoded as their index in the letters of the alphabets, and
+    the model as a vector of the initial state probabilities and matrices
+    of the transition and emission probabilities. Each step of the forward
+    and backward algorithms is then a few array operations for all of the
+    states of all of the sequences.
+
+    The forward variables are scaled to sum to one at each position (see
+    Durbin et al. p78), and the backward variables with the same scaling
+    values, so the log probability of each sequence is the sum of the logs
+    of its scaling values. Unlike ScaledDPAlgorithms, this uses the initial
+    probabilities of the model, rather than the transitions from and to the
+    first state.
+
+    This can be used as the dp_method of the BaumWelchTrainer, which then
+    calculates the expected counts with arrays as well.
+    """
+
+    def __init__(self, markov_model, sequences):
+        """Initialize to calculate forward and backward variables.
+
+        Arguments:
+         - markov_model -- The current Markov model we are working with.
+         - sequences -- A list of TrainingSequence objects, with the same
+           state and emission alphabets.
+
+        """
+        if numpy is None:
+            raise MissingPythonDependencyError(
+                "Please install NumPy if you want to use ArrayDPAlgorithms. "
+                "See http://www.numpy.org/")
+        self._mm = markov_model
+        self._seqs = sequences
+        self.state_letters = sequences[0].states.alphabet.letters
+        self.emission_letters = sequences[0].emissions.alphabet.letters
+        self.codes, self.lengths = _encode(
+            [sequence.emissions for sequence in sequences],
+            self.emission_letters)
+        self._scales = None
+
+    def _arrays(self):
+        """Return the model probabilities as arrays (PRIVATE)."""
+        return self._mm._arrays(self.state_letters, self.emission_letters)
+
+    def forward_algorithm(self):
+        """Calculate the forward variables and the sequence log probabilities.
+
+        Returns:
+         - An array of the scaled forward variables, by sequence, position
+           and state (ordered as the state alphabet letters). Positions after
+           the end of the shorter sequences should be ignored.
+         - An array of the log probabilities of the sequences.
+
+        """
+        initial, transition, emission = self._arrays()
+        forward, self._scales = _forward_arrays(initial, transition,
+                                                emission, self.codes,
+                                                self.lengths)
+        return forward, numpy.log(self._scales).sum(axis=1)
+
+    def backward_algorithm(self):
+        """Calculate the backward variables.
+
+        Returns an array of the scaled backward variables, by sequence,
+        position and state, using the scaling values of the forward
+        algorithm (which is run first if necessary).
+        """
+        if self._scales is None:
+            self.forward_algorithm()
+        initial, transition, emission = self._arrays()
+        return _backward_arrays(transition, emission, self.codes,
+                                self.lengths, self._scales)
+
+    def expected_counts(self):
+        """Calculate the expected transition and emission counts.
+
+        Returns:
+         - An array of the expected number of transitions, summed over the
+           sequences, from each state (rows) to each state (columns).
+         - An array of the expected number of emissions of each letter
+           (columns) by each state (rows).
+         - An array of the log probabilities of the sequences.
+
+        """
+        return _expected_counts(*self._arrays() + (self.codes, self.lengths))
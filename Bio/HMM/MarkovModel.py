@@ -12,6 +12,12 @@ import random
 # TODO - Take advantage of defaultdict once Python 2.4 is dead?
 # from collections import defaultdict
 
+try:
+    import numpy
+except ImportError:
+    # Fall back on the slower pure Python code
+    numpy = None
+
 from Bio._py3k import range
 
 from Bio.Seq import MutableSeq
@@ -544,12 +550,19 @@ class HiddenMarkovModel(object):
          - state_alphabet -- The alphabet of the possible state sequences
            that can be generated.
 
+        If NumPy is available, each position of the sequence is calculated
+        for all the states at once, using a matrix of the log transition
+        probabilities.
         """
         # calculate logarithms of the initial, transition, and emission probs
         log_initial = self._log_transform(self.initial_prob)
         log_trans = self._log_transform(self.transition_prob)
         log_emission = self._log_transform(self.emission_prob)
 
+        if numpy is not None:
+            return self._viterbi_arrays(sequence, state_alphabet, log_initial,
+                                        log_trans, log_emission)
+
         viterbi_probs = {}
         pred_state_seq = {}
         state_letters = state_alphabet.letters
@@ -635,6 +648,109 @@ class HiddenMarkovModel(object):
 
         return traceback_seq.toseq(), state_path_prob
 
+    def _viterbi_arrays(self, sequence, state_alphabet, log_initial,
+                        log_trans, log_emission):
+        """Calculate the most probable state path using NumPy arrays (PRIVATE).
+
+        This follows the viterbi method, with the states numbered in the
+        order of the alphabet letters. Each step takes the maximum over the
+        previous states for all the current states at once, with the
+        previous states of each state in the order of transitions_to, so
+        that the first of equally likely previous states is chosen, as in
+        the viterbi method.
+        """
+        state_letters = state_alphabet.letters
+        num_states = len(state_letters)
+        state_index = dict((state, i) for i, state in enumerate(state_letters))
+
+        # a row of the log emission probabilities of the states for each
+        # different letter in the sequence, and the rows for the sequence
+        symbol_index = {}
+        symbol_rows = []
+        codes = []
+        for symbol in sequence:
+            try:
+                code = symbol_index[symbol]
+            except KeyError:
+                code = symbol_index[symbol] = len(symbol_rows)
+                symbol_rows.append([log_emission[(state, symbol)]
+                                    for state in state_letters])
+            codes.append(code)
+        emission_rows = numpy.array(symbol_rows)[codes]
+
+        # the previous states of each state (in rows), and the log
+        # probabilities of the transitions, padded with -inf
+        pred_lists = [self.transitions_to(state) for state in state_letters]
+        width = max(len(pred_list) for pred_list in pred_lists)
+        if len(codes) > 1 and not all(pred_lists):
+            raise ValueError("State %r cannot be reached from any state"
+                             % state_letters[pred_lists.index([])])
+        preds = numpy.zeros((num_states, width), numpy.intp)
+        trans = numpy.empty((num_states, width))
+        trans.fill(-numpy.inf)
+        for i, pred_list in enumerate(pred_lists):
+            preds[i, :len(pred_list)] = [state_index[prev_state]
+                                         for prev_state in pred_list]
+            trans[i, :len(pred_list)] = [
+                log_trans[(prev_state, state_letters[i])]
+                for prev_state in pred_list]
+
+        # --- recursion
+        # for the first state, use the initial probability rather than
+        # looking back to previous states
+        viterbi_probs = emission_rows[0] + [log_initial[state]
+                                            for state in state_letters]
+        # the most likely previous state leading to each state
+        pred_states = numpy.zeros((len(codes), num_states), numpy.intp)
+        all_states = numpy.arange(num_states)
+        for i in range(1, len(codes)):
+            # scores of the previous states of the current states (rows)
+            scores = viterbi_probs[preds] + trans
+            best = scores.argmax(axis=1)
+            pred_states[i] = preds[all_states, best]
+            viterbi_probs = emission_rows[i] + scores[all_states, best]
+
+        # --- termination, using the last of the most probable states
+        last_state = num_states - 1 - viterbi_probs[::-1].argmax()
+        state_path_prob = float(viterbi_probs[last_state])
+
+        # --- traceback
+        path = [last_state]
+        for i in range(len(codes) - 1, 0, -1):
+            path.append(pred_states[i, path[-1]])
+        path.reverse()
+        traceback_seq = MutableSeq(''.join(state_letters[state]
+                                           for state in path),
+                                   state_alphabet)
+        return traceback_seq.toseq(), state_path_prob
+
+    def _arrays(self, state_letters, emission_letters):
+        """Return the probabilities of the model as NumPy arrays (PRIVATE).
+
+        Returns the vector of the initial probabilities of the states, the
+        matrix of the transition probabilities (from state by to state), and
+        the matrix of the emission probabilities (state by emission), in the
+        order of the given letters. Transitions and emissions which are not
+        allowed have a probability of zero.
+        """
+        state_index = dict((state, i) for i, state in enumerate(state_letters))
+        emission_index = dict((letter, i)
+                              for i, letter in enumerate(emission_letters))
+        initial = numpy.zeros(len(state_letters))
+        for state, prob in self.initial_prob.items():
+            if state in state_index:
+                initial[state_index[state]] = prob
+        transition = numpy.zeros((len(state_letters), len(state_letters)))
+        for (from_state, to_state), prob in self.transition_prob.items():
+            if from_state in state_index and to_state in state_index:
+                transition[state_index[from_state],
+                           state_index[to_state]] = prob
+        emission = numpy.zeros((len(state_letters), len(emission_letters)))
+        for (state, letter), prob in self.emission_prob.items():
+            if state in state_index and letter in emission_index:
+                emission[state_index[state], emission_index[letter]] = prob
+        return initial, transition, emission
+
     def _log_transform(self, probability):
         """Return log transform of the given probability dictionary (PRIVATE).
 
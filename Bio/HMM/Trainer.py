@@ -22,6 +22,27 @@ import math
 
 # local stuff
 from .DynamicProgramming import ScaledDPAlgorithms
+from .DynamicProgramming import ArrayDPAlgorithms
+from .DynamicProgramming import _encode, _expected_counts
+from Bio._utils import check_processes, WorkerPool
+
+# number of training sequences whose expected counts are calculated at once
+# with ArrayDPAlgorithms
+_BATCH_SIZE = 64
+
+
+def _batch_counts(task, batches):
+    """Calculate the expected counts of a batch of sequences (PRIVATE).
+
+    The task is the index of the batch and the initial, transition and
+    emission probability arrays of the current model, and batches holds
+    all the encoded training sequences.
+    """
+    index, initial, transition, emission = task
+    codes, lengths = batches[index]
+    transition_counts, emission_counts, log_likelihoods = \
+        _expected_counts(initial, transition, emission, codes, lengths)
+    return transition_counts, emission_counts, log_likelihoods.sum()
 
 
 class TrainingSequence(object):
@@ -171,7 +192,7 @@ class BaumWelchTrainer(AbstractTrainer):
         AbstractTrainer.__init__(self, markov_model)
 
     def train(self, training_seqs, stopping_criteria,
-              dp_method=ScaledDPAlgorithms):
+              dp_method=ScaledDPAlgorithms, processes=1):
         """Estimate the parameters using training sequences.
 
         The algorithm for this is taken from Durbin et al. p64, so this
@@ -186,8 +207,23 @@ class BaumWelchTrainer(AbstractTrainer):
          - dp_method -- A class instance specifying the dynamic programming
            implementation we should use to calculate the forward and
            backward variables. By default, we use the scaling method.
+         - processes -- The number of worker processes calculating the
+           expected counts in parallel (None meaning one per CPU), only
+           used with ArrayDPAlgorithms.
+
+        With ArrayDPAlgorithms as the dp_method, the training sequences are
+        sorted by length and encoded once as arrays, and in each iteration
+        the expected counts are calculated for batches of sequences at a
+        time, in parallel if processes is not 1. This requires NumPy.
 
         """
+        check_processes(processes)
+        if issubclass(dp_method, ArrayDPAlgorithms):
+            return self._train_arrays(training_seqs, stopping_criteria,
+                                      processes)
+        if processes != 1:
+            raise ValueError("Parallel training requires ArrayDPAlgorithms")
+
         prev_log_likelihood = None
         num_iterations = 1
 
@@ -246,6 +282,74 @@ class BaumWelchTrainer(AbstractTrainer):
 
         return self._markov_model
 
+    def _train_arrays(self, training_seqs, stopping_criteria, processes):
+        """Estimate the parameters with ArrayDPAlgorithms (PRIVATE).
+
+        This is the train method with the expected counts calculated
+        using NumPy arrays, in batches of training sequences of similar
+        lengths, in worker processes if processes is not 1.
+        """
+        # check the NumPy dependency and get the letters of the alphabets
+        DP = ArrayDPAlgorithms(self._markov_model, training_seqs[:1])
+        state_letters = DP.state_letters
+        emission_letters = DP.emission_letters
+        # sequences of similar lengths waste less time on the padding
+        emissions = sorted((training_seq.emissions
+                            for training_seq in training_seqs), key=len)
+        batches = [_encode(emissions[start:start + _BATCH_SIZE],
+                           emission_letters)
+                   for start in range(0, len(emissions), _BATCH_SIZE)]
+
+        with WorkerPool(_batch_counts, batches, processes) as pool:
+            prev_log_likelihood = None
+            num_iterations = 1
+
+            while True:
+                arrays = self._markov_model._arrays(state_letters,
+                                                    emission_letters)
+                tasks = [(index,) + arrays for index in range(len(batches))]
+                results = pool.map(tasks)
+
+                # add the expected counts to the pseudocounts of the allowed
+                # transitions and emissions
+                transition_count = \
+                    dict(self._markov_model.get_blank_transitions())
+                emission_count = dict(self._markov_model.get_blank_emissions())
+                transition_arrays, emission_arrays, log_likelihoods = \
+                    zip(*results)
+                transition_array = sum(transition_arrays)
+                emission_array = sum(emission_arrays)
+                for i, state in enumerate(state_letters):
+                    for j, to_state in enumerate(state_letters):
+                        if (state, to_state) in transition_count:
+                            transition_count[(state, to_state)] += \
+                                float(transition_array[i, j])
+                    for j, letter in enumerate(emission_letters):
+                        if (state, letter) in emission_count:
+                            emission_count[(state, letter)] += \
+                                float(emission_array[i, j])
+
+                # update the markov model with the new probabilities
+                ml_transitions, ml_emissions = \
+                    self.estimate_params(transition_count, emission_count)
+                self._markov_model.transition_prob = ml_transitions
+                self._markov_model.emission_prob = ml_emissions
+
+                cur_log_likelihood = float(sum(log_likelihoods))
+
+                # as in the train method
+                if prev_log_likelihood is not None:
+                    log_likelihood_change = abs(abs(cur_log_likelihood) -
+                                                abs(prev_log_likelihood))
+                    if stopping_criteria(log_likelihood_change,
+                                         num_iterations):
+                        break
+
+                prev_log_likelihood = cur_log_likelihood
+                num_iterations += 1
+
+        return self._markov_model
+
     def update_transitions(self, transition_counts, training_seq,
                            forward_vars, backward_vars, training_seq_prob):
         """Add the contribution of a new training sequence to the transitions.
@@ -24,6 +24,8 @@ MarkovModel     Holds the description of a markov model
 
 import numpy
 
+from Bio._utils import check_processes, WorkerPool
+
 
 try:
     logaddexp = numpy.logaddexp
@@ -147,7 +149,7 @@ def save(mm, handle):
 # XXX allow them to specify starting points
 def train_bw(states, alphabet, training_data,
              pseudo_initial=None, pseudo_transition=None, pseudo_emission=None,
-             update_fn=None,
+             update_fn=None, batched=False, processes=1,
              ):
     """Train a MarkovModel using the Baum-Welch algorithm.
 
@@ -165,10 +167,20 @@ def train_bw(states, alphabet, training_data,
 
     update_fn is an optional callback that takes parameters
     (iteration, log_likelihood).  It is called once per iteration.
+
+    By default the parameters are updated after each training
+    sequence.  If batched is True, each iteration instead sums the
+    expected counts over all of the training sequences before updating
+    the parameters (including the initial probabilities), calculating
+    them with arrays for batches of sequences of similar lengths at
+    once.  processes is the number of worker processes calculating the
+    batches in parallel (None meaning one per CPU), and can only be
+    used with batched.
     """
     N, M = len(states), len(alphabet)
     if not training_data:
         raise ValueError("No training data given.")
+    _check_processes(batched, processes)
     if pseudo_initial is not None:
         pseudo_initial = numpy.asarray(pseudo_initial)
         if pseudo_initial.shape != (N,):
@@ -202,19 +214,32 @@ def train_bw(states, alphabet, training_data,
                     pseudo_initial=pseudo_initial,
                     pseudo_transition=pseudo_transition,
                     pseudo_emission=pseudo_emission,
-                    update_fn=update_fn)
+                    update_fn=update_fn, batched=batched,
+                    processes=processes)
     p_initial, p_transition, p_emission = x
     return MarkovModel(states, alphabet, p_initial, p_transition, p_emission)
 
 
+def _check_processes(batched, processes):
+    """Check the number of worker processes for training (PRIVATE)."""
+    check_processes(processes)
+    if processes != 1 and not batched:
+        raise ValueError("Parallel training requires batched training")
+
+
 MAX_ITERATIONS = 1000
 
+# number of training sequences in each batch of batched training
+_BATCH_SIZE = 64
+
 
 def _baum_welch(N, M, training_outputs,
                 p_initial=None, p_transition=None, p_emission=None,
                 pseudo_initial=None, pseudo_transition=None,
-                pseudo_emission=None, update_fn=None):
+                pseudo_emission=None, update_fn=None, batched=False,
+                processes=1):
     """Implement the Baum-Welch algorithm to evaluate unknown parameters in the MarkovModel object (PRIVATE)."""
+    _check_processes(batched, processes)
     if p_initial is None:
         p_initial = _random_norm(N)
     else:
@@ -229,6 +254,12 @@ def _baum_welch(N, M, training_outputs,
     else:
         p_emission = _copy_and_check(p_emission, (N, M))
 
+    if batched:
+        return _baum_welch_batched(training_outputs, p_initial, p_transition,
+                                   p_emission, pseudo_initial,
+                                   pseudo_transition, pseudo_emission,
+                                   update_fn, processes)
+
     # Do all the calculations in log space to avoid underflows.
     lp_initial = numpy.log(p_initial)
     lp_transition = numpy.log(p_transition)
@@ -283,35 +314,25 @@ def _baum_welch_one(N, M, outputs,
     bmat = _backward(N, T, lp_transition, lp_emission, outputs)
 
     # Calculate the probability of traversing each arc for any given
-    # transition.
-    lp_arc = numpy.zeros((N, N, T))
-    for t in range(T):
-        k = outputs[t]
-        lp_traverse = numpy.zeros((N, N))  # P going over one arc.
-        for i in range(N):
-            for j in range(N):
-                # P(getting to this arc)
-                # P(making this transition)
-                # P(emitting this character)
-                # P(going to the end)
-                lp = (fmat[i][t] +
-                      lp_transition[i][j] +
-                      lp_emission[i][k] +
-                      bmat[j][t + 1])
-                lp_traverse[i][j] = lp
-        # Normalize the probability for this time step.
-        lp_arc[:, :, t] = lp_traverse - _logsum(lp_traverse)
+    # transition, of getting to the arc, making the transition, emitting
+    # the character and going to the end.  The first row of each of
+    # these is LOG0, to start the log sums.
+    outputs = numpy.asarray(outputs, int)
+    lp_arc = numpy.empty((N * N + 1, T))
+    lp_arc[0] = LOG0
+    lp_arc[1:] = (fmat[:, None, :T] +
+                  lp_transition[:, :, None] +
+                  lp_emission[:, None, outputs] +
+                  bmat[None, :, 1:]).reshape(N * N, T)
+    # Normalize the probability for each time step.
+    lp_arc[1:] -= logaddexp.reduce(lp_arc)
+    lp_arc = lp_arc[1:].reshape(N, N, T)
 
     # Sum of all the transitions out of state i at time t.
-    lp_arcout_t = numpy.zeros((N, T))
-    for t in range(T):
-        for i in range(N):
-            lp_arcout_t[i][t] = _logsum(lp_arc[i, :, t])
+    lp_arcout_t = _logsum_axis(lp_arc, 1)
 
     # Sum of all the transitions out of state i.
-    lp_arcout = numpy.zeros(N)
-    for i in range(N):
-        lp_arcout[i] = _logsum(lp_arcout_t[i, :])
+    lp_arcout = _logsum_axis(lp_arcout_t, 1)
 
     # UPDATE P_INITIAL.
     lp_initial = lp_arcout_t[:, 0]
@@ -322,22 +343,25 @@ def _baum_welch_one(N, M, outputs,
     # UPDATE P_TRANSITION.  p_transition[i][j] is the sum of all the
     # transitions from i to j, normalized by the sum of the
     # transitions out of i.
-    for i in range(N):
-        for j in range(N):
-            lp_transition[i][j] = _logsum(lp_arc[i, j, :]) - lp_arcout[i]
-        if lpseudo_transition is not None:
-            lp_transition[i] = _logvecadd(lp_transition[i], lpseudo_transition)
+    lp_transition[:] = _logsum_axis(lp_arc, 2) - lp_arcout[:, None]
+    if lpseudo_transition is not None:
+        for i in range(N):
+            lp_transition[i] = _logvecadd(lp_transition[i],
+                                          lpseudo_transition[i])
             lp_transition[i] = lp_transition[i] - _logsum(lp_transition[i])
 
     # UPDATE P_EMISSION.  lp_emission[i][k] is the sum of all the
     # transitions out of i when k is observed, divided by the sum of
     # the transitions out of i.
+    ksums = numpy.zeros((N, M)) + LOG0   # ksum[k] is the sum of all i with k.
+    for k in range(M):
+        positions = (outputs == k)
+        if positions.any():
+            # the arcs out of i at each time k is observed
+            ksums[:, k] = _logsum_axis(
+                lp_arc[:, :, positions].transpose(0, 2, 1).reshape(N, -1), 1)
     for i in range(N):
-        ksum = numpy.zeros(M) + LOG0    # ksum[k] is the sum of all i with k.
-        for t in range(T):
-            k = outputs[t]
-            for j in range(N):
-                ksum[k] = logaddexp(ksum[k], lp_arc[i, j, t])
+        ksum = ksums[i]
         ksum = ksum - _logsum(ksum)      # Normalize
         if lpseudo_emission is not None:
             ksum = _logvecadd(ksum, lpseudo_emission[i])
@@ -354,6 +378,136 @@ def _baum_welch_one(N, M, outputs,
     return _logsum(fmat[:, T])
 
 
+def _baum_welch_batched(training_outputs, p_initial, p_transition, p_emission,
+                        pseudo_initial, pseudo_transition, pseudo_emission,
+                        update_fn, processes):
+    """Implement the Baum-Welch algorithm over batches of outputs (PRIVATE).
+
+    Each iteration sums the expected counts of the initial states,
+    transitions and emissions over all of the training outputs, and then
+    updates the parameters.  The outputs are sorted by length and padded
+    into batches of similar lengths, whose counts are calculated by
+    _batch_counts, in worker processes if processes is not 1.
+    """
+    N, M = p_emission.shape
+    training_outputs = sorted(training_outputs, key=len)
+    batches = []
+    for start in range(0, len(training_outputs), _BATCH_SIZE):
+        outputs = training_outputs[start:start + _BATCH_SIZE]
+        lengths = numpy.array([len(x) for x in outputs])
+        codes = numpy.zeros((len(outputs), lengths.max()), int)
+        for row, x in zip(codes, outputs):
+            row[:len(x)] = x
+        batches.append((codes, lengths))
+
+    with WorkerPool(_batch_counts, batches, processes) as pool:
+        prev_llik = None
+        for i in range(MAX_ITERATIONS):
+            tasks = [(index, p_initial, p_transition, p_emission)
+                     for index in range(len(batches))]
+            results = pool.map(tasks)
+            initial_counts, transition_counts, emission_counts, lliks = \
+                [sum(x) for x in zip(*results)]
+
+            # The log likelihoods are for the parameters before the
+            # update, as in _baum_welch_one.
+            llik = lliks
+            p_initial = _update_probabilities(initial_counts, p_initial,
+                                              pseudo_initial)
+            p_transition = _update_probabilities(transition_counts,
+                                                 p_transition,
+                                                 pseudo_transition)
+            p_emission = _update_probabilities(emission_counts, p_emission,
+                                               pseudo_emission)
+            if update_fn is not None:
+                update_fn(i, llik)
+            if prev_llik is not None and numpy.fabs(prev_llik - llik) < 0.1:
+                break
+            prev_llik = llik
+        else:
+            raise RuntimeError("HMM did not converge in %d iterations"
+                               % MAX_ITERATIONS)
+
+    return [p_initial, p_transition, p_emission]
+
+
+def _update_probabilities(counts, previous, pseudo):
+    """Estimate probabilities from expected counts, by row (PRIVATE).
+
+    Rows without any counts keep their previous probabilities.  As in
+    _baum_welch_one, the pseudo-counts are added to the estimated
+    probabilities, which are then renormalized.
+    """
+    totals = counts.sum(axis=-1)[..., None]
+    matrix = numpy.where(totals > 0, counts / numpy.where(totals > 0,
+                                                          totals, 1),
+                         previous)
+    if pseudo is not None:
+        matrix = matrix + pseudo
+        matrix = matrix / matrix.sum(axis=-1)[..., None]
+    return matrix
+
+
+def _batch_counts(task, batches):
+    """Calculate the expected counts of a batch of outputs (PRIVATE).
+
+    The task is the index of the batch and the current probabilities, and
+    batches holds all the batches of training outputs.  Returns the expected counts of the initial states,
+    transitions and emissions, and the log likelihood of the batch.
+
+    The batch is the array of the outputs (padded to the same length) and
+    the array of their lengths.  Rather than in log space, the forward and
+    backward matrices are calculated for all of the outputs at once with
+    each column scaled to sum to one, and the scaling factors give the log
+    likelihoods.
+    """
+    index, p_initial, p_transition, p_emission = task
+    codes, lengths = batches[index]
+    B, T = codes.shape
+    N, M = p_emission.shape
+    emissions = p_emission.T[codes]  # P(emitting output t) by state
+
+    # The scaled forward matrix of each output, before emitting each
+    # output and at the end.  The padding is left unscaled.
+    fmats = numpy.empty((B, T + 1, N))
+    scales = numpy.ones((B, T + 1))
+    fmats[:, 0] = p_initial / p_initial.sum()
+    scales[:, 0] = p_initial.sum()
+    for t in range(T):
+        values = (fmats[:, t] * emissions[:, t]).dot(p_transition)
+        total = values.sum(axis=1)
+        total[t >= lengths] = 1
+        fmats[:, t + 1] = values / total[:, None]
+        scales[:, t + 1] = total
+    if not (scales > 0).all():
+        raise ValueError("Training output with a probability of zero")
+
+    # The backward matrix, scaled by the factors of the forward matrix,
+    # so that the product of the two is the probability of each state.
+    bmats = numpy.ones((B, T + 1, N))
+    for t in range(T - 1, -1, -1):
+        values = emissions[:, t] * (
+            bmats[:, t + 1] / scales[:, t + 1, None]).dot(p_transition.T)
+        values[t >= lengths] = 1
+        bmats[:, t] = values
+
+    valid = numpy.arange(T) < lengths[:, None]
+    # The probability of being in each state at each time.
+    lp_state = (fmats[:, :T] * bmats[:, :T])[valid]
+    initial_counts = (fmats[:, 0] * bmats[:, 0]).sum(axis=0)
+    # Sum of the probabilities of traversing each arc, of getting to
+    # the arc and emitting the character, times the transition and going
+    # to the end.
+    transition_counts = p_transition * \
+        (fmats[:, :T] * emissions)[valid].T.dot(
+            (bmats[:, 1:] / scales[:, 1:, None])[valid])
+    outputs = codes[valid]
+    emission_counts = numpy.array([
+        numpy.bincount(outputs, lp_state[:, i], M) for i in range(N)])
+    llik = numpy.log(scales).sum()
+    return initial_counts, transition_counts, emission_counts, llik
+
+
 def _forward(N, T, lp_initial, lp_transition, lp_emission, outputs):
     """Implement forward algorithm (PRIVATE).
 
@@ -364,34 +518,34 @@ def _forward(N, T, lp_initial, lp_transition, lp_emission, outputs):
 
     # Initialize the first column to be the initial values.
     matrix[:, 0] = lp_initial
+    # The transitions from state i (rows) to state j (columns), after a
+    # first row of LOG0.
+    lp = numpy.empty((N + 1, N))
+    lp[0] = LOG0
     for t in range(1, T + 1):
         k = outputs[t - 1]
-        for j in range(N):
-            # The probability of the state is the sum of the
-            # transitions from all the states from time t-1.
-            lprob = LOG0
-            for i in range(N):
-                lp = matrix[i][t - 1] + lp_transition[i][j] + lp_emission[i][k]
-                lprob = logaddexp(lprob, lp)
-            matrix[j][t] = lprob
+        # The probability of the state is the sum of the
+        # transitions from all the states from time t-1.
+        numpy.add(matrix[:, t - 1, None] + lp_transition,
+                  lp_emission[:, k, None], lp[1:])
+        matrix[:, t] = logaddexp.reduce(lp)
     return matrix
 
 
 def _backward(N, T, lp_transition, lp_emission, outputs):
     """Implement backward algorithm (PRIVATE)."""
     matrix = numpy.zeros((N, T + 1))
+    # The transitions to state j (rows) from state i (columns), after a
+    # first row of LOG0.
+    lp = numpy.empty((N + 1, N))
+    lp[0] = LOG0
     for t in range(T - 1, -1, -1):
         k = outputs[t]
-        for i in range(N):
-            # The probability of the state is the sum of the
-            # transitions from all the states from time t+1.
-            lprob = LOG0
-            for j in range(N):
-                lp = (matrix[j][t + 1] +
-                      lp_transition[i][j] +
-                      lp_emission[i][k])
-                lprob = logaddexp(lprob, lp)
-            matrix[i][t] = lprob
+        # The probability of the state is the sum of the
+        # transitions from all the states from time t+1.
+        numpy.add(matrix[:, t + 1, None] + lp_transition.T,
+                  lp_emission[:, k], lp[1:])
+        matrix[:, t] = logaddexp.reduce(lp)
     return matrix
 
 
@@ -521,24 +675,23 @@ def find_states(markov_model, output):
 def _viterbi(N, lp_initial, lp_transition, lp_emission, output):
     """Implement Viterbi algorithm to find most likely states for a given input (PRIVATE)."""
     T = len(output)
-    # Store the backtrace in a NxT matrix.
-    backtrace = []    # list of indexes of states in previous timestep.
-    for i in range(N):
-        backtrace.append([None] * T)
+    # Store the backtrace in a NxT matrix of the index of the state in
+    # the previous timestep.
+    backtrace = numpy.zeros((N, T), int)
 
     # Store the best scores.
     scores = numpy.zeros((N, T))
     scores[:, 0] = lp_initial + lp_emission[:, output[0]]
+    states = numpy.arange(N)
     for t in range(1, T):
         k = output[t]
-        for j in range(N):
-            # Find the most likely place it came from.
-            i_scores = (scores[:, t - 1] +
-                        lp_transition[:, j] +
-                        lp_emission[j, k])
-            indexes = _argmaxes(i_scores)
-            scores[j, t] = i_scores[indexes[0]]
-            backtrace[j][t] = indexes
+        # Find the most likely place each state j (columns) came from.
+        i_scores = (scores[:, t - 1, None] +
+                    lp_transition +
+                    lp_emission[:, k])
+        indexes = i_scores.argmax(axis=0)
+        scores[:, t] = i_scores[indexes, states]
+        backtrace[:, t] = indexes
 
     # Do the backtrace.  First, find a good place to start.  Then,
     # we'll follow the backtrace matrix to find the list of states.
@@ -549,15 +702,15 @@ def _viterbi(N, lp_initial, lp_transition, lp_emission, output):
     results = []       # return values.  list of (states, score)
     indexes = _argmaxes(scores[:, T - 1])      # pick the first place
     for i in indexes:
-        in_process.append((T - 1, [i], scores[i][T - 1]))
+        in_process.append((T - 1, [int(i)], scores[i][T - 1]))
     while in_process:
         t, states, score = in_process.pop()
         if t == 0:
             results.append((states, score))
         else:
-            indexes = backtrace[states[0]][t]
+            indexes = [backtrace[states[0], t]]
             for i in indexes:
-                in_process.append((t - 1, [i] + states, score))
+                in_process.append((t - 1, [int(i)] + states, score))
     return results
 
 
@@ -608,23 +761,32 @@ def _copy_and_check(matrix, desired_shape):
 
 def _logsum(matrix):
     """Implement logsum for a matrix object (PRIVATE)."""
-    if len(matrix.shape) > 1:
-        vec = numpy.reshape(matrix, (numpy.product(matrix.shape),))
-    else:
-        vec = matrix
-    sum = LOG0
-    for num in vec:
-        sum = logaddexp(sum, num)
-    return sum
+    vec = numpy.empty(matrix.size + 1)
+    vec[0] = LOG0
+    vec[1:] = numpy.ravel(matrix)
+    return logaddexp.reduce(vec)
+
+
+def _logsum_axis(matrix, axis):
+    """Implement logsum along one axis of a matrix object (PRIVATE).
+
+    As in _logsum, the sums start from LOG0.
+    """
+    shape = list(matrix.shape)
+    shape[axis] += 1
+    values = numpy.empty(shape)
+    first = [slice(None)] * len(shape)
+    first[axis] = slice(0, 1)
+    values[tuple(first)] = LOG0
+    first[axis] = slice(1, None)
+    values[tuple(first)] = matrix
+    return logaddexp.reduce(values, axis)
 
 
 def _logvecadd(logvec1, logvec2):
     """Implement a log sum for two vector objects (PRIVATE)."""
     assert len(logvec1) == len(logvec2), "vectors aren't the same length"
-    sumvec = numpy.zeros(len(logvec1))
-    for i in range(len(logvec1)):
-        sumvec[i] = logaddexp(logvec1[i], logvec2[i])
-    return sumvec
+    return logaddexp(logvec1, logvec2)
 
 
 def _exp_logsum(numbers):
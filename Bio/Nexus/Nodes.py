@@ -97,14 +97,12 @@ class Chain(object):
 
     def is_parent_of(self, parent, grandchild):
         """Check if grandchild is a subnode of parent."""
-        if grandchild == parent or grandchild in self.chain[parent].get_succ():
-            return True
-        else:
-            for sn in self.chain[parent].get_succ():
-                if self.is_parent_of(sn, grandchild):
-                    return True
-            else:
-                return False
+        # follow the predecessors up from the grandchild
+        while grandchild is not None:
+            if grandchild == parent:
+                return True
+            grandchild = self.chain[grandchild].get_prev()
+        return False
 
     def trace(self, start, finish):
         """Return a list of all node_ids between two nodes (excluding start, including end)."""
@@ -112,9 +110,12 @@ class Chain(object):
             raise NodeException('Unknown node.')
         if not self.is_parent_of(start, finish) or start == finish:
             return []
-        for sn in self.chain[start].get_succ():
-            if self.is_parent_of(sn, finish):
-                return [sn] + self.trace(sn, finish)
+        path = []
+        while finish != start:
+            path.append(finish)
+            finish = self.chain[finish].get_prev()
+        path.reverse()
+        return path
 
 
 class Node(object):
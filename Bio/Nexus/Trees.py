@@ -15,6 +15,7 @@ nodes).
 from __future__ import print_function
 
 import random
+import re
 import sys
 from . import Nodes
 
@@ -24,6 +25,10 @@ PRECISION_SUPPORT = 6
 NODECOMMENT_START = '[&'
 NODECOMMENT_END = ']'
 
+# The parentheses, commas and comment delimiters of a newick tree
+_parse_pattern = re.compile(r'[(),]|%s|%s' % (re.escape(NODECOMMENT_START),
+                                              re.escape(NODECOMMENT_END)))
+
 
 class TreeError(Exception):
     pass
@@ -73,67 +78,95 @@ class Tree(Nodes.Chain):
             self._add_subtree(parent_id=root.id, tree=subtree_info)
 
     def _parse(self, tree):
-        """Parse (a,b,c...)[[[xx]:]yy] into subcomponents and travels down recursively (PRIVATE)."""
+        """Parse (a,b,c...)[[[xx]:]yy] into subcomponents (PRIVATE).
+
+        This returns the nested list of [subclades, values] or, for a leaf,
+        [taxon, values]. The text is scanned once, keeping a stack of the
+        clades whose closing parenthesis has not been reached yet, rather
+        than splitting each subtree recursively.
+        """
         # Remove any leading/trailing white space - want any string starting
         # with " (..." should be recognised as a leaf, "(..."
         tree = tree.strip()
         if tree.count('(') != tree.count(')'):
             raise TreeError('Parentheses do not match in (sub)tree: ' + tree)
         if tree.count('(') == 0:  # a leaf
-            # check if there's a colon, or a special comment, or both  after the taxon name
-            nodecomment = tree.find(NODECOMMENT_START)
-            colon = tree.find(':')
-            if colon == -1 and nodecomment == -1:  # none
-                return [tree, [None]]
-            elif colon == -1 and nodecomment > -1:  # only special comment
-                return [tree[:nodecomment], self._get_values(tree[nodecomment:])]
-            elif colon > -1 and nodecomment == -1:  # only numerical values
-                return [tree[:colon], self._get_values(tree[colon + 1:])]
-            elif colon < nodecomment:  # taxon name ends at first colon or with special comment
-                return [tree[:colon], self._get_values(tree[colon + 1:])]
-            else:
-                return [tree[:nodecomment], self._get_values(tree[nodecomment:])]
-        else:
-            closing = tree.rfind(')')
-            val = self._get_values(tree[closing + 1:])
-            if not val:
-                val = [None]
-            subtrees = []
-            plevel = 0
-            prev = 1
-            incomment = False
-            for p in range(1, closing):
-                if not incomment and tree[p] == '(':
-                    plevel += 1
-                elif not incomment and tree[p] == ')':
-                    plevel -= 1
-                elif tree[p:].startswith(NODECOMMENT_START):
-                    incomment = True
-                elif incomment and tree[p] == NODECOMMENT_END:
+            return self._parse_leaf(tree)
+        # each entry is the list of subclades parsed so far, the start of
+        # the current subclade, and the current subclade if it is internal
+        # (its list of subclades and the position of its closing parenthesis)
+        stack = []
+        incomment = False
+        for match in _parse_pattern.finditer(tree):
+            token = match.group()
+            p = match.start()
+            if incomment:
+                if token == NODECOMMENT_END:
                     incomment = False
-                elif not incomment and tree[p] == ',' and plevel == 0:
-                    subtrees.append(tree[prev:p])
-                    prev = p + 1
-
-            subtrees.append(tree[prev:closing])
-            subclades = [self._parse(subtree) for subtree in subtrees]
-            return [subclades, val]
+            elif token == NODECOMMENT_START:
+                incomment = True
+            elif token == '(':
+                if tree[stack[-1][1]:p].strip() if stack else p:
+                    raise TreeError('Text before parenthesis in (sub)tree: ' + tree)
+                stack.append([[], p + 1, None])
+            elif token in ',)':
+                subclades, prev, internal = entry = stack[-1]
+                if internal is None:
+                    subclades.append(self._parse_leaf(tree[prev:p].strip()))
+                else:
+                    val = self._get_values(tree[internal[1] + 1:p].rstrip())
+                    subclades.append([internal[0], val or [None]])
+                if token == ',':
+                    entry[1:] = [p + 1, None]
+                else:
+                    stack.pop()
+                    if not stack:
+                        break
+                    stack[-1][2] = (subclades, p)
+        val = self._get_values(tree[p + 1:])
+        return [subclades, val or [None]]
+
+    def _parse_leaf(self, tree):
+        """Parse a leaf taxon[[:xx]:yy] into the taxon and its values (PRIVATE)."""
+        # check if there's a colon, or a special comment, or both  after the taxon name
+        nodecomment = tree.find(NODECOMMENT_START)
+        colon = tree.find(':')
+        if colon == -1 and nodecomment == -1:  # none
+            return [tree, [None]]
+        elif colon == -1 and nodecomment > -1:  # only special comment
+            return [tree[:nodecomment], self._get_values(tree[nodecomment:])]
+        elif colon > -1 and nodecomment == -1:  # only numerical values
+            return [tree[:colon], self._get_values(tree[colon + 1:])]
+        elif colon < nodecomment:  # taxon name ends at first colon or with special comment
+            return [tree[:colon], self._get_values(tree[colon + 1:])]
+        else:
+            return [tree[:nodecomment], self._get_values(tree[nodecomment:])]
 
     def _add_subtree(self, parent_id=None, tree=None):
-        """Add leaf or tree (in newick format) to a parent_id (PRIVATE)."""
+        """Add leaf or tree (in newick format) to a parent_id (PRIVATE).
+
+        The nodes are added in pre-order, using a stack of the parent ids and
+        iterators over the remaining subtrees of each.
+        """
         if parent_id is None:
             raise TreeError('Need node_id to connect to.')
-        for st in tree:
-            nd = self.dataclass()
-            nd = self._add_nodedata(nd, st)
-            if isinstance(st[0], list):  # it's a subtree
-                sn = Nodes.Node(nd)
-                self.add(sn, parent_id)
-                self._add_subtree(sn.id, st[0])
-            else:  # it's a leaf
-                nd.taxon = st[0]
-                leaf = Nodes.Node(nd)
-                self.add(leaf, parent_id)
+        stack = [(parent_id, iter(tree))]
+        while stack:
+            parent_id, subtrees = stack[-1]
+            for st in subtrees:
+                nd = self.dataclass()
+                nd = self._add_nodedata(nd, st)
+                if isinstance(st[0], list):  # it's a subtree
+                    sn = Nodes.Node(nd)
+                    self.add(sn, parent_id)
+                    stack.append((sn.id, iter(st[0])))
+                    break
+                else:  # it's a leaf
+                    nd.taxon = st[0]
+                    leaf = Nodes.Node(nd)
+                    self.add(leaf, parent_id)
+            else:
+                stack.pop()
 
     def _add_nodedata(self, nd, st):
         """Add data to the node parsed from the comments, taxon and support (PRIVATE)."""
@@ -190,10 +223,11 @@ class Tree(Nodes.Chain):
         """Return all node_ids downwards from a node (PRIVATE)."""
         if node is None:
             node = self.root
-        for n in self.node(node).succ:
+        stack = self.node(node).succ[::-1]
+        while stack:
+            n = stack.pop()
             yield n
-            for sn in self._walk(n):
-                yield sn
+            stack.extend(self.node(n).succ[::-1])
 
     def node(self, node_id):
         """Return the instance of node_id.
@@ -278,10 +312,8 @@ class Tree(Nodes.Chain):
             else:
                 return None
         else:
-            list = []
-            for succ in self.chain[node_id].succ:
-                list.extend(self.get_taxa(succ))
-            return list
+            return [self.chain[n].data.taxon for n in self._walk(node_id)
+                    if self.chain[n].succ == []]
 
     def get_terminals(self):
         """Return a list of all terminal nodes."""
@@ -359,25 +391,42 @@ class Tree(Nodes.Chain):
 
         sets = set_subtree(self,node)
         """
-        if self.node(node).succ == []:
-            return self.node(node).data.taxon
-        else:
-            try:
-                return frozenset(self.set_subtree(n) for n in self.node(node).succ)
-            except Exception:
-                print(node)
-                print(self.node(node).succ)
-                for n in self.node(node).succ:
-                    print("%s %s" % (n, self.set_subtree(n)))
-                print([self.set_subtree(n) for n in self.node(node).succ])
-                raise
+        # build the sets from the terminals up, in reverse pre-order
+        sets = {}
+        for n in reversed([node] + list(self._walk(node))):
+            succ = self.node(n).succ
+            if succ == []:
+                sets[n] = self.node(n).data.taxon
+            else:
+                sets[n] = frozenset(sets[sn] for sn in succ)
+        return sets[node]
 
     def is_identical(self, tree2):
         """Compare tree and tree2 for identity.
 
         result = is_identical(self,tree2)
         """
-        return self.set_subtree(self.root) == tree2.set_subtree(tree2.root)
+        # equal subtrees are given the same number, rather than comparing
+        # the nested sets of set_subtree, which is recursive
+        numbers = {}
+        return self._number_subtree(self.root, numbers) == \
+            tree2._number_subtree(tree2.root, numbers)
+
+    def _number_subtree(self, node, numbers):
+        """Return the number of a subtree, given a dict of subtrees to numbers (PRIVATE).
+
+        The subtrees are numbered from the terminals up, with the same number
+        for subtrees with the same nested sets from set_subtree.
+        """
+        ids = {}
+        for n in reversed([node] + list(self._walk(node))):
+            succ = self.node(n).succ
+            if succ == []:
+                key = (0, self.node(n).data.taxon)
+            else:
+                key = (1, frozenset(ids[sn] for sn in succ))
+            ids[n] = numbers.setdefault(key, len(numbers))
+        return ids[node]
 
     def is_compatible(self, tree2, threshold, strict=True):
         """Compare branches with support>threshold for compatibility.
@@ -453,15 +502,16 @@ class Tree(Nodes.Chain):
         if node is None:
             node = self.root
         if node == self.root and len(self.node(node).succ) == 3:  # root can be trifurcating, because it has no ancestor
-            return self.is_bifurcating(self.node(node).succ[0]) and \
-                    self.is_bifurcating(self.node(node).succ[1]) and \
-                    self.is_bifurcating(self.node(node).succ[2])
-        if len(self.node(node).succ) == 2:
-            return self.is_bifurcating(self.node(node).succ[0]) and self.is_bifurcating(self.node(node).succ[1])
-        elif len(self.node(node).succ) == 0:
-            return True
+            stack = list(self.node(node).succ)
         else:
-            return False
+            stack = [node]
+        while stack:
+            succ = self.node(stack.pop()).succ
+            if len(succ) == 2:
+                stack.extend(succ)
+            elif len(succ) != 0:
+                return False
+        return True
 
     def branchlength2support(self):
         """Move values stored in data.branchlength to data.support, and set branchlength to 0.0.
@@ -614,13 +664,24 @@ class Tree(Nodes.Chain):
             return succnodes
 
         def newickize(node, ladderize=None):
-            """Convert a node tree to a newick tree recursively."""
-            if not self.node(node).succ:    # terminal
-                return self.node(node).data.taxon + make_info_string(self.node(node).data, terminal=True)
-            else:
-                succnodes = ladderize_nodes(self.node(node).succ, ladderize=ladderize)
-                subtrees = [newickize(sn, ladderize=ladderize) for sn in succnodes]
-                return '(%s)%s' % (','.join(subtrees), make_info_string(self.node(node).data))
+            """Convert a node tree to a newick tree, using a stack of nodes and text."""
+            parts = []
+            stack = [(node, None)]
+            while stack:
+                node, text = stack.pop()
+                if node is None:
+                    parts.append(text)
+                elif not self.node(node).succ:    # terminal
+                    parts.append(self.node(node).data.taxon + make_info_string(self.node(node).data, terminal=True))
+                else:
+                    succnodes = list(ladderize_nodes(self.node(node).succ, ladderize=ladderize))
+                    parts.append('(')
+                    stack.append((None, ')' + make_info_string(self.node(node).data)))
+                    stack.append((succnodes[-1], None))
+                    for sn in reversed(succnodes[:-1]):
+                        stack.append((None, ','))
+                        stack.append((sn, None))
+            return ''.join(parts)
 
         treeline = ['tree']
         if self.name:
@@ -648,14 +709,10 @@ class Tree(Nodes.Chain):
         """Define a unrooted Tree structure, using data of a rooted Tree."""
         # travel down the rooted tree structure and save all branches and the nodes they connect
 
-        def _get_branches(node):
-            branches = []
-            for b in self.node(node).succ:
-                branches.append([node, b, self.node(b).data.branchlength, self.node(b).data.support])
-                branches.extend(_get_branches(b))
-            return branches
-
-        self.unrooted = _get_branches(self.root)
+        self.unrooted = []
+        for b in self._walk():
+            prev = self.node(b).prev
+            self.unrooted.append([prev, b, self.node(b).data.branchlength, self.node(b).data.support])
         # if root is bifurcating, then it is eliminated
         if len(self.node(self.root).succ) == 2:
             # find the two branches that connect to root
@@ -682,24 +739,27 @@ class Tree(Nodes.Chain):
 
         def _connect_subtree(parent, child):
             """Attach subtree starting with node child to parent (PRIVATE)."""
-            for i, branch in enumerate(self.unrooted):
-                if parent in branch[:2] and child in branch[:2]:
-                    branch = self.unrooted.pop(i)
-                    break
-            else:
-                raise TreeError('Unable to connect nodes for rooting: nodes %d and %d are not connected'
-                                % (parent, child))
-            self.link(parent, child)
-            self.node(child).data.branchlength = branch[2]
-            self.node(child).data.support = branch[3]
-            # now check if there are more branches connected to the child, and if so, connect them
-            child_branches = [b for b in self.unrooted if child in b[:2]]
-            for b in child_branches:
-                if child == b[0]:
-                    succ = b[1]
+            stack = [(parent, child)]
+            while stack:
+                parent, child = stack.pop()
+                for i, branch in enumerate(self.unrooted):
+                    if parent in branch[:2] and child in branch[:2]:
+                        branch = self.unrooted.pop(i)
+                        break
                 else:
-                    succ = b[0]
-                _connect_subtree(child, succ)
+                    raise TreeError('Unable to connect nodes for rooting: nodes %d and %d are not connected'
+                                    % (parent, child))
+                self.link(parent, child)
+                self.node(child).data.branchlength = branch[2]
+                self.node(child).data.support = branch[3]
+                # now check if there are more branches connected to the child, and if so, connect them
+                child_branches = [b for b in self.unrooted if child in b[:2]]
+                for b in reversed(child_branches):
+                    if child == b[0]:
+                        succ = b[1]
+                    else:
+                        succ = b[0]
+                    stack.append((child, succ))
 
         # check the outgroup we're supposed to root with
         if outgroup is None:
@@ -0,0 +1,433 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+"""Array based view of a tree, for fast queries on large trees.
+
+The methods of Tree and Clade objects such as common_ancestor, distance and
+get_path walk through the clade objects on every call, which takes seconds
+for trees with hundreds of thousands of tips. An ArrayTree instead numbers
+the clades of a tree in preorder once, storing the parent of each clade,
+the offsets of its children, the branch lengths and the depths in NumPy
+arrays, together with a table of the clades with the smallest number of
+branches from the root in each range of clades. With these, the most
+recent common ancestor of any two clades is found in constant time, as is
+the distance between them, and many pairs of clades can be queried at once.
+For example::
+
+    from Bio import Phylo
+    from Bio.Phylo.ArrayTree import ArrayTree
+    tree = Phylo.read("big.nwk", "newick")
+    arrays = ArrayTree(tree)
+    print(arrays.distance("A", "B"))
+    print(arrays.common_ancestor("A", "B", "C"))
+
+The methods common_ancestor, distance, depths, get_path, trace,
+is_monophyletic, get_terminals and count_terminals work as the TreeMixin
+methods of the same name, returning the same Clade objects. The view is not
+updated if the tree is changed afterwards, so a new ArrayTree should be
+made after modifying the tree.
+
+An ArrayTree can also be made without a tree, from the parent of each
+clade (see the from_parents method), as done when parsing Newick files with
+the arrays option, in which case Clade objects are only created when needed.
+
+The arrays are available as attributes, indexed by the number of each
+clade (the root being zero), for use with NumPy directly:
+
+ - parents - the parent of each clade (-1 for the root).
+ - child_offsets - the children of clade i are children[child_offsets[i]:
+   child_offsets[i + 1]], in the order of the clade's clades list.
+ - children - the children of all the clades.
+ - branch_lengths - the branch length of each clade (None counting as 0).
+ - names - a list of the name of each clade (or None).
+ - depths_array - the sum of the branch lengths from the root to each
+   clade, starting from the branch length of the root itself, as in the
+   TreeMixin depths method.
+ - levels - the number of branches from the root to each clade.
+ - ends - the descendants of clade i are the clades i + 1 to ends[i] - 1.
+ - terminal - whether each clade is terminal.
+
+"""
+
+from Bio._py3k import basestring
+
+from Bio import MissingPythonDependencyError
+
+try:
+    import numpy
+except ImportError:
+    raise MissingPythonDependencyError(
+        "Please install NumPy if you want to use Bio.Phylo.ArrayTree. "
+        "See http://www.numpy.org/")
+
+from Bio.Phylo import BaseTree
+from Bio.Phylo.BaseTree import TreeElement, _combine_args, _combine_matchers
+
+
+class ArrayTree(object):
+    """Array based view of a Tree or Clade, for constant time queries.
+
+    The clades are numbered in preorder, so clade 0 is the root. Targets
+    given to the methods may be Clade objects, clade names (matching the
+    first clade in preorder with that name, as for the TreeMixin methods),
+    or any other target accepted by TreeMixin.get_path.
+    """
+
+    def __init__(self, tree):
+        """Build the arrays from a Tree or Clade object."""
+        clades = []
+        parents = []
+        # walk the tree iteratively, so deep trees need no recursion
+        stack = [(tree.root, -1)]
+        while stack:
+            clade, parent = stack.pop()
+            index = len(clades)
+            clades.append(clade)
+            parents.append(parent)
+            for child in reversed(clade.clades):
+                stack.append((child, index))
+        self._build(parents, [clade.branch_length or 0 for clade in clades],
+                    [clade.name for clade in clades])
+        self._set_clades(clades)
+
+    @classmethod
+    def from_parents(cls, parents, branch_lengths=None, names=None):
+        """Build the arrays from the parent of each clade, without a tree.
+
+        The clades should be numbered in preorder, so the root (with parent
+        -1) comes first and each clade comes after its parent, and the
+        children of each clade are in the order of their numbers. The
+        branch lengths (by default zero) and names (by default None) are
+        given in the same order. Clade objects for the methods returning
+        clades, such as common_ancestor, are only created when needed.
+        """
+        parents = [int(parent) for parent in parents]
+        # each parent should be the last clade or one of its ancestors
+        path = [-1]
+        for index, parent in enumerate(parents):
+            while path and path[-1] != parent:
+                path.pop()
+            if not path:
+                raise ValueError("The parents should be numbered in "
+                                 "preorder, starting from the root with "
+                                 "parent -1")
+            path.append(index)
+        if not parents or parents.count(-1) != 1:
+            raise ValueError("Expected a single root, with parent -1")
+        if branch_lengths is None:
+            branch_lengths = [0] * len(parents)
+        else:
+            branch_lengths = [length or 0 for length in branch_lengths]
+        if names is None:
+            names = [None] * len(parents)
+        else:
+            names = list(names)
+        if len(branch_lengths) != len(parents) or len(names) != len(parents):
+            raise ValueError("Expected one branch length and name per clade")
+        return cls._from_preorder(parents, branch_lengths, names)
+
+    @classmethod
+    def _from_preorder(cls, parents, branch_lengths, names, levels=None,
+                       ends=None):
+        """Build the arrays from checked lists, without a tree (PRIVATE).
+
+        The levels and ends of the clades may be given if already known,
+        as when parsing Newick trees.
+        """
+        arrays = cls.__new__(cls)
+        arrays._build(parents, branch_lengths, names, levels, ends)
+        arrays._set_clades(None)
+        return arrays
+
+    def _build(self, parents, lengths, names, levels=None, ends=None):
+        """Calculate the arrays from lists in preorder (PRIVATE)."""
+        n = len(parents)
+        depths = [lengths[0]] + [0] * (n - 1)
+        if levels is None:
+            levels = [0] * n
+            for index in range(1, n):
+                parent = parents[index]
+                depths[index] = depths[parent] + lengths[index]
+                levels[index] = levels[parent] + 1
+        else:
+            for index in range(1, n):
+                depths[index] = depths[parents[index]] + lengths[index]
+        self._root_length = lengths[0]
+        self.names = names
+        self._name_indices = {}
+        for index, name in enumerate(names):
+            if name is not None and name not in self._name_indices:
+                self._name_indices[name] = index
+        self.parents = numpy.array(parents, numpy.intp)
+        self.branch_lengths = numpy.array(lengths, float)
+        self.depths_array = numpy.array(depths, float)
+        self.levels = numpy.array(levels, numpy.intp)
+        # the children of each clade follow it in preorder, so sorting by
+        # the parent keeps them in their original order
+        counts = numpy.bincount(self.parents[1:], minlength=n)
+        self.terminal = counts == 0
+        self.child_offsets = numpy.zeros(n + 1, numpy.intp)
+        numpy.cumsum(counts, out=self.child_offsets[1:])
+        self.children = numpy.argsort(self.parents[1:], kind="mergesort") + 1
+        # the subtree of each clade is a range of clades in preorder
+        if ends is None:
+            sizes = [1] * n
+            for index in range(n - 1, 0, -1):
+                sizes[parents[index]] += sizes[index]
+            self.ends = numpy.arange(n) + sizes
+        else:
+            self.ends = numpy.array(ends, numpy.intp)
+        self._terminal_counts = numpy.zeros(n + 1, numpy.intp)
+        numpy.cumsum(self.terminal, out=self._terminal_counts[1:])
+        # the table for lca is made when first needed
+        self._table = None
+
+    def _set_clades(self, clades):
+        """Store the clade objects, if any, in preorder (PRIVATE)."""
+        self._clades = clades
+        if clades is None:
+            self._indices = {}
+        else:
+            self._indices = dict((clade, index)
+                                 for index, clade in enumerate(clades))
+
+    @property
+    def clades(self):
+        """List of the clade objects, in preorder.
+
+        Without a tree, Clade objects are created from the arrays.
+        """
+        if self._clades is None:
+            clades = [BaseTree.Clade(float(length), name)
+                      for length, name in zip(self.branch_lengths, self.names)]
+            for index in range(1, len(clades)):
+                clades[self.parents[index]].clades.append(clades[index])
+            self._set_clades(clades)
+        return self._clades
+
+    def to_tree(self, rooted=True):
+        """Return a Tree of the clade objects."""
+        return BaseTree.Tree(self.clades[0], rooted=rooted)
+
+    def __getstate__(self):
+        """Return the state for pickling, without the table (PRIVATE)."""
+        state = self.__dict__.copy()
+        state["_table"] = None
+        return state
+
+    @staticmethod
+    def _range_minima(levels):
+        """Return a sparse table of the range minima of the levels (PRIVATE).
+
+        Row k of the table holds, for each clade i, the clade with the lowest
+        level among clades i to i + 2**k - 1 (or to the last clade).
+        """
+        n = len(levels)
+        rows = [numpy.arange(n)]
+        width = 1
+        while 2 * width <= n:
+            previous = rows[-1]
+            row = previous.copy()
+            left = previous[:n - width]
+            right = previous[width:]
+            row[:n - width] = numpy.where(levels[right] < levels[left],
+                                          right, left)
+            rows.append(row)
+            width *= 2
+        return numpy.array(rows)
+
+    def __len__(self):
+        """Return the number of clades in the tree."""
+        return len(self.parents)
+
+    # Looking up clades
+
+    def _find(self, target):
+        """Return the number of the target clade, or None (PRIVATE)."""
+        try:
+            index = self._indices.get(target)
+        except TypeError:
+            # unhashable targets, such as a dictionary of attributes
+            index = None
+        if index is not None:
+            return index
+        if isinstance(target, basestring):
+            return self._name_indices.get(target)
+        if isinstance(target, TreeElement):
+            # not one of the clades of this tree
+            return None
+        match = _combine_matchers(target, {}, True)
+        for index, clade in enumerate(self.clades):
+            if match(clade):
+                return index
+        return None
+
+    def index(self, target):
+        """Return the number of the target clade in preorder.
+
+        Raises a ValueError if the target is not in the tree.
+        """
+        index = self._find(target)
+        if index is None:
+            raise ValueError("target %s is not in this tree" % repr(target))
+        return index
+
+    def _indices_of(self, targets, *more_targets):
+        """Return the numbers of several targets as an array (PRIVATE)."""
+        return numpy.array([self.index(target) for target
+                            in _combine_args(targets, *more_targets)],
+                           numpy.intp)
+
+    # Vectorized queries on clade numbers
+
+    def lca(self, indices1, indices2):
+        """Return the most recent common ancestors of pairs of clades.
+
+        Takes two clade numbers, or two arrays of clade numbers, and returns
+        the number (or an array of the numbers) of their common ancestors.
+        """
+        indices1 = numpy.asarray(indices1)
+        indices2 = numpy.asarray(indices2)
+        first = numpy.minimum(indices1, indices2)
+        last = numpy.maximum(indices1, indices2)
+        # The ancestor is the parent of the clade closest to the root after
+        # the first clade, up to the last clade (unless they are the same)
+        size = numpy.maximum(last - first, 1)
+        k = numpy.frexp(size)[1] - 1
+        start = numpy.minimum(first + 1, len(self.parents) - 1)
+        if self._table is None:
+            self._table = self._range_minima(self.levels)
+        left = self._table[k, start]
+        right = self._table[k, numpy.maximum(last - (1 << k) + 1, start)]
+        lowest = numpy.where(self.levels[right] < self.levels[left],
+                             right, left)
+        result = numpy.where(first == last, first, self.parents[lowest])
+        if result.ndim == 0:
+            return int(result)
+        return result
+
+    def distances(self, indices1, indices2):
+        """Return the sums of the branch lengths between pairs of clades.
+
+        Takes two clade numbers, or two arrays of clade numbers.
+        """
+        ancestors = self.lca(indices1, indices2)
+        depths = self.depths_array
+        return (depths[indices1] + depths[indices2] -
+                2 * depths[ancestors])
+
+    # Methods working as the TreeMixin methods
+
+    def get_path(self, target=None):
+        """List the clades directly between the root and the given target.
+
+        :returns: list of all clade objects along this path, ending with the
+            given target, but excluding the root clade, or None if the
+            target is not in the tree.
+
+        """
+        index = self._find(target)
+        if index is None:
+            return None
+        return self._path(0, index)
+
+    def _path(self, ancestor, index):
+        """List the clades below the ancestor down to the clade (PRIVATE)."""
+        path = []
+        clades = self.clades
+        parents = self.parents
+        while index != ancestor:
+            path.append(clades[index])
+            index = parents[index]
+        path.reverse()
+        return path
+
+    def trace(self, start, finish):
+        """List of all clade object between two targets in this tree.
+
+        Excluding `start`, including `finish`.
+        """
+        start = self.index(start)
+        finish = self.index(finish)
+        mrca = self.lca(start, finish)
+        fromstart = self._path(mrca, start)[-2::-1]
+        return fromstart + [self.clades[mrca]] + self._path(mrca, finish)
+
+    def common_ancestor(self, targets, *more_targets):
+        """Most recent common ancestor (clade) of all the given targets.
+
+        Edge cases:
+         - If no target is given, returns the root
+         - If 1 target is given, returns the target
+         - If any target is not found in this tree, raises a ValueError
+
+        """
+        indices = self._indices_of(targets, *more_targets)
+        if not len(indices):
+            return self.clades[0]
+        # The first and last of the clades in preorder share the ancestor
+        # of all of them
+        return self.clades[self.lca(indices.min(), indices.max())]
+
+    def depths(self, unit_branch_lengths=False):
+        """Create a mapping of tree clades to depths (by branch length).
+
+        :Parameters:
+            unit_branch_lengths : bool
+                If True, count only the number of branches (levels in the tree).
+                By default the distance is the cumulative branch length leading
+                to the clade.
+
+        :returns: dict of {clade: depth}, where keys are all of the Clade
+            instances in the tree, and values are the distance from the root to
+            each clade (including terminals).
+
+        """
+        if unit_branch_lengths:
+            values = self.levels + self._root_length
+        else:
+            values = self.depths_array
+        return dict(zip(self.clades, values.tolist()))
+
+    def distance(self, target1, target2=None):
+        """Calculate the sum of the branch lengths between two targets.
+
+        If only one target is specified, the other is the root of this tree.
+        """
+        index1 = self.index(target1)
+        if target2 is None:
+            index2 = 0
+        else:
+            index2 = self.index(target2)
+        return float(self.distances(index1, index2))
+
+    def is_monophyletic(self, terminals, *more_terminals):
+        """MRCA of terminals if they comprise a complete subclade, or False.
+
+        The targets may be given as a single list, or as separate arguments.
+
+        :returns: common ancestor if terminals are monophyletic, otherwise False.
+
+        """
+        indices = set()
+        for target in _combine_args(terminals, *more_terminals):
+            index = self._find(target)
+            if index is None or not self.terminal[index]:
+                return False
+            indices.add(index)
+        if not indices:
+            return False
+        mrca = self.lca(min(indices), max(indices))
+        counts = self._terminal_counts
+        if counts[self.ends[mrca]] - counts[mrca] == len(indices):
+            return self.clades[mrca]
+        return False
+
+    def get_terminals(self):
+        """Get a list of all of this tree's terminal (leaf) nodes."""
+        return [self.clades[index] for index in numpy.flatnonzero(self.terminal)]
+
+    def count_terminals(self):
+        """Count the number of terminal (leaf) nodes within this tree."""
+        return int(self._terminal_counts[-1])
@@ -44,25 +44,34 @@ def _level_traverse(root, get_children):
 
 
 def _preorder_traverse(root, get_children):
-    """Traverse a tree in depth-first pre-order (parent before children) (PRIVATE)."""
-    def dfs(elem):
-        yield elem
-        for v in get_children(elem):
-            for u in dfs(v):
-                yield u
-    for elem in dfs(root):
+    """Traverse a tree in depth-first pre-order (parent before children) (PRIVATE).
+
+    This uses a stack rather than recursion, so works on very deep trees.
+    """
+    stack = [root]
+    while stack:
+        elem = stack.pop()
         yield elem
+        children = list(get_children(elem))
+        children.reverse()
+        stack.extend(children)
 
 
 def _postorder_traverse(root, get_children):
-    """Traverse a tree in depth-first post-order (children before parent) (PRIVATE)."""
-    def dfs(elem):
-        for v in get_children(elem):
-            for u in dfs(v):
-                yield u
-        yield elem
-    for elem in dfs(root):
-        yield elem
+    """Traverse a tree in depth-first post-order (children before parent) (PRIVATE).
+
+    This uses a stack of the elements and iterators over their children
+    rather than recursion, so works on very deep trees.
+    """
+    stack = [(root, iter(get_children(root)))]
+    while stack:
+        elem, children = stack[-1]
+        for child in children:
+            stack.append((child, iter(get_children(child))))
+            break
+        else:
+            stack.pop()
+            yield elem
 
 
 def _sorted_attrs(elem):
@@ -379,24 +388,27 @@ class TreeMixin(object):
 
         """
         # Only one path will work -- ignore weights and visits
-        path = []
         match = _combine_matchers(target, kwargs, True)
-
-        def check_in_path(v):
-            if match(v):
-                path.append(v)
-                return True
-            elif v.is_terminal():
-                return False
-            for child in v:
-                if check_in_path(child):
-                    path.append(v)
-                    return True
-            return False
-
-        if not check_in_path(self.root):
-            return None
-        return path[-2::-1]
+        if match(self.root):
+            return []
+        # Search in pre-order, keeping the path to the current clade and an
+        # iterator over the remaining children of each clade on the path
+        path = []
+        stack = [iter(self.root)]
+        while stack:
+            for child in stack[-1]:
+                if match(child):
+                    path.append(child)
+                    return path
+                if not child.is_terminal():
+                    path.append(child)
+                    stack.append(iter(child))
+                    break
+            else:
+                stack.pop()
+                if path:
+                    path.pop()
+        return None
 
     def get_nonterminals(self, order='preorder'):
         """Get a list of all of this tree's nonterminal (internal) nodes."""
@@ -467,15 +479,14 @@ class TreeMixin(object):
             depth_of = lambda c: 1
         else:
             depth_of = lambda c: c.branch_length or 0
-        depths = {}
-
-        def update_depths(node, curr_depth):
-            depths[node] = curr_depth
+        depths = {self.root: self.root.branch_length or 0}
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            curr_depth = depths[node]
             for child in node.clades:
-                new_depth = curr_depth + depth_of(child)
-                update_depths(child, new_depth)
-
-        update_depths(self.root, self.root.branch_length or 0)
+                depths[child] = curr_depth + depth_of(child)
+            stack.extend(node.clades)
         return depths
 
     def distance(self, target1, target2=None):
@@ -498,15 +509,16 @@ class TreeMixin(object):
         """
         # Root can be trifurcating
         if isinstance(self, Tree) and len(self.root) == 3:
-            return (self.root.clades[0].is_bifurcating() and
-                    self.root.clades[1].is_bifurcating() and
-                    self.root.clades[2].is_bifurcating())
-        if len(self.root) == 2:
-            return (self.root.clades[0].is_bifurcating() and
-                    self.root.clades[1].is_bifurcating())
-        if len(self.root) == 0:
-            return True
-        return False
+            stack = list(self.root.clades)
+        else:
+            stack = [self.root]
+        while stack:
+            clade = stack.pop()
+            if len(clade) == 2:
+                stack.extend(clade.clades)
+            elif len(clade) != 0:
+                return False
+        return True
 
     def is_monophyletic(self, terminals, *more_terminals):
         """MRCA of terminals if they comprise a complete subclade, or False.
@@ -529,13 +541,27 @@ class TreeMixin(object):
 
         """
         target_set = set(_combine_args(terminals, *more_terminals))
+        # Count the terminals, and the targets among them, below each clade
+        counts = {}
+        for clade in _postorder_traverse(self.root, lambda c: c.clades):
+            if clade.clades:
+                terms = targets = 0
+                for child in clade.clades:
+                    child_terms, child_targets = counts[child]
+                    terms += child_terms
+                    targets += child_targets
+                counts[clade] = (terms, targets)
+            else:
+                counts[clade] = (1, int(clade in target_set))
+        total = len(target_set)
         current = self.root
         while True:
-            if set(current.get_terminals()) == target_set:
+            terms, targets = counts[current]
+            if terms == targets == total:
                 return current
             # Try a narrower subclade
             for subclade in current.clades:
-                if set(subclade.get_terminals()).issuperset(target_set):
+                if counts[subclade][1] == total:
                     current = subclade
                     break
             else:
@@ -644,10 +670,15 @@ class TreeMixin(object):
         Deepest clades are last by default. Use ``reverse=True`` to sort clades
         deepest-to-shallowest.
         """
-        self.root.clades.sort(key=lambda c: c.count_terminals(),
-                              reverse=reverse)
-        for subclade in self.root.clades:
-            subclade.ladderize(reverse=reverse)
+        # Count the terminals below each clade once, from the terminals up
+        counts = {}
+        for clade in _postorder_traverse(self.root, lambda c: c.clades):
+            if clade.clades:
+                counts[clade] = sum(counts[child] for child in clade.clades)
+            else:
+                counts[clade] = 1
+        for clade in counts:
+            clade.clades.sort(key=counts.__getitem__, reverse=reverse)
 
     def prune(self, target=None, **kwargs):
         """Prunes a terminal clade from the tree.
@@ -974,17 +1005,15 @@ class Tree(TreeElement, TreeMixin):
     def __str__(self):
         """Return a string representation of the entire tree.
 
-        Serialize each sub-clade recursively using ``repr`` to create a summary
+        Serialize each sub-clade using ``repr`` to create a summary
         of the object structure.
         """
         TAB = '    '
         textlines = []
-
-        def print_tree(obj, indent):
-            """Recursively serialize sub-elements.
-
-            This closes over textlines and modifies it in-place.
-            """
+        # Serialize the sub-elements in pre-order, using a stack
+        stack = [(self, 0)]
+        while stack:
+            obj, indent = stack.pop()
             if isinstance(obj, (Tree, Clade)):
                 # Avoid infinite recursion or special formatting from str()
                 objstr = repr(obj)
@@ -992,16 +1021,17 @@ class Tree(TreeElement, TreeMixin):
                 objstr = as_string(obj)
             textlines.append(TAB * indent + objstr)
             indent += 1
+            children = []
             for attr in obj.__dict__:
                 child = getattr(obj, attr)
                 if isinstance(child, TreeElement):
-                    print_tree(child, indent)
+                    children.append((child, indent))
                 elif isinstance(child, list):
                     for elem in child:
                         if isinstance(elem, TreeElement):
-                            print_tree(elem, indent)
-
-        print_tree(self, 0)
+                            children.append((elem, indent))
+            children.reverse()
+            stack.extend(children)
         return '\n'.join(textlines)
 
 
@@ -8,14 +8,23 @@
 This module contains a ``_BitString`` class to assist the consensus tree
 searching and some common consensus algorithms such as strict, majority rule and
 adam consensus.
+
+Internally the clades are represented as splits, Python integers with one bit
+per terminal (set if the terminal is in the clade), so that comparing clades
+takes a single integer operation. The bits follow the order of the terminals,
+the first terminal being the most significant bit, matching the ``_BitString``
+representation of the same clade.
 """
 from __future__ import division
 
 import random
 import itertools
 
-from ast import literal_eval
+from Bio.Align import MultipleSeqAlignment
 from Bio.Phylo import BaseTree
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Bio._utils import WorkerPool
 
 
 class _BitString(str):
@@ -127,38 +136,38 @@ class _BitString(str):
                 "The input should be a binary string composed of '0' and '1'")
 
     def __and__(self, other):
-        selfint = literal_eval('0b' + self)
-        otherint = literal_eval('0b' + other)
+        selfint = int(self, 2)
+        otherint = int(other, 2)
         resultint = selfint & otherint
         return _BitString(bin(resultint)[2:].zfill(len(self)))
 
     def __or__(self, other):
-        selfint = literal_eval('0b' + self)
-        otherint = literal_eval('0b' + other)
+        selfint = int(self, 2)
+        otherint = int(other, 2)
         resultint = selfint | otherint
         return _BitString(bin(resultint)[2:].zfill(len(self)))
 
     def __xor__(self, other):
-        selfint = literal_eval('0b' + self)
-        otherint = literal_eval('0b' + other)
+        selfint = int(self, 2)
+        otherint = int(other, 2)
         resultint = selfint ^ otherint
         return _BitString(bin(resultint)[2:].zfill(len(self)))
 
     def __rand__(self, other):
-        selfint = literal_eval('0b' + self)
-        otherint = literal_eval('0b' + other)
+        selfint = int(self, 2)
+        otherint = int(other, 2)
         resultint = otherint & selfint
         return _BitString(bin(resultint)[2:].zfill(len(self)))
 
     def __ror__(self, other):
-        selfint = literal_eval('0b' + self)
-        otherint = literal_eval('0b' + other)
+        selfint = int(self, 2)
+        otherint = int(other, 2)
         resultint = otherint | selfint
         return _BitString(bin(resultint)[2:].zfill(len(self)))
 
     def __rxor__(self, other):
-        selfint = literal_eval('0b' + self)
-        otherint = literal_eval('0b' + other)
+        selfint = int(self, 2)
+        otherint = int(other, 2)
         resultint = otherint ^ selfint
         return _BitString(bin(resultint)[2:].zfill(len(self)))
 
@@ -217,6 +226,111 @@ class _BitString(str):
         return cls(''.join(map(str, map(int, bools))))
 
 
+def _bit_count(split):
+    """Return the number of terminals in a split (PRIVATE)."""
+    return bin(split).count("1")
+
+
+def _split_indices(split, length):
+    """Return the sorted indices of the terminals in a split (PRIVATE)."""
+    indices = []
+    while split:
+        low = split & -split
+        indices.append(length - low.bit_length())
+        split ^= low
+    indices.reverse()
+    return indices
+
+
+def _term_bits(term_names):
+    """Return a dict of terminal names to their bits in a split (PRIVATE)."""
+    length = len(term_names)
+    return dict((name, 1 << (length - 1 - i))
+                for i, name in enumerate(term_names))
+
+
+def _clade_splits(clade, term_bits):
+    """Return a list of (clade, split) tuples for a clade and its descendants (PRIVATE).
+
+    The splits are calculated in a single pass from the terminals up, with
+    each clade in the list before its descendants. Terminals with names not
+    in term_bits are ignored (their bits are zero).
+    """
+    clades = []
+    stack = [clade]
+    while stack:
+        clade = stack.pop()
+        clades.append(clade)
+        stack.extend(clade.clades)
+    splits = {}
+    for clade in reversed(clades):
+        if clade.clades:
+            split = 0
+            for child in clade.clades:
+                split |= splits[child]
+        else:
+            split = term_bits.get(clade.name, 0)
+        splits[clade] = split
+    return [(clade, splits[clade]) for clade in clades]
+
+
+class _SplitTree(object):
+    """A consensus tree built up by adding compatible splits (PRIVATE).
+
+    Starts from a star tree of the terminals. Each split added becomes a
+    new clade, holding those children of the smallest clade containing the
+    split which are part of it. A split is compatible with the tree if each
+    of these children is either completely inside or outside the split.
+    """
+
+    def __init__(self, terms):
+        """Create a star tree of the terminals."""
+        length = len(terms)
+        self.root_split = (1 << length) - 1
+        self.root = BaseTree.Clade()
+        self.root.clades.extend(terms)
+        self.clades = {self.root_split: self.root}
+        self._splits = {}
+        self._parents = {}
+        for i, term in enumerate(terms):
+            split = 1 << (length - 1 - i)
+            self._splits[term] = split
+            self._parents[split] = self.root_split
+
+    def add(self, split):
+        """Add a clade for the split, returning it (or None if incompatible)."""
+        if _bit_count(split) < 2:
+            # a single terminal is not a clade to add
+            return None
+        # Walk up from the clade holding one of the terminals in the split
+        parent = self._parents[split & -split]
+        while parent & split != split:
+            parent = self._parents[parent]
+        if parent == split:
+            return None
+        parent_clade = self.clades[parent]
+        inside = []
+        outside = []
+        for child in parent_clade.clades:
+            child_split = self._splits[child]
+            common = child_split & split
+            if not common:
+                outside.append(child)
+            elif common == child_split:
+                inside.append(child)
+            else:
+                return None
+        clade = BaseTree.Clade()
+        clade.clades = inside
+        parent_clade.clades = outside + [clade]
+        self.clades[split] = clade
+        self._splits[clade] = split
+        self._parents[split] = parent
+        for child in inside:
+            self._parents[self._splits[child]] = split
+        return clade
+
+
 def strict_consensus(trees):
     """Search strict consensus tree from multiple trees.
 
@@ -229,45 +343,22 @@ def strict_consensus(trees):
     first_tree = next(trees_iter)
 
     terms = first_tree.get_terminals()
-    bitstr_counts, tree_count = _count_clades(
-        itertools.chain([first_tree], trees_iter))
-
-    # Store bitstrs for strict clades
-    strict_bitstrs = [bitstr for bitstr, t in bitstr_counts.items()
-                      if t[0] == tree_count]
-    strict_bitstrs.sort(key=lambda bitstr: bitstr.count('1'), reverse=True)
+    split_counts, tree_count = _count_splits(
+        itertools.chain([first_tree], trees_iter),
+        [term.name for term in terms])
+
+    # Store splits for strict clades, largest first
+    strict_splits = [split for split, (count, sum_bl) in split_counts.items()
+                     if count == tree_count]
+    strict_splits.sort(key=_bit_count, reverse=True)
     # Create root
-    root = BaseTree.Clade()
-    if strict_bitstrs[0].count('1') == len(terms):
-        root.clades.extend(terms)
-    else:
+    consensus_tree = _SplitTree(terms)
+    if strict_splits[0] != consensus_tree.root_split:
         raise ValueError('Taxons in provided trees should be consistent')
-    # make a bitstr to clades dict and store root clade
-    bitstr_clades = {strict_bitstrs[0]: root}
-    # create inner clades
-    for bitstr in strict_bitstrs[1:]:
-        clade_terms = [terms[i] for i in bitstr.index_one()]
-        clade = BaseTree.Clade()
-        clade.clades.extend(clade_terms)
-        for bs, c in bitstr_clades.items():
-            # check if it should be the parent of current clade
-            if bs.contains(bitstr):
-                # remove old bitstring
-                del bitstr_clades[bs]
-                # update clade childs
-                new_childs = [child for child in c.clades
-                              if child not in clade_terms]
-                c.clades = new_childs
-                # set current clade as child of c
-                c.clades.append(clade)
-                # update bitstring
-                bs = bs ^ bitstr
-                # update clade
-                bitstr_clades[bs] = c
-                break
-        # put new clade
-        bitstr_clades[bitstr] = clade
-    return BaseTree.Tree(root=root)
+    # create inner clades, which are all compatible with each other
+    for split in strict_splits[1:]:
+        consensus_tree.add(split)
+    return BaseTree.Tree(root=consensus_tree.root)
 
 
 def majority_consensus(trees, cutoff=0):
@@ -289,84 +380,36 @@ def majority_consensus(trees, cutoff=0):
     first_tree = next(tree_iter)
 
     terms = first_tree.get_terminals()
-    bitstr_counts, tree_count = _count_clades(
-        itertools.chain([first_tree], tree_iter))
-
-    # Sort bitstrs by descending #occurrences, then #tips, then tip order
-    bitstrs = sorted(bitstr_counts.keys(),
-                     key=lambda bitstr: (bitstr_counts[bitstr][0],
-                                         bitstr.count('1'),
-                                         str(bitstr)),
-                     reverse=True)
-    root = BaseTree.Clade()
-    if bitstrs[0].count('1') == len(terms):
-        root.clades.extend(terms)
-    else:
+    split_counts, tree_count = _count_splits(
+        itertools.chain([first_tree], tree_iter),
+        [term.name for term in terms])
+
+    # Sort splits by descending #occurrences, then #tips, then tip order
+    splits = sorted(split_counts,
+                    key=lambda split: (split_counts[split][0],
+                                       _bit_count(split),
+                                       split),
+                    reverse=True)
+    consensus_tree = _SplitTree(terms)
+    root = consensus_tree.root
+    if splits[0] != consensus_tree.root_split:
         raise ValueError('Taxons in provided trees should be consistent')
-    # Make a bitstr-to-clades dict and store root clade
-    bitstr_clades = {bitstrs[0]: root}
     # create inner clades
-    for bitstr in bitstrs[1:]:
+    for split in splits[1:]:
         # apply majority rule
-        count_in_trees, branch_length_sum = bitstr_counts[bitstr]
+        count_in_trees, branch_length_sum = split_counts[split]
         confidence = 100.0 * count_in_trees / tree_count
         if confidence < cutoff * 100.0:
             break
-        clade_terms = [terms[i] for i in bitstr.index_one()]
-        clade = BaseTree.Clade()
-        clade.clades.extend(clade_terms)
+        # skip clades incompatible with the previous clades
+        clade = consensus_tree.add(split)
+        if clade is None:
+            continue
         clade.confidence = confidence
         clade.branch_length = branch_length_sum / count_in_trees
-        bsckeys = sorted(bitstr_clades, key=lambda bs: bs.count('1'),
-                         reverse=True)
-
-        # check if current clade is compatible with previous clades and
-        # record it's possible parent and child clades.
-        compatible = True
-        parent_bitstr = None
-        child_bitstrs = []  # multiple independent childs
-        for bs in bsckeys:
-            if not bs.iscompatible(bitstr):
-                compatible = False
-                break
-            # assign the closest ancestor as its parent
-            # as bsckeys is sorted, it should be the last one
-            if bs.contains(bitstr):
-                parent_bitstr = bs
-            # assign the closest descendant as its child
-            # the largest and independent clades
-            if (bitstr.contains(bs) and bs != bitstr and
-                    all(c.independent(bs) for c in child_bitstrs)):
-                child_bitstrs.append(bs)
-        if not compatible:
-            continue
-
-        if parent_bitstr:
-            # insert current clade; remove old bitstring
-            parent_clade = bitstr_clades.pop(parent_bitstr)
-            # update parent clade childs
-            parent_clade.clades = [c for c in parent_clade.clades
-                                   if c not in clade_terms]
-            # set current clade as child of parent_clade
-            parent_clade.clades.append(clade)
-            # update bitstring
-            # parent = parent ^ bitstr
-            # update clade
-            bitstr_clades[parent_bitstr] = parent_clade
-
-        if child_bitstrs:
-            remove_list = []
-            for c in child_bitstrs:
-                remove_list.extend(c.index_one())
-                child_clade = bitstr_clades[c]
-                parent_clade.clades.remove(child_clade)
-                clade.clades.append(child_clade)
-            remove_terms = [terms[i] for i in remove_list]
-            clade.clades = [c for c in clade.clades if c not in remove_terms]
-        # put new clade
-        bitstr_clades[bitstr] = clade
-        if ((len(bitstr_clades) == len(terms) - 1) or
-                (len(bitstr_clades) == len(terms) - 2 and len(root.clades) == 3)):
+        if ((len(consensus_tree.clades) == len(terms) - 1) or
+                (len(consensus_tree.clades) == len(terms) - 2 and
+                 len(root.clades) == 3)):
             break
     return BaseTree.Tree(root=root)
 
@@ -391,40 +434,37 @@ def _part(clades):
     if len(terms) == 1 or len(terms) == 2:
         new_clade = clades[0]
     else:
-        bitstrs = set([_BitString('1' * len(terms))])
+        term_bits = _term_bits(term_names)
+        splits = set([(1 << len(terms)) - 1])
         for clade in clades:
+            clade_splits = dict(_clade_splits(clade, term_bits))
             for child in clade.clades:
-                bitstr = _clade_to_bitstr(child, term_names)
+                split = clade_splits[child]
                 to_remove = set()
                 to_add = set()
-                for bs in bitstrs:
-                    if bs == bitstr:
+                for s in splits:
+                    if s == split:
                         continue
-                    elif bs.contains(bitstr):
-                        to_add.add(bitstr)
-                        to_add.add(bs ^ bitstr)
-                        to_remove.add(bs)
-                    elif bitstr.contains(bs):
-                        to_add.add(bs ^ bitstr)
-                    elif not bs.independent(bitstr):
-                        to_add.add(bs & bitstr)
-                        to_add.add(bs & bitstr ^ bitstr)
-                        to_add.add(bs & bitstr ^ bs)
-                        to_remove.add(bs)
-                # bitstrs = bitstrs | to_add
-                bitstrs ^= to_remove
+                    elif s & split == split:
+                        to_add.add(split)
+                        to_add.add(s ^ split)
+                        to_remove.add(s)
+                    elif s & split == s:
+                        to_add.add(s ^ split)
+                    elif s & split:
+                        to_add.add(s & split)
+                        to_add.add(s & split ^ split)
+                        to_add.add(s & split ^ s)
+                        to_remove.add(s)
+                # splits = splits | to_add
+                splits ^= to_remove
                 if to_add:
-                    for ta in sorted(to_add, key=lambda bs: bs.count('1')):
-                        independent = True
-                        for bs in bitstrs:
-                            if not ta.independent(bs):
-                                independent = False
-                                break
-                        if independent:
-                            bitstrs.add(ta)
+                    for ta in sorted(to_add, key=_bit_count):
+                        if not any(ta & s for s in splits):
+                            splits.add(ta)
         new_clade = BaseTree.Clade()
-        for bitstr in sorted(bitstrs):
-            indices = bitstr.index_one()
+        for split in sorted(splits):
+            indices = _split_indices(split, len(terms))
             if len(indices) == 1:
                 new_clade.clades.append(terms[indices[0]])
             elif len(indices) == 2:
@@ -467,31 +507,61 @@ def _sub_clade(clade, term_names):
     return sub_clade
 
 
-def _count_clades(trees):
-    """Count distinct clades (different sets of terminal names) in the trees (PRIVATE).
+def _count_splits(trees, term_names):
+    """Count distinct clades in the trees as splits of the terminal names (PRIVATE).
 
-    Return a tuple first a dict of bitstring (representing clade) and a tuple of its count of
-    occurrences and sum of branch length for that clade, second the number of trees processed.
+    Return a tuple first a dict of the split integers (representing clades)
+    and a list of the count of occurrences and sum of branch length for
+    that clade, second the number of trees processed. The bits of the splits
+    follow the order of term_names.
 
     :Parameters:
         trees : iterable
             An iterable that returns the trees to count
+        term_names : list
+            The terminal names, in order
 
     """
-    bitstrs = {}
+    term_bits = _term_bits(term_names)
+    splits = {}
     tree_count = 0
     for tree in trees:
         tree_count += 1
-        clade_bitstrs = _tree_to_bitstrs(tree)
-        for clade in tree.find_clades(terminal=False):
-            bitstr = clade_bitstrs[clade]
-            if bitstr in bitstrs:
-                count, sum_bl = bitstrs[bitstr]
-                count += 1
-                sum_bl += clade.branch_length or 0
-                bitstrs[bitstr] = (count, sum_bl)
+        for clade, split in _clade_splits(tree.root, term_bits):
+            if not clade.clades:
+                continue
+            try:
+                counts = splits[split]
+            except KeyError:
+                splits[split] = [1, clade.branch_length or 0]
             else:
-                bitstrs[bitstr] = (1, clade.branch_length or 0)
+                counts[0] += 1
+                counts[1] += clade.branch_length or 0
+    return splits, tree_count
+
+
+def _count_clades(trees):
+    """Count distinct clades (different sets of terminal names) in the trees (PRIVATE).
+
+    Return a tuple first a dict of bitstring (representing clade) and a tuple of its count of
+    occurrences and sum of branch length for that clade, second the number of trees processed.
+    The bitstrings follow the order of the terminals of the first tree.
+
+    :Parameters:
+        trees : iterable
+            An iterable that returns the trees to count
+
+    """
+    trees = iter(trees)
+    try:
+        first_tree = next(trees)
+    except StopIteration:
+        return {}, 0
+    term_names = [term.name for term in first_tree.get_terminals()]
+    splits, tree_count = _count_splits(itertools.chain([first_tree], trees),
+                                       term_names)
+    bitstrs = dict((_split_to_bitstr(split, len(term_names)), tuple(counts))
+                   for split, counts in splits.items())
     return bitstrs, tree_count
 
 
@@ -510,7 +580,7 @@ def get_support(target_tree, trees, len_trees=None):
     """
     term_names = sorted(term.name
                         for term in target_tree.find_clades(terminal=True))
-    bitstrs = {}
+    term_bits = _term_bits(term_names)
 
     size = len_trees
     if size is None:
@@ -521,20 +591,69 @@ def get_support(target_tree, trees, len_trees=None):
                             "you must provide the number of replicates in trees "
                             "as the optional parameter len_trees.")
 
-    for clade in target_tree.find_clades(terminal=False):
-        bitstr = _clade_to_bitstr(clade, term_names)
-        bitstrs[bitstr] = (clade, 0)
+    target_clades = {}
+    for clade, split in _clade_splits(target_tree.root, term_bits):
+        if clade.clades:
+            target_clades[split] = clade
+    counts = dict.fromkeys(target_clades, 0)
     for tree in trees:
-        for clade in tree.find_clades(terminal=False):
-            bitstr = _clade_to_bitstr(clade, term_names)
-            if bitstr in bitstrs:
-                c, t = bitstrs[bitstr]
-                c.confidence = (t + 1) * 100.0 / size
-                bitstrs[bitstr] = (c, t + 1)
+        for clade, split in _clade_splits(tree.root, term_bits):
+            if clade.clades and split in counts:
+                counts[split] += 1
+    for split, count in counts.items():
+        if count:
+            target_clades[split].confidence = count * 100.0 / size
     return target_tree
 
 
-def bootstrap(msa, times):
+def _replicate_seeds(times, seed):
+    """Yield a random seed for each bootstrap replicate (PRIVATE).
+
+    If seed is None the seeds are taken from the random module, so the
+    replicates can also be reproduced by calling random.seed beforehand.
+    """
+    if seed is None:
+        rng = random
+    else:
+        rng = random.Random(seed)
+    for i in range(times):
+        yield rng.getrandbits(32)
+
+
+def _take(value, columns):
+    """Return the values of a string or sequence at the given columns (PRIVATE)."""
+    if isinstance(value, str):
+        return "".join([value[i] for i in columns])
+    return [value[i] for i in columns]
+
+
+def _resample(msa, sequences, replicate_seed):
+    """Return a bootstrap replicate of the alignment (PRIVATE).
+
+    The columns are drawn with replacement using a random number generator
+    seeded with replicate_seed, and taken from each sequence (given as
+    strings), rather than slicing and concatenating the alignment column by
+    column. Any per-letter and per-column annotations are resampled too.
+    """
+    length = len(sequences[0])
+    rng_random = random.Random(replicate_seed).random
+    columns = [int(length * rng_random()) for i in range(length)]
+    records = []
+    for record, sequence in zip(msa, sequences):
+        new_record = SeqRecord(Seq(_take(sequence, columns),
+                                   record.seq.alphabet),
+                               id=record.id, name=record.name,
+                               description=record.description)
+        for key, value in record.letter_annotations.items():
+            new_record.letter_annotations[key] = _take(value, columns)
+        records.append(new_record)
+    column_annotations = dict((key, _take(value, columns))
+                              for key, value in msa.column_annotations.items())
+    return MultipleSeqAlignment(records, msa._alphabet,
+                                dict(msa.annotations), column_annotations)
+
+
+def bootstrap(msa, times, seed=None):
     """Generate bootstrap replicates from a multiple sequence alignment object.
 
     :Parameters:
@@ -542,23 +661,28 @@ def bootstrap(msa, times):
             multiple sequence alignment to generate replicates.
         times : int
             number of bootstrap times.
+        seed : int
+            optional seed for the random numbers, to make the replicates
+            reproducible.
 
     """
-    length = len(msa[0])
-    i = 0
-    while i < times:
-        i += 1
-        item = None
-        for j in range(length):
-            col = random.randint(0, length - 1)
-            if not item:
-                item = msa[:, col:col + 1]
-            else:
-                item += msa[:, col:col + 1]
-        yield item
+    sequences = [str(record.seq) for record in msa]
+    for replicate_seed in _replicate_seeds(times, seed):
+        yield _resample(msa, sequences, replicate_seed)
+
 
+def _bootstrap_tree(replicate_seed, arguments):
+    """Build the tree of a bootstrap replicate (PRIVATE).
+
+    Takes the seed of the replicate, and the alignment, its sequences and
+    the tree constructor.
+    """
+    msa, sequences, tree_constructor = arguments
+    return tree_constructor.build_tree(_resample(msa, sequences,
+                                                 replicate_seed))
 
-def bootstrap_trees(msa, times, tree_constructor):
+
+def bootstrap_trees(msa, times, tree_constructor, processes=1, seed=None):
     """Generate bootstrap replicate trees from a multiple sequence alignment.
 
     :Parameters:
@@ -568,15 +692,27 @@ def bootstrap_trees(msa, times, tree_constructor):
             number of bootstrap times.
         tree_constructor : TreeConstructor
             tree constructor to be used to build trees.
-
+        processes : int
+            number of worker processes building the trees in parallel
+            (None meaning one per CPU). The alignment and tree constructor
+            are sent to each worker once.
+        seed : int
+            optional seed for the random numbers, to make the trees
+            reproducible.
+
+    Each replicate is drawn using its own seed, so the same trees are
+    returned (in the same order) whatever the number of processes. Trees
+    are yielded as soon as they are built.
     """
-    msas = bootstrap(msa, times)
-    for aln in msas:
-        tree = tree_constructor.build_tree(aln)
-        yield tree
+    arguments = (msa, [str(record.seq) for record in msa], tree_constructor)
+    with WorkerPool(_bootstrap_tree, arguments, processes) as pool:
+        # imap returns the trees in order, as each one is done
+        for tree in pool.imap(_replicate_seeds(times, seed)):
+            yield tree
 
 
-def bootstrap_consensus(msa, times, tree_constructor, consensus):
+def bootstrap_consensus(msa, times, tree_constructor, consensus, processes=1,
+                        seed=None):
     """Consensus tree of a series of bootstrap trees for a multiple sequence alignment.
 
     :Parameters:
@@ -589,13 +725,24 @@ def bootstrap_consensus(msa, times, tree_constructor, consensus):
         consensus : function
             Consensus method in this module: `strict_consensus`,
             `majority_consensus`, `adam_consensus`.
+        processes : int
+            Number of worker processes building the trees in parallel
+            (None meaning one per CPU).
+        seed : int
+            Optional seed for the random numbers, to make the result
+            reproducible.
 
     """
-    trees = bootstrap_trees(msa, times, tree_constructor)
+    trees = bootstrap_trees(msa, times, tree_constructor, processes, seed)
     tree = consensus(list(trees))
     return tree
 
 
+def _split_to_bitstr(split, length):
+    """Create a BitString from a split of the given number of terminals (PRIVATE)."""
+    return _BitString(bin(split)[2:].zfill(length))
+
+
 def _clade_to_bitstr(clade, tree_term_names):
     """Create a BitString representing a clade, given ordered tree taxon names (PRIVATE)."""
     clade_term_names = set(term.name for term in
@@ -606,12 +753,11 @@ def _clade_to_bitstr(clade, tree_term_names):
 
 def _tree_to_bitstrs(tree):
     """Create a dict of a tree's clades to corresponding BitStrings (PRIVATE)."""
-    clades_bitstrs = {}
     term_names = [term.name for term in tree.find_clades(terminal=True)]
-    for clade in tree.find_clades(terminal=False):
-        bitstr = _clade_to_bitstr(clade, term_names)
-        clades_bitstrs[clade] = bitstr
-    return clades_bitstrs
+    term_bits = _term_bits(term_names)
+    return dict((clade, _split_to_bitstr(split, len(term_names)))
+                for clade, split in _clade_splits(tree.root, term_bits)
+                if clade.clades)
 
 
 def _bitstring_topology(tree):
@@ -626,6 +772,16 @@ def _bitstring_topology(tree):
     return bitstrs
 
 
+def _split_topology(tree, term_bits):
+    """Generate a branch length dict for a tree, keyed by splits (PRIVATE).
+
+    Like _bitstring_topology, but using the given bits for the terminals.
+    """
+    return dict((split, round(clade.branch_length or 0.0, 5))
+                for clade, split in _clade_splits(tree.root, term_bits)
+                if clade.clades)
+
+
 def _equal_topology(tree1, tree2):
     """Are two trees are equal in terms of topology and branch lengths (PRIVATE).
 
@@ -633,5 +789,9 @@ def _equal_topology(tree1, tree2):
     """
     term_names1 = set(term.name for term in tree1.find_clades(terminal=True))
     term_names2 = set(term.name for term in tree2.find_clades(terminal=True))
-    return ((term_names1 == term_names2) and
-            (_bitstring_topology(tree1) == _bitstring_topology(tree2)))
+    if term_names1 != term_names2:
+        return False
+    # Use the same terminal order for both trees
+    term_bits = _term_bits(sorted(term_names1))
+    return (_split_topology(tree1, term_bits) ==
+            _split_topology(tree2, term_bits))
@@ -10,8 +10,11 @@
 See: http://evolution.genetics.washington.edu/phylip/newick_doc.html
 """
 
+import itertools
 import re
+
 from Bio._py3k import StringIO
+from Bio._utils import check_processes, WorkerPool
 
 from Bio.Phylo import Newick
 
@@ -26,14 +29,16 @@ tokens = [
     (r"\(", 'open parens'),
     (r"\)", 'close parens'),
     (r"[^\s\(\)\[\]\'\:\;\,]+", 'unquoted node label'),
-    (r"\:\ ?[+-]?[0-9]*\.?[0-9]+([eE][+-]?[0-9]+)?", 'edge length'),
+    (r"\:\ ?[+-]?[0-9]*\.?[0-9]+(?:[eE][+-]?[0-9]+)?", 'edge length'),
     (r"\,", 'comma'),
-    (r"\[(\\.|[^\]])*\]", 'comment'),
-    (r"\'(\\.|[^\'])*\'", 'quoted node label'),
+    (r"\[(?:\\.|[^\]])*\]", 'comment'),
+    (r"\'(?:\\.|[^\'])*\'", 'quoted node label'),
     (r"\;", 'semicolon'),
     (r"\n", 'newline'),
 ]
 tokenizer = re.compile('(%s)' % '|'.join(token[0] for token in tokens))
+# The same without the enclosing group, so findall returns the tokens
+_token_pattern = re.compile('|'.join(token[0] for token in tokens))
 token_dict = dict((name, re.compile(token)) for (token, name) in tokens)
 
 
@@ -43,6 +48,9 @@ token_dict = dict((name, re.compile(token)) for (token, name) in tokens)
 def parse(handle, **kwargs):
     """Iterate over the trees in a Newick file handle.
 
+    See Parser.parse for the options, including parsing the trees into
+    compact array trees, and parsing them in parallel.
+
     :returns: generator of Bio.Phylo.Newick.Tree objects.
 
     """
@@ -74,6 +82,13 @@ def _parse_confidence(text):
         return None
 
 
+def _label_to_confidence(clade):
+    """Use the name of an internal clade as its confidence, if numeric (PRIVATE)."""
+    clade.confidence = _parse_confidence(clade.name)
+    if clade.confidence is not None:
+        clade.name = None
+
+
 def _format_comment(text):
     return '[%s]' % (text.replace('[', '\\[').replace(']', '\\]'))
 
@@ -101,12 +116,43 @@ class Parser(object):
         handle = StringIO(treetext)
         return cls(handle)
 
-    def parse(self, values_are_confidence=False, comments_are_confidence=False, rooted=False):
-        """Parse the text stream this object was initialized with."""
+    def parse(self, values_are_confidence=False, comments_are_confidence=False, rooted=False,
+              arrays=False, processes=1):
+        """Parse the text stream this object was initialized with.
+
+        If arrays is True, Bio.Phylo.ArrayTree.ArrayTree objects holding only
+        the topology, clade names and branch lengths are returned instead of
+        Tree objects, without creating any Clade objects (this requires
+        NumPy).
+
+        Using processes, the trees are parsed in parallel by a pool of worker
+        processes (None meaning one per CPU), which is useful for files with
+        many trees, such as samples from a Bayesian analysis. The trees are
+        returned in the same order.
+        """
         self.values_are_confidence = values_are_confidence
         self.comments_are_confidence = comments_are_confidence
         self.rooted = rooted
-        buf = ''
+        self.arrays = arrays
+        check_processes(processes)
+        if processes == 1:
+            for text in self._tree_texts():
+                yield self._parse_text(text)
+            return
+        options = (values_are_confidence, comments_are_confidence, rooted,
+                   arrays)
+        with WorkerPool(_parse_batch, options, processes) as pool:
+            # imap returns the results in order, as each batch is done
+            batches = _batches(self._tree_texts(), _BATCH_SIZE)
+            for trees in pool.imap(batches):
+                for tree in trees:
+                    if not arrays:
+                        tree = _unflatten(tree)
+                    yield tree
+
+    def _tree_texts(self):
+        """Split the text stream at the end of each tree (PRIVATE)."""
+        buf = []
         unicodeChecked = False
         unicodeLines = ("\xef", "\xff", "\xfe", "\x00")
         for line in self.handle:
@@ -118,98 +164,239 @@ class Parser(object):
                                       "unicode byte order marks.  You must convert it to "
                                       "ASCII before it can be parsed.")
                 unicodeChecked = True
-            buf += line.rstrip()
-            if buf.endswith(';'):
-                yield self._parse_tree(buf)
-                buf = ''
+            line = line.rstrip()
+            if line:
+                buf.append(line)
+                if line.endswith(';'):
+                    yield ''.join(buf)
+                    buf = []
         if buf:
             # Last tree is missing a terminal ';' character -- that's OK
-            yield self._parse_tree(buf)
+            yield ''.join(buf)
+
+    def _parse_text(self, text):
+        """Parse the text of one tree, as a Tree or ArrayTree (PRIVATE)."""
+        if self.arrays:
+            return self._parse_arrays(text)
+        return self._parse_tree(text)
 
     def _parse_tree(self, text):
         """Parse the text representation into an Tree object (PRIVATE)."""
-        tokens = re.finditer(tokenizer, text.strip())
-
-        new_clade = self.new_clade
-        root_clade = new_clade()
-
+        tokens = _token_pattern.findall(text.strip())
+
+        Clade = Newick.Clade
+        values_are_confidence = self.values_are_confidence
+        comments_are_confidence = self.comments_are_confidence
+        # internal node labels are used as confidence values, unless the
+        # confidence values are given in some other way
+        labels_are_confidence = not (values_are_confidence or
+                                     comments_are_confidence)
+        root_clade = Clade()
         current_clade = root_clade
-        entering_branch_length = False
-
+        added_root = None
+        # the parents of the current clade, which is always the last child
+        # of the last parent
+        parents = []
         lp_count = 0
         rp_count = 0
-        for match in tokens:
-            token = match.group()
+        for index, token in enumerate(tokens):
+            first = token[0]
+            if first == '(':
+                # start a new clade, which is a child of the current clade
+                parents.append(current_clade)
+                current_clade = Clade()
+                parents[-1].clades.append(current_clade)
+                lp_count += 1
+
+            elif first == ',':
+                # if the current clade is the root, then the external parentheses
+                # are missing and a new root should be created
+                if not parents:
+                    root_clade = Clade()
+                    root_clade.clades.append(current_clade)
+                    parents.append(root_clade)
+                    added_root = root_clade
+                if labels_are_confidence and current_clade.name and \
+                        current_clade.clades and \
+                        current_clade.confidence is None:
+                    _label_to_confidence(current_clade)
+                # start a new child clade at the same level as the current clade
+                current_clade = Clade()
+                parents[-1].clades.append(current_clade)
 
-            if token.startswith("'"):
+            elif first == ')':
+                # done adding children for this parent clade
+                if not parents:
+                    raise NewickError('Parenthesis mismatch.')
+                if labels_are_confidence and current_clade.name and \
+                        current_clade.clades and \
+                        current_clade.confidence is None:
+                    _label_to_confidence(current_clade)
+                current_clade = parents.pop()
+                if current_clade is added_root:
+                    # the added root has no open parenthesis
+                    raise NewickError('Parenthesis mismatch.')
+                rp_count += 1
+
+            elif first == ':':
+                # branch length or confidence
+                value = float(token[1:])
+                if values_are_confidence:
+                    current_clade.confidence = value
+                else:
+                    current_clade.branch_length = value
+
+            elif first == "'":
                 # quoted label; add characters to clade name
                 current_clade.name = token[1:-1]
 
-            elif token.startswith('['):
+            elif first == '[':
                 # comment
                 current_clade.comment = token[1:-1]
-                if self.comments_are_confidence:
+                if comments_are_confidence:
                     # Try to use this comment as a numeric support value
                     current_clade.confidence = _parse_confidence(current_clade.comment)
 
-            elif token == '(':
+            elif first == ';':
+                # there should be no remaining tokens
+                if index + 1 < len(tokens):
+                    raise NewickError('Text after semicolon in Newick tree: %s'
+                                      % tokens[index + 1])
+                break
+
+            elif first == '\n':
+                pass
+
+            else:
+                # unquoted node label
+                current_clade.name = token
+
+        if not lp_count == rp_count:
+            raise NewickError('Number of open/close parentheses do not match.')
+
+        for clade in (current_clade, root_clade):
+            if labels_are_confidence and clade.name and clade.clades and \
+                    clade.confidence is None:
+                _label_to_confidence(clade)
+        return Newick.Tree(root=root_clade, rooted=self.rooted)
+
+    def _parse_arrays(self, text):
+        """Parse the text representation into an ArrayTree object (PRIVATE).
+
+        This follows _parse_tree, but only keeps the parent, branch length
+        and name of each clade.
+        """
+        from Bio.Phylo.ArrayTree import ArrayTree
+
+        tokens = _token_pattern.findall(text.strip())
+
+        values_are_confidence = self.values_are_confidence
+        labels_are_confidence = not (values_are_confidence or
+                                     self.comments_are_confidence)
+        # there are at most two more clades than commas and open parentheses
+        size = text.count('(') + text.count(',') + 2
+        parents = [-1] * size
+        lengths = [0] * size
+        names = [None] * size
+        # the number of branches from the root, and the end of the subtree
+        # in preorder, noted when each clade is started and finished
+        levels = [0] * size
+        ends = [0] * size
+        count = 1
+        root_clade = 0
+        current_clade = 0
+        # the parents of the current clade
+        path = []
+        lp_count = 0
+        rp_count = 0
+        for index, token in enumerate(tokens):
+            first = token[0]
+            if first == '(':
                 # start a new clade, which is a child of the current clade
-                current_clade = new_clade(current_clade)
-                entering_branch_length = False
+                path.append(current_clade)
+                parents[count] = current_clade
+                levels[count] = len(path)
+                current_clade = count
+                count += 1
                 lp_count += 1
 
-            elif token == ',':
+            elif first == ',':
                 # if the current clade is the root, then the external parentheses
                 # are missing and a new root should be created
-                if current_clade is root_clade:
-                    root_clade = new_clade()
-                    current_clade.parent = root_clade
+                if not path:
+                    if count + 2 > size:
+                        raise NewickError('Parenthesis mismatch.')
+                    root_clade = count
+                    parents[current_clade] = root_clade
+                    path.append(root_clade)
+                    count += 1
                 # start a new child clade at the same level as the current clade
-                parent = self.process_clade(current_clade)
-                current_clade = new_clade(parent)
-                entering_branch_length = False
+                ends[current_clade] = count
+                parents[count] = path[-1]
+                levels[count] = len(path)
+                current_clade = count
+                count += 1
 
-            elif token == ')':
+            elif first == ')':
                 # done adding children for this parent clade
-                parent = self.process_clade(current_clade)
-                if not parent:
+                if not path:
+                    raise NewickError('Parenthesis mismatch.')
+                ends[current_clade] = count
+                current_clade = path.pop()
+                if current_clade == root_clade and root_clade:
+                    # the added root has no open parenthesis
                     raise NewickError('Parenthesis mismatch.')
-                current_clade = parent
-                entering_branch_length = False
                 rp_count += 1
 
-            elif token == ';':
-                break
+            elif first == ':':
+                if not values_are_confidence:
+                    lengths[current_clade] = float(token[1:])
 
-            elif token.startswith(':'):
-                # branch length or confidence
-                value = float(token[1:])
-                if self.values_are_confidence:
-                    current_clade.confidence = value
-                else:
-                    current_clade.branch_length = value
+            elif first == "'":
+                names[current_clade] = token[1:-1]
 
-            elif token == '\n':
-                pass
+            elif first == ';':
+                # there should be no remaining tokens
+                if index + 1 < len(tokens):
+                    raise NewickError('Text after semicolon in Newick tree: %s'
+                                      % tokens[index + 1])
+                break
 
-            else:
+            elif first != '[' and first != '\n':
                 # unquoted node label
-                current_clade.name = token
+                names[current_clade] = token
 
         if not lp_count == rp_count:
             raise NewickError('Number of open/close parentheses do not match.')
 
-        # if ; token broke out of for loop, there should be no remaining tokens
-        try:
-            next_token = next(tokens)
-            raise NewickError('Text after semicolon in Newick tree: %s'
-                              % next_token.group())
-        except StopIteration:
-            pass
-
-        self.process_clade(current_clade)
-        self.process_clade(root_clade)
-        return Newick.Tree(root=root_clade, rooted=self.rooted)
+        del parents[count:], lengths[count:], names[count:]
+        del levels[count:], ends[count:]
+        ends[current_clade] = count
+        if labels_are_confidence:
+            # numeric labels of internal clades are confidence values
+            for index in set(parents):
+                if index >= 0 and names[index] and \
+                        _parse_confidence(names[index]) is not None:
+                    names[index] = None
+        if root_clade:
+            # a new root was added last, so number the clades in preorder
+            children = [[] for parent in parents]
+            for index, parent in enumerate(parents):
+                if parent >= 0:
+                    children[parent].append(index)
+            order = []
+            stack = [root_clade]
+            while stack:
+                index = stack.pop()
+                order.append(index)
+                stack.extend(reversed(children[index]))
+            numbers = dict((index, number) for number, index in enumerate(order))
+            numbers[-1] = -1
+            parents = [numbers[parents[index]] for index in order]
+            lengths = [lengths[index] for index in order]
+            names = [names[index] for index in order]
+            return ArrayTree._from_preorder(parents, lengths, names)
+        return ArrayTree._from_preorder(parents, lengths, names, levels, ends)
 
     def new_clade(self, parent=None):
         """Return new Newick.Clade, optionally with temporary reference to parent."""
@@ -235,6 +422,63 @@ class Parser(object):
             return parent
 
 
+# Number of trees parsed at a time by each worker process
+_BATCH_SIZE = 100
+
+
+def _parse_batch(texts, options):
+    """Parse a list of tree strings in a worker process (PRIVATE).
+
+    Takes the tree strings and the parsing options. Tree objects are
+    returned flattened, as pickling many Clade objects is slower than
+    parsing them.
+    """
+    parser = Parser(None)
+    (parser.values_are_confidence, parser.comments_are_confidence,
+     parser.rooted, parser.arrays) = options
+    if parser.arrays:
+        return [parser._parse_arrays(text) for text in texts]
+    return [_flatten(parser._parse_tree(text)) for text in texts]
+
+
+def _flatten(tree):
+    """Return the attributes of the clades of a parsed tree in lists (PRIVATE)."""
+    parents = []
+    attributes = []
+    stack = [(tree.root, -1)]
+    while stack:
+        clade, parent = stack.pop()
+        index = len(parents)
+        parents.append(parent)
+        attributes.append((clade.branch_length, clade.name, clade.confidence,
+                           clade.comment))
+        for child in reversed(clade.clades):
+            stack.append((child, index))
+    return tree.rooted, parents, attributes
+
+
+def _unflatten(flat):
+    """Make a Tree from the output of _flatten (PRIVATE)."""
+    rooted, parents, attributes = flat
+    clades = []
+    for parent, (branch_length, name, confidence, comment) in zip(parents, attributes):
+        clade = Newick.Clade(branch_length, name, None, confidence, comment)
+        if parent >= 0:
+            clades[parent].clades.append(clade)
+        clades.append(clade)
+    return Newick.Tree(root=clades[0], rooted=rooted)
+
+
+def _batches(iterable, size):
+    """Yield lists of at most size items from the iterable (PRIVATE)."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            break
+        yield batch
+
+
 # ---------------------------------------------------------
 # Output
 
@@ -265,21 +509,42 @@ class Writer(object):
                                               confidence_as_branch_length, branch_length_only, max_confidence,
                                               format_confidence, format_branch_length)
 
-        def newickize(clade):
-            """Convert a node tree to a Newick tree string, recursively."""
+        def make_label(clade):
+            """Return the clade name, quoted if necessary."""
             label = clade.name or ''
             if label:
                 unquoted_label = re.match(token_dict['unquoted node label'], label)
                 if (not unquoted_label) or (unquoted_label.end() < len(label)):
                     label = "'%s'" % label.replace(
                         '\\', '\\\\').replace("'", "\\'")
+            return label
 
-            if clade.is_terminal():    # terminal
-                return (label + make_info_string(clade, terminal=True))
-            else:
-                subtrees = (newickize(sub) for sub in clade)
-                return '(%s)%s' % (','.join(subtrees),
-                                   label + make_info_string(clade))
+        def newickize(clade):
+            """Convert a node tree to a Newick tree string.
+
+            The clades are written in pre-order using a stack of clades and
+            of the text following them (commas, and the closing parenthesis
+            and label of each clade), rather than by recursion.
+            """
+            parts = []
+            stack = [(clade, None)]
+            while stack:
+                clade, text = stack.pop()
+                if clade is None:
+                    parts.append(text)
+                elif clade.is_terminal():    # terminal
+                    parts.append(make_label(clade) +
+                                 make_info_string(clade, terminal=True))
+                else:
+                    parts.append('(')
+                    stack.append((None, ')' + make_label(clade) +
+                                  make_info_string(clade)))
+                    subclades = list(clade)
+                    stack.append((subclades[-1], None))
+                    for sub in reversed(subclades[:-1]):
+                        stack.append((None, ','))
+                        stack.append((sub, None))
+            return ''.join(parts)
 
         # Convert each tree to a string
         for tree in self.trees:
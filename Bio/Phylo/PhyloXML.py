@@ -369,16 +369,25 @@ class Clade(PhyloElement, BaseTree.Clade):
 
         Keyword arguments are the usual PhyloXML Clade constructor parameters.
         """
-        new_clade = cls(branch_length=clade.branch_length,
-                        name=clade.name)
-        new_clade.clades = [cls.from_clade(c) for c in clade]
-        new_clade.confidence = clade.confidence
-        new_clade.width = clade.width
-        new_clade.color = (BranchColor(
-            clade.color.red, clade.color.green, clade.color.blue)
-            if clade.color else None)
-        new_clade.__dict__.update(kwargs)
-        return new_clade
+        def copy_clade(clade):
+            new_clade = cls(branch_length=clade.branch_length,
+                            name=clade.name)
+            new_clade.confidence = clade.confidence
+            new_clade.width = clade.width
+            new_clade.color = (BranchColor(
+                clade.color.red, clade.color.green, clade.color.blue)
+                if clade.color else None)
+            return new_clade
+
+        root = copy_clade(clade)
+        # copy the descendants with a stack, rather than recursively
+        stack = [(clade, root)]
+        while stack:
+            clade, new_clade = stack.pop()
+            new_clade.clades = [copy_clade(c) for c in clade]
+            stack.extend(zip(clade.clades, new_clade.clades))
+        root.__dict__.update(kwargs)
+        return root
 
     def to_phylogeny(self, **kwargs):
         """Create a new phylogeny containing just this clade."""
@@ -17,6 +17,7 @@ About capitalization:
 
 """
 
+import io
 import sys
 
 from Bio._py3k import basestring
@@ -332,7 +333,10 @@ class Parser(object):
         phytag = _ns('phylogeny')
         for event, elem in self.context:
             if event == 'start' and elem.tag == phytag:
-                yield self._parse_phylogeny(elem)
+                phylogeny = self._parse_phylogeny(elem)
+                # drop the elements parsed so far
+                self.root.clear()
+                yield phylogeny
 
     # Special parsing cases -- incremental, using self.context
 
@@ -394,17 +398,25 @@ class Parser(object):
         ['branch_length', 'name', 'node_id', 'width'])
 
     def _parse_clade(self, parent):
-        """Parse a Clade node and its children, recursively (PRIVATE)."""
-        clade = PX.Clade(**parent.attrib)
-        if clade.branch_length is not None:
-            clade.branch_length = float(clade.branch_length)
+        """Parse a Clade node and its children (PRIVATE).
+
+        Nested clades are parsed using a stack rather than recursion, so
+        deep trees do not reach the recursion limit. The elements of each
+        nested clade are removed from the XML tree once parsed.
+        """
+        clade = self._new_clade(parent)
+        # the enclosing clades, with their elements and tag stacks
+        stack = []
         # NB: Only evaluate nodes at the current level
         tag_stack = []
         for event, elem in self.context:
             namespace, tag = _split_namespace(elem.tag)
             if event == 'start':
                 if tag == 'clade':
-                    clade.clades.append(self._parse_clade(elem))
+                    stack.append((clade, parent, tag_stack))
+                    clade = self._new_clade(elem)
+                    parent = elem
+                    tag_stack = []
                     continue
                 if tag == 'taxonomy':
                     clade.taxonomies.append(self._parse_taxonomy(elem))
@@ -417,7 +429,15 @@ class Parser(object):
             if event == 'end':
                 if tag == 'clade':
                     elem.clear()
-                    break
+                    if not stack:
+                        break
+                    child = clade
+                    clade, parent, tag_stack = stack.pop()
+                    clade.clades.append(child)
+                    # all the elements parsed so far in the enclosing clade,
+                    # ending with this one, have been handled
+                    del parent[:]
+                    continue
                 if tag != tag_stack[-1]:
                     continue
                 tag_stack.pop()
@@ -448,6 +468,14 @@ class Parser(object):
                     raise PhyloXMLError('Misidentified tag: ' + tag)
         return clade
 
+    @staticmethod
+    def _new_clade(elem):
+        """Create a Clade from the attributes of a clade element (PRIVATE)."""
+        clade = PX.Clade(**elem.attrib)
+        if clade.branch_length is not None:
+            clade.branch_length = float(clade.branch_length)
+        return clade
+
     def _parse_sequence(self, parent):
         """Parse a molecular sequence (PRIVATE)."""
         sequence = PX.Sequence(**parent.attrib)
@@ -703,20 +731,202 @@ def _handle_simple(tag):
     return wrapped
 
 
+# Clades with at most this many clades below them are converted to elements
+# in one go, rather than written one clade at a time
+_CLADE_CHUNK = 100
+
+
+def _large_clades(root):
+    """Return the ids of the clades with many clades below them (PRIVATE)."""
+    clades = [root]
+    parents = [-1]
+    for index, clade in enumerate(clades):
+        for child in clade.clades:
+            clades.append(child)
+            parents.append(index)
+    sizes = [1] * len(clades)
+    for index in range(len(clades) - 1, 0, -1):
+        sizes[parents[index]] += sizes[index]
+    return set(id(clade) for clade, size in zip(clades, sizes)
+               if size > _CLADE_CHUNK + 1)
+
+
+def _tostring(elem):
+    """Serialize an element and its subelements as a unicode string (PRIVATE)."""
+    if sys.version_info[0] >= 3:
+        return ElementTree.tostring(elem, encoding="unicode")
+    return ElementTree.tostring(elem, "utf-8").decode("utf-8")
+
+
+def _start_tag(elem):
+    """Return the start tag of an element without subelements (PRIVATE)."""
+    if not elem.attrib:
+        return u"<%s>" % elem.tag
+    # ElementTree writes an empty element as <tag attr="..." />
+    return _tostring(elem)[:-3] + '>'
+
+
 class Writer(object):
-    """Methods for serializing a PhyloXML object to XML."""
+    """Methods for serializing a PhyloXML object to XML.
+
+    The phylogenies and clades are written incrementally, one clade at a
+    time, so the elements of the whole tree are never held in memory and
+    deep trees do not reach the recursion limit. The other nodes are
+    converted to ElementTree elements with the methods of this class.
+    """
 
     def __init__(self, phyloxml):
-        """Build an ElementTree from a PhyloXML object."""
+        """Prepare to write a PhyloXML object."""
         assert isinstance(phyloxml, PX.Phyloxml), "Not a Phyloxml object"
-        self._tree = ElementTree.ElementTree(self.phyloxml(phyloxml))
+        self._phyloxml = phyloxml
+        # the clades of the current phylogeny to write one at a time
+        self._large_clades = set()
 
     def write(self, file, encoding=DEFAULT_ENCODING, indent=True):
-        """Write PhyloXML to a file."""
+        """Write PhyloXML to a file.
+
+        Returns the number of phylogenies and other top-level elements
+        written.
+        """
+        if isinstance(file, basestring):
+            if encoding.lower() == "unicode":
+                handle = io.open(file, "w", encoding="utf-8",
+                                 errors="xmlcharrefreplace")
+            else:
+                handle = io.open(file, "w", encoding=encoding,
+                                 errors="xmlcharrefreplace")
+            try:
+                return self._write(handle.write, encoding, indent)
+            finally:
+                handle.close()
+        if encoding.lower() == "unicode":
+            write = file.write
+        else:
+            def write(text):
+                file.write(text.encode(encoding, "xmlcharrefreplace"))
+        return self._write(write, encoding, indent)
+
+    def _write(self, write, encoding, indent):
+        """Write the document with the given write function (PRIVATE)."""
+        if encoding.lower() not in ("unicode", "utf-8", "us-ascii"):
+            write(u"<?xml version='1.0' encoding='%s'?>\n" % encoding)
+        obj = self._phyloxml
+        root = ElementTree.Element('phyloxml', obj.attributes)  # Namespaces
+        count = 0
+        for tree in obj.phylogenies:
+            if not count:
+                write(_start_tag(root))
+            count += 1
+            self._write_node(write, self._node('phylogeny', tree), indent)
+        for otr in obj.other:
+            if not count:
+                write(_start_tag(root))
+            count += 1
+            self._write_node(write, self.other(otr), indent)
+        if not count:
+            write(_tostring(root))
+        else:
+            if indent:
+                write(u"\n")
+            write(u"</phyloxml>")
+        return count
+
+    def _write_node(self, write, node, indent, level=1):
+        """Write a node below the root, without recursion (PRIVATE).
+
+        Elements are written in one go, while for phylogenies and large
+        clades (given as an element with no subelements and an iterator
+        over the subnodes, see _node) the subnodes are written one by one.
+        """
+        # the open nodes, with the subnodes still to be written
+        stack = []
+        while True:
+            if isinstance(node, tuple):
+                if indent:
+                    write(u"\n" + "  " * (level + len(stack)))
+                elem, subnodes = node
+                node = next(subnodes, None)
+                if node is not None:
+                    write(_start_tag(elem))
+                    stack.append((elem.tag, subnodes))
+                    continue
+                write(_tostring(elem))
+            else:
+                # write this and any following elements together
+                elems = [node]
+                node = None
+                if stack:
+                    for node in stack[-1][1]:
+                        if isinstance(node, tuple):
+                            break
+                        elems.append(node)
+                    else:
+                        node = None
+                self._write_elements(write, elems, indent,
+                                     level + len(stack))
+                if node is not None:
+                    continue
+            # continue with the next subnode, closing the finished nodes
+            while stack:
+                node = next(stack[-1][1], None)
+                if node is not None:
+                    break
+                tag = stack.pop()[0]
+                if indent:
+                    write(u"\n" + "  " * (level + len(stack)))
+                write(u"</%s>" % tag)
+            else:
+                return
+
+    @staticmethod
+    def _write_elements(write, elems, indent, level):
+        """Write a list of sibling elements (PRIVATE)."""
         if indent:
-            _indent(self._tree.getroot())
-        self._tree.write(file, encoding)
-        return len(self._tree.getroot())
+            space = u"\n" + "  " * level
+            write(space)
+            for elem in elems:
+                _indent(elem, level)
+                elem.tail = space
+            elems[-1].tail = None
+        wrapper = ElementTree.Element('_')
+        wrapper.extend(elems)
+        text = _tostring(wrapper)
+        if text.startswith('<_>'):
+            write(text[3:-4])
+        else:
+            # keep any namespace declarations on the elements themselves
+            for elem in elems:
+                write(_tostring(elem))
+
+    def _node(self, method, obj):
+        """Convert a node to an element, or prepare to stream it (PRIVATE).
+
+        Phylogenies and large clades are returned as an element with no
+        subelements and an iterator over their converted subnodes.
+        """
+        if method == 'phylogeny':
+            if obj.root is None:
+                self._large_clades = set()
+            else:
+                self._large_clades = _large_clades(obj.root)
+        elif method != 'clade' or id(obj) not in self._large_clades:
+            return getattr(self, method)(obj)
+        tag, attribs, subnodes = self._streamed[method]
+        elem = ElementTree.Element(tag, _clean_attrib(obj, attribs))
+        return elem, self._subnodes(obj, subnodes)
+
+    def _subnodes(self, obj, subnodes):
+        """Iterate over the converted subnodes of an object, in order (PRIVATE)."""
+        for subn in subnodes:
+            if isinstance(subn, basestring):
+                # singular object: method and attribute names are the same
+                if getattr(obj, subn) is not None:
+                    yield self._node(subn, getattr(obj, subn))
+            else:
+                # list: singular method, pluralized attribute name
+                method, plural = subn
+                for item in getattr(obj, plural):
+                    yield self._node(method, item)
 
     # Convert classes to ETree elements
 
@@ -737,40 +947,46 @@ class Writer(object):
             elem.append(self.other(child))
         return elem
 
-    phylogeny = _handle_complex('phylogeny',
-                                ('rooted', 'rerootable',
-                                 'branch_length_unit', 'type'),
-                                ('name',
-                                 'id',
-                                 'description',
-                                 'date',
-                                 ('confidence', 'confidences'),
-                                 'clade',
-                                 ('clade_relation', 'clade_relations'),
-                                 ('sequence_relation',
-                                  'sequence_relations'),
-                                 ('property', 'properties'),
-                                 ('other', 'other'),
-                                 ))
-
-    clade = _handle_complex('clade', ('id_source',),
-                            ('name',
-                             'branch_length',
-                             ('confidence', 'confidences'),
-                             'width',
-                             'color',
-                             'node_id',
-                             ('taxonomy', 'taxonomies'),
-                             ('sequence', 'sequences'),
-                             'events',
-                             'binary_characters',
-                             ('distribution', 'distributions'),
-                             'date',
-                             ('reference', 'references'),
-                             ('property', 'properties'),
-                             ('clade', 'clades'),
-                             ('other', 'other'),
-                             ))
+    # Nodes written incrementally: method, (tag, attributes, subnodes)
+    _streamed = {
+        'phylogeny': ('phylogeny',
+                      ('rooted', 'rerootable',
+                       'branch_length_unit', 'type'),
+                      ('name',
+                       'id',
+                       'description',
+                       'date',
+                       ('confidence', 'confidences'),
+                       'clade',
+                       ('clade_relation', 'clade_relations'),
+                       ('sequence_relation',
+                        'sequence_relations'),
+                       ('property', 'properties'),
+                       ('other', 'other'),
+                       )),
+        'clade': ('clade', ('id_source',),
+                  ('name',
+                   'branch_length',
+                   ('confidence', 'confidences'),
+                   'width',
+                   'color',
+                   'node_id',
+                   ('taxonomy', 'taxonomies'),
+                   ('sequence', 'sequences'),
+                   'events',
+                   'binary_characters',
+                   ('distribution', 'distributions'),
+                   'date',
+                   ('reference', 'references'),
+                   ('property', 'properties'),
+                   ('clade', 'clades'),
+                   ('other', 'other'),
+                   )),
+    }
+
+    phylogeny = _handle_complex(*_streamed['phylogeny'])
+
+    clade = _handle_complex(*_streamed['clade'])
 
     accession = _handle_complex('accession', ('source',),
                                 (), has_text=True)
@@ -13,6 +13,12 @@ from Bio.SubsMat import MatrixInfo
 from Bio import _py3k
 from Bio._py3k import zip, range
 
+try:
+    import numpy
+except ImportError:
+    # NumPy is only needed for the faster array based calculations
+    numpy = None
+
 
 def _is_numeric(x):
     """Return True if is numeric."""
@@ -355,6 +361,25 @@ class DistanceMatrix(_Matrix):
 _DistanceMatrix = DistanceMatrix
 
 
+def _to_array(distance_matrix):
+    """Return the distances as a symmetric square NumPy array (PRIVATE)."""
+    n = len(distance_matrix)
+    array = numpy.zeros((n, n))
+    for i, row in enumerate(distance_matrix.matrix):
+        array[i, :i + 1] = row
+    lower = numpy.tril(array, -1)
+    return lower + lower.T
+
+
+def _from_array(names, array):
+    """Return a DistanceMatrix of the lower triangle of a square array (PRIVATE)."""
+    distance_matrix = DistanceMatrix(names)
+    distance_matrix.matrix = [row[:i + 1].tolist()
+                              for i, row in enumerate(array)]
+    distance_matrix._set_zero_diagonal()
+    return distance_matrix
+
+
 class DistanceCalculator(object):
     """Class to calculate the distance matrix from a DNA or Protein.
 
@@ -508,11 +533,79 @@ class DistanceCalculator(object):
             raise TypeError("Must provide a MultipleSeqAlignment object.")
 
         names = [s.id for s in msa]
+        if numpy is not None:
+            distances = self._distance_array(msa)
+            if distances is not None:
+                return _from_array(names, distances)
         dm = DistanceMatrix(names)
         for seq1, seq2 in itertools.combinations(msa, 2):
             dm[seq1.id, seq2.id] = self._pairwise(seq1, seq2)
         return dm
 
+    def _distance_array(self, msa):
+        """Calculate all pairwise distances as a NumPy array (PRIVATE).
+
+        The alignment is encoded as an array of letter codes, and the scores
+        of all pairs of sequences are calculated together, one letter at a
+        time, as the product of the positions where the first sequence has
+        that letter with the scores of that letter against the letters of
+        the second sequence. This gives the same distances as _pairwise.
+
+        Returns None if a sequence has a letter which is not in the scoring
+        matrix (or is not a single byte), leaving it to _pairwise, which only
+        rejects such letters where the other sequence has no letter to skip.
+        """
+        n = len(msa)
+        if n < 2:
+            return numpy.zeros((n, n))
+        try:
+            codes = numpy.array([numpy.frombuffer(
+                str(record.seq).encode("latin-1"), numpy.uint8)
+                for record in msa])
+        except UnicodeEncodeError:
+            return None
+        length = codes.shape[1]
+        skip = numpy.zeros(256, bool)
+        for letter in self.skip_letters:
+            if len(letter) == 1:
+                skip[ord(letter)] = True
+        valid = ~skip[codes]
+        score = numpy.zeros((n, n))
+        if self.scoring_matrix:
+            letters = self.scoring_matrix.names
+            lookup = numpy.full(256, -1, int)
+            for index, letter in enumerate(letters):
+                lookup[ord(letter)] = index
+            indices = lookup[codes]
+            if (valid & (indices < 0)).any():
+                return None
+            # Skipped letters are given index 0, but then ignored
+            indices[~valid] = 0
+            scores = numpy.array([[self.scoring_matrix[letter1, letter2]
+                                   for letter2 in letters]
+                                  for letter1 in letters], float)
+            for index in numpy.unique(indices[valid]):
+                matches = (valid & (indices == index)).astype(float)
+                letter_scores = scores[index][indices] * valid
+                score += numpy.dot(matches, letter_scores.T)
+            # Score of each sequence against itself, over the positions
+            # where the other sequence is not skipped
+            self_scores = numpy.dot(scores[indices, indices] * valid,
+                                    valid.T.astype(float))
+            # Take the higher score if the matrix is asymmetrical
+            max_score = numpy.maximum(self_scores, self_scores.T)
+        else:
+            # Score by character identity, not skipping any special letters
+            for code in numpy.unique(codes[valid]):
+                matches = (valid & (codes == code)).astype(float)
+                score += numpy.dot(matches, matches.T)
+            max_score = numpy.full((n, n), float(length))
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            distances = numpy.where(max_score == 0, 1.0,
+                                    1 - score / max_score)
+        numpy.fill_diagonal(distances, 0)
+        return distances
+
     def _build_protein_matrix(self, subsmat):
         """Convert matrix from SubsMat format to _Matrix object (PRIVATE)."""
         protein_matrix = _Matrix(self.protein_alphabet)
@@ -622,10 +715,18 @@ class DistanceTreeConstructor(TreeConstructor):
             distance_matrix : DistanceMatrix
                 The distance matrix for tree construction.
 
+        If NumPy is installed, the closest pair of clades is found using the
+        minimum distance of each row of the matrix, which is kept up to date
+        as clades are joined, rather than by searching the whole matrix.
         """
         if not isinstance(distance_matrix, DistanceMatrix):
             raise TypeError("Must provide a DistanceMatrix object.")
+        if numpy is not None and len(distance_matrix) > 1:
+            return self._upgma_array(distance_matrix)
+        return self._upgma_python(distance_matrix)
 
+    def _upgma_python(self, distance_matrix):
+        """Construct an UPGMA tree using the DistanceMatrix directly (PRIVATE)."""
         # make a copy of the distance matrix to be used
         dm = copy.deepcopy(distance_matrix)
         # init terminal clades
@@ -680,17 +781,28 @@ class DistanceTreeConstructor(TreeConstructor):
         inner_clade.branch_length = 0
         return BaseTree.Tree(inner_clade)
 
-    def nj(self, distance_matrix):
+    def nj(self, distance_matrix, prune=True):
         """Construct and return a Neighbor Joining tree.
 
         :Parameters:
             distance_matrix : DistanceMatrix
                 The distance matrix for tree construction.
+            prune : bool
+                Only used with NumPy. If True (default), the search for the
+                pair of clades to join skips the rows of the matrix which
+                cannot contain the best pair, using the minimum distance of
+                each row as a lower bound (as done by RapidNJ). The tree is
+                the same either way.
 
         """
         if not isinstance(distance_matrix, DistanceMatrix):
             raise TypeError("Must provide a DistanceMatrix object.")
+        if numpy is not None and len(distance_matrix) > 2:
+            return self._nj_array(distance_matrix, prune)
+        return self._nj_python(distance_matrix)
 
+    def _nj_python(self, distance_matrix):
+        """Construct a Neighbor Joining tree using the DistanceMatrix directly (PRIVATE)."""
         # make a copy of the distance matrix to be used
         dm = copy.deepcopy(distance_matrix)
         # init terminal clades
@@ -781,6 +893,212 @@ class DistanceTreeConstructor(TreeConstructor):
 
         return BaseTree.Tree(root, rooted=False)
 
+    @staticmethod
+    def _joined_array(distance_matrix):
+        """Prepare the arrays used to join clades (PRIVATE).
+
+        Returns the distances as a square array, with infinity on the
+        diagonal, and the minimum of each row. Rather than deleting rows and
+        columns, the clades which have been joined are set to infinity, so
+        the remaining clades keep their order.
+        """
+        distances = _to_array(distance_matrix)
+        numpy.fill_diagonal(distances, numpy.inf)
+        return distances, distances.min(axis=1)
+
+    @staticmethod
+    def _join_rows(distances, row_mins, active, min_i, min_j, new):
+        """Replace clades min_i and min_j by a new clade at min_j (PRIVATE).
+
+        The new distances should be given for all clades (any values at
+        min_i, min_j and inactive clades are ignored). Updates the minimum
+        of each row, recalculating it only where it was the distance to one
+        of the joined clades.
+        """
+        old_i = distances[min_i].copy()
+        old_j = distances[min_j].copy()
+        active[min_i] = False
+        new = numpy.where(active, new, numpy.inf)
+        new[min_j] = numpy.inf
+        distances[min_i, :] = numpy.inf
+        distances[:, min_i] = numpy.inf
+        distances[min_j, :] = new
+        distances[:, min_j] = new
+        stale = active & ((old_i == row_mins) | (old_j == row_mins))
+        numpy.minimum(row_mins, new, out=row_mins)
+        row_mins[stale] = distances[stale].min(axis=1)
+        row_mins[min_j] = new.min()
+        row_mins[min_i] = numpy.inf
+
+    def _upgma_array(self, distance_matrix):
+        """Construct an UPGMA tree using NumPy arrays (PRIVATE).
+
+        Joins the same clades in the same order as _upgma_python, taking the
+        last pair with the minimum distance in the lower triangle.
+        """
+        distances, row_mins = self._joined_array(distance_matrix)
+        n = len(distances)
+        positions = numpy.arange(n)
+        active = numpy.ones(n, bool)
+        # init terminal clades
+        clades = [BaseTree.Clade(None, name) for name in distance_matrix.names]
+        heights = {}
+        inner_count = 0
+        for remaining in range(n, 1, -1):
+            if 2 * remaining <= len(active) and remaining >= 32:
+                # drop the rows and columns of the joined clades
+                keep = numpy.flatnonzero(active)
+                distances = distances[numpy.ix_(keep, keep)]
+                row_mins = row_mins[keep]
+                active = active[keep]
+                positions = positions[:remaining]
+                clades = [clades[i] for i in keep]
+            width = len(active)
+            min_dist = float(row_mins.min())
+            # Only rows with this minimum can hold the closest pair, take
+            # the last one in the lower triangle
+            rows = numpy.flatnonzero(row_mins == min_dist)
+            found = ((distances[rows] == min_dist) &
+                     (positions[None, :] < rows[:, None]))
+            last = found.size - 1 - numpy.argmax(found.ravel()[::-1])
+            min_i = int(rows[last // width])
+            min_j = int(last % width)
+
+            # create clade
+            clade1 = clades[min_i]
+            clade2 = clades[min_j]
+            inner_count += 1
+            inner_clade = BaseTree.Clade(None, "Inner" + str(inner_count))
+            inner_clade.clades.append(clade1)
+            inner_clade.clades.append(clade2)
+            # assign branch length, keeping track of the clade heights
+            # (as calculated by _height_of)
+            for clade in (clade1, clade2):
+                if clade.is_terminal():
+                    clade.branch_length = min_dist * 1.0 / 2
+                    heights[clade] = clade.branch_length
+                else:
+                    clade.branch_length = min_dist * 1.0 / 2 - heights[clade]
+            heights[inner_clade] = max(heights[clade1], heights[clade2])
+
+            # update node list
+            clades[min_j] = inner_clade
+            clades[min_i] = None
+
+            # set the distances of new node at the index of min_j
+            new = (distances[min_i] + distances[min_j]) * 1.0 / 2
+            self._join_rows(distances, row_mins, active, min_i, min_j, new)
+        inner_clade.branch_length = 0
+        return BaseTree.Tree(inner_clade)
+
+    def _nj_array(self, distance_matrix, prune=True):
+        """Construct a Neighbor Joining tree using NumPy arrays (PRIVATE).
+
+        Joins the same clades in the same order as _nj_python, taking the
+        first pair with the minimum value in the lower triangle (or the
+        first two clades, if that pair is one of the minimum pairs). The
+        values are rounded as in _nj_python, as the distances of each clade
+        are summed one by one in the same order, so the same pair is chosen
+        even between pairs which are equal but for rounding (as with four
+        clades, or tied distances).
+        """
+        distances, row_mins = self._joined_array(distance_matrix)
+        # the distances with zeros for the joined clades, to be summed
+        summed = _to_array(distance_matrix)
+        n = len(distances)
+        positions = numpy.arange(n)
+        active = numpy.ones(n, bool)
+        # init terminal clades
+        clades = [BaseTree.Clade(None, name) for name in distance_matrix.names]
+        inner_count = 0
+        for size in range(n, 2, -1):
+            if 2 * size <= len(active) and size >= 32:
+                # drop the rows and columns of the joined clades
+                keep = numpy.flatnonzero(active)
+                distances = distances[numpy.ix_(keep, keep)]
+                summed = summed[numpy.ix_(keep, keep)]
+                row_mins = row_mins[keep]
+                active = active[keep]
+                positions = positions[:size]
+                clades = [clades[i] for i in keep]
+            width = len(active)
+            # calculate nodeDist, summing by column, as NumPy then adds up
+            # the distances in order (rather than pairwise, as along rows)
+            node_dist = summed.sum(axis=0) / (size - 2)
+            if prune:
+                # The values in row i are at least bounds[i], so only rows
+                # whose bound is below the best value of the row with the
+                # lowest bound need to be searched
+                max_dist = node_dist[active].max()
+                bounds = row_mins - node_dist - max_dist
+                best = numpy.argmin(bounds)
+                # The values of the pairs in this row, calculated in the
+                # same order as below (where each pair is in the row of
+                # its later clade), so the rounding is the same
+                best_values = numpy.where(
+                    positions < best,
+                    distances[best] - node_dist[best] - node_dist,
+                    distances[best] - node_dist - node_dist[best])
+                rows = numpy.flatnonzero(bounds <= best_values.min())
+            else:
+                rows = numpy.flatnonzero(active)
+            # find minimum distance pair, first in the lower triangle
+            values = distances[rows]
+            values -= node_dist[rows, None]
+            values -= node_dist
+            values[positions >= rows[:, None]] = numpy.inf
+            first = numpy.argmin(values)
+            min_i = int(rows[first // width])
+            min_j = int(first % width)
+            first_two = numpy.flatnonzero(active)[:2]
+            if min_j == first_two[0] and min_i == first_two[1]:
+                # _nj_python starts from this pair the other way round
+                min_i, min_j = min_j, min_i
+            # create clade
+            clade1 = clades[min_i]
+            clade2 = clades[min_j]
+            inner_count += 1
+            inner_clade = BaseTree.Clade(None, "Inner" + str(inner_count))
+            inner_clade.clades.append(clade1)
+            inner_clade.clades.append(clade2)
+            # assign branch length
+            min_dist = float(distances[min_i, min_j])
+            clade1.branch_length = (min_dist + float(node_dist[min_i]) -
+                                    float(node_dist[min_j])) / 2.0
+            clade2.branch_length = min_dist - clade1.branch_length
+
+            # update node list
+            clades[min_j] = inner_clade
+            clades[min_i] = None
+
+            # set the distances of new node at the index of min_j
+            new = (distances[min_i] + distances[min_j] - min_dist) / 2.0
+            self._join_rows(distances, row_mins, active, min_i, min_j, new)
+            new = numpy.where(active, new, 0)
+            new[min_j] = 0
+            summed[min_i, :] = 0
+            summed[:, min_i] = 0
+            summed[min_j, :] = new
+            summed[:, min_j] = new
+
+        # set the last clade as one of the child of the inner_clade
+        last_two = numpy.flatnonzero(active)
+        clades = [clades[i] for i in last_two]
+        last_dist = float(distances[last_two[1], last_two[0]])
+        root = None
+        if clades[0] == inner_clade:
+            clades[0].branch_length = 0
+            clades[1].branch_length = last_dist
+            clades[0].clades.append(clades[1])
+            root = clades[0]
+        else:
+            clades[0].branch_length = last_dist
+            clades[1].branch_length = 0
+            clades[1].clades.append(clades[0])
+            root = clades[1]
+
+        return BaseTree.Tree(root, rooted=False)
+
     def _height_of(self, clade):
         """Calculate clade height -- the longest path to any terminal (PRIVATE)."""
         height = 0
@@ -847,6 +1165,28 @@ class NNITreeSearcher(TreeSearcher):
 
     def _nni(self, starting_tree, alignment):
         """Search for the best parsimony tree using the NNI algorithm (PRIVATE)."""
+        if not (isinstance(self.scorer, ParsimonyScorer) and
+                type(self.scorer).get_score == ParsimonyScorer.get_score):
+            # rescore each neighbor tree with the given scorer
+            return self._nni_rescoring(starting_tree, alignment)
+        best_tree = starting_tree
+        while True:
+            states = _ParsimonyStates(best_tree, alignment, self.scorer.matrix)
+            best_score = states.score
+            best_swap = None
+            for swap in self._get_swaps(best_tree):
+                score = states.swap_score(*swap)
+                if score < best_score:
+                    best_score = score
+                    best_swap = swap
+            # stop if no smaller score exist
+            if best_swap is None:
+                break
+            best_tree = self._swapped(best_tree, *best_swap)
+        return best_tree
+
+    def _nni_rescoring(self, starting_tree, alignment):
+        """Search for the best tree, scoring each neighbor tree (PRIVATE)."""
         best_tree = starting_tree
         while True:
             best_score = self.scorer.get_score(best_tree, alignment)
@@ -861,106 +1201,61 @@ class NNITreeSearcher(TreeSearcher):
                 break
         return best_tree
 
-    def _get_neighbors(self, tree):
-        """Get all neighbor trees of the given tree (PRIVATE).
+    def _get_swaps(self, tree):
+        """Get the swaps giving the neighbor trees of the given tree (PRIVATE).
 
-        Currently only for binary rooted trees.
+        Currently only for binary rooted trees. Each NNI is given as a tuple
+        (clade1, index1, clade2, index2), meaning the child at index1 of
+        clade1 is swapped with the child at index2 of clade2, where clade2
+        is either a child of clade1 or its sister at the root.
         """
         # make child to parent dict
         parents = {}
         for clade in tree.find_clades():
-            if clade != tree.root:
-                node_path = tree.get_path(clade)
-                # cannot get the parent if the parent is root. Bug?
-                if len(node_path) == 1:
-                    parents[clade] = tree.root
-                else:
-                    parents[clade] = node_path[-2]
-        neighbors = []
-        root_childs = []
+            for child in clade.clades:
+                parents[child] = clade
+        swaps = []
+        root = tree.root
+        left = root.clades[0]
+        right = root.clades[1]
         for clade in tree.get_nonterminals(order="level"):
-            if clade == tree.root:
-                left = clade.clades[0]
-                right = clade.clades[1]
-                root_childs.append(left)
-                root_childs.append(right)
+            if clade is root:
                 if not left.is_terminal() and not right.is_terminal():
-                    # make changes around the left_left clade
-                    # left_left = left.clades[0]
-                    left_right = left.clades[1]
-                    right_left = right.clades[0]
-                    right_right = right.clades[1]
-                    # neightbor 1 (left_left + right_right)
-                    del left.clades[1]
-                    del right.clades[1]
-                    left.clades.append(right_right)
-                    right.clades.append(left_right)
-                    temp_tree = copy.deepcopy(tree)
-                    neighbors.append(temp_tree)
+                    # neighbor 1 (left_left + right_right)
+                    swaps.append((left, 1, right, 1))
                     # neighbor 2 (left_left + right_left)
-                    del left.clades[1]
-                    del right.clades[0]
-                    left.clades.append(right_left)
-                    right.clades.append(right_right)
-                    temp_tree = copy.deepcopy(tree)
-                    neighbors.append(temp_tree)
-                    # change back (left_left + left_right)
-                    del left.clades[1]
-                    del right.clades[0]
-                    left.clades.append(left_right)
-                    right.clades.insert(0, right_left)
-            elif clade in root_childs:
+                    swaps.append((left, 1, right, 0))
+            elif clade is left or clade is right:
                 # skip root child
                 continue
             else:
-                # method for other clades
                 # make changes around the parent clade
-                left = clade.clades[0]
-                right = clade.clades[1]
                 parent = parents[clade]
-                if clade == parent.clades[0]:
-                    sister = parent.clades[1]
-                    # neighbor 1 (parent + right)
-                    del parent.clades[1]
-                    del clade.clades[1]
-                    parent.clades.append(right)
-                    clade.clades.append(sister)
-                    temp_tree = copy.deepcopy(tree)
-                    neighbors.append(temp_tree)
-                    # neighbor 2 (parent + left)
-                    del parent.clades[1]
-                    del clade.clades[0]
-                    parent.clades.append(left)
-                    clade.clades.append(right)
-                    temp_tree = copy.deepcopy(tree)
-                    neighbors.append(temp_tree)
-                    # change back (parent + sister)
-                    del parent.clades[1]
-                    del clade.clades[0]
-                    parent.clades.append(sister)
-                    clade.clades.insert(0, left)
-                else:
-                    sister = parent.clades[0]
-                    # neighbor 1 (parent + right)
-                    del parent.clades[0]
-                    del clade.clades[1]
-                    parent.clades.insert(0, right)
-                    clade.clades.append(sister)
-                    temp_tree = copy.deepcopy(tree)
-                    neighbors.append(temp_tree)
-                    # neighbor 2 (parent + left)
-                    del parent.clades[0]
-                    del clade.clades[0]
-                    parent.clades.insert(0, left)
-                    clade.clades.append(right)
-                    temp_tree = copy.deepcopy(tree)
-                    neighbors.append(temp_tree)
-                    # change back (parent + sister)
-                    del parent.clades[0]
-                    del clade.clades[0]
-                    parent.clades.insert(0, sister)
-                    clade.clades.insert(0, left)
-        return neighbors
+                sister = 1 if clade is parent.clades[0] else 0
+                # neighbor 1 (parent + right)
+                swaps.append((parent, sister, clade, 1))
+                # neighbor 2 (parent + left)
+                swaps.append((parent, sister, clade, 0))
+        return swaps
+
+    @staticmethod
+    def _swapped(tree, clade1, index1, clade2, index2):
+        """Return a copy of the tree with the two children swapped (PRIVATE)."""
+        clade1.clades[index1], clade2.clades[index2] = \
+            clade2.clades[index2], clade1.clades[index1]
+        try:
+            return copy.deepcopy(tree)
+        finally:
+            # change back
+            clade1.clades[index1], clade2.clades[index2] = \
+                clade2.clades[index2], clade1.clades[index1]
+
+    def _get_neighbors(self, tree):
+        """Get all neighbor trees of the given tree (PRIVATE).
+
+        Currently only for binary rooted trees.
+        """
+        return [self._swapped(tree, *swap) for swap in self._get_swaps(tree)]
 
 # ######################## Parsimony Classes ##########################
 
@@ -984,12 +1279,12 @@ class ParsimonyScorer(Scorer):
         else:
             raise TypeError("Must provide a _Matrix object.")
 
-    def get_score(self, tree, alignment):
-        """Calculate parsimony score using the Fitch algorithm.
+    @staticmethod
+    def _sorted_terminals(tree, alignment):
+        """Check the tree, and sort its terminals and the alignment (PRIVATE).
 
-        Calculate and return the parsimony score given a tree and the
-        MSA using either the Fitch algorithm (without a penalty matrix)
-        or the Sankoff algorithm (with a matrix).
+        Roots the tree at its midpoint if needed, and returns the terminals
+        in the same order as the alignment, which is sorted by ID.
         """
         # make sure the tree is rooted and bifurcating
         if not tree.is_bifurcating():
@@ -1003,6 +1298,16 @@ class ParsimonyScorer(Scorer):
         if not all(t.name == a.id for t, a in zip(terms, alignment)):
             raise ValueError(
                 "Taxon names of the input tree should be the same with the alignment.")
+        return terms
+
+    def get_score(self, tree, alignment):
+        """Calculate parsimony score using the Fitch algorithm.
+
+        Calculate and return the parsimony score given a tree and the
+        MSA using either the Fitch algorithm (without a penalty matrix)
+        or the Sankoff algorithm (with a matrix).
+        """
+        terms = self._sorted_terminals(tree, alignment)
         # term_align = dict(zip(terms, alignment))
         score = 0
         for i in range(len(alignment[0])):
@@ -1068,6 +1373,153 @@ class ParsimonyScorer(Scorer):
         return score
 
 
+class _ParsimonyStates(object):
+    """Parsimony states of the clades of a tree, for scoring NNIs (PRIVATE).
+
+    The alignment columns are compressed into weighted site patterns, leaving
+    out the constant columns as ParsimonyScorer.get_score does. Without a
+    scoring matrix, the Fitch state sets of each clade are stored as one
+    integer per letter, with a bit for each site pattern holding the letter.
+    With a matrix, the Sankoff scores of each clade are stored as a list for
+    each site pattern.
+
+    The score after swapping two children (as given by the _get_swaps method
+    of NNITreeSearcher) is calculated by updating only the two clades whose
+    children changed and their ancestors, stopping once the states of an
+    ancestor are unchanged, so the tree itself is not copied or rescored.
+    """
+
+    def __init__(self, tree, alignment, matrix=None):
+        """Calculate the states of all clades, and the score of the tree."""
+        terms = ParsimonyScorer._sorted_terminals(tree, alignment)
+        counts = {}
+        patterns = []
+        for column in zip(*[str(record.seq) for record in alignment]):
+            # skip non-informative column
+            if column.count(column[0]) == len(column):
+                continue
+            if column in counts:
+                counts[column] += 1
+            else:
+                counts[column] = 1
+                patterns.append(column)
+        self.matrix = matrix
+        self.root = tree.root
+        self.states = {}
+        if not matrix:
+            letters = sorted(set(letter for column in patterns
+                                 for letter in column))
+            # the site patterns with each weight, as bits
+            weights = {}
+            for index, column in enumerate(patterns):
+                weight = counts[column]
+                weights[weight] = weights.get(weight, 0) | 1 << index
+            self._weights = sorted(weights.items())
+            self._all = (1 << len(patterns)) - 1
+            for i, term in enumerate(terms):
+                masks = dict((letter, 0) for letter in letters)
+                for index, column in enumerate(patterns):
+                    masks[column[i]] |= 1 << index
+                self.states[term] = tuple(masks[letter] for letter in letters)
+        else:
+            inf = float('inf')
+            alphabet = matrix.names
+            length = len(alphabet)
+            self._weights = [counts[column] for column in patterns]
+            self._costs = [[matrix[m, n] for n in alphabet] for m in alphabet]
+            for i, term in enumerate(terms):
+                arrays = []
+                for column in patterns:
+                    array = [inf] * length
+                    array[alphabet.index(column[i])] = 0
+                    arrays.append(array)
+                self.states[term] = arrays
+        # bottom up calculation
+        self.parents = {}
+        self.costs = {}
+        for clade in tree.get_nonterminals(order="postorder"):
+            for child in clade.clades:
+                self.parents[child] = clade
+            self.states[clade], self.costs[clade] = self._combine(
+                self.states[clade.clades[0]], self.states[clade.clades[1]])
+        self._root_score = self._score_of(self.states[self.root])
+        self.score = sum(self.costs.values()) + self._root_score
+
+    def _combine(self, left, right):
+        """Return the states and cost of a clade from its children (PRIVATE).
+
+        For the Sankoff algorithm the cost is zero, as the score follows from
+        the states of the root clade.
+        """
+        if not self.matrix:
+            # Fitch algorithm, taking the union of the states where the
+            # intersection is empty
+            states = [x & y for x, y in zip(left, right)]
+            found = 0
+            for state in states:
+                found |= state
+            empty = self._all & ~found
+            if not empty:
+                return tuple(states), 0
+            cost = 0
+            for weight, mask in self._weights:
+                cost += weight * bin(empty & mask).count("1")
+            return (tuple(state | ((x | y) & empty)
+                          for state, x, y in zip(states, left, right)), cost)
+        # Sankoff algorithm, for each site pattern
+        arrays = []
+        for left_score, right_score in zip(left, right):
+            array = []
+            for costs in self._costs:
+                array.append(min([c + s for c, s in zip(costs, left_score)]) +
+                             min([c + s for c, s in zip(costs, right_score)]))
+            arrays.append(array)
+        return arrays, 0
+
+    def _score_of(self, root_states):
+        """Return the part of the score given by the root states (PRIVATE)."""
+        if not self.matrix:
+            return 0
+        score = 0
+        for weight, array in zip(self._weights, root_states):
+            score += weight * min(array)
+        return score
+
+    def swap_score(self, clade1, index1, clade2, index2):
+        """Return the score after swapping two children of the clades.
+
+        The child at index1 of clade1 is swapped with the child at index2 of
+        clade2, where clade2 is a child of clade1 or its sister at the root.
+        """
+        children = {clade1: clade1.clades[:2], clade2: clade2.clades[:2]}
+        children[clade1][index1], children[clade2][index2] = \
+            children[clade2][index2], children[clade1][index1]
+        if self.parents[clade2] is clade1:
+            changed = [clade2, clade1]
+        else:
+            changed = [clade1, clade2]
+        states = {}
+        score = self.score
+        for clade in changed:
+            left, right = children[clade]
+            states[clade], cost = self._combine(
+                states.get(left, self.states[left]),
+                states.get(right, self.states[right]))
+            score += cost - self.costs[clade]
+        clade = self.parents.get(clade1)
+        while clade is not None:
+            left, right = clade.clades[:2]
+            state, cost = self._combine(states.get(left, self.states[left]),
+                                        states.get(right, self.states[right]))
+            score += cost - self.costs[clade]
+            if state == self.states[clade]:
+                # nothing changes further up the tree
+                return score
+            states[clade] = state
+            clade = self.parents.get(clade)
+        return score + self._score_of(states[self.root]) - self._root_score
+
+
 class ParsimonyTreeConstructor(TreeConstructor):
     """Parsimony tree constructor.
 
@@ -0,0 +1,214 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+"""Distances between trees with the same terminals.
+
+This module compares trees by their splits, the sets of terminals below
+each branch. The Robinson-Foulds distance counts the splits found in only
+one of the two trees, the weighted Robinson-Foulds distance sums the
+absolute differences of the branch lengths of the splits (a split missing
+from a tree having a branch length of zero), and the branch score distance
+of Kuhner and Felsenstein is the square root of the sum of the squared
+differences. The trees are compared as unrooted trees unless rooted is
+True, in which case each clade is a split.
+
+The splits of each tree are calculated once, as integers with one bit per
+terminal (as in ``Bio.Phylo.Consensus``), and numbered, so comparing many
+trees only takes a few set operations per pair of trees. For example::
+
+    from Bio import Phylo
+    from Bio.Phylo.TreeDistance import distance_matrix
+    from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
+    trees = list(Phylo.parse("gene_trees.nwk", "newick"))
+    dm = distance_matrix(trees, "rf", processes=4)
+    tree_of_trees = DistanceTreeConstructor().nj(dm)
+
+"""
+
+import math
+import operator
+
+from Bio._py3k import map
+from Bio._utils import check_processes, WorkerPool
+
+from Bio.Phylo.Consensus import _clade_splits, _term_bits
+from Bio.Phylo.TreeConstruction import DistanceMatrix
+
+
+def _tree_splits(tree, term_bits, rooted):
+    """Return a dict of the splits of a tree to their branch lengths (PRIVATE).
+
+    For unrooted trees each split is given by the terminals on the side
+    without the first terminal, so the branches either side of the root
+    give the same split, with the sum of their branch lengths.
+    """
+    full = (1 << len(term_bits)) - 1
+    first = 1 << (len(term_bits) - 1)
+    splits = {}
+    # the root itself is not a split
+    for clade, split in _clade_splits(tree.root, term_bits)[1:]:
+        if not rooted and split & first:
+            split ^= full
+        if split and split != full:
+            splits[split] = splits.get(split, 0) + (clade.branch_length or 0)
+    return splits
+
+
+def _prepare(trees, rooted):
+    """Return the splits of the trees as sets and dicts of numbers (PRIVATE).
+
+    The bits of the terminals are the same for all the trees, which should
+    have the same terminal names. Each different split is then given a
+    small number, which is quicker to hash than the split itself. For each
+    tree this returns the set of its splits of more than one terminal
+    (every tree has all the others), the set of all its splits, and a dict
+    of all its splits to their branch lengths.
+    """
+    term_bits = None
+    numbers = {}
+    prepared = []
+    for tree in trees:
+        names = [term.name for term in tree.get_terminals()]
+        if term_bits is None:
+            term_bits = _term_bits(sorted(set(names)))
+            # number the splits of single terminals first
+            for bit in sorted(term_bits.values()):
+                numbers[bit] = len(numbers)
+        if len(names) != len(term_bits) or \
+                any(name not in term_bits for name in names):
+            raise ValueError("The trees should have the same terminals, "
+                             "with unique names")
+        lengths = {}
+        for split, length in _tree_splits(tree, term_bits, rooted).items():
+            number = numbers.get(split)
+            if number is None:
+                number = numbers[split] = len(numbers)
+            lengths[number] = length
+        splits = frozenset(number for number in lengths
+                           if number >= len(term_bits))
+        prepared.append((splits, frozenset(lengths), lengths))
+    return prepared
+
+
+def _robinson_foulds(splits1, splits2):
+    """Count the splits in only one of two trees (PRIVATE)."""
+    return len(splits1[0] ^ splits2[0])
+
+
+def _differences(splits1, splits2):
+    """List the branch length differences of two trees (PRIVATE).
+
+    Splits missing from one tree count as having a branch length of zero.
+    """
+    numbers1, lengths1 = splits1[1:]
+    numbers2, lengths2 = splits2[1:]
+    shared = numbers1 & numbers2
+    differences = list(map(operator.sub, map(lengths1.__getitem__, shared),
+                           map(lengths2.__getitem__, shared)))
+    # each of the other splits is in one of the trees
+    others = numbers1 ^ numbers2
+    differences.extend(map(lengths1.get, others,
+                           map(lengths2.get, others)))
+    return differences
+
+
+def _weighted_robinson_foulds(splits1, splits2):
+    """Sum the differences of the branch lengths of two trees (PRIVATE)."""
+    return float(sum(map(abs, _differences(splits1, splits2))))
+
+
+def _branch_score(splits1, splits2):
+    """Calculate the branch score distance of two trees (PRIVATE)."""
+    differences = _differences(splits1, splits2)
+    return math.sqrt(sum(map(operator.mul, differences, differences)))
+
+
+_methods = {
+    'rf': _robinson_foulds,
+    'weighted_rf': _weighted_robinson_foulds,
+    'branch_score': _branch_score,
+}
+
+
+def robinson_foulds(tree1, tree2, rooted=False):
+    """Return the Robinson-Foulds distance between two trees.
+
+    This is the number of splits (or clades, if rooted is True) found in
+    only one of the trees.
+    """
+    return _robinson_foulds(*_prepare([tree1, tree2], rooted))
+
+
+def weighted_robinson_foulds(tree1, tree2, rooted=False):
+    """Return the weighted Robinson-Foulds distance between two trees.
+
+    This is the sum of the absolute differences of the branch lengths of
+    the splits (or clades, if rooted is True) in either tree.
+    """
+    return _weighted_robinson_foulds(*_prepare([tree1, tree2], rooted))
+
+
+def branch_score(tree1, tree2, rooted=False):
+    """Return the branch score distance between two trees.
+
+    This is the square root of the sum of the squared differences of the
+    branch lengths of the splits (or clades, if rooted is True) in either
+    tree, as defined by Kuhner and Felsenstein (1994).
+    """
+    return _branch_score(*_prepare([tree1, tree2], rooted))
+
+
+def _row(index, arguments):
+    """Calculate the distances of a tree to the trees before it (PRIVATE).
+
+    This is a row of the lower triangular matrix, taking the index of the
+    tree, and the splits of all the trees and the method.
+    """
+    prepared, method = arguments
+    distance = _methods[method]
+    splits = prepared[index]
+    return [distance(splits, other) for other in prepared[:index]] + [0]
+
+
+def distance_matrix(trees, method='rf', rooted=False, names=None,
+                    processes=1):
+    """Calculate the distances between all pairs of trees.
+
+    :Parameters:
+        trees : list
+            trees with the same terminal names.
+        method : str
+            'rf' for the Robinson-Foulds distance, 'weighted_rf' for the
+            weighted Robinson-Foulds distance, or 'branch_score' for the
+            branch score distance.
+        rooted : bool
+            compare the clades of the rooted trees rather than the splits
+            of the unrooted trees.
+        names : list
+            names of the trees in the matrix. By default these are the
+            names of the trees, if all different, otherwise Tree1, Tree2
+            and so on.
+        processes : int
+            number of worker processes calculating the distances in
+            parallel (None meaning one per CPU).
+
+    :returns: a DistanceMatrix, which can be used with the
+        DistanceTreeConstructor.
+    """
+    if method not in _methods:
+        raise ValueError("Unknown method %r, expected one of: %s"
+                         % (method, ", ".join(sorted(_methods))))
+    check_processes(processes)
+    trees = list(trees)
+    if names is None:
+        names = [tree.name for tree in trees]
+        if not all(names) or len(set(names)) != len(names):
+            names = ["Tree%d" % (index + 1) for index in range(len(trees))]
+    elif len(names) != len(trees):
+        raise ValueError("Expected one name per tree")
+    prepared = _prepare(trees, rooted)
+    with WorkerPool(_row, (prepared, method), processes) as pool:
+        # the later rows are longer, so hand out a few at a time
+        rows = pool.map(range(len(prepared)), 4)
+    return DistanceMatrix(list(names), rows)
@@ -171,6 +171,30 @@ The blast-xml write function also accepts 'use_raw_query_ids' and
 writer are set to 'True'. This is because the writer is meant to mimic native
 BLAST result as much as possible.
 
+For very large BLAST XML files, Bio.SearchIO.parse_rows and
+Bio.SearchIO.parse_columns offer a low memory alternative which returns only
+the requested fields of each HSP as flat tuples (or NumPy column arrays),
+without building any QueryResult, Hit, or HSP objects. The alignment strings
+are skipped unless asked for. These also accept the 'use_raw_query_ids' and
+'use_raw_hit_ids' parameters:
+
+    >>> from Bio import SearchIO
+    >>> rows = SearchIO.parse_rows('Blast/xml_2226_blastp_004.xml', 'blast-xml',
+    ...                            fields=['hit_id', 'evalue', 'hit_start'])
+    >>> for row in rows:
+    ...     print(row)
+    ...
+    ('gi|11464971|ref|NP_062422.1|', 2.24956e-69, 3)
+    ('gi|11464971|ref|NP_062422.1|', 2.90061e-09, 245)
+    ('gi|354480464|ref|XP_003502426.1|', 3.2078e-69, 3)
+    ('gi|354480464|ref|XP_003502426.1|', 1.81272e-09, 245)
+    ('gi|156616273|ref|NP_002655.2|', 1.081e-68, 3)
+    ('gi|156616273|ref|NP_002655.2|', 1.50729e-10, 245)
+    ('gi|297667453|ref|XP_002811995.1|', 1.10449e-68, 3)
+    ('gi|297667453|ref|XP_002811995.1|', 6.1425e-10, 245)
+    ('gi|350596020|ref|XP_003360649.2|', 1.97058e-68, 3)
+    ('gi|350596020|ref|XP_003360649.2|', 1.12281e-05, 152)
+
 
 blast-tab
 =========
@@ -409,7 +433,9 @@ The blast-text parser provides the following object attributes:
 """
 
 from .blast_tab import BlastTabParser, BlastTabIndexer, BlastTabWriter
+from .blast_tab import BlastTabRowParser
 from .blast_xml import BlastXmlParser, BlastXmlIndexer, BlastXmlWriter
+from .blast_xml import BlastXmlRowParser
 from .blast_text import BlastTextParser
 
 # if not used as a module, run the doctest
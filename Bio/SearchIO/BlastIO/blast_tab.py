@@ -8,15 +8,18 @@
 """Bio.SearchIO parser for BLAST+ tab output format, with or without comments."""
 
 import re
+from itertools import chain
 
 from Bio._py3k import _as_bytes, _bytes_to_string
 from Bio._py3k import basestring
 
 from Bio.SearchIO._index import SearchIndexer
 from Bio.SearchIO._model import QueryResult, Hit, HSP, HSPFragment
+from Bio.SearchIO._rows import TabularRowParser
 
 
-__all__ = ('BlastTabIndexer', 'BlastTabParser', 'BlastTabWriter')
+__all__ = ('BlastTabIndexer', 'BlastTabParser', 'BlastTabRowParser',
+           'BlastTabWriter')
 
 
 # longname-shortname map
@@ -140,6 +143,33 @@ _DEFAULT_FIELDS = ['qseqid', 'sseqid', 'pident', 'length', 'mismatch',
 _MIN_QUERY_FIELDS = set(['qseqid', 'qacc', 'qaccver'])
 _MIN_HIT_FIELDS = set(['sseqid', 'sacc', 'saccver', 'sallseqid'])
 
+# column name to (field name, object level, attribute name) map, used by the
+# row parser which names its fields after the SearchIO attributes
+_ROW_COLUMNS = {}
+for _short, (_attr, _caster) in _COLUMN_QRESULT.items():
+    _ROW_COLUMNS[_short] = ('query_' + _attr, 'qresult', _attr)
+for _short, (_attr, _caster) in _COLUMN_HIT.items():
+    _ROW_COLUMNS[_short] = ('hit_' + _attr, 'hit', _attr)
+# avoid a clash with the hit_strand of the HSP fragment
+_ROW_COLUMNS['sstrand'] = ('subject_strand', 'hit', 'strand')
+for _short, (_attr, _caster) in _COLUMN_HSP.items():
+    _ROW_COLUMNS[_short] = (_attr, 'hsp', _attr)
+for _short, (_attr, _caster) in _COLUMN_FRAG.items():
+    _ROW_COLUMNS[_short] = (_attr, 'frag', _attr)
+_ROW_COLUMNS['qseq'] = ('query_seq', 'frag', 'query')
+_ROW_COLUMNS['sseq'] = ('hit_seq', 'frag', 'hit')
+# field name to (object level, attribute name) and field name to type maps
+_ROW_FIELD_ATTRS = {'query_strand': ('frag', 'query_strand'),
+                    'hit_strand': ('frag', 'hit_strand')}
+_ROW_FIELD_TYPES = {'query_strand': int, 'hit_strand': int}
+for _columns in (_COLUMN_QRESULT, _COLUMN_HIT, _COLUMN_HSP, _COLUMN_FRAG):
+    for _short, (_attr, _caster) in _columns.items():
+        _name, _level, _attr = _ROW_COLUMNS[_short]
+        _ROW_FIELD_ATTRS[_name] = (_level, _attr)
+        _ROW_FIELD_TYPES[_name] = _caster if _caster in (int, float) else \
+            (str if _caster is str else list)
+del _short, _attr, _caster, _name, _level, _columns
+
 # simple function to create BLAST HSP attributes that may be computed if
 # other certain attributes are present
 # This was previously implemented in the HSP objects in the old model
@@ -147,6 +177,25 @@ _MIN_HIT_FIELDS = set(['sseqid', 'sacc', 'saccver', 'sallseqid'])
 _RE_GAPOPEN = re.compile(r'\w-')
 
 
+def _prep_fields(fields):
+    """Validate and format the given fields for use by the parsers (PRIVATE)."""
+    # cast into list if fields is a space-separated string
+    if isinstance(fields, basestring):
+        fields = fields.strip().split(' ')
+    # blast allows 'std' as a proxy for the standard default lists
+    # we want to transform 'std' to its proper column names
+    if 'std' in fields:
+        idx = fields.index('std')
+        fields = fields[:idx] + _DEFAULT_FIELDS + fields[idx + 1:]
+    # if set(fields) has a null intersection with minimum required
+    # fields for hit and query, raise an exception
+    if not set(fields).intersection(_MIN_QUERY_FIELDS) or \
+            not set(fields).intersection(_MIN_HIT_FIELDS):
+        raise ValueError("Required query and/or hit ID field not found.")
+
+    return fields
+
+
 def _compute_gapopen_num(hsp):
     """Return the number of gap openings in the given HSP (PRIVATE)."""
     gapopen = 0
@@ -231,21 +280,7 @@ class BlastTabParser(object):
 
     def _prep_fields(self, fields):
         """Validate and format the given fields for use by the parser (PRIVATE)."""
-        # cast into list if fields is a space-separated string
-        if isinstance(fields, basestring):
-            fields = fields.strip().split(' ')
-        # blast allows 'std' as a proxy for the standard default lists
-        # we want to transform 'std' to its proper column names
-        if 'std' in fields:
-            idx = fields.index('std')
-            fields = fields[:idx] + _DEFAULT_FIELDS + fields[idx + 1:]
-        # if set(fields) has a null intersection with minimum required
-        # fields for hit and query, raise an exception
-        if not set(fields).intersection(_MIN_QUERY_FIELDS) or \
-                not set(fields).intersection(_MIN_HIT_FIELDS):
-            raise ValueError("Required query and/or hit ID field not found.")
-
-        return fields
+        return _prep_fields(fields)
 
     def _parse_commented_qresult(self):
         """Yield `QueryResult` objects from a commented file (PRIVATE)."""
@@ -518,6 +553,151 @@ class BlastTabParser(object):
             # else implicit None return
 
 
+class BlastTabRowParser(TabularRowParser):
+    """Fast parser for the BLAST tabular format, returning flat rows.
+
+    Rather than building QueryResult, Hit, HSP and HSPFragment objects for
+    every line, this returns one tuple per line (i.e. per HSP), holding just
+    the requested fields, in the order given. The fields are named after the
+    SearchIO attributes, e.g. qseqid becomes query_id, sseqid becomes hit_id,
+    slen becomes hit_seq_len, pident becomes ident_pct, qstart becomes
+    query_start and qseq becomes query_seq. The hit sstrand column is called
+    subject_strand. By default all the supported columns of the file are
+    returned, in the order they appear in the file, and the field names used
+    can be checked via the fields attribute.
+
+    The column layout of the file is given by the columns argument, which
+    takes the BLAST column names accepted by the fields argument of
+    BlastTabParser (or by the comment lines of a commented file). The coordinates
+    follow the SearchIO conventions (zero based, with the start always less
+    than the end), and when both the start and end of the query (or hit) are
+    present the original orientation is given in an extra query_strand (or
+    hit_strand) field. Likewise, if only the combined frames column is
+    present it is also split into query_frame and hit_frame fields.
+
+    All the lines of a commented file must use the same column layout, and
+    the information only held in the comments (such as the program version)
+    is not used.
+
+    You are expected to use this via the Bio.SearchIO.parse_rows() and
+    Bio.SearchIO.parse_columns() functions. The Bio.SearchIO.parse_columns()
+    function uses a faster path, converting a whole column at a time.
+    """
+
+    field_types = _ROW_FIELD_TYPES
+    field_attrs = _ROW_FIELD_ATTRS
+
+    def __init__(self, handle, comments=False, columns=None, fields=None):
+        """Initialize the class."""
+        if columns is None:
+            columns = _DEFAULT_FIELDS
+        self._handle = handle
+        self._comments = comments
+        line = handle.readline()
+        if comments:
+            # the column layout is given in the comment lines
+            while line.startswith('#'):
+                if line.startswith('# Fields: '):
+                    columns = self._parse_fields_line(line)
+                    break
+                line = handle.readline()
+        self._line = line
+        self._columns = _prep_fields(columns)
+
+        # work out how to convert the supported columns, and the field names
+        self._converters = []
+        names = []
+        for index, short in enumerate(self._columns):
+            if short in _ROW_COLUMNS:
+                for mapping in (_COLUMN_QRESULT, _COLUMN_HIT, _COLUMN_HSP,
+                                _COLUMN_FRAG):
+                    if short in mapping:
+                        caster = mapping[short][1]
+                self._converters.append((index, caster))
+                names.append(_ROW_COLUMNS[short][0])
+        # the frames column may be split into both frames, and the start and
+        # end coordinates are adjusted together, giving the strand (which is
+        # taken from the frame if there is one, as in the object model)
+        self._frames = []
+        if 'frames' in names:
+            for idx, seq_type in enumerate(('query', 'hit')):
+                if seq_type + '_frame' not in names:
+                    self._frames.append(idx)
+                    names.append(seq_type + '_frame')
+        self._coords = []
+        for seq_type in ('query', 'hit'):
+            start, end = seq_type + '_start', seq_type + '_end'
+            if start in names and end in names:
+                frame = seq_type + '_frame'
+                frame_idx = names.index(frame) if frame in names else None
+                self._coords.append((names.index(start), names.index(end),
+                                     frame_idx))
+                names.append(seq_type + '_strand')
+        self._names = names
+        if fields is None:
+            self.fields = tuple(names)
+        elif isinstance(fields, basestring):
+            raise TypeError("Expected a list or tuple of field names")
+        else:
+            self.fields = tuple(fields)
+        self._selected = []
+        for field in self.fields:
+            if field not in _ROW_FIELD_ATTRS:
+                raise ValueError("Unknown field %r, supported fields are %s"
+                                 % (field, ", ".join(sorted(_ROW_FIELD_ATTRS))))
+            elif field not in names:
+                raise ValueError("Field %r is not available from the "
+                                 "columns of this file" % field)
+            self._selected.append(names.index(field))
+
+    def _parse_fields_line(self, line):
+        """Return column short names from a 'Fields' comment line (PRIVATE)."""
+        long_fields = line[len('# Fields: '):].strip().split(', ')
+        return _prep_fields([_LONG_SHORT_MAP[name] for name in long_fields])
+
+    def _raw_rows(self):
+        """Return lists of column strings, one per line (PRIVATE)."""
+        if not self._line:
+            return
+        columns = self._columns
+        for line in chain([self._line], self._handle):
+            if line.startswith('#'):
+                if not self._comments:
+                    raise ValueError("Encountered unexpected character '#' "
+                                     "at the beginning of a line. Set "
+                                     "comments=True if the file is a "
+                                     "commented file.")
+                if line.startswith('# Fields: ') and \
+                        self._parse_fields_line(line) != columns:
+                    raise ValueError("All the lines must use the same "
+                                     "columns, found: %s" % line.strip())
+            elif line.strip():
+                cols = line.rstrip('\r\n').split('\t')
+                if len(cols) != len(columns):
+                    raise ValueError("Expected %i columns, found: "
+                                     "%i" % (len(columns), len(cols)))
+                yield cols
+
+    def _finish_columns(self, columns):
+        """Add the frames and strands, and adjust the coordinates (PRIVATE)."""
+        if self._frames:
+            frames = [value.split('/') for value in
+                      columns[self._names.index('frames')]]
+            for idx in self._frames:
+                columns.append([int(value[idx]) for value in frames])
+        for start_idx, end_idx, frame_idx in self._coords:
+            starts, ends = columns[start_idx], columns[end_idx]
+            if frame_idx is None:
+                columns.append([1 if start <= end else -1
+                                for start, end in zip(starts, ends)])
+            else:
+                columns.append([(frame > 0) - (frame < 0)
+                                for frame in columns[frame_idx]])
+            columns[start_idx] = [value - 1 for value in map(min, starts, ends)]
+            columns[end_idx] = list(map(max, starts, ends))
+        return [columns[index] for index in self._selected]
+
+
 class BlastTabIndexer(SearchIndexer):
     """Indexer class for BLAST+ tab output."""
 
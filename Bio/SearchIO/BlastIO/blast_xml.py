@@ -32,10 +32,11 @@ from Bio.Alphabet import generic_dna, generic_protein
 from Bio.SearchIO._index import SearchIndexer
 from Bio.SearchIO._model import QueryResult, Hit, HSP, HSPFragment
 
-from Bio._py3k import _as_bytes, _bytes_to_string, unicode
+from Bio._py3k import _as_bytes, _bytes_to_string, unicode, basestring
 _empty_bytes_string = _as_bytes("")
 
-__all__ = ('BlastXmlParser', 'BlastXmlIndexer', 'BlastXmlWriter')
+__all__ = ('BlastXmlParser', 'BlastXmlRowParser', 'BlastXmlIndexer',
+           'BlastXmlWriter')
 
 
 # element - optional qresult attribute name mapping
@@ -181,6 +182,49 @@ _DTD_OPT = (
     'Hsp_midline',
 )
 
+# field name - (element tag, caster) mappings, for the row parser
+# (the query and hit IDs and descriptions are handled separately)
+_ROW_HIT_FIELDS = {
+    'hit_accession': ('Hit_accession', str),
+    'hit_seq_len': ('Hit_len', int),
+}
+_ROW_HSP_FIELDS = {
+    'bitscore': ('Hsp_bit-score', float),
+    'bitscore_raw': ('Hsp_score', int),
+    'evalue': ('Hsp_evalue', float),
+    'ident_num': ('Hsp_identity', int),
+    'pos_num': ('Hsp_positive', int),
+    'gap_num': ('Hsp_gaps', int),
+    'density': ('Hsp_density', float),
+    'query_frame': ('Hsp_query-frame', int),
+    'hit_frame': ('Hsp_hit-frame', int),
+    'aln_span': ('Hsp_align-len', int),
+    'query_seq': ('Hsp_qseq', str),
+    'hit_seq': ('Hsp_hseq', str),
+    'similarity': ('Hsp_midline', str),
+}
+# coordinates need both the from and to tags
+_ROW_COORD_FIELDS = {
+    'query_start': ('Hsp_query-from', 'Hsp_query-to', min),
+    'query_end': ('Hsp_query-from', 'Hsp_query-to', max),
+    'hit_start': ('Hsp_hit-from', 'Hsp_hit-to', min),
+    'hit_end': ('Hsp_hit-from', 'Hsp_hit-to', max),
+    'pattern_start': ('Hsp_pattern-from', 'Hsp_pattern-to', min),
+    'pattern_end': ('Hsp_pattern-from', 'Hsp_pattern-to', max),
+}
+_ROW_FIELD_TYPES = {
+    'query_id': str,
+    'query_description': str,
+    'query_seq_len': int,
+    'hit_id': str,
+    'hit_description': str,
+}
+_ROW_FIELD_TYPES.update((k, v[1]) for k, v in _ROW_HIT_FIELDS.items())
+_ROW_FIELD_TYPES.update((k, v[1]) for k, v in _ROW_HSP_FIELDS.items())
+_ROW_FIELD_TYPES.update((k, int) for k in _ROW_COORD_FIELDS)
+_ROW_DEFAULT_FIELDS = ('query_id', 'hit_id', 'evalue', 'bitscore',
+                       'query_start', 'query_end', 'hit_start', 'hit_end')
+
 # compile RE patterns
 # for capturing BLAST version
 _RE_VERSION = re.compile(r'\d+\.\d+\.\d+\+?')
@@ -544,6 +588,203 @@ class BlastXmlParser(object):
             yield hsp
 
 
+class BlastXmlRowParser(object):
+    """Low memory parser for the BLAST XML format, returning flat rows.
+
+    Rather than building QueryResult, Hit and HSP objects, this returns one
+    tuple per HSP holding just the requested fields, in the order given.
+    The available field names follow the attribute names of the SearchIO
+    object model:
+
+     - query_id, query_description, query_seq_len
+     - hit_id, hit_description, hit_accession, hit_seq_len
+     - bitscore, bitscore_raw, evalue, ident_num, pos_num, gap_num, density
+     - query_start, query_end, hit_start, hit_end, pattern_start,
+       pattern_end (zero based, Python style coordinates)
+     - query_frame, hit_frame, aln_span
+     - query_seq, hit_seq, similarity (the alignment strings)
+
+    Missing optional values are returned as None.  The default fields are
+    query_id, hit_id, evalue, bitscore, query_start, query_end, hit_start
+    and hit_end.
+
+    Each XML element is cleared as soon as it has been processed (including
+    the finished queries and hits), so memory use does not grow with the
+    size of the file.  Unless requested, the alignment strings are discarded
+    without being converted.
+
+    You are expected to use this via the Bio.SearchIO.parse_rows() and
+    Bio.SearchIO.parse_columns() functions.
+    """
+
+    field_types = _ROW_FIELD_TYPES
+
+    def __init__(self, handle, fields=None, use_raw_query_ids=False,
+                 use_raw_hit_ids=False):
+        """Initialize the class."""
+        if fields is None:
+            fields = _ROW_DEFAULT_FIELDS
+        elif isinstance(fields, basestring):
+            raise TypeError("Expected a list or tuple of field names")
+        self.fields = tuple(fields)
+        for field in self.fields:
+            if field not in self.field_types:
+                raise ValueError("Unknown field %r, supported fields are %s"
+                                 % (field, ", ".join(sorted(self.field_types))))
+        self._handle = handle
+        self._use_raw_query_ids = use_raw_query_ids
+        self._use_raw_hit_ids = use_raw_hit_ids
+        # how to get each field, worked out once rather than for every row
+        self._getters = []
+        for field in self.fields:
+            if field in _ROW_HSP_FIELDS:
+                self._getters.append(('hsp',) + _ROW_HSP_FIELDS[field])
+            elif field in _ROW_COORD_FIELDS:
+                self._getters.append(('coord',) + _ROW_COORD_FIELDS[field])
+            elif field.startswith('hit_'):
+                self._getters.append(('hit', field, None))
+            else:
+                self._getters.append(('query', field, None))
+
+    def __iter__(self):
+        """Iterate over the HSPs in the file, yielding tuples."""
+        # only the values for these HSP level tags are kept
+        hsp_tags = set()
+        for getter in self._getters:
+            if getter[0] == 'hsp':
+                hsp_tags.add(getter[1])
+            elif getter[0] == 'coord':
+                hsp_tags.update(getter[1:3])
+        hit_tags = set(['Hit_id', 'Hit_def', 'Hit_accession', 'Hit_len'])
+        query_tags = set(['Iteration_query-ID', 'Iteration_query-def',
+                          'Iteration_query-len'])
+
+        fallback = {}
+        query = {}
+        hit = {}
+        hsp = {}
+        qvalues = hvalues = None
+        seen_hit_ids = set()
+        iterations = hits = None
+
+        for event, elem in ElementTree.iterparse(self._handle,
+                                                 events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == 'Hit_hsps':
+                    hvalues = self._hit_values(hit, seen_hit_ids,
+                                               qvalues['query_id'])
+                elif tag == 'Iteration_hits':
+                    hits = elem
+                    qvalues = self._query_values(query, fallback)
+                    seen_hit_ids = set()
+                elif tag == 'BlastOutput_iterations':
+                    iterations = elem
+                continue
+
+            # end events, in decreasing order of frequency
+            if tag.startswith('Hsp_'):
+                if tag in hsp_tags:
+                    hsp[tag] = elem.text
+            elif tag == 'Hsp':
+                yield self._row(qvalues, hvalues, hsp)
+                hsp = {}
+                elem.clear()
+            elif tag in hit_tags:
+                hit[tag] = elem.text
+            elif tag == 'Hit':
+                hit = {}
+                # drop this (and any earlier) finished hit from the tree
+                hits.clear()
+            elif tag in query_tags:
+                query[tag] = elem.text
+            elif tag == 'Iteration':
+                query = {}
+                elem.clear()
+                if iterations is not None:
+                    iterations.clear()
+            elif tag in _ELEM_QRESULT_FALLBACK:
+                fallback[_ELEM_QRESULT_FALLBACK[tag][0]] = elem.text
+                elem.clear()
+
+    def _query_values(self, query, fallback):
+        """Return a dictionary of the query level fields (PRIVATE)."""
+        # assign query attributes with fallbacks, as in BlastXmlParser
+        query_id = query.get('Iteration_query-ID', fallback.get('id'))
+        query_desc = query.get('Iteration_query-def',
+                               fallback.get('description'))
+        query_len = query.get('Iteration_query-len', fallback.get('len'))
+        if not self._use_raw_query_ids and \
+                (query_id.startswith('Query_') or query_id.startswith('lcl|')):
+            id_desc = query_desc.split(' ', 1)
+            query_id = id_desc[0]
+            try:
+                query_desc = id_desc[1]
+            except IndexError:
+                query_desc = ''
+        return {'query_id': query_id,
+                'query_description': query_desc,
+                'query_seq_len': int(query_len)}
+
+    def _hit_values(self, hit, seen_hit_ids, query_id):
+        """Return a dictionary of the hit level fields (PRIVATE)."""
+        raw_hit_id = hit['Hit_id']
+        raw_hit_desc = hit['Hit_def']
+        if not self._use_raw_hit_ids:
+            ids, descs, blast_hit_id = _extract_ids_and_descs(raw_hit_id,
+                                                              raw_hit_desc)
+        else:
+            ids, descs, blast_hit_id = [raw_hit_id], [raw_hit_desc], raw_hit_id
+        hit_id = ids[0]
+        hit_desc = descs[0]
+        if hit_id in seen_hit_ids:
+            # same fallback to the BLAST-generated ID as in BlastXmlParser
+            warnings.warn("Renaming hit ID %r to a BLAST-generated ID "
+                          "%r since the ID was already matched "
+                          "by your query %r. Your BLAST database "
+                          "may contain duplicate entries." %
+                          (hit_id, blast_hit_id, query_id),
+                          BiopythonParserWarning)
+            hit_desc = '%s %s' % (hit_id, hit_desc)
+            hit_id = blast_hit_id
+        else:
+            seen_hit_ids.add(hit_id)
+        values = {'hit_id': hit_id, 'hit_description': hit_desc}
+        for field, (tag, caster) in _ROW_HIT_FIELDS.items():
+            value = hit.get(tag)
+            if value is not None and caster is not str:
+                value = caster(value)
+            values[field] = value
+        return values
+
+    def _row(self, qvalues, hvalues, hsp):
+        """Return the tuple of requested fields for one HSP (PRIVATE)."""
+        row = []
+        for getter in self._getters:
+            kind = getter[0]
+            if kind == 'hsp':
+                value = hsp.get(getter[1])
+                if value is not None and getter[2] is not str:
+                    value = getter[2](value)
+            elif kind == 'coord':
+                try:
+                    coords = int(hsp[getter[1]]), int(hsp[getter[2]])
+                except KeyError:
+                    value = None
+                else:
+                    # convert to python range
+                    if getter[3] is min:
+                        value = min(coords) - 1
+                    else:
+                        value = max(coords)
+            elif kind == 'hit':
+                value = hvalues[getter[1]]
+            else:
+                value = qvalues[getter[1]]
+            row.append(value)
+        return tuple(row)
+
+
 class BlastXmlIndexer(SearchIndexer):
     """Indexer class for BLAST XML output."""
 
@@ -11,17 +11,56 @@ from Bio.Alphabet import generic_protein
 from Bio.SearchIO._model import QueryResult, Hit, HSP, HSPFragment
 
 from .hmmer3_tab import Hmmer3TabParser, Hmmer3TabIndexer
+from .hmmer3_tab import Hmmer3TabRowParser
 
 __all__ = (
     'Hmmer3DomtabHmmhitParser',
     'Hmmer3DomtabHmmqueryParser',
     'Hmmer3DomtabHmmhitIndexer',
     'Hmmer3DomtabHmmqueryIndexer',
+    'Hmmer3DomtabHmmhitRowParser',
+    'Hmmer3DomtabHmmqueryRowParser',
     'Hmmer3DomtabHmmhitWriter',
     'Hmmer3DomtabHmmqueryWriter',
 )
 
 
+def _domtab_row_fields(hmm_as_hit):
+    """Return the row parser fields, given the HMM coordinates type (PRIVATE).
+
+    Like the _TAB_ROW_FIELDS of the hmmer3-tab row parser, each field is
+    given as (field name, column index, type, object level, attribute name).
+    """
+    if hmm_as_hit:
+        hmm, ali = 'hit', 'query'
+    else:
+        hmm, ali = 'query', 'hit'
+    return (
+        ('hit_id', 0, str, 'hit', 'id'),
+        ('hit_accession', 1, str, 'hit', 'accession'),
+        ('hit_seq_len', 2, int, 'hit', 'seq_len'),
+        ('query_id', 3, str, 'qresult', 'id'),
+        ('query_accession', 4, str, 'qresult', 'accession'),
+        ('query_seq_len', 5, int, 'qresult', 'seq_len'),
+        ('hit_evalue', 6, float, 'hit', 'evalue'),
+        ('hit_bitscore', 7, float, 'hit', 'bitscore'),
+        ('hit_bias', 8, float, 'hit', 'bias'),
+        ('domain_index', 9, int, 'hsp', 'domain_index'),
+        ('evalue_cond', 11, float, 'hsp', 'evalue_cond'),
+        ('evalue', 12, float, 'hsp', 'evalue'),
+        ('bitscore', 13, float, 'hsp', 'bitscore'),
+        ('bias', 14, float, 'hsp', 'bias'),
+        (hmm + '_start', 15, int, 'frag', hmm + '_start'),
+        (hmm + '_end', 16, int, 'frag', hmm + '_end'),
+        (ali + '_start', 17, int, 'frag', ali + '_start'),
+        (ali + '_end', 18, int, 'frag', ali + '_end'),
+        ('env_start', 19, int, 'hsp', 'env_start'),
+        ('env_end', 20, int, 'hsp', 'env_end'),
+        ('acc_avg', 21, float, 'hsp', 'acc_avg'),
+        ('hit_description', 22, str, 'hit', 'description'),
+    )
+
+
 class Hmmer3DomtabParser(Hmmer3TabParser):
     """Base hmmer3-domtab iterator."""
 
@@ -180,6 +219,48 @@ class Hmmer3DomtabHmmqueryParser(Hmmer3DomtabParser):
     hmm_as_hit = False
 
 
+class Hmmer3DomtabHmmhitRowParser(Hmmer3TabRowParser):
+    """Fast HMMER domain table parser using hit coordinates, returning rows.
+
+    Rather than building QueryResult, Hit, HSP and HSPFragment objects for
+    every line, this returns one tuple per line (i.e. per domain) holding
+    just the requested fields, in the order given. The field names follow
+    the SearchIO attributes, with the full sequence values prefixed by hit_:
+
+     - query_id, query_accession, query_seq_len
+     - hit_id, hit_accession, hit_seq_len, hit_description
+     - hit_evalue, hit_bitscore, hit_bias (full sequence)
+     - domain_index, evalue_cond, evalue, bitscore, bias, acc_avg
+     - hit_start, hit_end (HMM coordinates), query_start, query_end
+       (alignment coordinates), env_start, env_end
+
+    The coordinates are zero based, as elsewhere in SearchIO. By default
+    all the fields are returned, in the column order of the file.
+
+    You are expected to use this via the Bio.SearchIO.parse_rows() and
+    Bio.SearchIO.parse_columns() functions.
+    """
+
+    _row_fields = _domtab_row_fields(True)
+    _num_columns = 23
+    field_types = dict((spec[0], spec[2]) for spec in _row_fields)
+    field_attrs = dict((spec[0], spec[3:]) for spec in _row_fields)
+
+
+class Hmmer3DomtabHmmqueryRowParser(Hmmer3TabRowParser):
+    """Fast HMMER domain table parser using query coordinates, returning rows.
+
+    As Hmmer3DomtabHmmhitRowParser, but the HMM profile coordinates are
+    given as query_start and query_end, and the alignment coordinates as
+    hit_start and hit_end.
+    """
+
+    _row_fields = _domtab_row_fields(False)
+    _num_columns = 23
+    field_types = dict((spec[0], spec[2]) for spec in _row_fields)
+    field_attrs = dict((spec[0], spec[3:]) for spec in _row_fields)
+
+
 class Hmmer3DomtabHmmhitIndexer(Hmmer3TabIndexer):
     """HMMER domain table indexer using hit coordinates.
 
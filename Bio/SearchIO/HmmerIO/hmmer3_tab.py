@@ -8,12 +8,40 @@
 from itertools import chain
 
 from Bio._py3k import _as_bytes, _bytes_to_string
+from Bio._py3k import basestring
 from Bio.Alphabet import generic_protein
 from Bio.SearchIO._index import SearchIndexer
 from Bio.SearchIO._model import QueryResult, Hit, HSP, HSPFragment
-
-
-__all__ = ('Hmmer3TabParser', 'Hmmer3TabIndexer', 'Hmmer3TabWriter')
+from Bio.SearchIO._rows import TabularRowParser
+
+
+__all__ = ('Hmmer3TabParser', 'Hmmer3TabIndexer', 'Hmmer3TabRowParser',
+           'Hmmer3TabWriter')
+
+
+# fields of the row parser, as (field name, column index, type, object level,
+# attribute name), in the order of the columns
+_TAB_ROW_FIELDS = (
+    ('hit_id', 0, str, 'hit', 'id'),
+    ('hit_accession', 1, str, 'hit', 'accession'),
+    ('query_id', 2, str, 'qresult', 'id'),
+    ('query_accession', 3, str, 'qresult', 'accession'),
+    ('hit_evalue', 4, float, 'hit', 'evalue'),
+    ('hit_bitscore', 5, float, 'hit', 'bitscore'),
+    ('hit_bias', 6, float, 'hit', 'bias'),
+    ('evalue', 7, float, 'hsp', 'evalue'),
+    ('bitscore', 8, float, 'hsp', 'bitscore'),
+    ('bias', 9, float, 'hsp', 'bias'),
+    ('hit_domain_exp_num', 10, float, 'hit', 'domain_exp_num'),
+    ('hit_region_num', 11, int, 'hit', 'region_num'),
+    ('hit_cluster_num', 12, int, 'hit', 'cluster_num'),
+    ('hit_overlap_num', 13, int, 'hit', 'overlap_num'),
+    ('hit_env_num', 14, int, 'hit', 'env_num'),
+    ('hit_domain_obs_num', 15, int, 'hit', 'domain_obs_num'),
+    ('hit_domain_reported_num', 16, int, 'hit', 'domain_reported_num'),
+    ('hit_domain_included_num', 17, int, 'hit', 'domain_included_num'),
+    ('hit_description', 18, str, 'hit', 'description'),
+)
 
 
 class Hmmer3TabParser(object):
@@ -147,6 +175,81 @@ class Hmmer3TabParser(object):
             self.line = self.handle.readline()
 
 
+class Hmmer3TabRowParser(TabularRowParser):
+    """Fast parser for the HMMER table format, returning flat rows.
+
+    Rather than building QueryResult, Hit, HSP and HSPFragment objects for
+    every line, this returns one tuple per line holding just the requested
+    fields, in the order given. The field names follow the SearchIO
+    attributes, with the full sequence values prefixed by hit_ and the best
+    domain values used for the HSP:
+
+     - query_id, query_accession
+     - hit_id, hit_accession, hit_description
+     - hit_evalue, hit_bitscore, hit_bias (full sequence)
+     - evalue, bitscore, bias (best 1 domain)
+     - hit_domain_exp_num, hit_region_num, hit_cluster_num, hit_overlap_num,
+       hit_env_num, hit_domain_obs_num, hit_domain_reported_num,
+       hit_domain_included_num
+
+    By default all the fields are returned, in the column order of the file.
+
+    You are expected to use this via the Bio.SearchIO.parse_rows() and
+    Bio.SearchIO.parse_columns() functions.
+    """
+
+    _row_fields = _TAB_ROW_FIELDS
+    _num_columns = 19
+    field_types = dict((spec[0], spec[2]) for spec in _TAB_ROW_FIELDS)
+    field_attrs = dict((spec[0], spec[3:]) for spec in _TAB_ROW_FIELDS)
+    fixed_frag_attrs = {'query_strand': 0, 'hit_strand': 0,
+                        'alphabet': generic_protein}
+
+    def __init__(self, handle, fields=None):
+        """Initialize the class."""
+        specs = dict((spec[0], spec) for spec in self._row_fields)
+        if fields is None:
+            fields = [spec[0] for spec in self._row_fields]
+        elif isinstance(fields, basestring):
+            raise TypeError("Expected a list or tuple of field names")
+        self.fields = tuple(fields)
+        self._converters = []
+        for field in self.fields:
+            try:
+                name, index, caster = specs[field][:3]
+            except KeyError:
+                raise ValueError("Unknown field %r, supported fields are %s"
+                                 % (field, ", ".join(sorted(specs))))
+            if name.endswith('_start'):
+                # zero based start coordinates
+                caster = _zero_based
+            self._converters.append((index, caster))
+        self._handle = handle
+
+    def _raw_rows(self):
+        """Return lists of column strings, one per line (PRIVATE)."""
+        num_columns = self._num_columns
+        for line in self._handle:
+            # skip the header and the footer added by HMMER 3.1
+            if line.startswith('#') or not line.strip():
+                continue
+            cols = line.split(None, num_columns - 1)
+            if len(cols) == num_columns:
+                # the description may contain spaces
+                cols[-1] = ' '.join(cols[-1].split())
+            elif len(cols) == num_columns - 1:
+                cols.append('')
+            else:
+                raise ValueError("Expected %i columns, found: %i"
+                                 % (num_columns, len(cols)))
+            yield cols
+
+
+def _zero_based(value):
+    """Return a one based start coordinate string as a zero based int (PRIVATE)."""
+    return int(value) - 1
+
+
 class Hmmer3TabIndexer(SearchIndexer):
     """Indexer class for HMMER table output."""
 
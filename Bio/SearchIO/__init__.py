@@ -199,11 +199,14 @@ of the format's documentation.
 from __future__ import print_function
 from Bio._py3k import basestring
 
+import functools
 import sys
 from collections import OrderedDict
 
+from Bio._utils import check_processes
 from Bio.File import as_handle
 from Bio.SearchIO._model import QueryResult, Hit, HSP, HSPFragment
+from Bio.SearchIO._rows import build_qresults, chunked, value_array
 from Bio.SearchIO._utils import get_processor
 
 
@@ -214,7 +217,9 @@ else:
     _dict = dict
 
 
-__all__ = ('read', 'parse', 'to_dict', 'index', 'index_db', 'write', 'convert')
+__all__ = ('read', 'parse', 'parse_rows', 'parse_columns',
+           'columns_to_qresults', 'to_dict', 'index', 'index_db', 'write',
+           'convert')
 
 
 # dictionary of supported formats for parse() and read()
@@ -240,6 +245,16 @@ _ITERATOR_MAP = {
         'phmmer3-domtab': ('HmmerIO', 'Hmmer3DomtabHmmqueryParser'),
 }
 
+# dictionary of supported formats for parse_rows() and parse_columns()
+_ROW_ITERATOR_MAP = {
+        'blast-tab': ('BlastIO', 'BlastTabRowParser'),
+        'blast-xml': ('BlastIO', 'BlastXmlRowParser'),
+        'hmmer3-tab': ('HmmerIO', 'Hmmer3TabRowParser'),
+        'hmmscan3-domtab': ('HmmerIO', 'Hmmer3DomtabHmmhitRowParser'),
+        'hmmsearch3-domtab': ('HmmerIO', 'Hmmer3DomtabHmmqueryRowParser'),
+        'phmmer3-domtab': ('HmmerIO', 'Hmmer3DomtabHmmqueryRowParser'),
+}
+
 # dictionary of supported formats for index()
 _INDEXER_MAP = {
         'blast-tab': ('BlastIO', 'BlastTabIndexer'),
@@ -321,6 +336,166 @@ def parse(handle, format=None, **kwargs):
             yield qresult
 
 
+def parse_rows(handle, format=None, fields=None, **kwargs):
+    """Iterate over search tool output file as one flat tuple per HSP.
+
+    Arguments:
+     - handle - Handle to the file, or the filename as a string.
+     - format - Lower case string denoting one of the supported formats.
+     - fields - List or tuple of the field names wanted in each row, which
+       follow the SearchIO attribute names (e.g. query_id, hit_id, evalue,
+       bitscore, query_start, query_end, hit_start, hit_end). The default
+       and available fields depend on the format.
+     - kwargs - Format-specific keyword arguments (e.g. columns and comments
+       for blast-tab).
+
+    This is a low memory alternative to `parse` for very large files, which
+    does not build any QueryResult, Hit or HSP objects:
+
+    >>> from Bio import SearchIO
+    >>> rows = SearchIO.parse_rows('Blast/mirna.xml', 'blast-xml',
+    ...                            fields=['query_id', 'hit_id', 'evalue'])
+    >>> for row in rows:
+    ...     print(row)
+    ...     break
+    ...
+    ('33211', 'gi|262205317|ref|NR_030195.1|', 4.91151e-23)
+
+    Coordinates follow the SearchIO conventions (zero based, with the start
+    always less than the end). Missing optional values are given as None.
+
+    The supported formats are blast-xml, blast-tab, hmmer3-tab and the
+    hmmer3-domtab variants. The column layout of a blast-tab file, given by
+    the fields argument of `parse`, is instead given by the columns keyword
+    argument here:
+
+    >>> rows = SearchIO.parse_rows('Blast/tab_2226_tblastn_009.txt',
+    ...                            'blast-tab', columns=['qseqid', 'sseqid'],
+    ...                            fields=['hit_id', 'query_id'])
+    >>> print(next(rows))
+    ('gi|145479850|ref|XM_001425911.1|', 'gi|16080617|ref|NP_391444.1|')
+    """
+    # get the iterator object and do error checking
+    iterator = get_processor(format, _ROW_ITERATOR_MAP)
+
+    # HACK: force BLAST XML decoding to use utf-8
+    handle_kwargs = {}
+    if format == 'blast-xml' and sys.version_info[0] > 2:
+        handle_kwargs['encoding'] = 'utf-8'
+
+    with as_handle(handle, 'rU', **handle_kwargs) as source_file:
+        generator = iterator(source_file, fields=fields, **kwargs)
+
+        for row in generator:
+            yield row
+
+
+def parse_columns(handle, format=None, fields=None, chunk_size=None,
+                  **kwargs):
+    """Iterate over search tool output file as NumPy column arrays.
+
+    Arguments:
+     - handle - Handle to the file, or the filename as a string.
+     - format - Lower case string denoting one of the supported formats.
+     - fields - List or tuple of the field names wanted, as for `parse_rows`.
+     - chunk_size - Optional maximum number of HSPs in each chunk.
+     - kwargs - Format-specific keyword arguments.
+
+    This returns dictionaries mapping each field name to a NumPy array, with
+    one entry per HSP. Integer and float fields use NumPy integer and float
+    arrays, while string fields (and any field with missing values) use
+    object arrays. If chunk_size is omitted a single dictionary holding all
+    the HSPs in the file is returned, otherwise the file is returned in
+    chunks of at most chunk_size HSPs, allowing very large files to be
+    processed with bounded memory. For example::
+
+        from Bio import SearchIO
+        for chunk in SearchIO.parse_columns("big.xml", "blast-xml",
+                                            fields=["hit_id", "evalue"],
+                                            chunk_size=100000):
+            good_hits = chunk["hit_id"][chunk["evalue"] < 1e-10]
+
+    """
+    try:
+        import numpy
+    except ImportError:
+        from Bio import MissingPythonDependencyError
+        raise MissingPythonDependencyError(
+            "Please install NumPy if you want to use "
+            "Bio.SearchIO.parse_columns(). See http://www.numpy.org/")
+
+    if chunk_size is not None and \
+            (not isinstance(chunk_size, int) or chunk_size < 1):
+        raise ValueError("chunk_size should be a positive integer")
+
+    iterator = get_processor(format, _ROW_ITERATOR_MAP)
+
+    # HACK: force BLAST XML decoding to use utf-8
+    handle_kwargs = {}
+    if format == 'blast-xml' and sys.version_info[0] > 2:
+        handle_kwargs['encoding'] = 'utf-8'
+
+    with as_handle(handle, 'rU', **handle_kwargs) as source_file:
+        generator = iterator(source_file, fields=fields, **kwargs)
+        fields = generator.fields
+        field_types = generator.field_types
+
+        if hasattr(generator, '_column_chunks'):
+            # tabular formats can convert a whole column at a time
+            for chunk in generator._column_chunks(chunk_size):
+                yield chunk
+            return
+        for rows in chunked(generator, chunk_size):
+            if rows:
+                columns = list(zip(*rows))
+            else:
+                columns = [()] * len(fields)
+            yield dict((field, value_array(list(column), field_types[field]))
+                       for field, column in zip(fields, columns))
+
+
+def columns_to_qresults(columns, format=None):
+    """Build QueryResult objects from the output of parse_columns, on demand.
+
+    Arguments:
+     - columns - Dictionary of NumPy arrays from `parse_columns`, or an
+       iterable of such dictionaries (e.g. the chunks themselves).
+     - format - Lower case string denoting the format the columns came from.
+
+    This is a generator function, so the QueryResult objects (and their Hit,
+    HSP and HSPFragment objects) are only built as they are needed. This
+    means you can use the fast column based parsing to select the HSPs you
+    are interested in, and only then use the full object model for them::
+
+        from Bio import SearchIO
+        for chunk in SearchIO.parse_columns("big.tab", "blast-tab",
+                                            chunk_size=100000):
+            wanted = chunk["evalue"] < 1e-50
+            chunk = dict((k, v[wanted]) for k, v in chunk.items())
+            for qresult in SearchIO.columns_to_qresults(chunk, "blast-tab"):
+                ...
+
+    As with the tabular format parsers, consecutive HSPs with the same query
+    ID are grouped into one QueryResult. When given an iterable of chunks,
+    a query may continue from one chunk into the next. Only the values held
+    in the columns are used, so for example the comments of a commented
+    BLAST tabular file are not included.
+
+    This is supported for the tabular formats (blast-tab, hmmer3-tab and
+    the hmmer3-domtab variants), and needs the query and hit ID fields.
+    """
+    iterator = get_processor(format, _ROW_ITERATOR_MAP)
+    field_attrs = getattr(iterator, 'field_attrs', None)
+    if field_attrs is None:
+        raise ValueError("Building QueryResult objects from columns is not "
+                         "supported for format %r" % format)
+    if isinstance(columns, dict):
+        columns = [columns]
+    for qresult in build_qresults(columns, field_attrs,
+                                  iterator.fixed_frag_attrs):
+        yield qresult
+
+
 def read(handle, format=None, **kwargs):
     """Turn a search output file containing one query into a single QueryResult.
 
@@ -503,7 +678,7 @@ def index(filename, format=None, key_function=None, **kwargs):
 
 
 def index_db(index_filename, filenames=None, format=None,
-             key_function=None, **kwargs):
+             key_function=None, processes=1, update=False, **kwargs):
     """Indexes several search output files into an SQLite database.
 
      - index_filename - The SQLite filename.
@@ -515,6 +690,12 @@ def index_db(index_filename, filenames=None, format=None,
      - key_function - Optional callback function which when given a
                       QueryResult identifier string should return a unique
                       key for the dictionary.
+     - processes    - Number of worker processes used to scan the files when
+                      building (or updating) the index, default 1. Use None
+                      for one per CPU.
+     - update       - If the index file already exists, update it rather than
+                      just reloading it, scanning only new files and those
+                      whose size or modification time have changed.
      - kwargs       - Format-specific keyword arguments.
 
     The `index_db` function is similar to `index` in that it indexes the start
@@ -553,6 +734,11 @@ def index_db(index_filename, filenames=None, format=None,
     on a cluster. You could use `index_db` to index the ten BLAST output
     files together for seamless access to all the results as one dictionary.
 
+    With many files, they can be scanned in parallel by a pool of worker
+    processes (e.g. ``processes=8``), and as the output of further jobs
+    arrives, ``update=True`` will add just the new (or changed) files to an
+    existing index. See `Bio.SeqIO.index_db` for an example.
+
     Note that ':memory:' rather than an index filename tells SQLite to hold
     the index database in memory. This is useful for quick tests, but using
     the Bio.SearchIO.index(...) function instead would use less memory.
@@ -567,21 +753,27 @@ def index_db(index_filename, filenames=None, format=None,
     # (can we check if it's a string or a generator?)
     if isinstance(filenames, basestring):
         filenames = [filenames]
+    check_processes(processes)
 
     from Bio.File import _SQLiteManySeqFilesDict
     repr = ("SearchIO.index_db(%r, filenames=%r, format=%r, key_function=%r, ...)"
             % (index_filename, filenames, format, key_function))
 
-    def proxy_factory(format, filename=None):
-        """Given a filename returns proxy object, else boolean if format OK."""
-        if filename:
-            return get_processor(format, _INDEXER_MAP)(filename, **kwargs)
-        else:
-            return format in _INDEXER_MAP
+    # Bind the parser keyword arguments (see Bio.File on pickling)
+    proxy_factory = functools.partial(_index_db_proxy_factory, kwargs)
 
     return _SQLiteManySeqFilesDict(index_filename, filenames,
                                    proxy_factory, format,
-                                   key_function, repr)
+                                   key_function, repr,
+                                   processes=processes, update=update)
+
+
+def _index_db_proxy_factory(kwargs, format, filename=None):
+    """Given a filename returns proxy object, else boolean if format OK (PRIVATE)."""
+    if filename:
+        return get_processor(format, _INDEXER_MAP)(filename, **kwargs)
+    else:
+        return format in _INDEXER_MAP
 
 
 def write(qresults, handle, format=None, **kwargs):
@@ -0,0 +1,198 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Flat row and column parsing of search output, without the object model.
+
+These are the shared pieces behind Bio.SearchIO.parse_rows(),
+Bio.SearchIO.parse_columns() and Bio.SearchIO.columns_to_qresults().
+"""
+
+from itertools import islice
+
+from Bio.SearchIO._model import QueryResult, Hit, HSP, HSPFragment
+
+
+def chunked(iterable, chunk_size):
+    """Yield lists of at most chunk_size items from the iterable (PRIVATE).
+
+    If chunk_size is None a single list holding everything is returned,
+    even if it is empty.
+    """
+    iterator = iter(iterable)
+    if chunk_size is None:
+        yield list(iterator)
+        return
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def value_array(values, field_type):
+    """Return a NumPy array holding the list of values (PRIVATE).
+
+    Integer and float fields become NumPy integer and float arrays, unless
+    there are missing values (None) in which case an object array is used,
+    as is done for strings and lists.
+    """
+    import numpy
+
+    if None not in values:
+        if field_type is int:
+            return numpy.array(values, dtype=numpy.int64)
+        elif field_type is float:
+            return numpy.array(values, dtype=numpy.float64)
+    array = numpy.empty(len(values), dtype=object)
+    if field_type is list:
+        # assigning a list of lists to a slice would try to broadcast
+        for index, value in enumerate(values):
+            array[index] = value
+    else:
+        array[:] = values
+    return array
+
+
+class TabularRowParser(object):
+    """Base class for the row parsers of line based tabular formats (PRIVATE).
+
+    Each line of a tabular format holds a single HSP, so rather than parsing
+    one line at a time the lines are split into string columns and read in
+    chunks, converting each column with a single call to map.
+
+    Subclasses should define the fields, field_types and field_attrs
+    attributes, the _converters list of (column index, converter function)
+    pairs (one per field, str meaning no conversion is needed) and the
+    _raw_rows method returning lists of strings (one per line). They may
+    also override the _finish_columns method to adjust the converted column
+    lists, or add further columns computed from them.
+    """
+
+    #: extra attributes set on every HSPFragment by columns_to_qresults
+    fixed_frag_attrs = {}
+    #: number of lines converted at a time when returning rows
+    _chunk_size = 1000
+
+    def _raw_rows(self):
+        """Return lists of strings, one per line (PRIVATE)."""
+        raise NotImplementedError("Subclass should implement this")
+
+    def _finish_columns(self, columns):
+        """Adjust the converted column lists (PRIVATE)."""
+        return columns
+
+    def _convert(self, lines):
+        """Return the converted column lists for a list of lines (PRIVATE)."""
+        if lines:
+            values = list(zip(*lines))
+        else:
+            values = [()] * (max([0] + [i for i, c in self._converters]) + 1)
+        columns = []
+        for index, converter in self._converters:
+            if converter is str:
+                columns.append(list(values[index]))
+            else:
+                columns.append(list(map(converter, values[index])))
+        return self._finish_columns(columns)
+
+    def __iter__(self):
+        """Iterate over the HSPs in the file, yielding tuples."""
+        for lines in chunked(self._raw_rows(), self._chunk_size):
+            for row in zip(*self._convert(lines)):
+                yield row
+
+    def _column_chunks(self, chunk_size=None):
+        """Iterate over the file as dictionaries of NumPy arrays (PRIVATE)."""
+        field_types = self.field_types
+        for lines in chunked(self._raw_rows(), chunk_size):
+            columns = self._convert(lines)
+            yield dict((field, value_array(column, field_types[field]))
+                       for field, column in zip(self.fields, columns))
+
+
+def _get_id(values):
+    """Return the ID for a QueryResult or Hit from its values (PRIVATE)."""
+    # same fallbacks as used in the BLAST tabular parser
+    if values.get('id') is not None:
+        return values['id']
+    elif values.get('id_all'):
+        return values['id_all'][0]
+    elif values.get('accession') is not None:
+        return values['accession']
+    return values.get('accession_version')
+
+
+def build_qresults(chunks, field_attrs, fixed_frag_attrs):
+    """Yield QueryResult objects from dictionaries of columns (PRIVATE).
+
+    The rows are grouped into QueryResult and Hit objects in the same way as
+    the tabular format parsers do, with consecutive rows sharing the same
+    query (or hit) ID belonging to the same QueryResult (or Hit). A query
+    may continue from one chunk into the next.
+    """
+    qid = None
+    qvalues = None
+    hits = []
+    hid = None
+    hvalues = None
+    hsps = []
+    for chunk in chunks:
+        fields = list(chunk)
+        try:
+            attrs = [field_attrs[field] for field in fields]
+        except KeyError as err:
+            raise ValueError("Unknown field %s" % err)
+        # tolist turns NumPy values back into plain Python int and float
+        columns = [chunk[field].tolist() for field in fields]
+        for row in zip(*columns):
+            values = {'qresult': {}, 'hit': {}, 'hsp': {}, 'frag': {}}
+            for (level, attr), value in zip(attrs, row):
+                values[level][attr] = value
+            cur_qid = _get_id(values['qresult'])
+            cur_hid = _get_id(values['hit'])
+            if cur_qid is None or cur_hid is None:
+                raise ValueError("Need the query and hit ID fields to build "
+                                 "QueryResult objects")
+            if hsps and (cur_hid != hid or cur_qid != qid):
+                hits.append(_make_hit(hsps, hvalues))
+                hsps = []
+            if hits and cur_qid != qid:
+                yield _make_qresult(hits, qid, qvalues)
+                hits = []
+            qid, qvalues = cur_qid, values['qresult']
+            hid, hvalues = cur_hid, values['hit']
+
+            frag = HSPFragment(hid, qid)
+            for attr, value in fixed_frag_attrs.items():
+                setattr(frag, attr, value)
+            for attr, value in values['frag'].items():
+                setattr(frag, attr, value)
+            hsp = HSP([frag])
+            for attr, value in values['hsp'].items():
+                setattr(hsp, attr, value)
+            hsps.append(hsp)
+    if hsps:
+        hits.append(_make_hit(hsps, hvalues))
+        yield _make_qresult(hits, qid, qvalues)
+
+
+def _make_hit(hsps, values):
+    """Return a Hit holding the HSPs with the given attributes (PRIVATE)."""
+    hit = Hit(hsps)
+    for attr, value in values.items():
+        if attr == 'id_all':
+            # the hit ID itself is already set from the HSPs
+            hit._id_alt = value[1:]
+        else:
+            setattr(hit, attr, value)
+    return hit
+
+
+def _make_qresult(hits, qid, values):
+    """Return a QueryResult holding the hits with the given attributes (PRIVATE)."""
+    qresult = QueryResult(hits, qid)
+    for attr, value in values.items():
+        setattr(qresult, attr, value)
+    return qresult
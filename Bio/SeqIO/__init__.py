@@ -336,9 +336,11 @@ making up each alignment as SeqRecords.
 
 from __future__ import print_function
 
+import functools
 import sys
 
 from Bio._py3k import basestring
+from Bio._utils import check_processes
 
 # TODO
 # - define policy on reading aligned sequences with gaps in
@@ -952,7 +954,7 @@ def index(filename, format, alphabet=None, key_function=None):
 
 
 def index_db(index_filename, filenames=None, format=None, alphabet=None,
-             key_function=None):
+             key_function=None, processes=1, update=False):
     """Index several sequence files and return a dictionary like object.
 
     The index is stored in an SQLite database rather than in memory (as in the
@@ -971,6 +973,13 @@ def index_db(index_filename, filenames=None, format=None, alphabet=None,
      - key_function - Optional callback function which when given a
        SeqRecord identifier string should return a unique
        key for the dictionary.
+     - processes - Number of worker processes used to scan the files when
+       building (or updating) the index, default 1. Use None for one per
+       CPU. The keys are still added in file order.
+     - update - If the index file already exists, update it rather than just
+       reloading it. Only new files, and those whose size or modification
+       time have changed, are scanned again, and any files missing from the
+       given filenames (if any) are dropped from the index.
 
     This indexing function will return a dictionary like object, giving the
     SeqRecord objects as values:
@@ -998,6 +1007,18 @@ def index_db(index_filename, filenames=None, format=None, alphabet=None,
     BGZF compressed files are supported, and detected automatically. Ordinary
     GZIP compressed files are not supported.
 
+    With thousands of files, scanning them with a pool of worker processes
+    can save a lot of time. As with any use of the multiprocessing module,
+    on some platforms this requires your script's main code to be protected
+    by an ``if __name__ == "__main__":`` block. Later on, if some of the files
+    have been replaced or added to, ``update=True`` will rescan only those
+    files::
+
+        from Bio import SeqIO
+        import glob
+        records = SeqIO.index_db("reads.idx", glob.glob("reads_*.fastq"),
+                                 "fastq", processes=8, update=True)
+
     See Also: Bio.SeqIO.index() and Bio.SeqIO.to_dict(), and the Python module
     glob which is useful for building lists of files.
 
@@ -1020,22 +1041,29 @@ def index_db(index_filename, filenames=None, format=None, alphabet=None,
                                      isinstance(alphabet, AlphabetEncoder)):
         raise ValueError("Invalid alphabet, %r" % alphabet)
 
-    # Map the file format to a sequence iterator:
-    from ._index import _FormatToRandomAccess  # Lazy import
+    check_processes(processes)
+
     from Bio.File import _SQLiteManySeqFilesDict
     repr = ("SeqIO.index_db(%r, filenames=%r, format=%r, alphabet=%r, key_function=%r)"
             % (index_filename, filenames, format, alphabet, key_function))
 
-    def proxy_factory(format, filename=None):
-        """Given a filename returns proxy object, else boolean if format OK."""
-        if filename:
-            return _FormatToRandomAccess[format](filename, format, alphabet)
-        else:
-            return format in _FormatToRandomAccess
+    # Bind the alphabet, keeping the factory picklable (see Bio.File)
+    proxy_factory = functools.partial(_index_db_proxy_factory, alphabet)
 
     return _SQLiteManySeqFilesDict(index_filename, filenames,
                                    proxy_factory, format,
-                                   key_function, repr)
+                                   key_function, repr,
+                                   processes=processes, update=update)
+
+
+def _index_db_proxy_factory(alphabet, format, filename=None):
+    """Given a filename returns proxy object, else boolean if format OK (PRIVATE)."""
+    # Map the file format to a sequence iterator:
+    from ._index import _FormatToRandomAccess  # Lazy import
+    if filename:
+        return _FormatToRandomAccess[format](filename, format, alphabet)
+    else:
+        return format in _FormatToRandomAccess
 
 
 def convert(in_file, in_format, out_file, out_format, alphabet=None):
@@ -65,6 +65,85 @@ def getattr_str(obj, attr, fmt=None, fallback='?'):
     return fallback
 
 
+def check_processes(processes):
+    """Check a number of worker processes is a positive integer or None."""
+    if processes is not None and (not isinstance(processes, int) or
+                                  processes < 1):
+        raise ValueError("Number of processes should be a positive integer "
+                         "or None, not %r" % processes)
+
+
+# The function and fixed arguments of the WorkerPool in a worker process
+_worker_task = None
+
+
+def _init_worker(function, arguments):
+    """Store the function and its fixed arguments in a worker (PRIVATE)."""
+    global _worker_task
+    _worker_task = (function, arguments)
+
+
+def _call_worker(item):
+    """Call the stored function on an item in a worker process (PRIVATE)."""
+    function, arguments = _worker_task
+    return function(item, arguments)
+
+
+class WorkerPool(object):
+    """Call a function on many items, in a pool of worker processes.
+
+    The function is called as function(item, arguments), where arguments
+    (such as an alignment or packed matrices) are the same for all items,
+    and are sent to each worker process only once, when it starts. The
+    function must be defined at module level, so that it can be pickled.
+    Using processes=1 no pool is started and the function is called in
+    this process, while None means one worker process per CPU.
+
+    Use it as a context manager, which stops the worker processes::
+
+        with WorkerPool(_row, (matrix, method), processes) as pool:
+            rows = pool.map(range(len(matrix)))
+
+    """
+
+    def __init__(self, function, arguments, processes=1):
+        """Start the worker processes, unless processes is 1."""
+        check_processes(processes)
+        self.function = function
+        self.arguments = arguments
+        if processes == 1:
+            self._pool = None
+        else:
+            import multiprocessing
+            self._pool = multiprocessing.Pool(processes, _init_worker,
+                                              (function, arguments))
+
+    def imap(self, items, chunksize=1):
+        """Return an iterator of the results for the items, in order."""
+        if self._pool is None:
+            function = self.function
+            arguments = self.arguments
+            return (function(item, arguments) for item in items)
+        return self._pool.imap(_call_worker, items, chunksize)
+
+    def map(self, items, chunksize=1):
+        """Return a list of the results for the items, in order."""
+        return list(self.imap(items, chunksize))
+
+    def close(self):
+        """Stop the worker processes, without waiting for unfinished work."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 def find_test_dir(start_dir=None):
     """Find the absolute path of Biopython's Tests directory.
 
@@ -155,6 +155,49 @@ def read(handle, format, strict=True):
     return motif
 
 
+def _build_automaton(patterns):
+    """Build an Aho-Corasick automaton matching the patterns (PRIVATE).
+
+    Takes a list of (string, value, strand) tuples, where all the strings
+    have the same length and the strand is 0 or 1. Returns a list with the
+    transitions from each state, as a dictionary mapping letters to the next
+    state (with any other letter leading back to the initial state 0), and a
+    dictionary mapping each final state to a list of the first value given
+    for its string on each strand (or None).
+    """
+    from collections import deque
+
+    # First the trie of the patterns
+    children = [{}]
+    final_states = {}
+    for pattern, value, strand in patterns:
+        state = 0
+        for letter in pattern:
+            try:
+                state = children[state][letter]
+            except KeyError:
+                children[state][letter] = len(children)
+                state = len(children)
+                children.append({})
+        values = final_states.setdefault(state, [None, None])
+        if values[strand] is None:
+            values[strand] = value
+    # Then the complete transitions, following the failure links breadth
+    # first, so that the sequence is searched with one lookup per letter.
+    # As all the patterns have the same length, a final state is never
+    # reached by a failure link, so only the trie's final states match.
+    transitions = [None] * len(children)
+    transitions[0] = dict(children[0])
+    queue = deque((child, 0) for child in children[0].values())
+    while queue:
+        state, failure = queue.popleft()
+        transitions[state] = dict(transitions[failure])
+        for letter, child in children[state].items():
+            transitions[state][letter] = child
+            queue.append((child, transitions[failure].get(letter, 0)))
+    return transitions, final_states
+
+
 class Instances(list):
     """Class containing a list of sequences that made the motifs."""
 
@@ -208,17 +251,57 @@ class Instances(list):
                 counts[letter][position] += 1
         return counts
 
-    def search(self, sequence):
+    def _automaton(self, both):
+        """Return the automaton and its final states for searching (PRIVATE).
+
+        The automaton is cached, and rebuilt only if the instances change.
+        """
+        key = (tuple(str(instance) for instance in self), both)
+        cache = getattr(self, "_automaton_cache", None)
+        if cache is not None and cache[0] == key:
+            return cache[1]
+        patterns = [(pattern, instance, 0)
+                    for pattern, instance in zip(key[0], self)]
+        if both:
+            patterns.extend((str(instance.reverse_complement()), instance, 1)
+                            for instance in self)
+        automaton = _build_automaton(patterns)
+        self._automaton_cache = (key, automaton)
+        return automaton
+
+    def search(self, sequence, both=False):
         """Find positions of motifs in a given sequence.
 
         This is a generator function, returning found positions of motif
-        instances in a given sequence.
+        instances in a given sequence. If several instances are identical,
+        only the first is returned.
+
+        If both is True, the reverse complement of the instances are also
+        searched for in the same pass over the sequence. At each position a
+        hit on the forward strand is returned before one on the reverse
+        strand, which is given a negative position following the Python
+        convention on negative indices (as in the PSSM search method).
+
+        The instances are compiled once into an Aho-Corasick automaton, so
+        that the search takes a single pass over the sequence, however many
+        instances there are.
         """
-        for pos in range(0, len(sequence) - self.length + 1):
-            for instance in self:
-                if str(instance) == str(sequence[pos:pos + self.length]):
-                    yield (pos, instance)
-                    break  # no other instance will fit (we don't want to return multiple hits)
+        if not self:
+            return
+        transitions, final_states = self._automaton(both)
+        sequence = str(sequence)
+        n = len(sequence)
+        m = self.length
+        state = 0
+        for i, letter in enumerate(sequence):
+            # Any letter not in the instances goes back to the initial state
+            state = transitions[state].get(letter, 0)
+            if state in final_states:
+                forward, reverse = final_states[state]
+                if forward is not None:
+                    yield (i - m + 1, forward)
+                if reverse is not None:
+                    yield (i - m + 1 - n, reverse)
 
     def reverse_complement(self):
         """Compute reverse complement of sequences."""
@@ -1,8 +1,9 @@
+#define PY_SSIZE_T_CLEAN
 #include <Python.h>
 
 
 static void
-calculate(const char sequence[], int s, Py_ssize_t m, double* matrix,
+calculate(const char sequence[], Py_ssize_t s, Py_ssize_t m, double* matrix,
           Py_ssize_t n, float* scores)
 {
     Py_ssize_t i, j;
@@ -47,6 +48,154 @@ calculate(const char sequence[], int s, Py_ssize_t m, double* matrix,
     }
 }
 
+typedef struct {
+    Py_ssize_t size;
+    Py_ssize_t allocated;
+    int with_motifs;  /* if false, the motifs array is not used */
+    int* motifs;
+    long long* positions;
+    signed char* strands;
+    float* scores;
+} Hits;
+
+static int
+add_hit(Hits* hits, int motif, Py_ssize_t position, signed char strand,
+        float score)
+{
+    if (hits->size == hits->allocated) {
+        Py_ssize_t allocated = hits->allocated ? 2 * hits->allocated : 1024;
+        int* motifs;
+        long long* positions;
+        signed char* strands;
+        float* scores;
+        if (hits->with_motifs) {
+            motifs = realloc(hits->motifs, allocated * sizeof(int));
+            if (!motifs) return 0;
+            hits->motifs = motifs;
+        }
+        positions = realloc(hits->positions, allocated * sizeof(long long));
+        if (!positions) return 0;
+        hits->positions = positions;
+        strands = realloc(hits->strands, allocated * sizeof(signed char));
+        if (!strands) return 0;
+        hits->strands = strands;
+        scores = realloc(hits->scores, allocated * sizeof(float));
+        if (!scores) return 0;
+        hits->scores = scores;
+        hits->allocated = allocated;
+    }
+    if (hits->with_motifs) hits->motifs[hits->size] = motif;
+    hits->positions[hits->size] = position;
+    hits->strands[hits->size] = strand;
+    hits->scores[hits->size] = score;
+    hits->size++;
+    return 1;
+}
+
+static int
+search(const char sequence[], Py_ssize_t s, Py_ssize_t m, const double* matrix,
+       double threshold, int both, Hits* hits)
+{
+    /* Scores each window on the forward strand, and (if both is set) on the
+       reverse strand using the reverse complement of the matrix, which is
+       read directly from the forward matrix. Hits are stored in the order
+       of the window position, the forward strand first. The scores are
+       rounded to single precision before comparing them to the threshold,
+       to give the same results as the calculate function. */
+    Py_ssize_t i, j;
+    Py_ssize_t n = s - m + 1;
+    double forward, reverse;
+    float score;
+    int k;
+    signed char letters[256];
+    for (k = 0; k < 256; k++) letters[k] = -1;
+    letters['A'] = letters['a'] = 0;
+    letters['C'] = letters['c'] = 1;
+    letters['G'] = letters['g'] = 2;
+    letters['T'] = letters['t'] = 3;
+    for (i = 0; i < n; i++) {
+        forward = 0.0;
+        reverse = 0.0;
+        for (j = 0; j < m; j++) {
+            k = letters[(unsigned char)sequence[i+j]];
+            if (k < 0) break;
+            forward += matrix[j*4+k];
+            reverse += matrix[(m-1-j)*4+3-k];
+        }
+        if (j < m) {
+            /* Skip all windows including this unexpected letter */
+            i += j;
+            continue;
+        }
+        score = (float)forward;
+        if (score > threshold && !add_hit(hits, 0, i, 1, score)) return 0;
+        if (both) {
+            score = (float)reverse;
+            if (score > threshold && !add_hit(hits, 0, i, -1, score)) return 0;
+        }
+    }
+    return 1;
+}
+
+static int
+search_many(const char sequence[], Py_ssize_t s, int n, const int* lengths,
+            const double* matrices, const double* thresholds, int both,
+            Hits* hits)
+{
+    /* As search, but for several matrices stored one after the other,
+       scanning the sequence once. The sequence is first translated into
+       letter indices, so this is only done once for all the matrices.
+       Hits are stored in the order of the window position, then the
+       matrix, then the strand (forward first). */
+    Py_ssize_t i, j, m;
+    Py_ssize_t offset;
+    double forward, reverse;
+    const double* matrix;
+    float score;
+    int k, motif;
+    signed char letters[256];
+    signed char* indices = malloc(s > 0 ? s : 1);
+    if (!indices) return 0;
+    for (k = 0; k < 256; k++) letters[k] = -1;
+    letters['A'] = letters['a'] = 0;
+    letters['C'] = letters['c'] = 1;
+    letters['G'] = letters['g'] = 2;
+    letters['T'] = letters['t'] = 3;
+    for (i = 0; i < s; i++) indices[i] = letters[(unsigned char)sequence[i]];
+    for (i = 0; i < s; i++) {
+        offset = 0;
+        for (motif = 0; motif < n; motif++) {
+            m = lengths[motif];
+            matrix = matrices + 4 * offset;
+            offset += m;
+            if (i + m > s) continue;
+            forward = 0.0;
+            reverse = 0.0;
+            for (j = 0; j < m; j++) {
+                k = indices[i+j];
+                if (k < 0) break;
+                forward += matrix[j*4+k];
+                reverse += matrix[(m-1-j)*4+3-k];
+            }
+            if (j < m) continue;
+            score = (float)forward;
+            if (score > thresholds[motif]
+             && !add_hit(hits, motif, i, 1, score)) break;
+            if (both) {
+                score = (float)reverse;
+                if (score > thresholds[motif]
+                 && !add_hit(hits, motif, i, -1, score)) break;
+            }
+        }
+        if (motif < n) {
+            free(indices);
+            return 0;
+        }
+    }
+    free(indices);
+    return 1;
+}
+
 static int
 matrix_converter(PyObject* object, void* address)
 {
@@ -120,6 +269,53 @@ scores_converter(PyObject* object, void* address)
     return 1;
 }
 
+static int
+vector_converter(PyObject* object, Py_buffer* view, char expected,
+                 const char* name)
+{
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+    char datatype;
+    if (PyObject_GetBuffer(object, view, flags) == -1) return 0;
+    datatype = view->format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view->format[1]; break;
+        default: break;
+    }
+    if (datatype != expected) {
+        PyErr_Format(PyExc_RuntimeError,
+            "%s array has incorrect data format ('%c', expected '%c')",
+            name, datatype, expected);
+        PyBuffer_Release(view);
+        view->obj = NULL;
+        return 0;
+    }
+    if (view->ndim != 1) {
+        PyErr_Format(PyExc_ValueError,
+            "%s array has incorrect rank (%d expected 1)",
+            name, view->ndim);
+        PyBuffer_Release(view);
+        view->obj = NULL;
+        return 0;
+    }
+    return 1;
+}
+
+static int
+lengths_converter(PyObject* object, void* address)
+{
+    return vector_converter(object, address, 'i', "lengths");
+}
+
+static int
+thresholds_converter(PyObject* object, void* address)
+{
+    return vector_converter(object, address, 'd', "thresholds");
+}
+
 static char calculate__doc__[] =
 "    calculate(sequence, pwm) -> array of score values\n"
 "\n"
@@ -134,7 +330,7 @@ py_calculate(PyObject* self, PyObject* args, PyObject* keywords)
     static char* kwlist[] = {"sequence", "matrix", "scores", NULL};
     Py_ssize_t m;
     Py_ssize_t n;
-    int s;
+    Py_ssize_t s;
     PyObject* result = NULL;
     Py_buffer scores;
     Py_buffer matrix;
@@ -161,8 +357,150 @@ exit:
     return result;
 }
 
+static char search__doc__[] =
+"    search(sequence, matrix, threshold, both=True) -> tuple\n"
+"\n"
+"This function finds all positions along the sequence where the\n"
+"position-weight matrix score exceeds the threshold, on the forward strand\n"
+"and (if both is true) on the reverse strand, in a single pass over the\n"
+"sequence. It returns three bytearray objects, holding the 64-bit integer\n"
+"positions, the 8-bit integer strands (+1 or -1), and the 32-bit float\n"
+"scores of the hits.\n";
+
+static PyObject*
+py_search(PyObject* self, PyObject* args, PyObject* keywords)
+{
+    const char* sequence;
+    static char* kwlist[] = {"sequence", "matrix", "threshold", "both", NULL};
+    Py_ssize_t m;
+    Py_ssize_t s;
+    double threshold;
+    int both = 1;
+    int ok;
+    PyObject* result = NULL;
+    Py_buffer matrix;
+    Hits hits = {0, 0, 0, NULL, NULL, NULL, NULL};
+    matrix.obj = NULL;
+    if(!PyArg_ParseTupleAndKeywords(args, keywords, "s#O&d|i", kwlist,
+                                    &sequence,
+                                    &s,
+                                    matrix_converter, &matrix,
+                                    &threshold,
+                                    &both)) goto exit;
+    m = matrix.shape[0];
+    Py_BEGIN_ALLOW_THREADS
+    ok = search(sequence, s, m, matrix.buf, threshold, both, &hits);
+    Py_END_ALLOW_THREADS
+    if (!ok) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    result = Py_BuildValue("(N N N)",
+        PyByteArray_FromStringAndSize((const char*)hits.positions,
+                                      hits.size * sizeof(long long)),
+        PyByteArray_FromStringAndSize((const char*)hits.strands,
+                                      hits.size * sizeof(signed char)),
+        PyByteArray_FromStringAndSize((const char*)hits.scores,
+                                      hits.size * sizeof(float)));
+exit:
+    if (matrix.obj) PyBuffer_Release(&matrix);
+    free(hits.positions);
+    free(hits.strands);
+    free(hits.scores);
+    return result;
+}
+
+static char search_many__doc__[] =
+"    search_many(sequence, lengths, matrices, thresholds, both=True) -> tuple\n"
+"\n"
+"This function is like search, but for several position-weight matrices\n"
+"stacked in a single array, with their lengths given as an array of C ints\n"
+"and their thresholds as an array of doubles. The sequence is scanned once\n"
+"for all matrices. It returns four bytearray objects, holding the C int\n"
+"matrix indices, and the 64-bit integer positions, 8-bit integer strands,\n"
+"and 32-bit float scores of the hits.\n";
+
+static PyObject*
+py_search_many(PyObject* self, PyObject* args, PyObject* keywords)
+{
+    const char* sequence;
+    static char* kwlist[] = {"sequence", "lengths", "matrices", "thresholds",
+                             "both", NULL};
+    Py_ssize_t s;
+    Py_ssize_t i;
+    Py_ssize_t total = 0;
+    int n;
+    int both = 1;
+    int ok;
+    PyObject* result = NULL;
+    Py_buffer lengths;
+    Py_buffer matrices;
+    Py_buffer thresholds;
+    Hits hits = {0, 0, 1, NULL, NULL, NULL, NULL};
+    lengths.obj = NULL;
+    matrices.obj = NULL;
+    thresholds.obj = NULL;
+    if(!PyArg_ParseTupleAndKeywords(args, keywords, "s#O&O&O&|i", kwlist,
+                                    &sequence,
+                                    &s,
+                                    lengths_converter, &lengths,
+                                    matrix_converter, &matrices,
+                                    thresholds_converter, &thresholds,
+                                    &both)) goto exit;
+    if (lengths.shape[0] != thresholds.shape[0]) {
+        PyErr_SetString(PyExc_ValueError,
+                        "lengths and thresholds arrays differ in size");
+        goto exit;
+    }
+    if (lengths.shape[0] > INT_MAX) {
+        PyErr_SetString(PyExc_ValueError, "too many matrices");
+        goto exit;
+    }
+    n = (int)lengths.shape[0];
+    for (i = 0; i < n; i++) {
+        if (((int*)lengths.buf)[i] < 1) {
+            PyErr_SetString(PyExc_ValueError, "lengths should be positive");
+            goto exit;
+        }
+        total += ((int*)lengths.buf)[i];
+    }
+    if (total != matrices.shape[0]) {
+        PyErr_SetString(PyExc_ValueError,
+                        "lengths are inconsistent with the matrices array");
+        goto exit;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    ok = search_many(sequence, s, n, lengths.buf, matrices.buf,
+                     thresholds.buf, both, &hits);
+    Py_END_ALLOW_THREADS
+    if (!ok) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    result = Py_BuildValue("(N N N N)",
+        PyByteArray_FromStringAndSize((const char*)hits.motifs,
+                                      hits.size * sizeof(int)),
+        PyByteArray_FromStringAndSize((const char*)hits.positions,
+                                      hits.size * sizeof(long long)),
+        PyByteArray_FromStringAndSize((const char*)hits.strands,
+                                      hits.size * sizeof(signed char)),
+        PyByteArray_FromStringAndSize((const char*)hits.scores,
+                                      hits.size * sizeof(float)));
+exit:
+    if (lengths.obj) PyBuffer_Release(&lengths);
+    if (matrices.obj) PyBuffer_Release(&matrices);
+    if (thresholds.obj) PyBuffer_Release(&thresholds);
+    free(hits.motifs);
+    free(hits.positions);
+    free(hits.strands);
+    free(hits.scores);
+    return result;
+}
+
 static struct PyMethodDef methods[] = {
    {"calculate", (PyCFunction)py_calculate, METH_VARARGS | METH_KEYWORDS, calculate__doc__},
+   {"search", (PyCFunction)py_search, METH_VARARGS | METH_KEYWORDS, search__doc__},
+   {"search_many", (PyCFunction)py_search_many, METH_VARARGS | METH_KEYWORDS, search_many__doc__},
    {NULL,          NULL, 0, NULL} /* sentinel */
 };
 
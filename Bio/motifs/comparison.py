@@ -0,0 +1,192 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+"""Comparing many motifs against each other at once.
+
+The dist_pearson method of a position-specific scoring matrix compares two
+motifs, trying every offset between them in Python. The distance_matrix
+function in this module instead compares whole collections of motifs (for
+example all the motifs in a database, or those in one database against
+those in another), calculating the distances for all pairs of motifs at
+each offset together using NumPy, optionally using several processes.
+
+The resulting matrix of distances can be used directly for clustering the
+motifs, for example::
+
+    from Bio import motifs
+    from Bio.Cluster import treecluster
+    from Bio.motifs.comparison import distance_matrix
+    with open("JASPAR_CORE.txt") as handle:
+        collection = list(motifs.parse(handle, "jaspar"))
+    distances, offsets = distance_matrix(collection, processes=4)
+    tree = treecluster(None, distancematrix=distances, method="a")
+
+"""
+
+from Bio import MissingPythonDependencyError
+
+try:
+    import numpy
+except ImportError:
+    raise MissingPythonDependencyError(
+        "Please install NumPy if you want to use Bio.motifs.comparison. "
+        "See http://www.numpy.org/")
+
+from Bio._utils import check_processes, WorkerPool
+
+
+def _pack(matrices, letters):
+    """Return the matrices as zero padded arrays, with prefix sums (PRIVATE).
+
+    Returns the lengths of the matrices, a three dimensional array of their
+    values (matrix, position, letter), and the cumulative sums over the
+    positions of the sum and sum of squares of the values at each position.
+    """
+    lengths = numpy.array([matrix.length for matrix in matrices], int)
+    values = numpy.zeros((len(matrices), lengths.max(), len(letters)))
+    for i, matrix in enumerate(matrices):
+        values[i, :matrix.length] = numpy.transpose([matrix[letter]
+                                                     for letter in letters])
+    sums = numpy.zeros((len(matrices), values.shape[1] + 1))
+    numpy.cumsum(values.sum(axis=2), axis=1, out=sums[:, 1:])
+    squares = numpy.zeros((len(matrices), values.shape[1] + 1))
+    numpy.cumsum((values * values).sum(axis=2), axis=1, out=squares[:, 1:])
+    return lengths, values, sums, squares
+
+
+def _compare(rows, columns, metric):
+    """Return the distances and best offsets between two packed sets (PRIVATE).
+
+    The matrices are compared at each offset d, aligning position i of the
+    first matrix with position i - d of the second. As in the dist_pearson
+    method, the offsets are tried from the largest to the smallest, keeping
+    the first best score, and the sums are normalized by the length of the
+    union of the two aligned matrices (times the number of letters).
+    """
+    la, a_values, a_sums, a_squares = rows
+    lb, b_values, b_sums, b_squares = columns
+    na, length_a, k = a_values.shape
+    nb, length_b, k = b_values.shape
+    a_index = numpy.arange(na)[:, None]
+    b_index = numpy.arange(nb)[None, :]
+    if metric == "pearson":
+        # Matching dist_pearson, which starts from a correlation of -2
+        best = numpy.full((na, nb), -2.0)
+    else:
+        best = numpy.full((na, nb), numpy.inf)
+        totals = a_squares[:, -1][:, None] + b_squares[:, -1][None, :]
+    best_offsets = numpy.zeros((na, nb), int)
+    for d in range(length_a - 1, -length_b, -1):
+        # The padding is zero, so the products can be summed over the
+        # full width where the padded arrays overlap
+        start, stop = max(0, d), min(length_a, length_b + d)
+        x = a_values[:, start:stop].reshape(na, -1)
+        y = b_values[:, start - d:stop - d].reshape(nb, -1)
+        sxy = numpy.dot(x, y.T)
+        # End of the overlap of each pair, in the first matrix's positions
+        end = numpy.minimum(la[:, None], lb[None, :] + d)
+        valid = end > start
+        end = numpy.maximum(end, start)
+        norm = (numpy.maximum(la[:, None], lb[None, :] + d) - min(0, d)) * k
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            if metric == "pearson":
+                sx = (a_sums[a_index, end] - a_sums[:, start][:, None]) / norm
+                sy = (b_sums[b_index, end - d] -
+                      b_sums[:, start - d][None, :]) / norm
+                sxx = (a_squares[a_index, end] -
+                       a_squares[:, start][:, None]) / norm
+                syy = (b_squares[b_index, end - d] -
+                       b_squares[:, start - d][None, :]) / norm
+                scores = (sxy / norm - sx * sy) / numpy.sqrt((sxx - sx * sx) *
+                                                             (syy - sy * sy))
+                better = valid & (scores > best)
+            else:
+                # Positions outside the overlap are compared to zero
+                scores = (totals - 2 * sxy) / norm
+                better = valid & (scores < best)
+        best[better] = scores[better]
+        best_offsets[better] = d
+    if metric == "pearson":
+        return 1 - best, best_offsets
+    # Avoid taking the square root of rounding errors below zero
+    return numpy.sqrt(numpy.maximum(best, 0)), best_offsets
+
+
+def _compare_block(block, arguments):
+    """Compare a block of the first set of matrices to all others (PRIVATE).
+
+    Takes the start and end of the block of rows, and the packed matrices
+    and metric.
+    """
+    start, end = block
+    rows, columns, metric = arguments
+    rows = tuple(array[start:end] for array in rows)
+    return _compare(rows, columns, metric)
+
+
+def distance_matrix(motifs, others=None, metric="pearson", processes=1,
+                    block_size=100):
+    """Calculate the distances between all pairs of motifs.
+
+    Arguments:
+     - motifs - A list of Motif objects (in which case their pssm attribute
+       is used) or position matrices, all with the same alphabet.
+     - others - An optional second list of motifs or matrices. By default
+       all the motifs are compared to each other.
+     - metric - Either "pearson", meaning one minus the Pearson correlation
+       of the matrix values as calculated by the dist_pearson method, or
+       "euclidean", meaning the root mean square difference between the
+       matrix values, where any positions outside the overlap of the two
+       motifs are compared to zero (which for a PSSM means the background).
+     - processes - Number of worker processes to use (None meaning one per
+       CPU).
+     - block_size - Number of motifs compared to all the others at a time,
+       limiting the memory used.
+
+    For both metrics the best offset between each pair of motifs is used.
+    Returns two NumPy arrays, with a row for each motif and a column for
+    each of the other motifs (or each motif again). The first holds the
+    distances, and can be used directly as the distance matrix for the
+    clustering functions in Bio.Cluster. The second holds the best offsets,
+    as returned by the dist_pearson method, meaning position i of the first
+    motif is aligned to position i - offset of the second.
+    """
+    from Bio.motifs import Motif
+
+    if metric not in ("pearson", "euclidean"):
+        raise ValueError("Unknown metric %r, use 'pearson' or 'euclidean'"
+                         % metric)
+    check_processes(processes)
+    if block_size < 1:
+        raise ValueError("The block size should be positive, not %r"
+                         % block_size)
+    matrices = [motif.pssm if isinstance(motif, Motif) else motif
+                for motif in motifs]
+    if others is None:
+        other_matrices = matrices
+    else:
+        other_matrices = [motif.pssm if isinstance(motif, Motif) else motif
+                          for motif in others]
+    if not matrices or not other_matrices:
+        raise ValueError("No motifs given")
+    letters = matrices[0]._letters
+    for matrix in matrices + other_matrices:
+        if matrix._letters != letters:
+            raise ValueError("Cannot compare motifs with different alphabets")
+    rows = _pack(matrices, letters)
+    if others is None:
+        columns = rows
+    else:
+        columns = _pack(other_matrices, letters)
+    blocks = [(start, min(start + block_size, len(matrices)))
+              for start in range(0, len(matrices), block_size)]
+    distances = numpy.empty((len(matrices), len(other_matrices)))
+    offsets = numpy.empty((len(matrices), len(other_matrices)), int)
+    with WorkerPool(_compare_block, (rows, columns, metric),
+                    processes) as pool:
+        for (start, end), (block_distances, block_offsets) in zip(
+                blocks, pool.imap(blocks)):
+            distances[start:end] = block_distances
+            offsets[start:end] = block_offsets
+    return distances, offsets
@@ -4,7 +4,8 @@
 # as part of this package.
 """Provides read access to a JASPAR5 formatted database.
 
-This modules requires MySQLdb to be installed.
+This modules requires MySQLdb to be installed, unless an existing database
+connection (for example to a local SQLite copy of the database) is given.
 
 Example, substitute the your database credentials as
 appropriate::
@@ -51,10 +52,30 @@ appropriate::
         )
         for motif in motifs:
             pass # do something with the motif
+
+Fetching many motifs at once (as fetch_motifs does) uses a handful of
+queries per batch of motifs rather than several queries per motif. To avoid
+querying the database server at all after the first use, a snapshot of the
+JASPAR tables can be kept in a local SQLite file::
+
+        jdb = JASPAR5(
+            host=JASPAR_DB_HOST,
+            name=JASPAR_DB_NAME,
+            user=JASPAR_DB_USER,
+            password=JASPAR_DB_PASS,
+            cache="JASPAR2018.sqlite"
+        )
+
+If the cache file already exists it is used instead of connecting to the
+server, otherwise the tables are copied into it from the server. Any other
+DB-API connection to a database with the JASPAR5 tables can be used via the
+connection argument, for example ``JASPAR5(connection=sqlite3.connect(...))``.
 """
 
 from __future__ import print_function
 
+import os
+import sys
 import warnings
 from Bio import BiopythonWarning
 from Bio import MissingPythonDependencyError
@@ -62,8 +83,8 @@ from Bio import MissingPythonDependencyError
 try:
     import MySQLdb as mdb
 except ImportError:
-    raise MissingPythonDependencyError("Install MySQLdb if you want to use "
-                                       "Bio.motifs.jaspar.db")
+    # Only needed to connect to a server, not for an existing connection
+    mdb = None
 
 from Bio.Alphabet.IUPAC import unambiguous_dna as dna
 from Bio.motifs import jaspar, matrix
@@ -71,6 +92,20 @@ from Bio.motifs import jaspar, matrix
 
 JASPAR_DFLT_COLLECTION = 'CORE'
 
+# The tables (and their columns) read by the JASPAR5 class, as copied into
+# a snapshot cache
+_SNAPSHOT_TABLES = [
+    ("MATRIX", ("ID", "COLLECTION", "BASE_ID", "VERSION", "NAME")),
+    ("MATRIX_DATA", ("ID", "row", "col", "val")),
+    ("MATRIX_ANNOTATION", ("ID", "TAG", "VAL")),
+    ("MATRIX_SPECIES", ("ID", "TAX_ID")),
+    ("MATRIX_PROTEIN", ("ID", "ACC")),
+]
+
+# Number of internal IDs in each "in (...)" clause of the bulk queries,
+# below the SQLite limit of 999 parameters
+_BULK_SIZE = 500
+
 
 class JASPAR5(object):
     """Class representing a JASPAR5 database.
@@ -83,7 +118,8 @@ class JASPAR5(object):
     store JASPAR motifs or create a new DB at this time.
     """
 
-    def __init__(self, host=None, name=None, user=None, password=None):
+    def __init__(self, host=None, name=None, user=None, password=None,
+                 connection=None, cache=None):
         """Construct a JASPAR5 instance and connect to specified DB.
 
         Arguments:
@@ -92,6 +128,12 @@ class JASPAR5(object):
         - name - name of the JASPAR database
         - user - user name to connect to the JASPAR DB
         - password - JASPAR DB password
+        - connection - an existing DB-API connection to a JASPAR5 database
+          (e.g. a MySQLdb or sqlite3 connection), used instead of
+          connecting to the server
+        - cache - file name of a local SQLite snapshot of the database.
+          If the file exists it is used instead of the server, otherwise
+          the database is copied into it (see save_snapshot).
 
         """
         self.name = name
@@ -99,12 +141,70 @@ class JASPAR5(object):
         self.user = user
         self.password = password
 
-        self.dbh = mdb.connect(host, user, password, name)
+        if cache is not None and os.path.isfile(cache):
+            import sqlite3
+            connection = sqlite3.connect(cache)
+        if connection is None:
+            if mdb is None:
+                raise MissingPythonDependencyError(
+                    "Install MySQLdb if you want to use Bio.motifs.jaspar.db "
+                    "to connect to a JASPAR database server")
+            connection = mdb.connect(host, user, password, name)
+        self.dbh = connection
+        # The DB-API modules differ in their parameter placeholders
+        module = sys.modules.get(type(connection).__module__.split(".")[0])
+        self._paramstyle = getattr(module, "paramstyle", "format")
+        if cache is not None and not os.path.isfile(cache):
+            self.save_snapshot(cache)
 
     def __str__(self):
         """Return a string represention of the JASPAR5 DB connection."""
         return r"%s\@%s:%s" % (self.user, self.host, self.name)
 
+    def _execute(self, cur, sql, args=None):
+        """Execute the SQL with %s placeholders for the arguments (PRIVATE)."""
+        if args is None:
+            cur.execute(sql)
+            return
+        if self._paramstyle == "qmark":
+            sql = sql.replace("%s", "?")
+        cur.execute(sql, args)
+
+    def save_snapshot(self, filename):
+        """Copy the JASPAR tables into a local SQLite database file.
+
+        The file can then be used instead of the database server, either by
+        passing it as the cache argument or as an sqlite3 connection. An
+        existing file is replaced once the copy is complete.
+        """
+        import sqlite3
+
+        temp_filename = filename + ".tmp"
+        if os.path.isfile(temp_filename):
+            os.remove(temp_filename)
+        snapshot = sqlite3.connect(temp_filename)
+        try:
+            cur = self.dbh.cursor()
+            for table, columns in _SNAPSHOT_TABLES:
+                snapshot.execute("CREATE TABLE %s (%s)"
+                                 % (table, ", ".join(columns)))
+                cur.execute("select %s from %s" % (", ".join(columns), table))
+                snapshot.executemany("INSERT INTO %s VALUES (%s)"
+                                     % (table, ", ".join("?" * len(columns))),
+                                     cur.fetchall())
+                snapshot.execute("CREATE INDEX %s_ID ON %s (ID)"
+                                 % (table, table))
+            snapshot.execute("CREATE INDEX MATRIX_BASE_ID ON MATRIX (BASE_ID)")
+            snapshot.commit()
+        except Exception:
+            snapshot.close()
+            os.remove(temp_filename)
+            raise
+        snapshot.close()
+        if os.path.isfile(filename):
+            os.remove(filename)
+        os.rename(temp_filename, filename)
+
     def fetch_motif_by_id(self, id):
         """Fetch a single JASPAR motif from the DB by it's JASPAR matrix ID.
 
@@ -252,8 +352,7 @@ class JASPAR5(object):
         Now further filter motifs returned above based on any specified
         matrix specific criteria.
         """
-        for int_id in int_ids:
-            motif = self._fetch_motif_by_internal_id(int_id)
+        for motif in self._fetch_motifs_by_internal_ids(int_ids):
 
             # Filter motifs to those with matrix IC greater than min_ic
             if min_ic:
@@ -287,8 +386,8 @@ class JASPAR5(object):
     def _fetch_latest_version(self, base_id):
         """Get the latest version number for the given base_id (PRIVATE)."""
         cur = self.dbh.cursor()
-        cur.execute("""select VERSION from MATRIX where BASE_id = %s
-                       order by VERSION desc limit 1""", (base_id,))
+        self._execute(cur, """select VERSION from MATRIX where BASE_id = %s
+                      order by VERSION desc limit 1""", (base_id,))
 
         row = cur.fetchone()
 
@@ -309,8 +408,8 @@ class JASPAR5(object):
         Also checks if this combo exists or not.
         """
         cur = self.dbh.cursor()
-        cur.execute("""select id from MATRIX where BASE_id = %s
-                       and VERSION = %s""", (base_id, version))
+        self._execute(cur, """select id from MATRIX where BASE_id = %s
+                      and VERSION = %s""", (base_id, version))
 
         row = cur.fetchone()
 
@@ -327,69 +426,97 @@ class JASPAR5(object):
 
     def _fetch_motif_by_internal_id(self, int_id):
         """Fetch basic motif information (PRIVATE)."""
-        cur = self.dbh.cursor()
-        cur.execute("""select BASE_ID, VERSION, COLLECTION, NAME from MATRIX
-                       where id = %s""", (int_id,))
-
-        row = cur.fetchone()
-
-        # This should never happen as it is an internal method. If it does
-        # we should probably raise an exception
-        if not row:
+        motifs = self._fetch_motifs_by_internal_ids([int_id])
+        if not motifs:
+            # This should never happen as it is an internal method. If it
+            # does we should probably raise an exception
             warnings.warn("Could not fetch JASPAR motif with internal "
                           "ID = {0}".format(int_id), BiopythonWarning)
             return None
+        return motifs[0]
 
-        base_id = row[0]
-        version = row[1]
-        collection = row[2]
-        name = row[3]
+    def _fetch_motifs_by_internal_ids(self, int_ids):
+        """Fetch the motifs with the given internal IDs (PRIVATE).
 
-        matrix_id = "".join([base_id, '.', str(version)])
-
-        # fetch the counts matrix
-        counts = self._fetch_counts_matrix(int_id)
+        Rather than querying each table for each motif, the motifs are
+        fetched in batches, using one query per table for each batch.
+        Returns a list of Bio.motifs.jaspar.Motif objects in the order
+        of the internal IDs, skipping any IDs not found.
+        """
+        motifs = []
+        for start in range(0, len(int_ids), _BULK_SIZE):
+            batch = list(int_ids[start:start + _BULK_SIZE])
+            found = self._fetch_motif_batch(batch)
+            motifs.extend(found[int_id] for int_id in batch
+                          if int_id in found)
+        return motifs
+
+    def _fetch_rows(self, cur, sql, int_ids):
+        """Fetch the rows for the internal IDs from a bulk query (PRIVATE).
+
+        The query should contain a single "in (%s)" clause, which is
+        filled in with a placeholder per ID.
+        """
+        placeholders = ", ".join(["%s"] * len(int_ids))
+        self._execute(cur, sql % placeholders, tuple(int_ids))
+        return cur.fetchall()
 
-        # Create new JASPAR motif
-        motif = jaspar.Motif(
-            matrix_id, name, collection=collection, counts=counts
-        )
+    def _fetch_motif_batch(self, int_ids):
+        """Fetch a batch of motifs, returning a dictionary by ID (PRIVATE)."""
+        cur = self.dbh.cursor()
+        motifs = {}
 
-        # fetch species
-        cur.execute("""select TAX_ID from MATRIX_SPECIES
-                       where id = %s""", (int_id,))
-        tax_ids = []
-        rows = cur.fetchall()
-        for row in rows:
-            tax_ids.append(row[0])
+        rows = self._fetch_rows(cur, """select ID, BASE_ID, VERSION,
+                                COLLECTION, NAME from MATRIX
+                                where ID in (%s)""", int_ids)
+        if not rows:
+            return motifs
 
-        # Many JASPAR motifs (especially those not in the CORE collection)
-        # do not have taxonomy IDs. So this warning would get annoying.
-        # if not tax_ids:
-        #     warnings.warn("Could not fetch any taxonomy IDs for JASPAR motif"
-        #                   " {0}".format(motif.matrix_id), BiopythonWarning)
+        # fetch the counts matrices, with the rows of all the matrices
+        # together
+        counts = {}
+        for int_id, base, col, val in self._fetch_rows(
+                cur, """select ID, row, col, val from MATRIX_DATA
+                        where ID in (%s) order by ID, col""", int_ids):
+            counts.setdefault(int_id, {}).setdefault(base, []).append(
+                float(val))
+
+        for int_id, base_id, version, collection, name in rows:
+            matrix_id = "".join([base_id, '.', str(version)])
+            base_counts = counts.get(int_id, {})
+            motif_counts = dict((base, base_counts.get(base, []))
+                                for base in dna.letters)
+            motifs[int_id] = jaspar.Motif(
+                matrix_id, name, collection=collection,
+                counts=matrix.GenericPositionMatrix(dna, motif_counts)
+            )
+            # Many JASPAR motifs (especially those not in the CORE
+            # collection) do not have taxonomy IDs or protein accession
+            # numbers, so no warnings are given if these are missing.
+            motifs[int_id].species = []
+            motifs[int_id].acc = []
 
-        motif.species = tax_ids
+        # fetch species
+        for int_id, tax_id in self._fetch_rows(
+                cur, """select ID, TAX_ID from MATRIX_SPECIES
+                        where ID in (%s)""", int_ids):
+            if int_id in motifs:
+                motifs[int_id].species.append(tax_id)
 
         # fetch protein accession numbers
-        cur.execute("select ACC FROM MATRIX_PROTEIN where id = %s", (int_id,))
-        accs = []
-        rows = cur.fetchall()
-        for row in rows:
-            accs.append(row[0])
-
-        # Similarly as for taxonomy IDs, it would get annoying to print
-        # warnings for JASPAR motifs which do not have accession numbers.
-
-        motif.acc = accs
+        for int_id, acc in self._fetch_rows(
+                cur, """select ID, ACC from MATRIX_PROTEIN
+                        where ID in (%s)""", int_ids):
+            if int_id in motifs:
+                motifs[int_id].acc.append(acc)
 
         # fetch remaining annotation as tags from the ANNOTATION table
-        cur.execute("""select TAG, VAL from MATRIX_ANNOTATION
-                       where id = %s""", (int_id,))
-        rows = cur.fetchall()
-        for row in rows:
-            attr = row[0]
-            val = row[1]
+        for int_id, attr, val in self._fetch_rows(
+                cur, """select ID, TAG, VAL from MATRIX_ANNOTATION
+                        where ID in (%s)""", int_ids):
+            if int_id not in motifs:
+                continue
+            motif = motifs[int_id]
             if attr == 'class':
                 motif.tf_class = val
             elif attr == 'family':
@@ -411,7 +538,7 @@ class JASPAR5(object):
                 """
                 pass
 
-        return motif
+        return motifs
 
     def _fetch_counts_matrix(self, int_id):
         """Fetch the counts matrix from the JASPAR DB by the internal ID (PRIVATE).
@@ -424,8 +551,8 @@ class JASPAR5(object):
         for base in dna.letters:
             base_counts = []
 
-            cur.execute("""select val from MATRIX_DATA where ID = %s
-                           and row = %s order by col""", (int_id, base))
+            self._execute(cur, """select val from MATRIX_DATA where ID = %s
+                          and row = %s order by col""", (int_id, base))
 
             rows = cur.fetchall()
             for row in rows:
@@ -503,8 +630,9 @@ class JASPAR5(object):
                 for id in matrix_id:
                     # ignore vesion here, this is a stupidity filter
                     (base_id, version) = jaspar.split_jaspar_id(id)
-                    cur.execute(
-                        "select ID from MATRIX where BASE_ID = %s", (base_id,)
+                    self._execute(
+                        cur, "select ID from MATRIX where BASE_ID = %s",
+                        (base_id,)
                     )
 
                     rows = cur.fetchall()
@@ -711,14 +839,13 @@ class JASPAR5(object):
         cur.execute(sql)
         rows = cur.fetchall()
 
-        for row in rows:
-            id = row[0]
-            if all_versions:
-                int_ids.append(id)
-            else:
-                # is the latest version?
-                if self._is_latest_version(id):
-                    int_ids.append(id)
+        if all_versions:
+            int_ids = [row[0] for row in rows]
+        else:
+            # keep only the latest versions, checking them all at once
+            # rather than calling _is_latest_version for each ID
+            latest = self._fetch_latest_internal_ids()
+            int_ids = [row[0] for row in rows if row[0] in latest]
 
         if len(int_ids) < 1:
             warnings.warn("Zero motifs returned with current select critera",
@@ -726,6 +853,18 @@ class JASPAR5(object):
 
         return int_ids
 
+    def _fetch_latest_internal_ids(self):
+        """Fetch the internal IDs of the latest JASPAR matrices (PRIVATE).
+
+        Returns a set of the internal IDs of the matrices for which there
+        is no later version with the same base ID.
+        """
+        cur = self.dbh.cursor()
+        cur.execute("select m.ID from MATRIX m where not exists "
+                    "(select 1 from MATRIX m2 where m2.BASE_ID = m.BASE_ID "
+                    "and m2.VERSION > m.VERSION)")
+        return set(row[0] for row in cur.fetchall())
+
     def _is_latest_version(self, int_id):
         """Check if the internal ID represents the latest JASPAR matrix (PRIVATE).
 
@@ -734,10 +873,10 @@ class JASPAR5(object):
         """
         cur = self.dbh.cursor()
 
-        cur.execute("select count(*) from MATRIX where "
-                    "BASE_ID = (select BASE_ID from MATRIX where ID = %s) "
-                    "and VERSION > (select VERSION from MATRIX where ID = %s)",
-                    (int_id, int_id))
+        self._execute(cur, "select count(*) from MATRIX where "
+                      "BASE_ID = (select BASE_ID from MATRIX where ID = %s) "
+                      "and VERSION > (select VERSION from MATRIX where ID = %s)",
+                      (int_id, int_id))
 
         row = cur.fetchone()
 
@@ -6,10 +6,15 @@
 
 Implementation of frequency (count) matrices, position-weight matrices,
 and position-specific scoring matrices.
+
+The score distributions calculated by the distribution method of a
+position-specific scoring matrix are cached in this module, keeping the
+16 most recently used. Call clear_distribution_cache to free their memory.
 """
 
 import math
 import platform
+from collections import OrderedDict
 
 from Bio._py3k import range
 
@@ -38,6 +43,20 @@ try:
         _pwm.calculate(sequence, logodds, scores)
         return scores
 
+    def _search(score_dict, sequence, m, threshold, both):
+        """Find hits above the threshold using C code (PRIVATE).
+
+        Returns NumPy arrays of the positions, strands and scores.
+        """
+        logodds = numpy.array([[score_dict[letter][i] for letter in "ACGT"]
+                               for i in range(m)], float)
+        hits = _pwm.search(sequence, logodds, threshold, both)
+        # The C module returns the arrays as bytearray objects
+        return tuple(numpy.frombuffer(data, dtype) if data
+                     else numpy.empty(0, dtype)
+                     for data, dtype in zip(hits, (numpy.int64, numpy.int8,
+                                                   numpy.float32)))
+
 except ImportError:
     if platform.python_implementation() == 'CPython':
         import warnings
@@ -65,6 +84,41 @@ except ImportError:
             scores.append(score)
         return scores
 
+    def _search(score_dict, sequence, m, threshold, both):
+        """Find hits above the threshold using Python code (PRIVATE).
+
+        Returns lists of the positions, strands and scores.
+        """
+        forward = _calculate(score_dict, sequence, m)
+        if both:
+            reverse = _calculate(score_dict.reverse_complement(), sequence, m)
+        positions = []
+        strands = []
+        scores = []
+        for position, score in enumerate(forward):
+            if score > threshold:
+                positions.append(position)
+                strands.append(1)
+                scores.append(score)
+            if both and reverse[position] > threshold:
+                positions.append(position)
+                strands.append(-1)
+                scores.append(reverse[position])
+        return positions, strands, scores
+
+
+# Cache of the most recently used ScoreDistribution objects, keyed by the
+# matrix values, background and precision, used by the distribution method.
+# This is per module rather than per matrix, as the pssm property of a
+# Motif returns a new (but equal) matrix every time.
+_distributions = OrderedDict()
+_DISTRIBUTION_CACHE_SIZE = 16
+
+
+def clear_distribution_cache():
+    """Forget the cached score distributions of all PSSMs."""
+    _distributions.clear()
+
 
 class GenericPositionMatrix(dict):
     """Base class for the support of position matrix operations."""
@@ -400,12 +454,7 @@ class PositionSpecificScoringMatrix(GenericPositionMatrix):
 
         """
         # TODO - Code itself tolerates ambiguous bases (as NaN).
-        if not isinstance(self.alphabet, IUPAC.IUPACUnambiguousDNA):
-            raise ValueError("PSSM has wrong alphabet: %s - Use only with DNA motifs"
-                             % self.alphabet)
-        if not isinstance(sequence.alphabet, IUPAC.IUPACUnambiguousDNA):
-            raise ValueError("Sequence has wrong alphabet: %r - Use only with DNA sequences"
-                             % sequence.alphabet)
+        self._check_alphabets(sequence)
 
         # NOTE: The C code handles mixed case input as this could be large
         # (e.g. contig or chromosome), so requiring it be all upper or lower
@@ -419,26 +468,80 @@ class PositionSpecificScoringMatrix(GenericPositionMatrix):
         else:
             return scores
 
-    def search(self, sequence, threshold=0.0, both=True):
+    def _check_alphabets(self, sequence):
+        """Check the PSSM and the sequence are both DNA (PRIVATE)."""
+        if not isinstance(self.alphabet, IUPAC.IUPACUnambiguousDNA):
+            raise ValueError("PSSM has wrong alphabet: %s - Use only with DNA motifs"
+                             % self.alphabet)
+        if not isinstance(sequence.alphabet, IUPAC.IUPACUnambiguousDNA):
+            raise ValueError("Sequence has wrong alphabet: %r - Use only with DNA sequences"
+                             % sequence.alphabet)
+
+    def _find_hits(self, sequence, threshold, both, pvalue, background):
+        """Return the positions, strands and scores of the hits (PRIVATE)."""
+        self._check_alphabets(sequence)
+        if pvalue is not None:
+            distribution = self.distribution(background=background)
+            threshold = distribution.threshold_fpr(pvalue)
+        return _search(self, str(sequence), self.length, threshold, both)
+
+    def search(self, sequence, threshold=0.0, both=True, pvalue=None,
+               background=None):
         """Find hits with PWM score above given threshold.
 
         A generator function, returning found hits in the given sequence
-        with the pwm score higher than the threshold.
+        with the pwm score higher than the threshold. Hits on the reverse
+        strand are given negative positions, following the Python convention
+        on negative indices.
+
+        Instead of a score threshold, a p-value may be given, meaning the
+        false positive rate under the background model (a dictionary of
+        letter frequencies, by default uniform). The threshold is then
+        calculated from the score distribution of this PSSM (see the
+        distribution method and ScoreDistribution.threshold_fpr).
+
+        The whole sequence is scored in a single pass, on both strands
+        unless both is False; see also the scan method.
         """
-        sequence = sequence.upper()
         n = len(sequence)
-        m = self.length
-        if both:
-            rc = self.reverse_complement()
-        for position in range(0, n - m + 1):
-            s = sequence[position:position + m]
-            score = self.calculate(s)
-            if score > threshold:
-                yield (position, score)
-            if both:
-                score = rc.calculate(s)
-                if score > threshold:
-                    yield (position - n, score)
+        positions, strands, scores = self._find_hits(sequence, threshold, both,
+                                                     pvalue, background)
+        for position, strand, score in zip(positions, strands, scores):
+            if strand > 0:
+                yield (int(position), score)
+            else:
+                yield (int(position) - n, score)
+
+    def scan(self, sequence, threshold=0.0, both=True, pvalue=None,
+             background=None):
+        """Return the positions, strands and scores of all hits as arrays.
+
+        Like the search method, this finds all positions in the sequence
+        with a score above the threshold (or the threshold for the given
+        p-value) on the forward strand, and unless both is False, on the
+        reverse strand. Rather than a generator, it returns three NumPy
+        arrays: the start positions of the hits (always counted on the
+        forward strand from zero), their strands (+1 or -1), and their
+        scores. The hits are sorted by position, with the forward strand
+        first. For example::
+
+            positions, strands, scores = pssm.scan(chromosome, pvalue=1e-4)
+            reverse_positions = positions[strands == -1]
+
+        """
+        try:
+            import numpy
+        except ImportError:
+            from Bio import MissingPythonDependencyError
+            raise MissingPythonDependencyError(
+                "Please install NumPy if you want to use "
+                "Bio.motifs PositionSpecificScoringMatrix.scan(). "
+                "See http://www.numpy.org/")
+        positions, strands, scores = self._find_hits(sequence, threshold, both,
+                                                     pvalue, background)
+        return (numpy.asarray(positions, numpy.int64),
+                numpy.asarray(strands, numpy.int8),
+                numpy.asarray(scores, numpy.float32))
 
     @property
     def max(self):
@@ -565,7 +668,15 @@ class PositionSpecificScoringMatrix(GenericPositionMatrix):
         return numerator / denominator
 
     def distribution(self, background=None, precision=10 ** 3):
-        """Calculate the distribution of the scores at the given precision."""
+        """Calculate the distribution of the scores at the given precision.
+
+        The 16 most recently used distributions are cached, keyed by the
+        values of the matrix, the background and the precision, so asking
+        again for the same distribution (even from a different but equal PSSM
+        object) is fast. The returned ScoreDistribution may therefore be
+        shared, and should not be modified. Use the clear_distribution_cache
+        function of this module to empty the cache.
+        """
         from .thresholds import ScoreDistribution
         if background is None:
             background = dict.fromkeys(self._letters, 1.0)
@@ -574,4 +685,15 @@ class PositionSpecificScoringMatrix(GenericPositionMatrix):
         total = sum(background.values())
         for letter in self._letters:
             background[letter] /= total
-        return ScoreDistribution(precision=precision, pssm=self, background=background)
+        key = (tuple((letter, tuple(self[letter])) for letter in self._letters),
+               tuple(sorted(background.items())), precision)
+        try:
+            distribution = _distributions.pop(key)
+        except KeyError:
+            distribution = ScoreDistribution(precision=precision, pssm=self,
+                                             background=background)
+            if len(_distributions) >= _DISTRIBUTION_CACHE_SIZE:
+                # Forget the least recently used distribution
+                _distributions.popitem(last=False)
+        _distributions[key] = distribution
+        return distribution
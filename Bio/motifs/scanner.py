@@ -0,0 +1,255 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+"""Scanning a collection of motifs against many sequences.
+
+Searching for the hits of hundreds of motifs (for example all the motifs in
+a JASPAR or TRANSFAC file) in a set of sequences by calling the search
+method of each position-specific scoring matrix for each sequence is slow.
+The MotifScanner class instead packs the scoring matrices of all the motifs
+into a single array once, and then scans each sequence once for all the
+motifs, on both strands. The sequences can be spread over a pool of worker
+processes. For example::
+
+    from Bio import motifs, SeqIO
+    from Bio.motifs.scanner import MotifScanner
+    with open("JASPAR_CORE.txt") as handle:
+        collection = list(motifs.parse(handle, "jaspar"))
+    scanner = MotifScanner(collection, pvalue=1e-4)
+    promoters = SeqIO.parse("promoters.fasta", "fasta")
+    for table in scanner.search(promoters, processes=4):
+        for hit in table[table["score"] > 10]:
+            print(collection[hit["motif"]].name, hit["sequence"],
+                  hit["position"], hit["strand"])
+
+The hits are returned as NumPy record arrays (hit tables) with the fields
+given by hit_dtype, namely the index of the motif in the collection, the
+index of the sequence, the start position on the forward strand (counting
+from zero, for hits on either strand), the strand (+1 or -1), and the score.
+"""
+
+import itertools
+
+from Bio import MissingPythonDependencyError
+
+try:
+    import numpy
+except ImportError:
+    raise MissingPythonDependencyError(
+        "Please install NumPy if you want to use Bio.motifs.scanner. "
+        "See http://www.numpy.org/")
+
+from Bio.Alphabet import IUPAC
+from Bio._utils import check_processes, WorkerPool
+
+try:
+    from . import _pwm
+except ImportError:
+    _pwm = None
+
+
+#: NumPy record type of the hit tables
+hit_dtype = numpy.dtype([("motif", numpy.intc),
+                         ("sequence", numpy.int64),
+                         ("position", numpy.int64),
+                         ("strand", numpy.int8),
+                         ("score", numpy.float32)])
+
+
+def _frombuffer(data, dtype):
+    """Return an array from a bytearray returned by the C code (PRIVATE)."""
+    if data:
+        return numpy.frombuffer(data, dtype)
+    return numpy.empty(0, dtype)
+
+
+def _search_many(sequence, lengths, matrices, thresholds, both):
+    """Find the hits of all the matrices in a sequence (PRIVATE).
+
+    Returns arrays of the matrix indices, positions, strands and scores,
+    sorted by position, then matrix, with the forward strand first.
+    """
+    if _pwm is not None:
+        hits = _pwm.search_many(sequence, lengths, matrices, thresholds, both)
+        return tuple(_frombuffer(data, dtype)
+                     for data, dtype in zip(hits, (numpy.intc, numpy.int64,
+                                                   numpy.int8,
+                                                   numpy.float32)))
+    # Use NumPy rather than the C code, scanning one matrix at a time,
+    # with an extra column of NaN used for any unexpected letter.
+    table = numpy.full(256, 4, numpy.intp)
+    for index, letter in enumerate("ACGT"):
+        table[ord(letter)] = table[ord(letter.lower())] = index
+    complement = numpy.array([3, 2, 1, 0, 4])
+    indices = table[numpy.array(bytearray(sequence.encode("latin-1")),
+                                numpy.uint8)]
+    extended = numpy.empty((len(matrices), 5))
+    extended[:, :4] = matrices
+    extended[:, 4] = numpy.nan
+    s = len(sequence)
+    found = []
+    offset = 0
+    for motif, (m, threshold) in enumerate(zip(lengths, thresholds)):
+        matrix = extended[offset:offset + m]
+        offset += m
+        n = s - m + 1
+        if n <= 0:
+            continue
+        strands = [(1, matrix, indices)]
+        if both:
+            strands.append((-1, matrix[::-1], complement[indices]))
+        for strand, values, letters in strands:
+            scores = numpy.zeros(n)
+            for j in range(m):
+                scores += values[j, letters[j:j + n]]
+            scores = scores.astype(numpy.float32)
+            positions = numpy.flatnonzero(scores > threshold)
+            found.append((numpy.full(len(positions), motif, numpy.intc),
+                          positions, numpy.full(len(positions), strand,
+                                                numpy.int8),
+                          scores[positions]))
+    if not found:
+        return (numpy.empty(0, numpy.intc), numpy.empty(0, numpy.int64),
+                numpy.empty(0, numpy.int8), numpy.empty(0, numpy.float32))
+    motifs, positions, strands, scores = [numpy.concatenate(column)
+                                          for column in zip(*found)]
+    order = numpy.lexsort((-strands, motifs, positions))
+    return (motifs[order], positions[order].astype(numpy.int64),
+            strands[order], scores[order])
+
+
+def _hit_table(sequence_index, hits):
+    """Return the hits in a sequence as a hit table (PRIVATE)."""
+    motifs, positions, strands, scores = hits
+    table = numpy.empty(len(positions), hit_dtype)
+    table["motif"] = motifs
+    table["sequence"] = sequence_index
+    table["position"] = positions
+    table["strand"] = strands
+    table["score"] = scores
+    return table
+
+
+def _as_string(sequence):
+    """Return the letters of a string, Seq or SeqRecord object (PRIVATE)."""
+    # SeqRecord objects hold their sequence as the seq attribute
+    return str(getattr(sequence, "seq", sequence))
+
+
+def _scan_batch(batch, arguments):
+    """Return the hit table for a batch of sequences (PRIVATE).
+
+    Takes a tuple of the index of the first sequence and a list of the
+    sequences as strings, and the packed matrices and settings.
+    """
+    start, sequences = batch
+    return numpy.concatenate([_hit_table(start + i,
+                                         _search_many(sequence, *arguments))
+                              for i, sequence in enumerate(sequences)])
+
+
+class MotifScanner(object):
+    """Scan a collection of DNA motifs against many sequences at once.
+
+    The motifs can be given as a list of Motif objects (in which case their
+    pssm attribute is used) or of position-specific scoring matrices. Only
+    hits scoring above the threshold are reported, which may be a single
+    number or a list with one threshold per motif. Alternatively a p-value
+    (or a list of p-values) may be given, meaning the false positive rate
+    under the background model (a dictionary of letter frequencies, by
+    default uniform), from which the thresholds are calculated using the
+    score distribution of each motif. Hits are searched on both strands,
+    unless both is False.
+
+    The thresholds used are available as the thresholds attribute.
+    """
+
+    def __init__(self, motifs, threshold=0.0, both=True, pvalue=None,
+                 background=None):
+        """Initialize the scanner, packing the scoring matrices."""
+        from Bio.motifs import Motif
+
+        pssms = [motif.pssm if isinstance(motif, Motif) else motif
+                 for motif in motifs]
+        if not pssms:
+            raise ValueError("No motifs given")
+        for pssm in pssms:
+            if not isinstance(pssm.alphabet, IUPAC.IUPACUnambiguousDNA):
+                raise ValueError("PSSM has wrong alphabet: %s - Use only with "
+                                 "DNA motifs" % pssm.alphabet)
+        if pvalue is not None:
+            pvalues = self._per_motif(pvalue, len(pssms), "p-values")
+            thresholds = [pssm.distribution(background=background)
+                          .threshold_fpr(p)
+                          for pssm, p in zip(pssms, pvalues)]
+        else:
+            thresholds = self._per_motif(threshold, len(pssms), "thresholds")
+        self.thresholds = numpy.array(thresholds, float)
+        self.both = both
+        self._lengths = numpy.array([pssm.length for pssm in pssms],
+                                    numpy.intc)
+        self._matrices = numpy.array([[pssm[letter][i] for letter in "ACGT"]
+                                      for pssm in pssms
+                                      for i in range(pssm.length)], float)
+
+    @staticmethod
+    def _per_motif(value, count, name):
+        """Return a list of the value for each motif (PRIVATE)."""
+        try:
+            values = list(value)
+        except TypeError:
+            return [value] * count
+        if len(values) != count:
+            raise ValueError("Expected %i %s, one per motif, not %i"
+                             % (count, name, len(values)))
+        return values
+
+    def _arguments(self):
+        """Return the packed matrices and settings for scanning (PRIVATE)."""
+        return self._lengths, self._matrices, self.thresholds, self.both
+
+    def scan(self, sequence):
+        """Return the hit table for a single sequence.
+
+        The sequence may be a string, Seq or SeqRecord object, and the
+        sequence field of the hit table is zero. The hits are sorted by
+        position, then by motif, with the forward strand first.
+        """
+        hits = _search_many(_as_string(sequence), *self._arguments())
+        return _hit_table(0, hits)
+
+    def search(self, sequences, processes=1, batch_size=100):
+        """Scan the sequences, returning an iterator of hit tables.
+
+        The sequences (strings, Seq or SeqRecord objects) are read from the
+        iterable in batches of batch_size, giving one hit table per batch
+        in the order of the sequences, which are numbered from zero in the
+        sequence field of the hit tables.
+
+        Using processes, the batches are scanned in parallel by a pool of
+        worker processes (None meaning one per CPU), each of which receives
+        the packed matrices once.
+        """
+        check_processes(processes)
+        if batch_size < 1:
+            raise ValueError("The batch size should be positive, not %r"
+                             % batch_size)
+        batches = self._batches(sequences, batch_size)
+        with WorkerPool(_scan_batch, self._arguments(), processes) as pool:
+            # imap returns the results in order, as each batch is done
+            for table in pool.imap(batches):
+                yield table
+
+    @staticmethod
+    def _batches(sequences, batch_size):
+        """Yield tuples of the first index and a list of strings (PRIVATE)."""
+        iterator = iter(sequences)
+        start = 0
+        while True:
+            batch = [_as_string(sequence) for sequence
+                     in itertools.islice(iterator, batch_size)]
+            if not batch:
+                break
+            yield start, batch
+            start += len(batch)
@@ -5,6 +5,12 @@
 # as part of this package.
 """Approximate calculation of appropriate thresholds for motif finding."""
 
+try:
+    import numpy
+except ImportError:
+    # Fall back on the slower pure Python code
+    numpy = None
+
 
 class ScoreDistribution(object):
     """Class representing approximate score distribution for a given motif.
@@ -27,27 +33,24 @@ class ScoreDistribution(object):
             self.n_points = precision * pssm.length
             self.ic = pssm.mean(background)
         self.step = self.interval / (self.n_points - 1)
-        self.mo_density = [0.0] * self.n_points
+        if numpy is None:
+            self.mo_density = [0.0] * self.n_points
+            self.bg_density = [0.0] * self.n_points
+        else:
+            self.mo_density = numpy.zeros(self.n_points)
+            self.bg_density = numpy.zeros(self.n_points)
         self.mo_density[-self._index_diff(self.min_score)] = 1.0
-        self.bg_density = [0.0] * self.n_points
         self.bg_density[-self._index_diff(self.min_score)] = 1.0
         if pssm is None:
             for lo, mo in zip(motif.log_odds(), motif.pwm()):
                 self.modify(lo, mo, motif.background)
         else:
             for position in range(pssm.length):
-                mo_new = [0.0] * self.n_points
-                bg_new = [0.0] * self.n_points
                 lo = pssm[:, position]
-                for letter, score in lo.items():
-                    bg = background[letter]
-                    mo = pow(2, pssm[letter, position]) * bg
-                    d = self._index_diff(score)
-                    for i in range(self.n_points):
-                        mo_new[self._add(i, d)] += self.mo_density[i] * mo
-                        bg_new[self._add(i, d)] += self.bg_density[i] * bg
-                self.mo_density = mo_new
-                self.bg_density = bg_new
+                mo = {}
+                for letter in lo:
+                    mo[letter] = pow(2, pssm[letter, position]) * background[letter]
+                self.modify(lo, mo, background)
 
     def _index_diff(self, x, y=0.0):
         return int((x - y + 0.5 * self.step) // self.step)
@@ -55,8 +58,39 @@ class ScoreDistribution(object):
     def _add(self, i, j):
         return max(0, min(self.n_points - 1, i + j))
 
+    def _shift_add(self, new, density, d, probability):
+        """Add the density shifted by d points and scaled to new (PRIVATE).
+
+        This is the NumPy equivalent of the loop in the modify method, with
+        any part of the density shifted out of range piling up at the ends.
+        """
+        n = self.n_points
+        if d >= n:
+            new[-1] += density.sum() * probability
+        elif d >= 0:
+            new[d:] += density[:n - d] * probability
+            new[-1] += density[n - d:].sum() * probability
+        elif d > -n:
+            new[:d] += density[-d:] * probability
+            new[0] += density[:-d].sum() * probability
+        else:
+            new[0] += density.sum() * probability
+
     def modify(self, scores, mo_probs, bg_probs):
         """Modify motifs and background density."""
+        if numpy is not None:
+            # Vectorized discrete convolution with this column's scores
+            mo_density = numpy.asarray(self.mo_density, float)
+            bg_density = numpy.asarray(self.bg_density, float)
+            mo_new = numpy.zeros(self.n_points)
+            bg_new = numpy.zeros(self.n_points)
+            for k, v in scores.items():
+                d = self._index_diff(v)
+                self._shift_add(mo_new, mo_density, d, mo_probs[k])
+                self._shift_add(bg_new, bg_density, d, bg_probs[k])
+            self.mo_density = mo_new
+            self.bg_density = bg_new
+            return
         mo_new = [0.0] * self.n_points
         bg_new = [0.0] * self.n_points
         for k, v in scores.items():
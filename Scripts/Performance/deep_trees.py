@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Test timing of Bio.Phylo and Bio.Nexus on very deep trees.
+
+This parses, traverses and writes caterpillar trees, where every inner
+clade has a terminal and the next inner clade as its children, so the
+depth equals the number of terminals. The times should grow linearly
+with the depth, which is far beyond the recursion limit.
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+from Bio._py3k import StringIO
+
+from Bio import Phylo
+from Bio.Nexus import Trees
+
+depths = [5000, 10000, 20000, 40000]
+
+
+def caterpillar(depth):
+    """Return the Newick text of a caterpillar tree."""
+    return ("(" * (depth - 1) + "T0:1" +
+            "".join(",T%d:1):1" % i for i in range(1, depth)) + ";")
+
+
+def timed(function, *args):
+    """Return the result of calling the function, and the time taken."""
+    start_time = time.time()
+    result = function(*args)
+    return result, time.time() - start_time
+
+
+def phylo_times(text):
+    """Time the Bio.Phylo operations on a tree."""
+    tree, parse_time = timed(Phylo.read, StringIO(text), "newick")
+    terminals, terminals_time = timed(tree.get_terminals)
+    depths_time = timed(tree.depths)[1]
+    path_time = timed(tree.get_path, terminals[0])[1]
+    monophyletic_time = timed(tree.is_monophyletic, terminals[:3])[1]
+    ladderize_time = timed(tree.ladderize)[1]
+    handle = StringIO()
+    write_time = timed(Phylo.write, tree, handle, "newick")[1]
+    return [("parse", parse_time), ("get_terminals", terminals_time),
+            ("depths", depths_time), ("get_path", path_time),
+            ("is_monophyletic", monophyletic_time),
+            ("ladderize", ladderize_time), ("write", write_time)]
+
+
+def nexus_times(text):
+    """Time the Bio.Nexus operations on a tree."""
+    tree, parse_time = timed(Trees.Tree, text)
+    taxa_time = timed(tree.get_taxa)[1]
+    first = tree.search_taxon("T0")
+    trace_time = timed(tree.trace, tree.root, first)[1]
+    write_time = timed(tree.to_string)[1]
+    identical_time = timed(tree.is_identical, tree)[1]
+    unroot_time = timed(tree.unroot)[1]
+    return [("parse", parse_time), ("get_taxa", taxa_time),
+            ("trace", trace_time), ("to_string", write_time),
+            ("is_identical", identical_time), ("unroot", unroot_time)]
+
+
+print("Recursion limit is %i" % sys.getrecursionlimit())
+for depth in depths:
+    text = caterpillar(depth)
+    for module, function in [("Bio.Phylo", phylo_times),
+                             ("Bio.Nexus", nexus_times)]:
+        print("%s, depth %i:" % (module, depth))
+        for name, elapsed_time in function(text):
+            print("\t%-16s%f seconds" % (name, elapsed_time))
+        sys.stdout.flush()
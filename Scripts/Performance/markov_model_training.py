@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Test timing of Baum-Welch training in Bio.MarkovModel.
+
+This compares the time per iteration of the default training, which
+updates the parameters after each training sequence, with batched
+training, serially and with worker processes. The training sequences
+are sampled from a random model.
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy
+
+from Bio import MarkovModel
+
+num_states = 4
+alphabet = ["A", "C", "G", "T"]
+num_sequences = 200
+max_length = 300
+num_iterations = 5
+
+
+class _Done(Exception):
+    """Stop training after the timed iterations."""
+
+
+def sample(p_initial, p_transition, p_emission, length):
+    """Sample the outputs of a model."""
+    outputs = []
+    state = numpy.random.choice(len(p_initial), p=p_initial)
+    for i in range(length):
+        outputs.append(alphabet[numpy.random.choice(len(alphabet),
+                                                    p=p_emission[state])])
+        state = numpy.random.choice(len(p_initial), p=p_transition[state])
+    return outputs
+
+
+def time_training(training_data, **keywds):
+    """Return the time per iteration of training on the data."""
+    times = []
+
+    def update_fn(iteration, log_likelihood):
+        times.append(time.time())
+        if len(times) > num_iterations:
+            raise _Done
+
+    states = [str(i) for i in range(num_states)]
+    numpy.random.seed(0)
+    start_time = time.time()
+    try:
+        MarkovModel.train_bw(states, alphabet, training_data,
+                             update_fn=update_fn, **keywds)
+    except _Done:
+        pass
+    else:
+        # converged before the last timed iteration
+        times[-1:] = []
+    return (times[-1] - start_time) / len(times)
+
+
+numpy.random.seed(42)
+model = (MarkovModel._random_norm(num_states),
+         MarkovModel._random_norm((num_states, num_states)),
+         MarkovModel._random_norm((num_states, len(alphabet))))
+training_data = [sample(model[0], model[1], model[2],
+                        numpy.random.randint(max_length // 2, max_length))
+                 for i in range(num_sequences)]
+print("Training on %i sequences of up to %i outputs, with %i states"
+      % (num_sequences, max_length, num_states))
+sys.stdout.flush()
+
+for name, keywds in [("Per sequence", {}),
+                     ("Batched", {"batched": True}),
+                     ("Batched, 2 processes", {"batched": True,
+                                               "processes": 2})]:
+    elapsed_time = time_training(training_data, **keywds)
+    print("%s:\n\t%f seconds per iteration" % (name, elapsed_time))
+    sys.stdout.flush()
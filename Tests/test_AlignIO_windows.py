@@ -0,0 +1,170 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Tests for reading alignments column window by column window."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Bio._py3k import StringIO
+
+from Bio import AlignIO
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+test_files = [("Clustalw/opuntia.aln", "clustal"),
+              ("Clustalw/protein.aln", "clustal"),
+              ("Clustalw/hedgehog.aln", "clustal"),
+              ("Phylip/interlaced.phy", "phylip"),
+              ("Phylip/interlaced2.phy", "phylip"),
+              ("Stockholm/simple.sth", "stockholm"),
+              ("Stockholm/funny.sth", "stockholm"),
+              ]
+
+
+class TestParseWindows(unittest.TestCase):
+
+    def check_windows(self, filename, format, window):
+        alignment = AlignIO.read(filename, format)
+        windows = list(AlignIO.parse_windows(filename, format, window))
+        expected_start = 0
+        for start, part in windows:
+            self.assertEqual(start, expected_start)
+            self.assertEqual(len(part), len(alignment))
+            if window is not None and start + window < len(alignment[0]):
+                self.assertEqual(part.get_alignment_length(), window)
+            expected_start += part.get_alignment_length()
+        self.assertEqual(expected_start, alignment.get_alignment_length())
+        for i, record in enumerate(alignment):
+            self.assertEqual("".join(str(part[i].seq)
+                                     for start, part in windows),
+                             str(record.seq))
+            for start, part in windows:
+                self.assertEqual(part[i].id, record.id)
+        for key, value in alignment.column_annotations.items():
+            self.assertEqual("".join(part.column_annotations[key]
+                                     for start, part in windows),
+                             value)
+
+    def test_file_blocks(self):
+        """Check reading the blocks used in the files."""
+        for filename, format in test_files:
+            self.check_windows(filename, format, None)
+
+    def test_fixed_windows(self):
+        """Check reading fixed width windows."""
+        for filename, format in test_files:
+            for window in (1, 7, 50, 60, 1000):
+                self.check_windows(filename, format, window)
+
+    def test_block_sizes(self):
+        """Check the windows follow the interleaved blocks."""
+        windows = AlignIO.parse_windows("Phylip/interlaced2.phy", "phylip")
+        self.assertEqual([(start, part.get_alignment_length())
+                          for start, part in windows],
+                         [(0, 50), (50, 50), (100, 31)])
+
+    def test_stockholm_interleaved(self):
+        """Check the Stockholm #=GC annotation is split by block."""
+        handle = StringIO("""\
+# STOCKHOLM 1.0
+#=GS seq1 DE First sequence
+seq1   ACGU-A
+seq2   AC.UUA
+#=GC SS_cons <<..>>
+
+seq1   GGC
+seq2   GGC
+#=GC SS_cons ...
+//
+""")
+        windows = list(AlignIO.parse_windows(handle, "stockholm"))
+        self.assertEqual(len(windows), 2)
+        start, part = windows[0]
+        self.assertEqual(start, 0)
+        self.assertEqual(str(part[1].seq), "AC-UUA")
+        self.assertEqual(part.column_annotations,
+                         {"secondary_structure": "<<..>>"})
+        start, part = windows[1]
+        self.assertEqual(start, 6)
+        self.assertEqual(part.column_annotations,
+                         {"secondary_structure": "..."})
+
+    def test_bad_identifiers(self):
+        """Check a block with the sequences out of order is rejected."""
+        handle = StringIO("""\
+CLUSTAL W (1.83) multiple sequence alignment
+
+
+alpha    ACGT
+beta     ACGA
+
+beta     TTTT
+alpha    TTTT
+""")
+        windows = AlignIO.parse_windows(handle, "clustal")
+        next(windows)
+        self.assertRaises(ValueError, next, windows)
+
+    def test_bad_arguments(self):
+        """Check invalid window sizes and formats are rejected."""
+        for window in (0, -1, 2.5):
+            self.assertRaises(ValueError, list,
+                              AlignIO.parse_windows("Clustalw/opuntia.aln",
+                                                    "clustal", window))
+        self.assertRaises(ValueError, list,
+                          AlignIO.parse_windows("Emboss/needle.txt",
+                                                "emboss"))
+        self.assertRaises(ValueError, list,
+                          AlignIO.parse_windows("Clustalw/opuntia.aln",
+                                                "nonsense"))
+
+
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class TestReadMemmap(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="biopython-test")
+        self.filename = os.path.join(self.temp_dir, "matrix.dat")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_matrix(self):
+        """Check the memory-mapped matrix matches the alignment."""
+        for filename, format in test_files:
+            alignment = AlignIO.read(filename, format)
+            ids, matrix = AlignIO.read_memmap(filename, format,
+                                              self.filename)
+            self.assertEqual(ids, [record.id for record in alignment])
+            self.assertEqual(matrix.shape,
+                             (len(alignment),
+                              alignment.get_alignment_length()))
+            for i, record in enumerate(alignment):
+                self.assertEqual(matrix[i].tostring().decode("ascii"),
+                                 str(record.seq))
+            del matrix
+
+    def test_reopen(self):
+        """Check the matrix file can be reopened."""
+        with open("Phylip/interlaced.phy") as handle:
+            ids, matrix = AlignIO.read_memmap(handle, "phylip",
+                                              self.filename)
+        shape = matrix.shape
+        del matrix
+        matrix = numpy.memmap(self.filename, dtype="S1", mode="r",
+                              shape=shape)
+        self.assertEqual(matrix[2, :10].tostring(), b"------MWAT")
+        del matrix
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
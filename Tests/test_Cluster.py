@@ -1211,6 +1211,224 @@ class TestCluster(unittest.TestCase):
         self.assertAlmostEqual(matrix[8][6], 22.497, places=3)
         self.assertAlmostEqual(matrix[8][7], 36.745, places=3)
 
+    def test_distancematrix_condensed(self):
+        if TestCluster.module == 'Bio.Cluster':
+            from Bio.Cluster import distancematrix, treecluster
+        elif TestCluster.module == 'Pycluster':
+            from Pycluster import distancematrix, treecluster
+        import os
+        import shutil
+        import sys
+        import tempfile
+
+        data = numpy.array([[2.2, 3.3, 4.4],
+                            [2.1, 1.4, 5.6],
+                            [7.8, 9.0, 1.2],
+                            [4.5, 2.3, 1.5],
+                            [4.2, 2.4, 1.9],
+                            [3.6, 3.1, 9.3],
+                            [2.3, 1.2, 3.9],
+                            [4.2, 9.6, 9.3],
+                            [1.7, 8.9, 1.1]])
+        mask = numpy.array([[1, 1, 1],
+                            [1, 1, 1],
+                            [0, 1, 1],
+                            [1, 1, 1],
+                            [1, 1, 1],
+                            [0, 1, 0],
+                            [1, 1, 1],
+                            [1, 0, 1],
+                            [1, 1, 1]], int)
+        weight = numpy.array([2.0, 1.0, 0.5])
+        for dist in "ebcauxsk":
+            for transpose in (False, True):
+                if transpose:
+                    weight_dist = None
+                else:
+                    weight_dist = weight
+                matrix = distancematrix(data, mask, weight_dist, transpose,
+                                        dist)
+                expected = numpy.concatenate(matrix)
+                for threads in (1, 2, 5):
+                    rows = distancematrix(data, mask, weight_dist, transpose,
+                                          dist, threads=threads)
+                    self.assertTrue(numpy.array_equal(numpy.concatenate(rows),
+                                                      expected))
+                    condensed = distancematrix(data, mask, weight_dist,
+                                               transpose, dist,
+                                               condensed=True,
+                                               threads=threads)
+                    self.assertTrue(numpy.array_equal(condensed, expected))
+        self.assertRaises(ValueError, distancematrix, data, threads=0)
+
+        # write the matrix to a file, a few rows at a time
+        condensed = distancematrix(data, mask, weight, condensed=True)
+        self.assertEqual(len(condensed), 36)
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "distances")
+            module = sys.modules[distancematrix.__module__]
+            block_size = module._BLOCK_SIZE
+            module._BLOCK_SIZE = 10
+            try:
+                matrix = distancematrix(data, mask, weight, filename=filename,
+                                        threads=2)
+            finally:
+                module._BLOCK_SIZE = block_size
+            self.assertTrue(numpy.array_equal(matrix, condensed))
+            del matrix
+            self.assertTrue(numpy.array_equal(numpy.fromfile(filename),
+                                              condensed))
+            # a single item has an empty distance matrix
+            matrix = distancematrix(data[:1], filename=filename)
+            self.assertEqual(len(matrix), 0)
+            self.assertEqual(os.path.getsize(filename), 0)
+        finally:
+            shutil.rmtree(directory)
+
+        # the condensed matrix can be used to cluster the data
+        tree = treecluster(None, distancematrix=condensed)
+        expected = treecluster(data, mask, weight)
+        self.assertEqual(str(tree), str(expected))
+
+    def test_treecluster_nnchain(self):
+        if TestCluster.module == 'Bio.Cluster':
+            from Bio.Cluster import distancematrix, treecluster
+        elif TestCluster.module == 'Pycluster':
+            from Pycluster import distancematrix, treecluster
+        import os
+        import shutil
+        import tempfile
+
+        rng = numpy.random.RandomState(11)
+        data = rng.normal(0.0, 1.0, (40, 3))
+        data[20:] += 4.0
+        matrix = distancematrix(data)
+        for method in "ma":
+            # join the closest pair of clusters at each step
+            clusters = dict((i, [i]) for i in range(len(data)))
+            expected = []
+            for k in range(len(data) - 1):
+                best = None
+                for i in clusters:
+                    for j in clusters:
+                        if i >= j:
+                            continue
+                        distances = [matrix[max(x, y)][min(x, y)]
+                                     for x in clusters[i] for y in clusters[j]]
+                        if method == 'm':
+                            distance = max(distances)
+                        else:
+                            distance = sum(distances) / len(distances)
+                        if best is None or distance < best[0]:
+                            best = (distance, i, j)
+                distance, i, j = best
+                expected.append((distance, sorted(clusters[i] + clusters[j])))
+                clusters[-k - 1] = clusters.pop(i) + clusters.pop(j)
+            tree = treecluster(data, method=method)
+            members = []
+            for k in range(len(tree)):
+                node = tree[k]
+                items = []
+                for index in (node.left, node.right):
+                    if index < 0:
+                        items.extend(members[-index - 1])
+                    else:
+                        items.append(index)
+                members.append(items)
+                self.assertEqual(sorted(items), expected[k][1])
+                self.assertAlmostEqual(node.distance, expected[k][0],
+                                       places=10)
+            # from the distance matrix, and calculating it in parallel
+            condensed = distancematrix(data, condensed=True)
+            other = treecluster(None, method=method, distancematrix=condensed)
+            self.assertEqual(str(other), str(tree))
+            other = treecluster(data, method=method, threads=3)
+            self.assertEqual(str(other), str(tree))
+            other = treecluster(data.T, method=method, transpose=True)
+            self.assertEqual(str(other), str(tree))
+
+        # store the distance matrix in a file
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "distances")
+            tree = treecluster(data, method='a', filename=filename)
+            self.assertEqual(str(tree), str(treecluster(data, method='a')))
+            self.assertEqual(os.path.getsize(filename), 8 * 40 * 39 // 2)
+        finally:
+            shutil.rmtree(directory)
+
+        # with tied distances, any of the closest pairs may be joined
+        data = rng.randint(0, 4, (30, 2))
+        matrix = distancematrix(data, dist='b')
+        for method in "ma":
+            tree = treecluster(data, method=method, dist='b')
+            clusters = dict((i, [i]) for i in range(len(data)))
+            for k in range(len(tree)):
+                distances = {}
+                for i in clusters:
+                    for j in clusters:
+                        if i >= j:
+                            continue
+                        values = [matrix[max(x, y)][min(x, y)]
+                                  for x in clusters[i] for y in clusters[j]]
+                        if method == 'm':
+                            distance = max(values)
+                        else:
+                            distance = sum(values) / len(values)
+                        distances[(i, j)] = distance
+                node = tree[k]
+                pair = (min(node.left, node.right), max(node.left, node.right))
+                self.assertAlmostEqual(node.distance, distances[pair],
+                                       places=10)
+                self.assertAlmostEqual(node.distance,
+                                       min(distances.values()), places=10)
+                clusters[-k - 1] = (clusters.pop(node.left) +
+                                    clusters.pop(node.right))
+
+    def test_kcluster_threads(self):
+        if TestCluster.module == 'Bio.Cluster':
+            from Bio.Cluster import distancematrix, kcluster, kmedoids
+        elif TestCluster.module == 'Pycluster':
+            from Pycluster import distancematrix, kcluster, kmedoids
+
+        rng = numpy.random.RandomState(7)
+        data = numpy.concatenate([rng.normal(center, 1.0, (20, 4))
+                                  for center in (0.0, 3.0, 6.0)])
+        matrix = distancematrix(data, condensed=True)
+        for method in "am":
+            expected = kcluster(data, nclusters=4, npass=25, method=method,
+                                seed=12345)
+            self.assertTrue(1 <= expected[2] <= 25)
+            for threads in (2, 3, 30):
+                clusterid, error, nfound = kcluster(data, nclusters=4,
+                                                    npass=25, method=method,
+                                                    threads=threads,
+                                                    seed=12345)
+                self.assertTrue(numpy.array_equal(clusterid, expected[0]))
+                self.assertEqual(error, expected[1])
+                self.assertEqual(nfound, expected[2])
+        expected = kmedoids(matrix, nclusters=4, npass=25, seed=12345)
+        self.assertEqual(len(expected[0]), len(data))
+        self.assertTrue(1 <= expected[2] <= 25)
+        for threads in (2, 3, 30):
+            clusterid, error, nfound = kmedoids(matrix, nclusters=4, npass=25,
+                                                threads=threads, seed=12345)
+            self.assertTrue(numpy.array_equal(clusterid, expected[0]))
+            self.assertEqual(error, expected[1])
+            self.assertEqual(nfound, expected[2])
+
+        # the first pass depends on the seed only
+        first = [kcluster(data, nclusters=4, npass=1, seed=seed)[1]
+                 for seed in range(10)]
+        self.assertTrue(len(set(first)) > 1)
+        clusterid, error, nfound = kcluster(data, nclusters=4, npass=10,
+                                            seed=3)
+        self.assertTrue(error <= first[3])
+        self.assertRaises(ValueError, kcluster, data, threads=0)
+        self.assertRaises(ValueError, kcluster, data, seed=-1)
+        self.assertRaises(ValueError, kmedoids, matrix, seed=2 ** 32)
+
     def test_pca(self):
         if TestCluster.module == 'Bio.Cluster':
             from Bio.Cluster import pca
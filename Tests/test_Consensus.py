@@ -66,6 +66,33 @@ class ConsensusTest(unittest.TestCase):
         self.assertEqual(bitstr_counts[_BitString('00011')][0], 1)
         self.assertEqual(bitstr_counts[_BitString('01111')][0], 1)
 
+    def test_count_splits(self):
+        term_names = [term.name for term in self.trees[0].get_terminals()]
+        split_counts, len_trees = Consensus._count_splits(self.trees,
+                                                          term_names)
+        self.assertEqual(len_trees, len(self.trees))
+        self.assertEqual(dict((split, counts[0])
+                              for split, counts in split_counts.items()),
+                         {0b11111: 3, 0b11000: 2, 0b00111: 3, 0b00110: 2,
+                          0b00011: 1, 0b01111: 1})
+
+    def test_terminal_order(self):
+        """Check the consensus does not depend on the order of the terminals."""
+        for tree in self.trees[1:]:
+            for clade in tree.find_clades():
+                clade.clades.reverse()
+        self.assertNotEqual([term.name for term in self.trees[0].get_terminals()],
+                            [term.name for term in self.trees[1].get_terminals()])
+        bitstr_counts, len_trees = Consensus._count_clades(self.trees)
+        self.assertEqual(bitstr_counts[_BitString('11000')][0], 2)
+        self.assertEqual(bitstr_counts[_BitString('00110')][0], 2)
+        ref_trees = list(Phylo.parse('./TreeConstruction/strict_refs.tre', 'newick'))
+        consensus_tree = Consensus.strict_consensus(self.trees)
+        self.assertTrue(Consensus._equal_topology(consensus_tree, ref_trees[0]))
+        ref_tree = next(Phylo.parse('./TreeConstruction/majority_ref.tre', 'newick'))
+        consensus_tree = Consensus.majority_consensus(self.trees)
+        self.assertTrue(Consensus._equal_topology(consensus_tree, ref_tree))
+
     def test_strict_consensus(self):
         ref_trees = list(Phylo.parse('./TreeConstruction/strict_refs.tre', 'newick'))
         # three trees
@@ -136,6 +163,36 @@ class BootstrapTest(unittest.TestCase):
         self.assertEqual(len(msa_list[0]), len(self.msa))
         self.assertEqual(len(msa_list[0][0]), len(self.msa[0]))
 
+    def test_bootstrap_columns(self):
+        columns = set(self.msa[:, i] for i in range(self.msa.get_alignment_length()))
+        for replicate in Consensus.bootstrap(self.msa, 10):
+            self.assertEqual([record.id for record in replicate],
+                             [record.id for record in self.msa])
+            for i in range(replicate.get_alignment_length()):
+                self.assertIn(replicate[:, i], columns)
+
+    def test_bootstrap_seed(self):
+        msa_list1 = [[str(record.seq) for record in replicate] for replicate
+                     in Consensus.bootstrap(self.msa, 10, seed=42)]
+        msa_list2 = [[str(record.seq) for record in replicate] for replicate
+                     in Consensus.bootstrap(self.msa, 10, seed=42)]
+        self.assertEqual(msa_list1, msa_list2)
+        self.assertNotEqual(msa_list1[0], msa_list1[1])
+
+    def test_bootstrap_trees_processes(self):
+        calculator = DistanceCalculator('blosum62')
+        constructor = DistanceTreeConstructor(calculator)
+        trees1 = list(Consensus.bootstrap_trees(self.msa, 10, constructor,
+                                                seed=1))
+        trees2 = list(Consensus.bootstrap_trees(self.msa, 10, constructor,
+                                                processes=2, seed=1))
+        self.assertEqual(len(trees2), 10)
+        for tree1, tree2 in zip(trees1, trees2):
+            self.assertTrue(Consensus._equal_topology(tree1, tree2))
+        self.assertRaises(ValueError, list,
+                          Consensus.bootstrap_trees(self.msa, 10, constructor,
+                                                    processes=0))
+
     def test_bootstrap_trees(self):
         calculator = DistanceCalculator('blosum62')
         constructor = DistanceTreeConstructor(calculator)
@@ -11,6 +11,7 @@ Also tests Training methods.
 # standard modules
 from __future__ import print_function
 
+import itertools
 import unittest
 import math
 
@@ -24,6 +25,11 @@ from Bio.HMM import MarkovModel
 from Bio.HMM import DynamicProgramming
 from Bio.HMM import Trainer
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # create some simple alphabets
 class NumberAlphabet(Alphabet.Alphabet):
@@ -403,6 +409,170 @@ class ScaledDPAlgorithmsTest(unittest.TestCase):
         s_value = self.dp._calculate_s_value(1, previous_vars)
 
 
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class ArrayDPAlgorithmsTest(unittest.TestCase):
+    """Forward and backward algorithms and training with NumPy arrays."""
+
+    def setUp(self):
+        mm_builder = MarkovModel.MarkovModelBuilder(NumberAlphabet(),
+                                                    LetterAlphabet())
+        mm_builder.set_initial_probabilities({'1': 0.3, '2': 0.7})
+        self.transitions = {('1', '1'): 0.8, ('1', '2'): 0.2,
+                            ('2', '1'): 0.4, ('2', '2'): 0.6}
+        self.emissions = {('1', 'A'): 0.9, ('1', 'B'): 0.1,
+                          ('2', 'A'): 0.35, ('2', 'B'): 0.65}
+        for (from_state, to_state), prob in self.transitions.items():
+            mm_builder.allow_transition(from_state, to_state, prob)
+        for (state, letter), prob in self.emissions.items():
+            mm_builder.set_emission_score(state, letter, prob)
+        self.mm = mm_builder.get_markov_model()
+        self.training_seqs = [
+            Trainer.TrainingSequence(Seq(text, LetterAlphabet()),
+                                     Seq('', NumberAlphabet()))
+            for text in ('ABBA', 'A', 'BBABAB', 'AAB', 'BABBBA')]
+
+    def _paths(self, text):
+        """Yield each state path and its probability of emitting the text."""
+        for path in itertools.product(NumberAlphabet.letters,
+                                      repeat=len(text)):
+            prob = self.mm.initial_prob[path[0]]
+            for i, (state, letter) in enumerate(zip(path, text)):
+                if i:
+                    prob *= self.transitions[(path[i - 1], state)]
+                prob *= self.emissions[(state, letter)]
+            yield path, prob
+
+    def test_forward(self):
+        """Sequence probabilities of sequences of different lengths."""
+        dp = DynamicProgramming.ArrayDPAlgorithms(self.mm,
+                                                  self.training_seqs)
+        forward, log_probs = dp.forward_algorithm()
+        backward = dp.backward_algorithm()
+        self.assertEqual(forward.shape, (5, 6, 2))
+        self.assertEqual(backward.shape, (5, 6, 2))
+        for i, training_seq in enumerate(self.training_seqs):
+            text = str(training_seq.emissions)
+            total = sum(prob for path, prob in self._paths(text))
+            self.assertAlmostEqual(log_probs[i], math.log(total))
+            # the posterior probabilities of the states
+            for j in range(len(text)):
+                first = sum(prob for path, prob in self._paths(text)
+                            if path[j] == '1')
+                self.assertAlmostEqual(forward[i, j, 0] * backward[i, j, 0],
+                                       first / total)
+
+    def test_expected_counts(self):
+        """Expected transition and emission counts."""
+        dp = DynamicProgramming.ArrayDPAlgorithms(self.mm,
+                                                  self.training_seqs)
+        transition_counts, emission_counts, log_probs = dp.expected_counts()
+        expected_transitions = numpy.zeros((2, 2))
+        expected_emissions = numpy.zeros((2, 2))
+        for training_seq in self.training_seqs:
+            text = str(training_seq.emissions)
+            paths = list(self._paths(text))
+            total = sum(prob for path, prob in paths)
+            for path, prob in paths:
+                states = [int(state) - 1 for state in path]
+                for i, state in enumerate(states):
+                    expected_emissions[state, "AB".index(text[i])] += \
+                        prob / total
+                    if i:
+                        expected_transitions[states[i - 1], state] += \
+                            prob / total
+        self.assertTrue(numpy.allclose(transition_counts,
+                                       expected_transitions))
+        self.assertTrue(numpy.allclose(emission_counts, expected_emissions))
+
+    def test_unexpected_letter(self):
+        """Emissions which are not in the alphabet."""
+        training_seq = Trainer.TrainingSequence(Seq('ABC', LetterAlphabet()),
+                                                Seq('', NumberAlphabet()))
+        self.assertRaises(ValueError, DynamicProgramming.ArrayDPAlgorithms,
+                          self.mm, [training_seq])
+
+    def test_train(self):
+        """Baum-Welch training in parallel."""
+        def stop_training(log_likelihood_change, num_iterations):
+            return num_iterations >= 5
+
+        trainer = Trainer.BaumWelchTrainer(self.mm)
+        self.assertRaises(ValueError, trainer.train, self.training_seqs,
+                          stop_training, processes=2)
+        self.assertRaises(ValueError, trainer.train, self.training_seqs,
+                          stop_training, DynamicProgramming.ArrayDPAlgorithms,
+                          processes=0)
+        # start both from copies of the same model
+        trained = []
+        for processes in (1, 2):
+            mm = MarkovModel.HiddenMarkovModel(
+                self.mm.initial_prob, dict(self.transitions),
+                dict(self.emissions), self.mm.get_blank_transitions(),
+                self.mm.get_blank_emissions())
+            trainer = Trainer.BaumWelchTrainer(mm)
+            trained.append(trainer.train(
+                self.training_seqs, stop_training,
+                DynamicProgramming.ArrayDPAlgorithms, processes))
+        mm1, mm2 = trained
+        self.assertEqual(sorted(mm1.transition_prob),
+                         sorted(self.transitions))
+        for key, prob in mm1.transition_prob.items():
+            self.assertAlmostEqual(prob, mm2.transition_prob[key])
+        for key, prob in mm1.emission_prob.items():
+            self.assertAlmostEqual(prob, mm2.emission_prob[key])
+        self.assertAlmostEqual(mm1.emission_prob[('1', 'A')] +
+                               mm1.emission_prob[('1', 'B')], 1)
+
+    def test_viterbi(self):
+        """Viterbi with NumPy gives the same path as without."""
+        emissions = "ABBABBBAAABAABBBBBAABA"
+        path, prob = self.mm.viterbi(emissions, NumberAlphabet())
+        try:
+            MarkovModel.numpy = None
+            expected = self.mm.viterbi(emissions, NumberAlphabet())
+        finally:
+            MarkovModel.numpy = numpy
+        self.assertEqual(str(path), str(expected[0]))
+        self.assertAlmostEqual(prob, expected[1])
+
+    def test_viterbi_ties(self):
+        """Viterbi with NumPy breaks ties as without."""
+        # all paths are equally likely, and the previous states are
+        # tried in the order of transitions_to, not of the alphabet
+        transitions = {}
+        for key in [('2', '1'), ('1', '1'), ('2', '2'), ('1', '2')]:
+            transitions[key] = 0.5
+        emissions = {('1', 'A'): 0.5, ('1', 'B'): 0.5,
+                     ('2', 'A'): 0.5, ('2', 'B'): 0.5}
+        mm = MarkovModel.HiddenMarkovModel({'1': 0.5, '2': 0.5},
+                                           transitions, emissions, {}, {})
+        self.assertEqual(mm.transitions_to('1'), ['2', '1'])
+        results = []
+        for module_numpy in (numpy, None):
+            try:
+                MarkovModel.numpy = module_numpy
+                results.append(mm.viterbi("ABBA", NumberAlphabet()))
+            finally:
+                MarkovModel.numpy = numpy
+        for path, prob in results:
+            self.assertEqual(str(path), "2222")
+            self.assertEqual(prob, 8 * math.log(0.5))
+
+        # a state which cannot be reached can only start the path
+        del transitions[('2', '1')], transitions[('1', '1')]
+        mm = MarkovModel.HiddenMarkovModel({'1': 0.5, '2': 0.5},
+                                           transitions, emissions, {}, {})
+        for module_numpy in (numpy, None):
+            try:
+                MarkovModel.numpy = module_numpy
+                self.assertRaises(ValueError, mm.viterbi, "AB",
+                                  NumberAlphabet())
+                path, prob = mm.viterbi("A", NumberAlphabet())
+                self.assertEqual(str(path), "2")
+            finally:
+                MarkovModel.numpy = numpy
+
+
 class AbstractTrainerTest(unittest.TestCase):
     def setUp(self):
         # set up a bogus HMM and our trainer
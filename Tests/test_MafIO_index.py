@@ -350,6 +350,44 @@ if sqlite3:
                     3012076, 16160203, 16379004, 15860456,
                     3012441, 15860899, 16379447, 16160646, 180525]))
 
+        def test_multiple_regions_sorted(self):
+            """Blocks from several regions are sorted, and found once."""
+            search = self.idx.search((3021421, 3009319, 3012076),
+                                     (3021536, 3012566, 3012476))
+            starts = [x[0].annotations["start"] for x in search]
+            self.assertEqual(starts, [3009319, 3012076, 3012441,
+                                      3021421, 3021465, 3021494])
+
+        def test_record_cache(self):
+            """Repeated searches reuse the recently parsed blocks."""
+            first = list(self.idx.search((3012076,), (3012476,)))
+            second = list(self.idx.search((3012076,), (3012476,)))
+            self.assertEqual(len(first), 2)
+            for a, b in zip(first, second):
+                self.assertIs(a, b)
+
+        def test_record_cache_size(self):
+            """Check the block cache size limit, and disabling it."""
+            idx = MafIndex("MAF/ucsc_mm9_chr10.mafindex",
+                           "MAF/ucsc_mm9_chr10.maf", "mm9.chr10",
+                           cache_size=1)
+            first = list(idx.search((3012076,), (3012476,)))
+            second = list(idx.search((3012076,), (3012476,)))
+            # Only the last block was cached, but got evicted by the first
+            self.assertEqual(len(idx._record_cache), 1)
+            self.assertIsNot(first[0], second[0])
+            self.assertIsNot(first[1], second[1])
+            self.assertIs(next(idx.search((3012441,), (3012476,))),
+                          second[1])
+            idx = MafIndex("MAF/ucsc_mm9_chr10.mafindex",
+                           "MAF/ucsc_mm9_chr10.maf", "mm9.chr10",
+                           cache_size=0)
+            first = list(idx.search((3012076,), (3012476,)))
+            second = list(idx.search((3012076,), (3012476,)))
+            self.assertEqual(len(idx._record_cache), 0)
+            self.assertIsNot(first[1], second[1])
+            self.assertEqual(str(first[1][0].seq), str(second[1][0].seq))
+
         def test_correct_block_boundary(self):
             """Following issues 504 and 1086.
 
@@ -21,6 +21,7 @@ try:
     from numpy import random  # missing in PyPy's micronumpy
     from numpy import array_equal
     from numpy import around
+    from numpy import exp
     from numpy import log
 except ImportError:
     from Bio import MissingPythonDependencyError
@@ -330,6 +331,70 @@ class TestMarkovModel(unittest.TestCase):
             markov_model.p_emission, decimals=3),
             around(output_p_emission, decimals=3)))
 
+    def test_train_bw_batched(self):
+        states = ["0", "1", "2", "3"]
+        alphabet = ["A", "C", "G", "T"]
+        training_data = ["AACCCGGGTTTTTTT", "ACCGTTTTTTT",
+                         "ACGGGTTTTTT", "ACCGTTTTTTTT"]
+        models = []
+        for processes in (1, 2):
+            random.seed(0)
+            models.append(MarkovModel.train_bw(states, alphabet,
+                                               training_data, batched=True,
+                                               processes=processes))
+        markov_model, markov_model2 = models
+        for name in ("p_initial", "p_transition", "p_emission"):
+            self.assertTrue(array_equal(
+                around(getattr(markov_model, name), decimals=6),
+                around(getattr(markov_model2, name), decimals=6)))
+        self.assertAlmostEqual(markov_model.p_initial.sum(), 1.0)
+        self.assertTrue(array_equal(
+            around(markov_model.p_transition.sum(axis=1), decimals=6),
+            [1, 1, 1, 1]))
+        self.assertTrue(array_equal(
+            around(markov_model.p_emission.sum(axis=1), decimals=6),
+            [1, 1, 1, 1]))
+        self.assertRaises(ValueError, MarkovModel.train_bw, states,
+                          alphabet, training_data, processes=2)
+        self.assertRaises(ValueError, MarkovModel.train_bw, states,
+                          alphabet, training_data, batched=True, processes=0)
+
+    def test_batch_counts(self):
+        outputs = [[2, 1, 0], [0, 2]]
+        p_initial = array([0.9, 0.1])
+        p_transition = array([[0.7, 0.3], [0.5, 0.5]])
+        p_emission = array([[0.6, 0.1, 0.3], [0.1, 0.7, 0.2]])
+        codes = array([[2, 1, 0], [0, 2, 0]])
+        lengths = array([3, 2])
+        x = MarkovModel._batch_counts(
+            (0, p_initial, p_transition, p_emission), [(codes, lengths)])
+        initial_counts, transition_counts, emission_counts, llik = x
+        # the same counts from the forward and backward matrices
+        expected_llik = 0
+        expected_transitions = array([[0.0, 0.0], [0.0, 0.0]])
+        for output in outputs:
+            T = len(output)
+            fmat = MarkovModel._forward(2, T, log(p_initial),
+                                        log(p_transition), log(p_emission),
+                                        output)
+            bmat = MarkovModel._backward(2, T, log(p_transition),
+                                         log(p_emission), output)
+            lp = MarkovModel._logsum(fmat[:, T])
+            expected_llik += lp
+            for t in range(T):
+                for i in range(2):
+                    for j in range(2):
+                        expected_transitions[i, j] += exp(
+                            fmat[i, t] + log(p_transition[i, j]) +
+                            log(p_emission[i, output[t]]) +
+                            bmat[j, t + 1] - lp)
+        self.assertAlmostEqual(llik, expected_llik)
+        self.assertTrue(array_equal(around(transition_counts, decimals=6),
+                                    around(expected_transitions, decimals=6)))
+        self.assertAlmostEqual(initial_counts.sum(), 2.0)
+        self.assertAlmostEqual(emission_counts.sum(), 5.0)
+        self.assertAlmostEqual(emission_counts[:, 1].sum(), 1.0)
+
     def test_forward(self):
         states = ["CP", "IP"]
         outputs = [2, 1, 0]
@@ -584,6 +584,38 @@ Root:  16
         with open(os.path.join(self.testfile_dir, "int_node_labels.nwk")) as large_ex_handle:
             tree = Trees.Tree(large_ex_handle.read())
 
+    def test_deep_tree(self):
+        """Test the traversals of a tree deeper than the recursion limit."""
+        depth = sys.getrecursionlimit() + 1000
+        # nested to the right, with the support of each inner clade
+        text = "".join("(T%d:1," % i for i in range(depth - 1))
+        text += "T%d:1" % (depth - 1)
+        text += ")0.5:1" * (depth - 2) + ");"
+        tree = Trees.Tree(text)
+        taxa = tree.get_taxa()
+        self.assertEqual(sorted(taxa), sorted("T%d" % i for i in range(depth)))
+        self.assertEqual(tree.count_terminals(), depth)
+        self.assertTrue(tree.is_bifurcating())
+        last = tree.search_taxon("T%d" % (depth - 1))
+        path = tree.trace(tree.root, last)
+        self.assertEqual(len(path), depth - 1)
+        self.assertTrue(tree.is_parent_of(path[0], last))
+        self.assertFalse(tree.is_parent_of(last, path[0]))
+        self.assertEqual(tree.node(path[-2]).data.support, 0.5)
+        self.assertEqual(tree.sum_branchlength(node=last), depth - 1)
+        # the nested sets of the subtrees
+        subtree = tree.set_subtree(tree.root)
+        for i in range(depth - 2):
+            self.assertIn("T%d" % i, subtree)
+            subtree, = [x for x in subtree if isinstance(x, frozenset)]
+        self.assertEqual(subtree, frozenset(["T%d" % (depth - 2),
+                                             "T%d" % (depth - 1)]))
+        tree.unroot()
+        self.assertEqual(len(tree.unrooted), 2 * depth - 3)
+        text = tree.to_string(plain_newick=True, support_as_branchlengths=True)
+        self.assertEqual(text.count("):0.50"), depth - 2)
+        self.assertTrue(tree.is_identical(Trees.Tree(text)))
+
     def _get_flat_nodes(self, tree):
         cur_nodes = [tree.node(tree.root)]
         nodedata = []
@@ -15,6 +15,11 @@ from Bio._py3k import StringIO
 from Bio import Phylo
 from Bio.Phylo import PhyloXML, NewickIO
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # Example Newick and Nexus files
 EX_NEWICK = 'Nexus/int_node_labels.nwk'
@@ -70,6 +75,22 @@ class IOTests(unittest.TestCase):
         for tree in trees:
             self.assertEqual(len(tree.get_terminals()), 9)
 
+    def test_newick_read_processes(self):
+        """Parse Newick trees in parallel."""
+        handle = StringIO("(A,(B,C)0.9);\n((A:1,B:2)x:3,C)[y];\n" * 3)
+        trees = list(NewickIO.parse(handle))
+        handle.seek(0)
+        parallel = list(NewickIO.parse(handle, processes=2))
+        self.assertEqual(len(parallel), 6)
+        self.assertEqual([str(tree) for tree in parallel],
+                         [str(tree) for tree in trees])
+        self.assertEqual(parallel[1].root.comment, "y")
+        self.assertEqual(parallel[1].root.clades[0].name, "x")
+        self.assertEqual(parallel[1].root.clades[0].branch_length, 3)
+        for processes in (0, 1.5):
+            parser = NewickIO.parse(StringIO("(A,B);"), processes=processes)
+            self.assertRaises(ValueError, list, parser)
+
     def test_newick_write(self):
         """Parse a Nexus file with multiple trees."""
         # Tree with internal node labels
@@ -503,6 +524,172 @@ class MixinTests(unittest.TestCase):
             self.assertEqual(clade.name, name)
             self.assertEqual(clade.branch_length, blen)
 
+    def test_deep(self):
+        """TreeMixin: methods on a tree deeper than the recursion limit."""
+        depth = sys.getrecursionlimit() + 1000
+        text = "T0:1"
+        for i in range(1, depth):
+            text = "(%s,T%d:1):1" % (text, i)
+        # no branch length for the root
+        text = text[:-2]
+        tree = Phylo.read(StringIO(text + ";"), "newick")
+        terminals = tree.get_terminals()
+        self.assertEqual([t.name for t in terminals[:2]], ["T0", "T1"])
+        self.assertEqual(terminals[-1].name, "T%d" % (depth - 1))
+        self.assertEqual(tree.get_terminals("postorder")[:2], terminals[:2])
+        self.assertEqual(tree.count_terminals(), depth)
+        self.assertEqual(len(tree.get_path(terminals[0])), depth - 1)
+        self.assertEqual(tree.distance(terminals[0], terminals[-1]), depth)
+        self.assertEqual(tree.depths(True)[terminals[0]], depth - 1)
+        self.assertEqual(tree.total_branch_length(), 2 * depth - 2)
+        self.assertTrue(tree.is_bifurcating())
+        self.assertTrue(tree.is_monophyletic(terminals[:3]))
+        self.assertFalse(tree.is_monophyletic(terminals[1:3]))
+        tree.ladderize()
+        self.assertEqual(tree.root.clades[0].name, "T%d" % (depth - 1))
+        self.assertEqual(len(str(tree).splitlines()), 2 * depth)
+        handle = StringIO()
+        Phylo.write(tree, handle, "newick", plain=True)
+        self.assertEqual(handle.getvalue().count("("), depth - 1)
+        self.assertEqual(
+            Phylo.read(StringIO(handle.getvalue()), "newick").count_terminals(),
+            depth)
+
+
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class ArrayTreeTests(unittest.TestCase):
+    """Tests for the ArrayTree view, comparing to the TreeMixin methods."""
+
+    def setUp(self):
+        from Bio.Phylo.ArrayTree import ArrayTree
+        self.phylogenies = list(Phylo.parse(EX_PHYLO, 'phyloxml'))
+        self.arrays = [ArrayTree(tree) for tree in self.phylogenies]
+
+    def test_arrays(self):
+        """ArrayTree: arrays of the tree structure."""
+        tree = self.phylogenies[10]
+        arrays = self.arrays[10]
+        clades = list(tree.find_clades())
+        self.assertEqual(arrays.clades, clades)
+        self.assertEqual(len(arrays), len(clades))
+        for index, clade in enumerate(clades):
+            children = arrays.children[arrays.child_offsets[index]:
+                                       arrays.child_offsets[index + 1]]
+            self.assertEqual([clades[i] for i in children], clade.clades)
+            for child in children:
+                self.assertEqual(arrays.parents[child], index)
+            self.assertEqual(arrays.terminal[index], clade.is_terminal())
+            self.assertEqual(arrays.ends[index] - index,
+                             len(list(clade.find_clades())))
+        self.assertEqual(arrays.parents[0], -1)
+        self.assertEqual(arrays.index('C'), clades.index(tree.find_any('C')))
+        self.assertRaises(ValueError, arrays.index, 'X')
+
+    def test_queries(self):
+        """ArrayTree: queries give the same results as TreeMixin."""
+        for tree, arrays in zip(self.phylogenies, self.arrays):
+            clades = list(tree.find_clades())
+            terminals = tree.get_terminals()
+            self.assertEqual(arrays.get_terminals(), terminals)
+            self.assertEqual(arrays.count_terminals(), len(terminals))
+            self.assertEqual(arrays.depths(), tree.depths())
+            self.assertEqual(arrays.depths(True), tree.depths(True))
+            for clade1 in clades:
+                self.assertEqual(arrays.get_path(clade1),
+                                 tree.get_path(clade1))
+                for clade2 in clades:
+                    self.assertIs(arrays.common_ancestor(clade1, clade2),
+                                  tree.common_ancestor(clade1, clade2))
+                    self.assertEqual(arrays.trace(clade1, clade2),
+                                     tree.trace(clade1, clade2))
+                    if clade1.branch_length is not None:
+                        self.assertAlmostEqual(arrays.distance(clade1, clade2),
+                                               tree.distance(clade1, clade2))
+            for size in range(1, len(terminals) + 1):
+                self.assertEqual(arrays.is_monophyletic(terminals[:size]),
+                                 tree.is_monophyletic(terminals[:size]))
+                self.assertIs(arrays.common_ancestor(terminals[-size:]),
+                              tree.common_ancestor(terminals[-size:]))
+
+    def test_names(self):
+        """ArrayTree: targets given by name."""
+        tree = self.phylogenies[1]
+        arrays = self.arrays[1]
+        self.assertAlmostEqual(arrays.distance('A'), 0.162)
+        self.assertAlmostEqual(arrays.distance('A', 'B'), 0.332)
+        self.assertAlmostEqual(arrays.distance('B', 'C'), 0.69)
+        self.assertEqual(arrays.common_ancestor('A', 'B'), tree.clade[0])
+        self.assertEqual(arrays.common_ancestor('A', 'C'), tree.clade)
+        self.assertEqual(arrays.common_ancestor(['B']), tree.find_any('B'))
+        self.assertRaises(ValueError, arrays.common_ancestor, 'A', 'X')
+        self.assertEqual(arrays.get_path('X'), None)
+
+    def test_vectorized(self):
+        """ArrayTree: common ancestors and distances of arrays of clades."""
+        tree = self.phylogenies[10]
+        arrays = self.arrays[10]
+        n = len(arrays)
+        first = numpy.repeat(numpy.arange(n), n)
+        second = numpy.tile(numpy.arange(n), n)
+        ancestors = arrays.lca(first, second)
+        distances = arrays.distances(first, second)
+        for i, j, ancestor, distance in zip(first, second, ancestors,
+                                            distances):
+            clade1 = arrays.clades[i]
+            clade2 = arrays.clades[j]
+            self.assertIs(arrays.clades[ancestor],
+                          tree.common_ancestor(clade1, clade2))
+            self.assertAlmostEqual(distance,
+                                   arrays.distance(clade1, clade2))
+        self.assertEqual(arrays.lca(0, 0), 0)
+
+    def test_newick_arrays(self):
+        """ArrayTree: parsing Newick trees directly into arrays."""
+        from Bio.Phylo.ArrayTree import ArrayTree
+        tree = Phylo.read(EX_NEWICK, 'newick')
+        expected = ArrayTree(tree)
+        with open(EX_NEWICK) as handle:
+            arrays, = NewickIO.parse(handle, arrays=True)
+        self.assertIsInstance(arrays, ArrayTree)
+        for name in ('parents', 'branch_lengths', 'depths_array', 'levels',
+                     'child_offsets', 'children', 'ends', 'terminal'):
+            self.assertEqual(getattr(arrays, name).tolist(),
+                             getattr(expected, name).tolist())
+        self.assertEqual(arrays.names, expected.names)
+        self.assertEqual(str(arrays.to_tree(rooted=False)).splitlines()[2:],
+                         str(tree).splitlines()[2:])
+        # without the external parentheses, the root is added last
+        handle = StringIO("(A:1,B:2)0.5:3,C:4;\nA,B;")
+        arrays = list(NewickIO.parse(handle, arrays=True, processes=2))
+        self.assertEqual(arrays[0].parents.tolist(), [-1, 0, 1, 1, 0])
+        self.assertEqual(arrays[0].branch_lengths.tolist(), [0, 3, 1, 2, 4])
+        self.assertEqual(arrays[0].names, [None, None, 'A', 'B', 'C'])
+        self.assertEqual(arrays[0].distance('A', 'C'), 8)
+        self.assertEqual(arrays[1].parents.tolist(), [-1, 0, 0])
+
+    def test_newick_arrays_malformed(self):
+        """ArrayTree: parsing malformed Newick trees into arrays."""
+        for text in ("A,B),C;", "A,B)C,D;", "A,B),(C,D;", "(A,B)),C;",
+                     "A),B;", "(A,B),C);", "((A,B),C;"):
+            for arrays in (False, True):
+                parser = NewickIO.Parser(StringIO(text))
+                self.assertRaises(NewickIO.NewickError, list,
+                                  parser.parse(arrays=arrays))
+
+    def test_from_parents(self):
+        """ArrayTree: arrays made from the parent of each clade."""
+        from Bio.Phylo.ArrayTree import ArrayTree
+        arrays = ArrayTree.from_parents([-1, 0, 1, 1, 0], [0, 1, 2, 3, 4],
+                                        [None, None, 'A', 'B', 'C'])
+        self.assertEqual(arrays.ends.tolist(), [5, 4, 3, 4, 5])
+        self.assertEqual(arrays.distance('A', 'B'), 5)
+        self.assertEqual(arrays.common_ancestor('A', 'B'), arrays.clades[1])
+        self.assertEqual(arrays.to_tree().count_terminals(), 3)
+        self.assertRaises(ValueError, ArrayTree.from_parents, [-1, 0, 2])
+        self.assertRaises(ValueError, ArrayTree.from_parents, [-1, 0, 1, 0, 2])
+        self.assertRaises(ValueError, ArrayTree.from_parents, [-1, -1])
+        self.assertRaises(ValueError, ArrayTree.from_parents, [-1, 0], [1])
+
 
 # ---------------------------------------------------------
 
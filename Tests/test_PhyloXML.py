@@ -601,6 +601,48 @@ class WriterTests(unittest.TestCase):
         finally:
             EX_DOLLO = orig_fname
 
+    def test_deep(self):
+        """Write and parse a tree deeper than the recursion limit."""
+        depth = 3000
+        root = clade = PX.Clade(branch_length=1.0, name='root')
+        for i in range(depth):
+            child = PX.Clade(branch_length=0.5, name='A%d' % i)
+            clade.clades = [child, PX.Clade(name='B%d' % i)]
+            clade = child
+        phx = PX.Phyloxml({}, phylogenies=[PX.Phylogeny(root=root)])
+        self.assertEqual(PhyloXMLIO.write(phx, DUMMY, indent=False), 1)
+        tree, = PhyloXMLIO.parse(DUMMY)
+        clade = tree.root
+        self.assertEqual(clade.name, 'root')
+        for i in range(depth):
+            self.assertEqual([child.name for child in clade.clades],
+                             ['A%d' % i, 'B%d' % i])
+            clade = clade.clades[0]
+            self.assertEqual(clade.branch_length, 0.5)
+        self.assertEqual(clade.clades, [])
+
+    def test_streaming(self):
+        """Write large clades incrementally, as a whole element tree would be."""
+        from xml.etree import ElementTree
+        root = clade = PX.Clade(name='root', id_source='r')
+        for i in range(300):
+            child = PX.Clade(branch_length=0.5, name='A%d' % i)
+            clade.clades = [child, PX.Clade(name='B%d' % i, width=2.0)]
+            clade.confidences = [PX.Confidence(0.9, 'bootstrap')]
+            clade = child
+        phx = PX.Phyloxml({}, phylogenies=[PX.Phylogeny(root=root,
+                                                        name='test'),
+                                           PX.Phylogeny()])
+        for indent in (False, True):
+            writer = PhyloXMLIO.Writer(phx)
+            elem = writer.phyloxml(phx)
+            if indent:
+                PhyloXMLIO._indent(elem)
+            expected = ElementTree.tostring(elem).decode('ascii')
+            self.assertEqual(writer.write(DUMMY, 'us-ascii', indent), 2)
+            with open(DUMMY) as handle:
+                self.assertEqual(handle.read(), expected)
+
 
 # ---------------------------------------------------------
 # Method tests
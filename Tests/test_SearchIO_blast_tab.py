@@ -8,9 +8,18 @@
 import os
 import unittest
 
-from Bio.SearchIO import parse
+from Bio._py3k import StringIO
+
+from Bio.SearchIO import parse, parse_rows, parse_columns
+from Bio.SearchIO import columns_to_qresults
+from Bio.SearchIO.BlastIO import BlastTabRowParser
 from Bio.SearchIO.BlastIO.blast_tab import _LONG_SHORT_MAP as all_fields
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # test case files are in the Blast directory
 TEST_DIR = 'Blast'
 FMT = 'blast-tab'
@@ -21,6 +30,41 @@ def get_file(filename):
     return os.path.join(TEST_DIR, filename)
 
 
+# test files with the keyword arguments needed to parse their rows
+ROW_TEST_FILES = [
+    ('tab_2228_tblastn_001.txt', {'columns': ['evalue', 'sallseqid', 'qseqid'],
+                                  'comments': True}),
+    ('tab_2228_tblastx_001.txt', {'columns': list(all_fields.values()),
+                                  'comments': True}),
+    ('tab_2226_tblastn_001.txt', {}),
+    ('tab_2226_tblastn_004.txt', {}),
+    ('tab_2226_tblastn_005.txt', {'comments': True}),
+    ('tab_2226_tblastn_008.txt', {'comments': True}),
+    ('tab_2226_tblastn_009.txt', {'columns': ('qseqid', 'sseqid')}),
+    ('tab_2226_tblastn_011.txt', {'comments': True}),
+    ('tab_2226_tblastn_013.txt', {'columns': "qseq std sseq"}),
+]
+
+
+def parse_kwargs(kwargs):
+    """Return the keyword arguments of parse for those of parse_rows."""
+    kwargs = dict(kwargs)
+    if 'columns' in kwargs:
+        kwargs['fields'] = kwargs.pop('columns')
+    return kwargs
+
+
+def field_value(qresult, hit, hsp, field):
+    """Return the object model value of a row parser field."""
+    level, attr = BlastTabRowParser.field_attrs[field]
+    obj = {'qresult': qresult, 'hit': hit, 'hsp': hsp, 'frag': hsp[0]}[level]
+    if attr == 'id_all':
+        return [hit.id] + hit.id_all[1:]
+    elif attr in ('query', 'hit'):
+        return str(getattr(obj, attr).seq)
+    return getattr(obj, attr)
+
+
 class BlastTabCases(unittest.TestCase):
     """Tests for the tab-separated BLAST parser."""
 
@@ -947,6 +991,172 @@ class BlastTabCases(unittest.TestCase):
         self.assertEqual(1, counter)
 
 
+class BlastTabRowCases(unittest.TestCase):
+    """Check the flat rows match the QueryResult objects."""
+
+    def test_rows(self):
+        for filename, kwargs in ROW_TEST_FILES:
+            tab_file = get_file(filename)
+            with open(tab_file) as handle:
+                fields = BlastTabRowParser(handle, **kwargs).fields
+            rows = parse_rows(tab_file, FMT, **kwargs)
+            for qresult in parse(tab_file, FMT, **parse_kwargs(kwargs)):
+                for hit in qresult:
+                    for hsp in hit:
+                        expected = tuple(field_value(qresult, hit, hsp, f)
+                                         for f in fields)
+                        self.assertEqual(next(rows), expected)
+            self.assertRaises(StopIteration, next, rows)
+
+    def test_field_names(self):
+        with open(get_file('tab_2226_tblastn_013.txt')) as handle:
+            parser = BlastTabRowParser(handle, columns="qseq std sseq")
+        self.assertEqual(parser.fields,
+                         ('query_seq', 'query_id', 'hit_id', 'ident_pct',
+                          'aln_span', 'mismatch_num', 'gapopen_num',
+                          'query_start', 'query_end', 'hit_start', 'hit_end',
+                          'evalue', 'bitscore', 'hit_seq', 'query_strand',
+                          'hit_strand'))
+
+    def test_reverse_strand(self):
+        handle = StringIO("q1\th1\t1\t10\t5\t1\t1e-10\n")
+        rows = list(parse_rows(handle, FMT,
+                               columns="qseqid sseqid qstart qend sstart "
+                                       "send evalue"))
+        self.assertEqual(rows, [('q1', 'h1', 0, 10, 0, 5, 1e-10, 1, -1)])
+
+    def test_selected_fields(self):
+        tab_file = get_file('tab_2226_tblastn_001.txt')
+        rows = list(parse_rows(tab_file, FMT))
+        with open(tab_file) as handle:
+            names = BlastTabRowParser(handle).fields
+        query_idx = names.index('query_id')
+        evalue_idx = names.index('evalue')
+        selected = list(parse_rows(tab_file, FMT,
+                                   fields=['query_id', 'evalue']))
+        self.assertEqual(selected, [(row[query_idx], row[evalue_idx])
+                                    for row in rows])
+        self.assertEqual(selected[0], ('gi|16080617|ref|NP_391444.1|', 1e-05))
+        # the strands and frames computed from the columns can be selected
+        handle = StringIO("q1\th1\t1\t10\t5\t1\t1e-10\n")
+        rows = list(parse_rows(handle, FMT,
+                               columns="qseqid sseqid qstart qend sstart "
+                                       "send evalue",
+                               fields=['hit_strand', 'hit_start']))
+        self.assertEqual(rows, [(-1, 0)])
+
+    def test_bad_fields(self):
+        tab_file = get_file('tab_2226_tblastn_009.txt')
+        # the file has only the qseqid and sseqid columns
+        self.assertRaises(ValueError, next,
+                          parse_rows(tab_file, FMT, columns="qseqid sseqid",
+                                     fields=['evalue']))
+        self.assertRaises(ValueError, next,
+                          parse_rows(tab_file, FMT, columns="qseqid sseqid",
+                                     fields=['e-value']))
+        self.assertRaises(TypeError, next,
+                          parse_rows(tab_file, FMT, columns="qseqid sseqid",
+                                     fields='query_id'))
+
+    def test_changed_columns(self):
+        handle = StringIO("""\
+# BLASTN 2.2.26+
+# Query: q1
+# Fields: query id, subject id, evalue
+# 1 hits found
+q1\th1\t1e-10
+# BLASTN 2.2.26+
+# Query: q2
+# Fields: query id, subject id, bit score
+# 1 hits found
+q2\th2\t40.5
+""")
+        rows = parse_rows(handle, FMT, comments=True)
+        self.assertRaises(ValueError, list, rows)
+
+    def test_unexpected_comments(self):
+        rows = parse_rows(get_file('tab_2226_tblastn_005.txt'), FMT)
+        self.assertRaises(ValueError, next, rows)
+
+
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class BlastTabColumnCases(unittest.TestCase):
+    """Check the columns, and the QueryResult objects built from them."""
+
+    def test_columns(self):
+        for filename, kwargs in ROW_TEST_FILES:
+            tab_file = get_file(filename)
+            rows = list(parse_rows(tab_file, FMT, **kwargs))
+            for chunk_size in (None, 1, 5):
+                chunks = list(parse_columns(tab_file, FMT,
+                                            chunk_size=chunk_size, **kwargs))
+                values = []
+                for chunk in chunks:
+                    with open(tab_file) as handle:
+                        fields = BlastTabRowParser(handle, **kwargs).fields
+                    self.assertEqual(sorted(chunk), sorted(fields))
+                    values.extend(zip(*[chunk[f].tolist() for f in fields]))
+                self.assertEqual(values, rows)
+
+    def test_column_types(self):
+        tab_file = get_file('tab_2228_tblastx_001.txt')
+        chunk = next(parse_columns(tab_file, FMT, comments=True,
+                                   columns=list(all_fields.values())))
+        self.assertEqual(chunk['evalue'].dtype, numpy.float64)
+        self.assertEqual(chunk['hit_start'].dtype, numpy.int64)
+        self.assertEqual(chunk['hit_id'].dtype, object)
+        self.assertEqual(chunk['hit_id_all'][0],
+                         ['gi|296147483|ref|NM_001183135.1|',
+                          'gi|116616412|gb|EF059095.1|'])
+
+    def test_qresults(self):
+        for filename, kwargs in ROW_TEST_FILES:
+            tab_file = get_file(filename)
+            with open(tab_file) as handle:
+                fields = BlastTabRowParser(handle, **kwargs).fields
+            expected = [qresult for qresult in
+                        parse(tab_file, FMT, **parse_kwargs(kwargs))
+                        if qresult]
+            for chunk_size in (None, 2):
+                chunks = parse_columns(tab_file, FMT, chunk_size=chunk_size,
+                                       **kwargs)
+                qresults = list(columns_to_qresults(chunks, FMT))
+                self.assertEqual(len(qresults), len(expected))
+                for qresult, exp_qresult in zip(qresults, expected):
+                    self.assertEqual(qresult.id, exp_qresult.id)
+                    self.assertEqual(qresult.hit_keys, exp_qresult.hit_keys)
+                    for hit, exp_hit in zip(qresult, exp_qresult):
+                        self.assertEqual(len(hit), len(exp_hit))
+                        for hsp, exp_hsp in zip(hit, exp_hit):
+                            for field in fields:
+                                self.assertEqual(
+                                    field_value(qresult, hit, hsp, field),
+                                    field_value(exp_qresult, exp_hit,
+                                                exp_hsp, field))
+                            for attr in ('query_strand', 'hit_strand',
+                                         'query_frame', 'hit_frame'):
+                                self.assertEqual(getattr(hsp, attr),
+                                                 getattr(exp_hsp, attr))
+
+    def test_selected_qresults(self):
+        tab_file = get_file('tab_2226_tblastn_001.txt')
+        chunk = next(parse_columns(tab_file, FMT))
+        wanted = chunk['evalue'] < 1e-50
+        chunk = dict((k, v[wanted]) for k, v in chunk.items())
+        qresults = list(columns_to_qresults(chunk, FMT))
+        self.assertEqual(len(qresults), 1)
+        self.assertEqual(qresults[0].id, 'gi|11464971:4-101')
+        self.assertEqual(len(qresults[0]), 4)
+        self.assertEqual(qresults[0].hsps[0].evalue, 2e-67)
+
+    def test_unsupported_format(self):
+        chunk = next(parse_columns(get_file('tab_2226_tblastn_001.txt'), FMT))
+        self.assertRaises(ValueError, list,
+                          columns_to_qresults(chunk, 'blast-xml'))
+        del chunk['query_id']
+        self.assertRaises(ValueError, list, columns_to_qresults(chunk, FMT))
+
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity=2)
     unittest.main(testRunner=runner)
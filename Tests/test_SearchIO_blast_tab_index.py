@@ -5,8 +5,19 @@
 
 """Tests for SearchIO blast-tab indexing."""
 
+import os
+import shutil
+import tempfile
 import unittest
 
+try:
+    import sqlite3
+except ImportError:
+    # Python 3 without sqlite3 compiled in
+    sqlite3 = None
+
+from Bio import SearchIO
+
 from search_tests_common import CheckRaw, CheckIndex
 
 
@@ -169,6 +180,64 @@ class BlastTabIndexCases(CheckIndex):
         self.check_index(filename, self.fmt, comments=True)
 
 
+@unittest.skipIf(sqlite3 is None, "sqlite3 not available")
+class BlastTabIndexDbCases(unittest.TestCase):
+    """Check building blast-tab index_db with several processes, and updating it."""
+
+    fmt = 'blast-tab'
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="biopython-test")
+        self.index_file = os.path.join(self.temp_dir, "temp.idx")
+        with open('Blast/tab_2226_tblastn_007.txt') as handle:
+            data = handle.read()
+        # copies of the same file, with distinct query IDs
+        self.files = []
+        for i in range(3):
+            filename = os.path.join(self.temp_dir, "%i.txt" % i)
+            with open(filename, "w") as handle:
+                handle.write(data.replace("gi|", "file%i|" % i))
+            self.files.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def check_index(self, files):
+        expected = {}
+        for filename in files:
+            for qresult in SearchIO.parse(filename, self.fmt, comments=True):
+                expected[qresult.id] = qresult
+        idx = SearchIO.index_db(self.index_file, comments=True)
+        self.assertEqual(sorted(idx), sorted(expected))
+        for key, qresult in expected.items():
+            self.assertEqual(len(idx[key]), len(qresult))
+            self.assertEqual(idx[key].hit_keys, qresult.hit_keys)
+        idx.close()
+        idx._con.close()  # hack for PyPy
+
+    def test_parallel(self):
+        """Test blast-tab index_db using two processes."""
+        idx = SearchIO.index_db(self.index_file, self.files, self.fmt,
+                                processes=2, comments=True)
+        self.assertEqual(len(idx), 3)
+        idx.close()
+        idx._con.close()  # hack for PyPy
+        self.check_index(self.files)
+
+    def test_update(self):
+        """Test updating a blast-tab index_db after adding a file."""
+        idx = SearchIO.index_db(self.index_file, self.files[:2], self.fmt,
+                                comments=True)
+        idx.close()
+        idx._con.close()  # hack for PyPy
+        idx = SearchIO.index_db(self.index_file, self.files, self.fmt,
+                                update=True, comments=True)
+        self.assertEqual(len(idx), 3)
+        idx.close()
+        idx._con.close()  # hack for PyPy
+        self.check_index(self.files)
+
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity=2)
     unittest.main(testRunner=runner)
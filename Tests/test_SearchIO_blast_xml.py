@@ -11,7 +11,12 @@ import unittest
 import warnings
 
 from Bio import BiopythonParserWarning
-from Bio.SearchIO import parse
+from Bio.SearchIO import parse, parse_rows, parse_columns
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 # test case files are in the Blast directory
@@ -3258,6 +3263,104 @@ class BlastXmlSpecialCases(unittest.TestCase):
         self.assertEqual(qresult.blast_id, 'Query_1')
 
 
+class BlastXmlRowCases(unittest.TestCase):
+    """Check the flat rows match the QueryResult objects."""
+
+    fields = ('query_id', 'query_description', 'query_seq_len', 'hit_id',
+              'hit_description', 'hit_accession', 'hit_seq_len', 'bitscore',
+              'bitscore_raw', 'evalue', 'ident_num', 'pos_num', 'gap_num',
+              'query_start', 'query_end', 'hit_start', 'hit_end',
+              'query_frame', 'hit_frame', 'aln_span', 'query_seq', 'hit_seq',
+              'similarity')
+
+    def expected_rows(self, xml_file, **kwargs):
+        rows = []
+        for qresult in parse(xml_file, FMT, **kwargs):
+            for hit in qresult:
+                for hsp in hit:
+                    frag = hsp[0]
+                    rows.append((
+                        qresult.id, qresult.description, qresult.seq_len,
+                        hit.id, hit.description, hit.accession, hit.seq_len,
+                        hsp.bitscore, hsp.bitscore_raw, hsp.evalue,
+                        hsp.ident_num, hsp.pos_num, hsp.gap_num,
+                        frag.query_start, frag.query_end,
+                        frag.hit_start, frag.hit_end,
+                        frag.query_frame, frag.hit_frame, frag.aln_span,
+                        str(frag.query.seq), str(frag.hit.seq),
+                        frag.aln_annotation['similarity']))
+        return rows
+
+    def check_rows(self, filename, **kwargs):
+        xml_file = get_file(filename)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', BiopythonParserWarning)
+            expected = self.expected_rows(xml_file, **kwargs)
+            rows = list(parse_rows(xml_file, FMT, fields=self.fields,
+                                   **kwargs))
+        self.assertEqual(len(rows), len(expected))
+        for row, exp in zip(rows, expected):
+            self.assertEqual(row, exp)
+
+    def test_rows(self):
+        for filename in ('xml_2212L_blastn_001.xml',
+                         'xml_2226_blastp_004.xml',
+                         'xml_2226_tblastx_004.xml',
+                         'xml_2222_blastx_001.xml',
+                         'mirna.xml'):
+            self.check_rows(filename)
+
+    def test_rows_raw_ids(self):
+        self.check_rows('xml_2226_blastn_006.xml', use_raw_query_ids=True,
+                        use_raw_hit_ids=True)
+
+    def test_default_fields(self):
+        rows = parse_rows(get_file('xml_2226_blastp_004.xml'), FMT)
+        self.assertEqual(next(rows),
+                         ('gi|11464971:4-101', 'gi|11464971|ref|NP_062422.1|',
+                          2.24956e-69, 205.682, 0, 98, 3, 101))
+
+    def test_duplicate_hit_ids(self):
+        xml_file = get_file('xml_2226_blastn_006.xml')
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always', BiopythonParserWarning)
+            hit_ids = [row[0] for row in parse_rows(xml_file, FMT,
+                                                    fields=['hit_id'])]
+        self.assertEqual(len(w), 1)
+        self.assertEqual(len(hit_ids), len(set(hit_ids)))
+
+    def test_unknown_field(self):
+        rows = parse_rows(get_file('mirna.xml'), FMT, fields=['e-value'])
+        self.assertRaises(ValueError, next, rows)
+
+
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class BlastXmlColumnCases(unittest.TestCase):
+
+    def test_columns(self):
+        xml_file = get_file('mirna.xml')
+        fields = ['query_id', 'evalue', 'hit_start', 'query_frame']
+        rows = list(parse_rows(xml_file, FMT, fields=fields))
+        chunks = list(parse_columns(xml_file, FMT, fields=fields,
+                                    chunk_size=100))
+        self.assertEqual([len(c['evalue']) for c in chunks], [100, 100, 77])
+        self.assertEqual(chunks[0]['evalue'].dtype, numpy.float64)
+        self.assertEqual(chunks[0]['hit_start'].dtype, numpy.int64)
+        self.assertEqual(chunks[0]['query_id'].dtype, object)
+        for i, field in enumerate(fields):
+            values = numpy.concatenate([c[field] for c in chunks])
+            self.assertEqual(list(values), [row[i] for row in rows])
+
+    def test_single_chunk(self):
+        chunks = list(parse_columns(get_file('mirna.xml'), FMT))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(len(chunks[0]['hit_id']), 277)
+
+    def test_bad_chunk_size(self):
+        chunks = parse_columns(get_file('mirna.xml'), FMT, chunk_size=0)
+        self.assertRaises(ValueError, next, chunks)
+
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity=2)
     unittest.main(testRunner=runner)
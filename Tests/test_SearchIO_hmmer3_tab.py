@@ -9,7 +9,14 @@
 import os
 import unittest
 
-from Bio.SearchIO import parse
+from Bio.SearchIO import parse, parse_rows, parse_columns
+from Bio.SearchIO import columns_to_qresults
+from Bio.SearchIO.HmmerIO import Hmmer3TabRowParser
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 # test case files are in the Blast directory
@@ -486,6 +493,78 @@ class HmmsearchCases(unittest.TestCase):
         self.assertEqual(0.0, hsp.bias)
 
 
+class Hmmer3TabRowCases(unittest.TestCase):
+    """Check the flat rows and columns match the QueryResult objects."""
+
+    def check_rows(self, tab_file, fmt, parser):
+        fields = [spec[0] for spec in parser._row_fields]
+        rows = list(parse_rows(tab_file, fmt))
+        expected = []
+        for qresult in parse(tab_file, fmt):
+            for hit in qresult:
+                for hsp in hit:
+                    objects = {'qresult': qresult, 'hit': hit, 'hsp': hsp,
+                               'frag': hsp[0]}
+                    expected.append(tuple(
+                        getattr(objects[parser.field_attrs[f][0]],
+                                parser.field_attrs[f][1]) for f in fields))
+        self.assertEqual(rows, expected)
+        # and with only some of the fields
+        rows = parse_rows(tab_file, fmt, fields=['evalue', 'hit_id'])
+        self.assertEqual(list(rows), [(row[fields.index('evalue')],
+                                       row[fields.index('hit_id')])
+                                      for row in expected])
+
+    def test_rows(self):
+        for filename in ('tab_31b1_hmmscan_001.out', 'tab_30_hmmscan_001.out',
+                         'tab_30_hmmscan_002.out', 'tab_30_hmmscan_004.out',
+                         'tab_31b1_hmmsearch_001.out'):
+            self.check_rows(get_file(filename), FMT, Hmmer3TabRowParser)
+
+    def test_bad_fields(self):
+        tab_file = get_file('tab_30_hmmscan_001.out')
+        self.assertRaises(ValueError, list,
+                          parse_rows(tab_file, FMT, fields=['hit_start']))
+        self.assertRaises(TypeError, list,
+                          parse_rows(tab_file, FMT, fields='hit_id'))
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_columns(self):
+        for filename in ('tab_31b1_hmmscan_001.out', 'tab_30_hmmscan_001.out',
+                         'tab_30_hmmscan_002.out', 'tab_30_hmmscan_004.out',
+                         'tab_31b1_hmmsearch_001.out'):
+            self.check_columns(get_file(filename), FMT,
+                               Hmmer3TabRowParser)
+
+    def check_columns(self, tab_file, fmt, parser):
+        fields = [spec[0] for spec in parser._row_fields]
+        rows = list(parse_rows(tab_file, fmt))
+        for chunk_size in (None, 1, 3):
+            values = []
+            for chunk in parse_columns(tab_file, fmt, chunk_size=chunk_size):
+                self.assertEqual(sorted(chunk), sorted(fields))
+                values.extend(zip(*[chunk[f].tolist() for f in fields]))
+            self.assertEqual(values, rows)
+        expected = list(parse(tab_file, fmt))
+        chunks = parse_columns(tab_file, fmt, chunk_size=2)
+        qresults = list(columns_to_qresults(chunks, fmt))
+        self.assertEqual(len(qresults), len(expected))
+        for qresult, exp_qresult in zip(qresults, expected):
+            self.assertEqual(qresult.id, exp_qresult.id)
+            self.assertEqual(qresult.accession, exp_qresult.accession)
+            self.assertEqual(qresult.hit_keys, exp_qresult.hit_keys)
+            for hit, exp_hit in zip(qresult, exp_qresult):
+                self.assertEqual(hit.description, exp_hit.description)
+                self.assertEqual(hit.evalue, exp_hit.evalue)
+                self.assertEqual(len(hit), len(exp_hit))
+                for hsp, exp_hsp in zip(hit, exp_hit):
+                    for attr in ('evalue', 'bitscore', 'query_start',
+                                 'query_end', 'hit_start', 'hit_end',
+                                 'query_strand', 'hit_strand'):
+                        self.assertEqual(getattr(hsp, attr, None),
+                                         getattr(exp_hsp, attr, None))
+
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity=2)
     unittest.main(testRunner=runner)
@@ -14,6 +14,7 @@ except ImportError:
 
 import sys
 import os
+import shutil
 import unittest
 import tempfile
 import gzip
@@ -632,6 +633,131 @@ class IndexOrderingSingleFile(unittest.TestCase):
 
 
 if sqlite3:
+    class IndexDbParallelUpdate(unittest.TestCase):
+        """Check building index_db with several processes, and updating it."""
+
+        def setUp(self):
+            self.temp_dir = tempfile.mkdtemp(prefix="biopython-test")
+            self.index_file = os.path.join(self.temp_dir, "temp.idx")
+            self.files = []
+            for i, f in enumerate(["GenBank/NC_000932.faa",
+                                   "GenBank/NC_005816.faa",
+                                   "Fasta/f002"]):
+                filename = os.path.join(self.temp_dir, "%i.fasta" % i)
+                with open(f) as in_handle:
+                    with open(filename, "w") as out_handle:
+                        out_handle.write(in_handle.read())
+                self.files.append(filename)
+            self.scanned = []
+
+        def tearDown(self):
+            shutil.rmtree(self.temp_dir)
+
+        def key_function(self, name):
+            """Record which identifiers are scanned."""
+            self.scanned.append(name)
+            return name
+
+        def expected_ids(self, files):
+            ids = []
+            for f in files:
+                ids.extend(r.id for r in SeqIO.parse(f, "fasta"))
+            return ids
+
+        def check_index(self, d, files):
+            ids = self.expected_ids(files)
+            self.assertEqual(len(d), len(ids))
+            self.assertEqual(list(d), ids)
+            for f in files:
+                for record in SeqIO.parse(f, "fasta"):
+                    self.assertEqual(str(d[record.id].seq), str(record.seq))
+                    self.assertEqual(d.get_raw(record.id).count(b">"), 1)
+            d._con.close()  # hack for PyPy
+            d.close()
+
+        def test_parallel(self):
+            """Check building the index with several processes."""
+            d = SeqIO.index_db(self.index_file, self.files, "fasta",
+                               processes=2)
+            self.check_index(d, self.files)
+            d = SeqIO.index_db(":memory:", self.files, "fasta",
+                               key_function=add_prefix, processes=None)
+            self.assertEqual(list(d), [add_prefix(i) for i in
+                                       self.expected_ids(self.files)])
+            d.close()
+
+        def test_parallel_duplicates(self):
+            """Check duplicate keys are caught with several processes."""
+            self.assertRaises(ValueError, SeqIO.index_db, ":memory:",
+                              [self.files[0], self.files[0]], "fasta",
+                              processes=2)
+
+        def test_bad_processes(self):
+            """Check invalid numbers of processes are rejected."""
+            for processes in (0, -1, 1.5, "2"):
+                self.assertRaises(ValueError, SeqIO.index_db, ":memory:",
+                                  self.files, "fasta", processes=processes)
+
+        def test_update_unchanged(self):
+            """Check updating an index with no changes scans nothing."""
+            d = SeqIO.index_db(self.index_file, self.files, "fasta")
+            d.close()
+            d = SeqIO.index_db(self.index_file, self.files, "fasta",
+                               key_function=self.key_function, update=True)
+            self.assertEqual(self.scanned, [])
+            self.check_index(d, self.files)
+
+        def test_update(self):
+            """Check updating an index rescans only the changed files."""
+            d = SeqIO.index_db(self.index_file, self.files[:2], "fasta")
+            d.close()
+            # Replace the second file, making it smaller,
+            with open(self.files[1], "w") as handle:
+                handle.write(">new1\nACGT\n>new2\nGGGG\n")
+            # and add another file, while dropping the first.
+            files = [self.files[2], self.files[1]]
+            rescanned = files
+            for processes in (1, 2):
+                self.scanned = []
+                d = SeqIO.index_db(self.index_file, files,
+                                   key_function=self.key_function,
+                                   processes=processes, update=True)
+                self.assertEqual(sorted(self.scanned),
+                                 sorted(self.expected_ids(rescanned)))
+                self.check_index(d, files)
+                # Updating again should have nothing to do
+                self.scanned = []
+                d = SeqIO.index_db(self.index_file, files, update=True,
+                                   key_function=self.key_function)
+                self.assertEqual(self.scanned, [])
+                self.check_index(d, files)
+                # then put back the first file, which alone needs scanning
+                files = [self.files[0]] + files
+                rescanned = self.files[:1]
+            # Reloading without update still works as before
+            d = SeqIO.index_db(self.index_file)
+            self.check_index(d, self.files[:1] + [self.files[2],
+                                                  self.files[1]])
+
+        def test_update_old_index(self):
+            """Check updating an index without the file sizes and times."""
+            index_file = os.path.join(self.temp_dir, "triple_sff.idx")
+            shutil.copy("Roche/triple_sff_rel_paths.idx", index_file)
+            for f in ["E3MFGYR02_no_manifest.sff", "greek.sff", "paired.sff"]:
+                shutil.copy(os.path.join("Roche", f), self.temp_dir)
+            d = SeqIO.index_db(index_file, update=True)
+            self.assertEqual(395, len(d["alpha"]))
+            d._con.close()  # hack for PyPy
+            d.close()
+            # Now the sizes and times have been recorded
+            self.scanned = []
+            d = SeqIO.index_db(index_file, update=True,
+                               key_function=self.key_function)
+            self.assertEqual(self.scanned, [])
+            self.assertEqual(395, len(d["alpha"]))
+            d._con.close()  # hack for PyPy
+            d.close()
+
     class IndexOrderingManyFiles(unittest.TestCase):
         def test_order_index_db(self):
             """Check index_db preserves order in multiple indexed files."""
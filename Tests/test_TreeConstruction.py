@@ -5,7 +5,9 @@
 
 """Unit tests for the Bio.Phylo.TreeConstruction module."""
 
+import copy
 import os
+import random
 import unittest
 import tempfile
 
@@ -22,6 +24,12 @@ from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
 from Bio.Phylo.TreeConstruction import ParsimonyScorer
 from Bio.Phylo.TreeConstruction import NNITreeSearcher
 from Bio.Phylo.TreeConstruction import ParsimonyTreeConstructor
+from Bio.Phylo.TreeConstruction import _ParsimonyStates
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 temp_dir = tempfile.mkdtemp()
@@ -153,6 +161,33 @@ class DistanceCalculatorTest(unittest.TestCase):
         self.assertEqual(dmat['Alpha', 'Alpha'], 0.)
         self.assertAlmostEqual(dmat['Alpha', 'Gamma'], 4. / 5.)
 
+    def test_pairwise(self):
+        """Check all the distances match the pairwise calculation."""
+        aln = AlignIO.read('TreeConstruction/msa.phy', 'phylip')
+        aln.append(aln[0][:6] + aln[1][6:9] + "-*-*")
+        aln[-1].id = "Zeta"
+        for model in ('identity', 'blastn', 'trans', 'blosum62', 'pam250'):
+            calculator = DistanceCalculator(model)
+            dm = calculator.get_distance(aln)
+            for i in range(len(aln)):
+                for j in range(i):
+                    self.assertEqual(dm[i, j],
+                                     calculator._pairwise(aln[i], aln[j]))
+
+    def test_bad_alphabet(self):
+        aln = AlignIO.read(StringIO(">Alpha\nACGT\n>Beta\nACGU"), "fasta")
+        self.assertRaises(ValueError,
+                          DistanceCalculator('blastn').get_distance, aln)
+        # Letters are only checked where the other sequence is not skipped
+        aln = AlignIO.read(StringIO(">Alpha\nACGU\n>Beta\nACG-\n"
+                                    ">Gamma\nAGG*"), "fasta")
+        calculator = DistanceCalculator('blastn')
+        dm = calculator.get_distance(aln)
+        for i in range(len(aln)):
+            for j in range(i):
+                self.assertEqual(dm[i, j],
+                                 calculator._pairwise(aln[i], aln[j]))
+
 
 class DistanceTreeConstructorTest(unittest.TestCase):
     """Test DistanceTreeConstructor."""
@@ -193,6 +228,47 @@ class DistanceTreeConstructorTest(unittest.TestCase):
         ref_min_tree = Phylo.read('./TreeConstruction/nj_min.tre', 'newick')
         self.assertTrue(Consensus._equal_topology(min_tree, ref_min_tree))
 
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_array_methods(self):
+        """Check the NumPy based methods give the same trees."""
+        names = ["Taxon%i" % i for i in range(12)]
+        matrix = [[(i * 7 + j * 13) % 10 + (i + j) % 3 * 0.25
+                   for j in range(i)] + [0] for i in range(12)]
+        dm = DistanceMatrix(names, matrix)
+        trees = [self.constructor.upgma(dm),
+                 self.constructor._upgma_python(dm),
+                 self.constructor.nj(dm),
+                 self.constructor.nj(dm, prune=False),
+                 self.constructor._nj_python(dm)]
+        self.assertEqual(dm.matrix, matrix)
+        self.assertEqual(str(trees[0]), str(trees[1]))
+        self.assertEqual(str(trees[2]), str(trees[3]))
+        self.assertEqual(str(trees[2]), str(trees[4]))
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_nj_random(self):
+        """Check the NumPy based NJ gives the same trees on random matrices."""
+        rng = random.Random(39)
+        for trial in range(60):
+            # sizes up to 40 also test dropping the joined rows
+            size = rng.randint(3, 40)
+            if trial % 3 == 0:
+                values = [rng.random() for i in range(size * size)]
+            elif trial % 3 == 1:
+                # tied distances
+                values = [rng.randint(1, 4) for i in range(size * size)]
+            else:
+                # tied distances, which are also rounded
+                values = [rng.randint(0, 6) / 3.0 for i in range(size * size)]
+            names = ["Taxon%i" % i for i in range(size)]
+            matrix = [values[i * size:i * size + i] + [0]
+                      for i in range(size)]
+            dm = DistanceMatrix(names, matrix)
+            expected = str(self.constructor._nj_python(dm))
+            self.assertEqual(str(self.constructor.nj(dm)), expected)
+            self.assertEqual(str(self.constructor.nj(dm, prune=False)),
+                             expected)
+
     def test_built_tree(self):
         tree = self.constructor.build_tree(self.aln)
         self.assertTrue(isinstance(tree, BaseTree.Tree))
@@ -272,6 +348,31 @@ class NNITreeSearcherTest(unittest.TestCase):
         self.assertEqual(len(trees), 2 * (5 - 3))
         Phylo.write(trees, os.path.join(temp_dir, 'neighbor_trees.tre'), 'newick')
 
+    def test_incremental_scores(self):
+        aln = AlignIO.read('TreeConstruction/msa.phy', 'phylip')
+        alphabet = ['A', 'T', 'C', 'G']
+        step_matrix = [[0],
+                       [2.5, 0],
+                       [2.5, 1, 0],
+                       [1, 2.5, 2.5, 0]]
+        for matrix in (None, _Matrix(alphabet, step_matrix)):
+            scorer = ParsimonyScorer(matrix)
+            searcher = NNITreeSearcher(scorer)
+            for filename in ('upgma.tre', 'nj.tre'):
+                tree = Phylo.read('./TreeConstruction/' + filename, 'newick')
+                states = _ParsimonyStates(tree, aln, matrix)
+                self.assertEqual(states.score, scorer.get_score(tree, aln))
+                swaps = searcher._get_swaps(tree)
+                neighbors = searcher._get_neighbors(tree)
+                self.assertEqual(len(swaps), len(neighbors))
+                for swap, neighbor in zip(swaps, neighbors):
+                    self.assertEqual(states.swap_score(*swap),
+                                     scorer.get_score(neighbor, aln))
+                # same tree as when rescoring all neighbor trees
+                best_tree = searcher.search(copy.deepcopy(tree), aln)
+                ref_tree = searcher._nni_rescoring(copy.deepcopy(tree), aln)
+                self.assertEqual(str(best_tree), str(ref_tree))
+
 
 class ParsimonyTreeConstructorTest(unittest.TestCase):
     """Test ParsimonyTreeConstructor."""
@@ -0,0 +1,140 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Unit tests for the Bio.Phylo.TreeDistance module."""
+
+import itertools
+import math
+import random
+import unittest
+
+from Bio._py3k import StringIO
+
+from Bio import Phylo
+from Bio.Phylo import BaseTree, TreeDistance
+from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
+
+
+def _read(text):
+    """Read a tree from a Newick string."""
+    return Phylo.read(StringIO(text), 'newick')
+
+
+def _random_tree(names, rng):
+    """Join the terminals at random into a tree with branch lengths."""
+    clades = [BaseTree.Clade(rng.random(), name) for name in names]
+    while len(clades) > 3:
+        rng.shuffle(clades)
+        clades.append(BaseTree.Clade(rng.random(),
+                                     clades=[clades.pop(), clades.pop()]))
+    return BaseTree.Tree(BaseTree.Clade(clades=clades), rooted=False)
+
+
+class PairwiseTests(unittest.TestCase):
+    """Distances between two trees."""
+
+    def test_unrooted(self):
+        """Distances of two unrooted trees."""
+        tree1 = _read("((A:1,B:2):3,(C:4,D:5):6,E:7);")
+        tree2 = _read("((A:1,C:2):3,(B:4,D:5):6,E:7);")
+        self.assertEqual(TreeDistance.robinson_foulds(tree1, tree2), 4)
+        self.assertEqual(TreeDistance.robinson_foulds(tree1, tree1), 0)
+        self.assertEqual(
+            TreeDistance.weighted_robinson_foulds(tree1, tree2), 22)
+        self.assertAlmostEqual(TreeDistance.branch_score(tree1, tree2),
+                               math.sqrt(98))
+        self.assertEqual(TreeDistance.branch_score(tree2, tree2), 0)
+
+    def test_rooted(self):
+        """Trees which differ only in their roots."""
+        tree1 = _read("((A:1,B:1):1,(C:1,(D:1,E:1):1):1);")
+        tree2 = _read("(((A:1,B:1):1,C:1):1,(D:1,E:1):1);")
+        self.assertEqual(TreeDistance.robinson_foulds(tree1, tree2), 0)
+        self.assertEqual(
+            TreeDistance.robinson_foulds(tree1, tree2, rooted=True), 2)
+        # the branches either side of the root are a single branch, of
+        # length 2 in one tree and 1 in the other
+        self.assertEqual(
+            TreeDistance.weighted_robinson_foulds(tree1, tree2), 2)
+        self.assertEqual(
+            TreeDistance.weighted_robinson_foulds(tree1, tree2, True), 2)
+
+    def test_rerooted(self):
+        """Rerooting does not change the unrooted distances."""
+        rng = random.Random(7)
+        names = ["T%d" % i for i in range(20)]
+        tree1 = _random_tree(names, rng)
+        tree2 = _random_tree(names, rng)
+        expected = TreeDistance.branch_score(tree1, tree2)
+        for name in ("T0", "T5", "T19"):
+            rerooted = _random_tree(names, random.Random(7))
+            rerooted.root_with_outgroup(name)
+            self.assertEqual(TreeDistance.robinson_foulds(tree1, rerooted),
+                             0)
+            self.assertAlmostEqual(
+                TreeDistance.branch_score(rerooted, tree2), expected)
+
+    def test_terminals(self):
+        """Trees should have the same terminals."""
+        tree1 = _read("((A,B),(C,D));")
+        for text in ("((A,B),(C,E));", "((A,B),C);", "((A,B),(C,D,D));"):
+            self.assertRaises(ValueError, TreeDistance.robinson_foulds,
+                              tree1, _read(text))
+
+
+class MatrixTests(unittest.TestCase):
+    """Distance matrices of many trees."""
+
+    def setUp(self):
+        rng = random.Random(42)
+        names = ["T%d" % i for i in range(12)]
+        self.trees = [_random_tree(names, rng) for i in range(15)]
+
+    def test_matrix(self):
+        """Matrices match the pairwise distances."""
+        functions = {
+            'rf': TreeDistance.robinson_foulds,
+            'weighted_rf': TreeDistance.weighted_robinson_foulds,
+            'branch_score': TreeDistance.branch_score,
+        }
+        for method, function in functions.items():
+            for rooted in (False, True):
+                dm = TreeDistance.distance_matrix(self.trees, method, rooted)
+                self.assertEqual(dm.names[:2], ["Tree1", "Tree2"])
+                for i, j in itertools.combinations(range(len(self.trees)),
+                                                   2):
+                    self.assertAlmostEqual(
+                        dm[i, j],
+                        function(self.trees[i], self.trees[j], rooted))
+
+    def test_processes(self):
+        """Matrices calculated in parallel."""
+        names = ["G%d" % i for i in range(len(self.trees))]
+        dm = TreeDistance.distance_matrix(self.trees, 'branch_score',
+                                          names=names)
+        dm2 = TreeDistance.distance_matrix(self.trees, 'branch_score',
+                                           names=names, processes=2)
+        self.assertEqual(dm2.names, names)
+        self.assertEqual(dm2.matrix, dm.matrix)
+        self.assertRaises(ValueError, TreeDistance.distance_matrix,
+                          self.trees, processes=0)
+        self.assertRaises(ValueError, TreeDistance.distance_matrix,
+                          self.trees, 'quartet')
+
+    def test_constructor(self):
+        """A tree of the trees."""
+        trees = list(Phylo.parse('TreeConstruction/trees.tre', 'newick'))
+        dm = TreeDistance.distance_matrix(trees, rooted=True)
+        self.assertEqual(dm.matrix, [[0], [2, 0], [2, 4, 0]])
+        dm = TreeDistance.distance_matrix(trees)
+        self.assertEqual(dm.matrix, [[0], [2, 0], [0, 2, 0]])
+        tree = DistanceTreeConstructor().upgma(dm)
+        self.assertEqual(sorted(term.name for term in tree.get_terminals()),
+                         ["Tree1", "Tree2", "Tree3"])
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -14,8 +14,14 @@ from Bio.Alphabet import generic_dna
 from Bio.Alphabet import Gapped
 from Bio.Alphabet import IUPAC
 from Bio import motifs
+from Bio.motifs import matrix
 from Bio.Seq import Seq
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class MotifTestsBasic(unittest.TestCase):
     """Basic motif tests."""
@@ -1983,6 +1989,76 @@ class MotifTestPWM(unittest.TestCase):
         self.assertAlmostEqual(result[5], -25.18009186, places=5)
         self.assertTrue(math.isnan(result[6]), "Expected nan, not %r" % result[6])
 
+    def test_search(self):
+        """Test Bio.motifs PWM search on both strands."""
+        pssm = self.m.counts.normalize(pseudocounts=0.25).log_odds()
+        rc = pssm.reverse_complement()
+        seq = Seq("ACGTGTGCGTAGTGCGTCCATATAAGGNCCTTTTTGGAC" * 3,
+                  self.m.alphabet)
+        n = len(seq)
+        forward = pssm.calculate(seq)
+        reverse = rc.calculate(seq)
+        for threshold in (-30.0, -20.0, 0.0):
+            expected = []
+            for position in range(n - pssm.length + 1):
+                if forward[position] > threshold:
+                    expected.append((position, forward[position]))
+                if reverse[position] > threshold:
+                    expected.append((position - n, reverse[position]))
+            hits = list(pssm.search(seq, threshold))
+            self.assertEqual(len(hits), len(expected))
+            for (position, score), (position2, score2) in zip(hits, expected):
+                self.assertEqual(position, position2)
+                self.assertAlmostEqual(score, score2, places=5)
+            hits = list(pssm.search(seq, threshold, both=False))
+            self.assertEqual([position for position, score in hits],
+                             [position for position, score in expected
+                              if position >= 0])
+        self.assertEqual(list(pssm.search(seq[:5])), [])
+
+    def test_search_pvalue(self):
+        """Test Bio.motifs PWM search with a p-value threshold."""
+        pssm = self.m.counts.normalize(pseudocounts=0.25).log_odds()
+        seq = Seq("ACGTGTGCGTAGTGCGTCCATATAAGGNCCTTTTTGGAC" * 3,
+                  self.m.alphabet)
+        distribution = pssm.distribution(precision=100)
+        background = {"A": 0.3, "C": 0.2, "G": 0.2, "T": 0.3}
+        for pvalue in (0.5, 0.01):
+            threshold = distribution.threshold_fpr(pvalue)
+            self.assertEqual(list(pssm.search(seq, pvalue=pvalue)),
+                             list(pssm.search(seq, threshold)))
+            distribution = pssm.distribution(background, precision=100)
+            threshold = distribution.threshold_fpr(pvalue)
+            self.assertEqual(list(pssm.search(seq, pvalue=pvalue,
+                                              background=background)),
+                             list(pssm.search(seq, threshold)))
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_scan(self):
+        """Test Bio.motifs PWM scan returning arrays."""
+        pssm = self.m.counts.normalize(pseudocounts=0.25).log_odds()
+        seq = Seq("ACGTGTGCGTAGTGCGTCCATATAAGGNCCTTTTTGGAC" * 3,
+                  self.m.alphabet)
+        n = len(seq)
+        positions, strands, scores = pssm.scan(seq, -20.0)
+        self.assertEqual(positions.dtype, numpy.int64)
+        self.assertEqual(strands.dtype, numpy.int8)
+        self.assertEqual(scores.dtype, numpy.float32)
+        hits = list(pssm.search(seq, -20.0))
+        self.assertEqual(len(positions), len(hits))
+        self.assertEqual(sorted(set(strands.tolist())), [-1, 1])
+        for position, strand, score, hit in zip(positions, strands, scores,
+                                                hits):
+            if strand == 1:
+                self.assertEqual(position, hit[0])
+            else:
+                self.assertEqual(position - n, hit[0])
+            self.assertEqual(score, hit[1])
+        positions, strands, scores = pssm.scan(seq, 1000.0)
+        self.assertEqual(len(positions), 0)
+        self.assertEqual(len(strands), 0)
+        self.assertEqual(len(scores), 0)
+
     def test_mixed_alphabets(self):
         """Test creating motif with mixed alphabets."""
         # TODO - Can we support this?
@@ -1997,6 +2073,310 @@ class MotifTestPWM(unittest.TestCase):
         self.assertRaises(ValueError, motifs.create, seqs)
 
 
+class MotifTestInstances(unittest.TestCase):
+    """Tests for searching for exact matches to the motif instances."""
+
+    def setUp(self):
+        """Define motif and sequence for tests."""
+        instances = [Seq("TACAA"), Seq("TACGC"), Seq("TACAC"), Seq("TACCC"),
+                     Seq("AACCC"), Seq("AATGC"), Seq("AATGC")]
+        self.m = motifs.create(instances)
+        self.s = Seq("TACACTGCATTACAACCCAAGCATTA", self.m.alphabet)
+
+    def test_search(self):
+        """Test searching for the instances on the forward strand."""
+        hits = list(self.m.instances.search(self.s))
+        self.assertEqual([(pos, str(seq)) for pos, seq in hits],
+                         [(0, "TACAC"), (10, "TACAA"), (13, "AACCC")])
+        self.assertTrue(hits[0][1] is self.m.instances[2])
+        self.assertEqual(list(self.m.instances.search("TACGTACG")), [])
+        self.assertEqual(list(self.m.instances.search("TACA")), [])
+
+    def test_search_duplicates(self):
+        """Test only the first identical instance is returned."""
+        hits = list(self.m.instances.search(Seq("GAATGCC")))
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0][0], 1)
+        self.assertTrue(hits[0][1] is self.m.instances[5])
+
+    def test_search_both(self):
+        """Test searching for the instances on both strands at once."""
+        hits = list(self.m.instances.search(self.s, both=True))
+        self.assertEqual([(pos, str(seq)) for pos, seq in hits],
+                         [(0, "TACAC"), (-20, "AATGC"), (10, "TACAA"),
+                          (13, "AACCC"), (-6, "AATGC")])
+        for pos, seq in hits:
+            if pos < 0:
+                self.assertEqual(str(self.s[pos:pos + 5]),
+                                 str(seq.reverse_complement()))
+        reverse = self.m.instances.reverse_complement()
+        self.assertEqual([(pos, str(seq)) for pos, seq in
+                          reverse.search(self.s)],
+                         [(6, "GCATT"), (20, "GCATT")])
+
+    def test_search_modified(self):
+        """Test searching after changing the instances."""
+        instances = self.m.instances
+        self.assertEqual(len(list(instances.search(self.s))), 3)
+        instances.append(Seq("GCATT", instances.alphabet))
+        self.assertEqual([pos for pos, seq in instances.search(self.s)],
+                         [0, 6, 10, 13, 20])
+
+
+class MotifTestDistribution(unittest.TestCase):
+    """Tests for the score distribution of a PSSM."""
+
+    def setUp(self):
+        """Define a PSSM for tests."""
+        with open("motifs/SRF.pfm") as handle:
+            motif = motifs.read(handle, "pfm")
+        motif.pseudocounts = 0.5
+        self.motif = motif
+        self.background = {"A": 0.3, "C": 0.2, "G": 0.2, "T": 0.3}
+
+    def test_thresholds(self):
+        """Test thresholds calculated from the score distribution."""
+        distribution = self.motif.pssm.distribution(self.background,
+                                                    precision=100)
+        self.assertAlmostEqual(sum(distribution.bg_density), 1.0)
+        self.assertAlmostEqual(distribution.threshold_fpr(0.01), -2.9061, 4)
+        self.assertAlmostEqual(distribution.threshold_fnr(0.1), 9.5674, 4)
+        self.assertAlmostEqual(distribution.threshold_balanced(1000),
+                               8.8443, 4)
+        self.assertAlmostEqual(distribution.threshold_patser(), 12.3995, 4)
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_pure_python(self):
+        """Test the NumPy and pure Python distributions are the same."""
+        from Bio.motifs import thresholds
+        pssm = self.motif.pssm
+        for background in (self.background, None):
+            if background is None:
+                background = dict.fromkeys("ACGT", 0.25)
+            distribution = thresholds.ScoreDistribution(
+                pssm=pssm, precision=50, background=background)
+            try:
+                thresholds.numpy = None
+                expected = thresholds.ScoreDistribution(
+                    pssm=pssm, precision=50, background=background)
+            finally:
+                thresholds.numpy = numpy
+            self.assertTrue(isinstance(expected.bg_density, list))
+            for a, b in zip(distribution.bg_density, expected.bg_density):
+                self.assertAlmostEqual(a, b, places=12)
+            for a, b in zip(distribution.mo_density, expected.mo_density):
+                self.assertAlmostEqual(a, b, places=12)
+            for fpr in (0.1, 0.01, 0.001):
+                self.assertAlmostEqual(distribution.threshold_fpr(fpr),
+                                       expected.threshold_fpr(fpr))
+
+    def test_cache(self):
+        """Test the score distributions are cached."""
+        distribution = self.motif.pssm.distribution(self.background)
+        # motif.pssm is a new but equal object every time
+        self.assertTrue(distribution is
+                        self.motif.pssm.distribution(self.background))
+        self.assertFalse(distribution is self.motif.pssm.distribution())
+        self.assertFalse(distribution is self.motif.pssm.distribution(
+            self.background, precision=100))
+        self.motif.pseudocounts = 0.25
+        self.assertFalse(distribution is
+                         self.motif.pssm.distribution(self.background))
+        self.motif.pseudocounts = 0.5
+        self.assertTrue(distribution is
+                        self.motif.pssm.distribution(self.background))
+        matrix.clear_distribution_cache()
+        self.assertEqual(len(matrix._distributions), 0)
+        self.assertFalse(distribution is
+                         self.motif.pssm.distribution(self.background))
+        # only the most recently used distributions are kept
+        for precision in range(10, 60):
+            self.motif.pssm.distribution(self.background, precision)
+        self.assertEqual(len(matrix._distributions),
+                         matrix._DISTRIBUTION_CACHE_SIZE)
+
+
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class MotifTestScanner(unittest.TestCase):
+    """Tests for scanning several motifs at once."""
+
+    def setUp(self):
+        """Define motifs and sequences for tests."""
+        with open("motifs/SRF.pfm") as handle:
+            srf = motifs.read(handle, "pfm")
+        with open("motifs/Arnt.sites") as handle:
+            arnt = motifs.read(handle, "sites")
+        self.motifs = [srf, arnt, arnt.reverse_complement()]
+        for motif in self.motifs:
+            # Avoid minus infinity scores, which ScoreDistribution rejects
+            motif.pseudocounts = 0.5
+        self.seqs = ["ACGTGTGCGTAGTGCGTCCATATAAGGNCCTTTTTGGAC",
+                     "cacgtgCACGTGtttCACGTGnnnCACG",
+                     "",
+                     "CACGTGGTGCAAAGGCCATATAAGGACCTTTTTGG" * 2]
+
+    def check_table(self, scanner, table, seq_offset=0):
+        """Compare a hit table to the hits of the motifs one by one."""
+        expected = []
+        for seq_index, seq in enumerate(self.seqs):
+            hits = []
+            for motif_index, motif in enumerate(self.motifs):
+                threshold = scanner.thresholds[motif_index]
+                for position, strand, score in zip(
+                        *motif.pssm.scan(Seq(seq, motif.alphabet), threshold,
+                                         scanner.both)):
+                    hits.append((position, motif_index, -strand, score))
+            hits.sort()
+            expected.extend((motif_index, seq_index + seq_offset, position,
+                             -strand, score)
+                            for position, motif_index, strand, score in hits)
+        self.assertEqual(len(table), len(expected))
+        for hit, values in zip(table.tolist(), expected):
+            self.assertEqual(hit[:4], values[:4])
+            self.assertAlmostEqual(hit[4], values[4], places=5)
+
+    def test_search(self):
+        """Test scanning several motifs over several sequences."""
+        from Bio.motifs.scanner import MotifScanner
+        for both in (True, False):
+            scanner = MotifScanner(self.motifs, [-10.0, 0.0, 2.0], both)
+            tables = list(scanner.search(self.seqs, batch_size=3))
+            self.assertEqual(len(tables), 2)
+            self.assertEqual(sorted(set(tables[0]["sequence"])), [0, 1])
+            self.check_table(scanner, numpy.concatenate(tables))
+            tables = list(scanner.search(iter(self.seqs), processes=2,
+                                         batch_size=1))
+            self.assertEqual(len(tables), 4)
+            self.check_table(scanner, numpy.concatenate(tables))
+
+    def test_scan(self):
+        """Test scanning several motifs over a single sequence."""
+        from Bio.motifs.scanner import MotifScanner
+        scanner = MotifScanner(self.motifs[1:], 2.0)
+        table = scanner.scan(Seq(self.seqs[1], self.motifs[1].alphabet))
+        # CACGTG is palindromic, so matches both motifs on both strands
+        self.assertEqual([hit[:4] for hit in table.tolist()],
+                         [(0, 0, 0, 1), (0, 0, 0, -1),
+                          (1, 0, 0, 1), (1, 0, 0, -1),
+                          (0, 0, 6, 1), (0, 0, 6, -1),
+                          (1, 0, 6, 1), (1, 0, 6, -1),
+                          (0, 0, 15, 1), (0, 0, 15, -1),
+                          (1, 0, 15, 1), (1, 0, 15, -1)])
+        for score in table["score"]:
+            self.assertAlmostEqual(score, 11.00341511, places=5)
+        self.assertEqual(len(scanner.scan("")), 0)
+
+    def test_pvalue(self):
+        """Test scanning several motifs with p-value thresholds."""
+        from Bio.motifs.scanner import MotifScanner
+        scanner = MotifScanner(self.motifs, pvalue=[0.01, 0.001, 0.001])
+        for threshold, motif, pvalue in zip(scanner.thresholds, self.motifs,
+                                            [0.01, 0.001, 0.001]):
+            distribution = motif.pssm.distribution()
+            self.assertAlmostEqual(threshold,
+                                   distribution.threshold_fpr(pvalue))
+        self.check_table(scanner,
+                         numpy.concatenate(list(scanner.search(self.seqs))))
+
+    def test_bad_arguments(self):
+        """Test the scanner rejects bad arguments."""
+        from Bio.motifs.scanner import MotifScanner
+        self.assertRaises(ValueError, MotifScanner, [])
+        self.assertRaises(ValueError, MotifScanner, self.motifs, [1.0, 2.0])
+        protein = motifs.create(["ACDE", "ACDF"], IUPAC.protein)
+        self.assertRaises(ValueError, MotifScanner, [protein])
+        scanner = MotifScanner(self.motifs)
+        self.assertRaises(ValueError, list, scanner.search(self.seqs,
+                                                           processes=0))
+        self.assertRaises(ValueError, list, scanner.search(self.seqs,
+                                                           batch_size=0))
+
+
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class MotifTestComparison(unittest.TestCase):
+    """Tests for comparing many motifs at once."""
+
+    def setUp(self):
+        """Define motifs for tests."""
+        with open("motifs/SRF.pfm") as handle:
+            srf = motifs.read(handle, "pfm")
+        with open("motifs/Arnt.sites") as handle:
+            arnt = motifs.read(handle, "sites")
+        self.motifs = [srf, arnt, arnt.reverse_complement(),
+                       motifs.create(["TACAA", "TACGC", "TACAC", "TACCC",
+                                      "AACCC", "AATGC", "AATGC"]),
+                       motifs.create(["GATTACAGA", "GATTACCGA", "GTTTACAGA"])]
+        for motif in self.motifs:
+            motif.pseudocounts = 0.5
+
+    def test_pearson(self):
+        """Test the Pearson distances match dist_pearson."""
+        from Bio.motifs.comparison import distance_matrix
+        distances, offsets = distance_matrix(self.motifs)
+        self.assertEqual(distances.shape, (5, 5))
+        for i, motif in enumerate(self.motifs):
+            for j, other in enumerate(self.motifs):
+                distance, offset = motif.pssm.dist_pearson(other.pssm)
+                self.assertAlmostEqual(distances[i, j], distance)
+                self.assertEqual(offsets[i, j], offset)
+            self.assertAlmostEqual(distances[i, i], 0.0)
+            self.assertEqual(offsets[i, i], 0)
+        pssms = [motif.pssm for motif in self.motifs]
+        parallel = distance_matrix(pssms, processes=2, block_size=2)
+        self.assertTrue(numpy.allclose(parallel[0], distances))
+        self.assertTrue((parallel[1] == offsets).all())
+        part = distance_matrix(pssms[:2], pssms[2:])
+        self.assertTrue(numpy.allclose(part[0], distances[:2, 2:]))
+        self.assertTrue((part[1] == offsets[:2, 2:]).all())
+
+    def test_euclidean(self):
+        """Test the Euclidean distances between motifs."""
+        from Bio.motifs.comparison import distance_matrix
+        distances, offsets = distance_matrix(self.motifs, metric="euclidean")
+        self.assertTrue(numpy.allclose(distances, distances.T))
+        self.assertTrue(numpy.allclose(distances.diagonal(), 0.0, atol=1e-6))
+        # Check one pair against the definition
+        a = self.motifs[0].pssm
+        b = self.motifs[3].pssm
+        offset = int(offsets[0, 3])
+        start = min(0, offset)
+        stop = max(a.length, b.length + offset)
+        total = 0.0
+        for i in range(start, stop):
+            for letter in "ACGT":
+                x = a[letter, i] if 0 <= i < a.length else 0.0
+                j = i - offset
+                y = b[letter, j] if 0 <= j < b.length else 0.0
+                total += (x - y) ** 2
+        self.assertAlmostEqual(distances[0, 3],
+                               math.sqrt(total / (4 * (stop - start))))
+
+    def test_cluster(self):
+        """Test the distance matrix can be used for clustering."""
+        from Bio.motifs.comparison import distance_matrix
+        from Bio.Cluster import treecluster
+        distances, offsets = distance_matrix(self.motifs)
+        tree = treecluster(None, distancematrix=distances, method="a")
+        self.assertEqual(len(tree), 4)
+        # The first node should join the two closest motifs
+        numpy.fill_diagonal(distances, numpy.inf)
+        i, j = numpy.unravel_index(numpy.argmin(distances), distances.shape)
+        self.assertEqual(sorted([tree[0].left, tree[0].right]),
+                         sorted([i, j]))
+
+    def test_bad_arguments(self):
+        """Test bad arguments are rejected."""
+        from Bio.motifs.comparison import distance_matrix
+        self.assertRaises(ValueError, distance_matrix, [])
+        self.assertRaises(ValueError, distance_matrix, self.motifs,
+                          metric="spearman")
+        self.assertRaises(ValueError, distance_matrix, self.motifs,
+                          processes=0)
+        protein = motifs.create(["ACDE", "ACDF"], IUPAC.protein)
+        self.assertRaises(ValueError, distance_matrix, self.motifs,
+                          [protein])
+
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity=2)
     unittest.main(testRunner=runner)
@@ -0,0 +1,215 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Tests for Bio.motifs.jaspar.db using a local SQLite JASPAR database."""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import warnings
+
+from Bio import BiopythonWarning
+from Bio.motifs.jaspar.db import JASPAR5
+
+
+SCHEMA = """
+CREATE TABLE MATRIX (ID INTEGER PRIMARY KEY, COLLECTION VARCHAR(16),
+                     BASE_ID VARCHAR(16), VERSION INTEGER, NAME VARCHAR(255));
+CREATE TABLE MATRIX_DATA (ID INTEGER, row VARCHAR(1), col INTEGER,
+                          val FLOAT);
+CREATE TABLE MATRIX_ANNOTATION (ID INTEGER, TAG VARCHAR(255),
+                                VAL VARCHAR(255));
+CREATE TABLE MATRIX_SPECIES (ID INTEGER, TAX_ID VARCHAR(255));
+CREATE TABLE MATRIX_PROTEIN (ID INTEGER, ACC VARCHAR(255));
+"""
+
+# internal ID, collection, base ID, version, name, counts (A, C, G, T)
+MATRICES = [
+    (1, "CORE", "MA0004", 1, "Arnt",
+     ([4, 19, 0, 0, 0, 0], [16, 0, 20, 0, 0, 0],
+      [0, 1, 0, 20, 0, 20], [0, 0, 0, 0, 20, 0])),
+    (2, "CORE", "MA0006", 1, "Ahr::Arnt",
+     ([3, 0, 0, 0, 0, 0], [8, 0, 23, 0, 0, 0],
+      [2, 23, 0, 23, 0, 24], [11, 1, 1, 1, 24, 0])),
+    (3, "CORE", "MA0098", 1, "ETS1",
+     ([0, 1, 2], [5, 4, 0], [0, 0, 3], [0, 0, 0])),
+    (4, "CORE", "MA0098", 2, "ETS1",
+     ([1, 5, 0, 0], [0, 0, 0, 6], [5, 0, 6, 0], [0, 1, 0, 0])),
+    (5, "PBM", "PB0001", 1, "Arid3a",
+     ([1, 2], [3, 0], [0, 1], [0, 1])),
+]
+
+ANNOTATIONS = [
+    (1, "class", "Zipper-Type"),
+    (1, "family", "Helix-Loop-Helix"),
+    (1, "tax_group", "vertebrates"),
+    (1, "type", "SELEX"),
+    (1, "medline", "7592839"),
+    (1, "pazar_tf_id", "TF0000003"),
+    (1, "comment", "-"),
+    (2, "class", "Zipper-Type"),
+    (2, "family", "Helix-Loop-Helix"),
+    (2, "tax_group", "vertebrates"),
+    (3, "class", "Tryptophan cluster factors"),
+    (4, "class", "Tryptophan cluster factors"),
+    (4, "tax_group", "vertebrates"),
+    (5, "tax_group", "vertebrates"),
+]
+
+SPECIES = [(1, "10090"), (2, "10090"), (2, "9606"), (4, "9606")]
+
+PROTEINS = [(1, "P53762"), (2, "P30561"), (2, "P53762"), (4, "P14921")]
+
+
+def create_database(connection):
+    """Fill an empty SQLite database with the test JASPAR tables."""
+    connection.executescript(SCHEMA)
+    for int_id, collection, base_id, version, name, counts in MATRICES:
+        connection.execute("INSERT INTO MATRIX VALUES (?, ?, ?, ?, ?)",
+                           (int_id, collection, base_id, version, name))
+        for base, values in zip("ACGT", counts):
+            # insert the columns in reverse, as the order is not guaranteed
+            for col in reversed(range(len(values))):
+                connection.execute("INSERT INTO MATRIX_DATA "
+                                   "VALUES (?, ?, ?, ?)",
+                                   (int_id, base, col + 1, values[col]))
+    connection.executemany("INSERT INTO MATRIX_ANNOTATION VALUES (?, ?, ?)",
+                           ANNOTATIONS)
+    connection.executemany("INSERT INTO MATRIX_SPECIES VALUES (?, ?)",
+                           SPECIES)
+    connection.executemany("INSERT INTO MATRIX_PROTEIN VALUES (?, ?)",
+                           PROTEINS)
+    connection.commit()
+
+
+class JASPAR5SQLiteTests(unittest.TestCase):
+    """Reading motifs from an SQLite stand-in for a JASPAR database."""
+
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        create_database(self.connection)
+        self.jdb = JASPAR5(connection=self.connection)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def check_motif(self, motif, int_id):
+        """Check the motif against the one fetched by the old queries."""
+        (int_id, collection, base_id, version, name,
+         counts) = MATRICES[int_id - 1]
+        self.assertEqual(motif.matrix_id, "%s.%i" % (base_id, version))
+        self.assertEqual(motif.name, name)
+        self.assertEqual(motif.collection, collection)
+        for base, values in zip("ACGT", counts):
+            self.assertEqual(list(motif.counts[base]), values)
+        self.assertEqual(motif.counts,
+                         self.jdb._fetch_counts_matrix(int_id))
+        self.assertEqual(motif.species,
+                         [tax_id for i, tax_id in SPECIES if i == int_id])
+        self.assertEqual(motif.acc,
+                         [acc for i, acc in PROTEINS if i == int_id])
+
+    def test_fetch_motif_by_id(self):
+        """Fetch single motifs by their full or base matrix ID."""
+        motif = self.jdb.fetch_motif_by_id("MA0004.1")
+        self.check_motif(motif, 1)
+        self.assertEqual(motif.tf_class, "Zipper-Type")
+        self.assertEqual(motif.tf_family, "Helix-Loop-Helix")
+        self.assertEqual(motif.tax_group, "vertebrates")
+        self.assertEqual(motif.data_type, "SELEX")
+        self.assertEqual(motif.medline, "7592839")
+        self.assertEqual(motif.pazar_id, "TF0000003")
+        self.assertEqual(motif.comment, "-")
+        self.check_motif(self.jdb.fetch_motif_by_id("MA0098"), 4)
+        self.check_motif(self.jdb.fetch_motif_by_id("MA0098.1"), 3)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", BiopythonWarning)
+            self.assertIsNone(self.jdb.fetch_motif_by_id("MA9999"))
+
+    def test_fetch_motifs(self):
+        """Fetch motifs by selection criteria."""
+        motifs = self.jdb.fetch_motifs()
+        self.assertEqual([motif.matrix_id for motif in motifs],
+                         ["MA0004.1", "MA0006.1", "MA0098.2"])
+        for motif, int_id in zip(motifs, [1, 2, 4]):
+            self.check_motif(motif, int_id)
+        motifs = self.jdb.fetch_motifs(all_versions=True)
+        self.assertEqual(sorted(motif.matrix_id for motif in motifs),
+                         ["MA0004.1", "MA0006.1", "MA0098.1", "MA0098.2"])
+        motifs = self.jdb.fetch_motifs(collection=None,
+                                       tax_group="vertebrates",
+                                       species="9606")
+        self.assertEqual(sorted(motif.matrix_id for motif in motifs),
+                         ["MA0006.1", "MA0098.2"])
+        motifs = self.jdb.fetch_motifs(tf_class="Zipper-Type", min_length=6,
+                                       min_sites=21)
+        self.assertEqual([motif.matrix_id for motif in motifs], ["MA0006.1"])
+        motifs = self.jdb.fetch_motifs_by_name("ETS1")
+        self.assertEqual([motif.matrix_id for motif in motifs], ["MA0098.2"])
+        motifs = self.jdb.fetch_motifs(matrix_id=["MA0098", "PB0001.1"])
+        self.assertEqual([motif.matrix_id for motif in motifs],
+                         ["MA0098.2", "PB0001.1"])
+        self.check_motif(motifs[1], 5)
+        self.assertEqual(motifs[1].species, [])
+        self.assertEqual(motifs[1].acc, [])
+
+    @unittest.skipUnless(hasattr(sqlite3.Connection, "set_trace_callback"),
+                         "SQLite query tracing not available")
+    def test_all(self):
+        """Fetch all the motifs in a small number of queries."""
+        queries = []
+        self.connection.set_trace_callback(queries.append)
+        motifs = self.jdb.fetch_motifs(all=True)
+        self.connection.set_trace_callback(None)
+        self.assertEqual([motif.matrix_id for motif in motifs],
+                         ["MA0004.1", "MA0006.1", "MA0098.1", "MA0098.2",
+                          "PB0001.1"])
+        for int_id, motif in enumerate(motifs, 1):
+            self.check_motif(motif, int_id)
+        # One query for the IDs, and one for each of the five tables
+        self.assertEqual(len(queries), 6)
+
+    def test_latest_versions(self):
+        """Check the latest versions found at once and one by one agree."""
+        latest = self.jdb._fetch_latest_internal_ids()
+        self.assertEqual(latest, set([1, 2, 4, 5]))
+        for int_id in range(1, 6):
+            self.assertEqual(int_id in latest,
+                             self.jdb._is_latest_version(int_id))
+
+
+class JASPAR5SnapshotTests(unittest.TestCase):
+    """Keeping a local snapshot of a JASPAR database."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="biopython-test")
+        self.filename = os.path.join(self.temp_dir, "jaspar.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cache(self):
+        """Create the snapshot cache file, and then read from it."""
+        connection = sqlite3.connect(":memory:")
+        create_database(connection)
+        jdb = JASPAR5(connection=connection, cache=self.filename)
+        expected = [str(motif) for motif in jdb.fetch_motifs(all=True)]
+        connection.close()
+        self.assertTrue(os.path.isfile(self.filename))
+        self.assertFalse(os.path.isfile(self.filename + ".tmp"))
+        # The server is not needed once the cache exists
+        jdb = JASPAR5(host="jaspar.invalid", name="JASPAR",
+                      cache=self.filename)
+        self.assertEqual([str(motif) for motif in jdb.fetch_motifs(all=True)],
+                         expected)
+        self.assertEqual(str(jdb.fetch_motif_by_id("MA0098")), expected[3])
+        jdb.dbh.close()
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)